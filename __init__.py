@@ -37,7 +37,11 @@ def classFactory(iface):  # pylint: disable=invalid-name
     """
     # Yeah, this is annoying but QGIS needs it so....
     # pylint: disable=import-error
-    from .src.qris_toolbar import QRiSToolbar
+    from .src.QRiS.lazy_loader import record_imports
+
+    # Time the plugin modules imported at startup (logged when startup diagnostics are enabled)
+    with record_imports(__name__):
+        from .src.qris_toolbar import QRiSToolbar
     from .__version__ import __version__
 
     return QRiSToolbar(iface)
@@ -0,0 +1,166 @@
+"""Deferred imports for plugin startup.
+
+Forms, charts and processing tasks are registered as LazyObjects that import their
+module the first time they are called or an attribute is read from them. Every plugin
+module imported while an ImportTimer is installed has its import time recorded so the
+cost of startup (and of each deferred import) can be reported as a diagnostic.
+"""
+
+import sys
+import time
+import importlib
+import importlib.abc
+import threading
+from contextlib import contextmanager
+
+STARTUP_DIAGNOSTICS_KEY = 'startupDiagnosticsEnabled'
+
+# {module name: inclusive import seconds} in the order the imports completed
+_import_timings = {}
+_timer_lock = threading.RLock()
+_timer_depth = 0
+
+
+class _TimedLoader(importlib.abc.Loader):
+    """Wraps a module loader and records how long executing the module takes."""
+
+    def __init__(self, loader):
+        self.loader = loader
+
+    def create_module(self, spec):
+        return self.loader.create_module(spec)
+
+    def exec_module(self, module):
+        start = time.perf_counter()
+        try:
+            self.loader.exec_module(module)
+        finally:
+            _import_timings[module.__name__] = time.perf_counter() - start
+
+    def __getattr__(self, name):
+        return getattr(self.loader, name)
+
+
+class ImportTimer(importlib.abc.MetaPathFinder):
+    """Meta path finder that times the import of every module below package."""
+
+    def __init__(self, package: str):
+        self.package = package
+
+    def find_spec(self, fullname, path, target=None):
+        if fullname != self.package and not fullname.startswith(self.package + '.'):
+            return None
+
+        for finder in sys.meta_path:
+            if finder is self or isinstance(finder, ImportTimer):
+                continue
+            find_spec = getattr(finder, 'find_spec', None)
+            if find_spec is None:
+                continue
+            spec = find_spec(fullname, path, target)
+            if spec is not None:
+                if spec.loader is not None and hasattr(spec.loader, 'exec_module'):
+                    spec.loader = _TimedLoader(spec.loader)
+                return spec
+        return None
+
+
+@contextmanager
+def record_imports(package: str):
+    """Record the import time of every module in package imported within the block."""
+
+    global _timer_depth
+    with _timer_lock:
+        timer = None
+        if _timer_depth == 0:
+            timer = ImportTimer(package)
+            sys.meta_path.insert(0, timer)
+        _timer_depth += 1
+    try:
+        yield
+    finally:
+        with _timer_lock:
+            _timer_depth -= 1
+            if timer is not None:
+                sys.meta_path.remove(timer)
+
+
+def import_timings() -> dict:
+    """Return a copy of the recorded {module name: seconds} import timings."""
+    return dict(_import_timings)
+
+
+def startup_diagnostics(top: int = 15) -> list:
+    """Human readable lines listing the slowest recorded plugin module imports."""
+
+    lines = [f'QRiS module imports: {len(_import_timings)} modules timed']
+    slowest = sorted(_import_timings.items(), key=lambda item: item[1], reverse=True)[:top]
+    for module_name, seconds in slowest:
+        lines.append(f'  {module_name}: {seconds * 1000:.1f} ms')
+    return lines
+
+
+class LazyObject:
+    """Stand-in for a class, function or module that is imported on first use.
+
+    Calling the object calls the real target, and reading an attribute reads it from
+    the real target, so call sites do not change when an import is deferred.
+    """
+
+    def __init__(self, registry, module_name: str, attribute: str = None):
+        self._registry = registry
+        self._module_name = module_name
+        self._attribute = attribute
+        self._target = None
+
+    @property
+    def loaded(self) -> bool:
+        return self._target is not None
+
+    def resolve(self):
+        if self._target is None:
+            module = self._registry.import_module(self._module_name)
+            self._target = module if self._attribute is None else getattr(module, self._attribute)
+        return self._target
+
+    def __call__(self, *args, **kwargs):
+        return self.resolve()(*args, **kwargs)
+
+    def __getattr__(self, name):
+        # Only called for attributes not found on the LazyObject itself
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return getattr(self.resolve(), name)
+
+    def __repr__(self):
+        target = self._module_name if self._attribute is None else f'{self._module_name}.{self._attribute}'
+        return f'<LazyObject {target}{" (loaded)" if self.loaded else ""}>'
+
+
+class LazyRegistry:
+    """Registry of deferred imports relative to a package."""
+
+    def __init__(self, package: str):
+        self.package = package
+        self.entries = {}
+        # Import timing is recorded against the top level plugin package
+        self._root_package = package.split('.')[0]
+
+    def register(self, module_name: str, attribute: str = None, name: str = None) -> LazyObject:
+        """Register a module (or an attribute of a module) and return its LazyObject."""
+
+        key = name or attribute or module_name
+        lazy = LazyObject(self, module_name, attribute)
+        self.entries[key] = lazy
+        return lazy
+
+    def import_module(self, module_name: str):
+        with record_imports(self._root_package):
+            return importlib.import_module(module_name, self.package)
+
+    def get(self, name: str):
+        """Return the real object registered under name, importing it if required."""
+        return self.entries[name].resolve()
+
+    def loaded(self) -> list:
+        return [name for name, lazy in self.entries.items() if lazy.loaded]
@@ -1,5 +1,6 @@
 import os
 import json
+import sqlite3
 from textwrap import dedent
 
 from .riverscapes_map_manager import RiverscapesMapManager
@@ -18,14 +19,19 @@ from ..model.cross_sections import CrossSections
 
 from ..lib.climate_engine import CLIMATE_ENGINE_MACHINE_CODE
 from ..gp.map_centroid import build_aoi_centroids_layer
+from ..gp.import_photos_task import dce_photo_viewer_folder
+from ..gp.sample_frame_geometry import update_sample_frame_geometries
 
-from .path_utilities import parse_posix_path
+from .path_utilities import parse_posix_path, is_url
+from .sql_utilities import validate_sql_identifier
 
 from qgis.utils import iface
+from qgis.PyQt.QtCore import QMetaType
 from qgis.core import (
     Qgis,
     QgsVectorLayer,
     QgsMapLayer,
+    QgsLayerTreeGroup,
     QgsProject,
     QgsExpressionContextUtils,
     qgsfunction,
@@ -47,6 +53,8 @@ class QRisMapManager(RiverscapesMapManager):
     def __init__(self, project: Project) -> None:
         super().__init__('QRiS')
         self.project: Project = project
+        # layer definition id -> form field configuration shared by all event layers of that definition
+        self._event_layer_field_configs: dict = {}
         # add the project folder to the front of symbology_folders
         self.symbology_folders.insert(0, os.path.dirname(self.project.project_file))
 
@@ -69,9 +77,9 @@ class QRisMapManager(RiverscapesMapManager):
     def stop_edits(self):
         super().stop_edits()
         
-        # Flush the changes to the geopackage
+        # Checkpoint the edits into the geopackage in the background
         if self.project:
-            self.project.flush(vacuum=False)
+            self.project.request_flush()
 
     def get_layer_for_export(self, db_item: DBItem, add_to_map: bool = False) -> QgsVectorLayer:
         """
@@ -114,6 +122,7 @@ class QRisMapManager(RiverscapesMapManager):
         symbology = 'mask'
         fc_path = f'{self.project.project_file}|layername={layer_name}'
         feature_layer = self.create_db_item_feature_layer(self.project.map_guid, group_layer, fc_path, aoi, 'sample_frame_id', symbology, add_to_map=add_to_map)
+        self.track_sample_frame_geometries(feature_layer, aoi)
 
         # setup fields
         self.set_hidden(feature_layer, 'fid', 'AOI Feature ID')
@@ -182,6 +191,7 @@ class QRisMapManager(RiverscapesMapManager):
 
         fc_path = f'{self.project.project_file}|layername=sample_frame_features'
         feature_layer = self.create_db_item_feature_layer(self.project.map_guid, group_layer, fc_path, sample_frame, 'sample_frame_id', 'sampling_frames', add_to_map=add_to_map)
+        self.track_sample_frame_geometries(feature_layer, sample_frame)
 
         # setup fields
         self.set_hidden(feature_layer, 'fid', 'Sample Frame Feature ID')
@@ -272,6 +282,7 @@ class QRisMapManager(RiverscapesMapManager):
     
         fc_path = f'{self.project.project_file}|layername=sample_frame_features'
         feature_layer = self.create_db_item_feature_layer(self.project.map_guid, group_layer, fc_path, valley_bottom, 'sample_frame_id', 'valley_bottom', add_to_map=add_to_map)
+        self.track_sample_frame_geometries(feature_layer, valley_bottom)
 
         # setup fields
         self.set_hidden(feature_layer, 'fid', 'VB Feature ID')
@@ -286,6 +297,17 @@ class QRisMapManager(RiverscapesMapManager):
 
         return feature_layer
 
+    def track_sample_frame_geometries(self, feature_layer: QgsVectorLayer, sample_frame: SampleFrame) -> None:
+        """Refresh the stored projected geometries of the sample frame whenever edits to its features are saved."""
+
+        def update_geometries():
+            try:
+                update_sample_frame_geometries(self.project.project_file, sample_frame.id)
+            except Exception as ex:
+                QgsMessageLog.logMessage(f"Error storing geometries for '{sample_frame.name}': {ex}", "QRiS", Qgis.Warning)
+
+        feature_layer.afterCommitChanges.connect(update_geometries)
+
     def build_stream_gage_layer(self) -> QgsMapLayer:
 
         existing_layer = self.get_machine_code_layer(self.project.map_guid, STREAM_GAGE_MACHINE_CODE, None)
@@ -447,30 +469,91 @@ class QRisMapManager(RiverscapesMapManager):
 
         group_layer = None
         if add_to_map:
-            machine_code = EVENT_MACHINE_CODE
-            group_name = 'Data Capture Events'
-            if event.event_type.id == DESIGN_EVENT_TYPE_ID:
-                machine_code = DESIGN_MACHINE_CODE
-                group_name = 'Designs'
-            if event.event_type.id == AS_BUILT_EVENT_TYPE_ID:
-                machine_code = AS_BUILT_MACHINE_CODE
-                group_name = 'As-Builts'
-
-            project_group = self.get_group_layer(self.project.map_guid, PROJECT_MACHINE_CODE, self.project.name, None, True)
-            events_group_layer = self.get_group_layer(self.project.map_guid, f'{machine_code}_ROOT', group_name, project_group, True)
-            event_group_layer = self.get_group_layer(self.project.map_guid, f'{machine_code}_{event.id}', event.name, events_group_layer, True, True)
-            
-            group_layer = event_group_layer
-            if event_layer.layer.hierarchy is not None:
-                # need to add group layers for each hierarchy level
-                for hierarchy_level in event_layer.layer.hierarchy:
-                    group_layer = self.get_group_layer(self.project.map_guid, f'{machine_code}_{event.id}_{hierarchy_level}', hierarchy_level, group_layer, True, True)
+            group_layer = self.get_event_layer_group(event, event_layer)
 
             existing_layer = self.get_db_item_layer(self.project.map_guid, event_layer, group_layer)
             if existing_layer is not None and extra_filter is None:
                 layer = existing_layer.layer()
                 return layer
 
+        return self.create_event_feature_layer(event, event_layer, group_layer, add_to_map=add_to_map, extra_filter=extra_filter, layer_name_override=layer_name_override)
+
+    def build_event_layers(self, event: Event, event_layers: list = None) -> list:
+        """
+        Add several layers for an event to the map in one batch.
+
+        Group layers, symbology and field configuration are resolved once and shared
+        between layers, the metadata keys for the virtual fields are read with one query
+        per DCE feature class and the new layers are added to the layer tree together.
+        """
+        if event_layers is None:
+            event_layers = event.event_layers
+
+        layers = []
+        new_layer_entries = []
+        group_layers = {}
+        metadata_field_types = None
+        edit_mode = self.get_edit_mode()
+        for event_layer in event_layers:
+            # if lookup table then forget about it
+            if event_layer.layer.is_lookup:
+                continue
+
+            hierarchy = tuple(event_layer.layer.hierarchy) if event_layer.layer.hierarchy is not None else ()
+            if hierarchy not in group_layers:
+                group_layers[hierarchy] = self.get_event_layer_group(event, event_layer)
+            group_layer = group_layers[hierarchy]
+
+            existing_layer = self.get_db_item_layer(self.project.map_guid, event_layer, group_layer)
+            if existing_layer is not None:
+                layers.append(existing_layer.layer())
+                continue
+
+            if metadata_field_types is None:
+                metadata_field_types = self.get_event_metadata_field_types(event, {el.fc_name for el in event_layers})
+
+            feature_layer = self.create_event_feature_layer(
+                event,
+                event_layer,
+                group_layer,
+                add_to_map=False,
+                metadata_field_types=metadata_field_types.get((event_layer.fc_name, event_layer.layer.id), {}),
+                edit_mode=edit_mode
+            )
+            new_layer_entries.append((feature_layer, group_layer, event_layer))
+            layers.append(feature_layer)
+
+        self.add_db_item_feature_layers(self.project.map_guid, new_layer_entries)
+
+        return layers
+
+    def get_event_layer_group(self, event: Event, event_layer: EventLayer) -> QgsLayerTreeGroup:
+        """Get (or create) the group layer that an event layer belongs in, including any layer hierarchy groups."""
+
+        machine_code = EVENT_MACHINE_CODE
+        group_name = 'Data Capture Events'
+        if event.event_type.id == DESIGN_EVENT_TYPE_ID:
+            machine_code = DESIGN_MACHINE_CODE
+            group_name = 'Designs'
+        if event.event_type.id == AS_BUILT_EVENT_TYPE_ID:
+            machine_code = AS_BUILT_MACHINE_CODE
+            group_name = 'As-Builts'
+
+        project_group = self.get_group_layer(self.project.map_guid, PROJECT_MACHINE_CODE, self.project.name, None, True)
+        events_group_layer = self.get_group_layer(self.project.map_guid, f'{machine_code}_ROOT', group_name, project_group, True)
+        event_group_layer = self.get_group_layer(self.project.map_guid, f'{machine_code}_{event.id}', event.name, events_group_layer, True, True)
+
+        group_layer = event_group_layer
+        if event_layer.layer.hierarchy is not None:
+            # need to add group layers for each hierarchy level
+            for hierarchy_level in event_layer.layer.hierarchy:
+                group_layer = self.get_group_layer(self.project.map_guid, f'{machine_code}_{event.id}_{hierarchy_level}', hierarchy_level, group_layer, True, True)
+
+        return group_layer
+
+    def create_event_feature_layer(self, event: Event, event_layer: EventLayer, group_layer: QgsLayerTreeGroup, add_to_map: bool = True, extra_filter: str = None, layer_name_override: str = None, metadata_field_types: dict = None, edit_mode: bool = None) -> QgsVectorLayer:
+        """Create and configure the feature layer for an event layer."""
+
         if event_layer.layer.geom_type == 'Point':
             fc_name = 'dce_points'
         elif event_layer.layer.geom_type == 'Linestring':
@@ -490,6 +573,7 @@ class QRisMapManager(RiverscapesMapManager):
             else:
                 layer_name += " (Filtered)"
             
+        # All layers of the same feature class share the same data source path so that the OGR provider can share the dataset connection
         fc_path = f'{self.project.project_file}|layername={fc_name}|subset={subset_string}'
         feature_layer = self.create_db_item_feature_layer(
             self.project.map_guid, 
@@ -499,7 +583,8 @@ class QRisMapManager(RiverscapesMapManager):
             None, 
             event_layer.layer.qml, 
             add_to_map=add_to_map,
-            layer_name_override=layer_name if extra_filter else None
+            layer_name_override=layer_name if extra_filter else None,
+            edit_mode=edit_mode
         )
         
         if feature_layer and not feature_layer.crs().isValid():
@@ -515,7 +600,7 @@ class QRisMapManager(RiverscapesMapManager):
         self.set_hidden(feature_layer, 'fid', 'Feature ID')
         self.set_hidden(feature_layer, 'event_layer_id', 'Layer ID')
         self.set_hidden(feature_layer, 'event_id', 'Event ID')
-        self.metadata_field(feature_layer, event_layer, 'metadata')
+        self.metadata_field(feature_layer, event_layer, 'metadata', metadata_field_types)
 
         # add length field for line layers
         if event_layer.layer.geom_type == 'Linestring':
@@ -527,7 +612,41 @@ class QRisMapManager(RiverscapesMapManager):
 
         return feature_layer
 
-    def metadata_field(self, feature_layer: QgsVectorLayer, event_layer: EventLayer, field_name: str) -> None:
+    def get_event_metadata_field_types(self, event: Event, fc_names: set) -> dict:
+        """
+        Read the keys (and value types) of the feature 'metadata' section for every layer of an event.
+        Returns {(fc_name, event_layer_id): {key: QMetaType}} using the type of the first value found for each key.
+        """
+        field_types = {}
+        with sqlite3.connect(self.project.project_file) as conn:
+            curs = conn.cursor()
+            for fc_name in fc_names:
+                validate_sql_identifier(fc_name)
+                curs.execute(f"""SELECT fc.event_layer_id, j.key, j.type, j.value
+                    FROM {fc_name} fc, json_each(CASE WHEN json_valid(fc.metadata) THEN fc.metadata ELSE '{{}}' END, '$.metadata') j
+                    WHERE fc.event_id = ?
+                    ORDER BY fc.fid""", [event.id])  # nosec B608 - fc_name is validated and is one of the fixed DCE feature classes
+                for event_layer_id, key, value_type, value in curs.fetchall():
+                    layer_types: dict = field_types.setdefault((fc_name, event_layer_id), {})
+                    if key in layer_types:
+                        continue
+                    if value_type in ('integer', 'true', 'false'):
+                        layer_types[key] = QMetaType.Int
+                    elif value_type == 'real':
+                        layer_types[key] = QMetaType.Double
+                    elif is_url(value):
+                        layer_types[key] = QMetaType.QUrl
+                    else:
+                        layer_types[key] = QMetaType.QString
+        return field_types
+
+    def get_event_layer_field_config(self, event_layer: EventLayer) -> dict:
+        """Get the form field configuration for a layer definition. It is built once and shared by every event that uses the layer."""
+
+        config = self._event_layer_field_configs.get(event_layer.layer.id)
+        if config is not None:
+            return config
+
         config: dict = event_layer.layer.metadata
         if 'fields' not in config:
             config['fields'] = []
@@ -545,9 +664,15 @@ class QRisMapManager(RiverscapesMapManager):
         if 'notes' not in [field['id'] for field in fields]:
             config['fields'].append({'id': 'notes', 'type': 'long_text', 'label': 'Notes'})
 
+        self._event_layer_field_configs[event_layer.layer.id] = config
+        return config
+
+    def metadata_field(self, feature_layer: QgsVectorLayer, event_layer: EventLayer, field_name: str, metadata_field_types: dict = None) -> None:
+        config = self.get_event_layer_field_config(event_layer)
+
         # build virtual metadata fields for attribute table
-        default_photo_path = os.path.join(os.path.dirname(self.project.project_file), 'photos', f'dce_{str(event_layer.event_id).zfill(3)}').replace('\\', '/')
-        self.set_metadata_virtual_fields(feature_layer, config, default_photo_path)
+        default_photo_path = dce_photo_viewer_folder(self.project.project_file, event_layer.event_id).replace('\\', '/')
+        self.set_metadata_virtual_fields(feature_layer, config, default_photo_path, metadata_field_types)
 
         # prepare the metadata attribute editor widget
         self.set_metadata_attribute_editor(feature_layer, 'metadata', 'Metadata', config)
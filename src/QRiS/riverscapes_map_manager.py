@@ -5,6 +5,7 @@ from textwrap import dedent
 
 from qgis.PyQt.QtGui import QColor
 from qgis.PyQt.QtCore import QVariant, QMetaType, pyqtSignal, QObject
+from qgis.PyQt.QtXml import QDomDocument
 from qgis.utils import iface
 
 from .path_utilities import is_url
@@ -56,11 +57,27 @@ class RiverscapesMapManager(QObject):
         self.symbology_folders: list = settings.getValue('symbologyDir')
         self.layer_order = ['Basemaps']
         self._previous_canvas_selection_color: QColor = None
+        # symbology key -> resolved qml path, and qml path -> parsed style document
+        self._symbology_qml_cache: dict = {}
+        self._symbology_style_cache: dict = {}
+
+    def clear_symbology_cache(self) -> None:
+        """Forget resolved and parsed QML files, e.g. after symbology files are edited on disk."""
+        self._symbology_qml_cache.clear()
+        self._symbology_style_cache.clear()
 
     def get_symbology_qml(self, symbology_key: str) -> str:
         
         if symbology_key is None:
             return None
+        if symbology_key in self._symbology_qml_cache:
+            return self._symbology_qml_cache[symbology_key]
+        qml = self._find_symbology_qml(symbology_key)
+        self._symbology_qml_cache[symbology_key] = qml
+        return qml
+
+    def _find_symbology_qml(self, symbology_key: str) -> str:
+
         raw_symbology_filename = symbology_key if symbology_key.endswith('.qml') else f'{symbology_key}.qml'
         qml = None
         # check if we can split the file name into a folder and file name
@@ -83,6 +100,26 @@ class RiverscapesMapManager(QObject):
         # if we can't find the symbology file, return None and let the layer use the default symbology        
         return qml
 
+    def load_symbology(self, layer: QgsMapLayer, symbology_key: str) -> bool:
+        """Apply the QML for the symbology key to the layer. Each QML file is only read and parsed once."""
+
+        qml = self.get_symbology_qml(symbology_key)
+        if qml is None or not os.path.isfile(qml):
+            return False
+
+        style_doc = self._symbology_style_cache.get(qml)
+        if style_doc is None:
+            style_doc = QDomDocument()
+            with open(qml, 'r', encoding='utf-8') as f:
+                if not style_doc.setContent(f.read()):
+                    # Let QGIS report the problem with the file
+                    _message, result = layer.loadNamedStyle(qml)
+                    return result
+            self._symbology_style_cache[qml] = style_doc
+
+        result, _message = layer.importNamedStyle(style_doc)
+        return result
+
     def get_product_key_layers(self) -> list:
 
         layers = QgsProject.instance().layerTreeRoot().findLayers()
@@ -305,34 +342,38 @@ class RiverscapesMapManager(QObject):
             if layer is not None and layer.type() == QgsMapLayer.VectorLayer:
                 self.apply_selection_color_override(layer)
 
-    def create_db_item_feature_layer(self, project_key: str, parent_group: QgsLayerTreeGroup, fc_path: str, db_item: DBItem, id_field: str, symbology_key: str, add_to_map: bool=True, layer_name_override: str=None) -> QgsVectorLayer:
+    def create_db_item_feature_layer(self, project_key: str, parent_group: QgsLayerTreeGroup, fc_path: str, db_item: DBItem, id_field: str, symbology_key: str, add_to_map: bool=True, layer_name_override: str=None, edit_mode: bool=None) -> QgsVectorLayer:
         """
         Creates a new feature layer for the specified DBItem and adds it to the map.
         args:
             project_key: The project key
                 db_item: The DBItem to create a layer for
-                symbology: The symbology to apply to the layer. File name only. No folder or extension."""
-
-        zoom = self.test_for_zoom()
+                symbology: The symbology to apply to the layer. File name only. No folder or extension.
+                edit_mode: The current map edit mode, if already known by the caller."""
 
         if add_to_map and layer_name_override is None:
             layer = self.get_db_item_layer(project_key, db_item, None)
             if layer is not None:
                 return layer.layer()
 
+        zoom = self.test_for_zoom() if add_to_map else False
+
         # Create a layer from the table
         if id_field is not None:
             id_value = db_item.event_id if id_field == 'event_id' else db_item.id
             fc_path = fc_path + f'|subset={id_field} = {id_value}'
         
+        # Skip probing the GeoPackage for a default style when a QML is going to replace it anyway
+        qml = self.get_symbology_qml(symbology_key)
+        layer_options = QgsVectorLayer.LayerOptions(QgsProject.instance().transformContext())
+        layer_options.loadDefaultStyle = qml is None or not os.path.isfile(qml)
+
         layer_name = layer_name_override if layer_name_override else db_item.name
-        layer = QgsVectorLayer(fc_path, layer_name, 'ogr')
+        layer = QgsVectorLayer(fc_path, layer_name, 'ogr', layer_options)
         # QgsProject.instance().addMapLayer(layer, False)
 
         # Apply symbology
-        qml = self.get_symbology_qml(symbology_key)
-        if qml is not None:
-            layer.loadNamedStyle(qml)
+        self.load_symbology(layer, symbology_key)
         self.apply_selection_color_override(layer)
 
         if id_field is not None:
@@ -369,13 +410,49 @@ class RiverscapesMapManager(QObject):
              # Even if not adding to map, we might want to configure some things?
              pass
 
-        layer.setReadOnly(self.get_edit_mode() or db_item.locked)
+        if edit_mode is None:
+            edit_mode = self.get_edit_mode()
+        layer.setReadOnly(edit_mode or db_item.locked)
 
         layer.editingStarted.connect(self.start_edits)
         layer.editingStopped.connect(self.stop_edits)
 
         return layer
 
+    def add_db_item_feature_layers(self, project_key: str, layer_entries: list) -> None:
+        """
+        Adds several configured feature layers to the map in one batch.
+        args:
+            project_key: The project key
+            layer_entries: list of (QgsVectorLayer, parent QgsLayerTreeGroup, DBItem) tuples
+                built with create_db_item_feature_layer(..., add_to_map=False)"""
+
+        if len(layer_entries) == 0:
+            return
+
+        zoom = self.test_for_zoom()
+        canvas = iface.mapCanvas() if iface is not None else None
+        frozen = canvas is not None and not canvas.isFrozen()
+        if frozen:
+            canvas.freeze(True)
+        try:
+            QgsProject.instance().addMapLayers([layer for layer, _parent_group, _db_item in layer_entries], False)
+            for layer, parent_group, db_item in layer_entries:
+                if parent_group is None:
+                    continue
+                tree_layer_node = parent_group.addLayer(layer)
+                tree_layer_node.setCustomProperty(self.product_key, self.__get_custom_property(project_key, db_item))
+                tree_layer_node.setCustomProperty("showFeatureCount", True)
+                tree_layer_node.setExpanded(False)
+        finally:
+            if frozen:
+                canvas.freeze(False)
+                canvas.refresh()
+
+        if zoom:
+            iface.setActiveLayer(layer_entries[0][0])
+            iface.zoomToActiveLayer()
+
     def create_machine_code_feature_layer(self, project_key: str, parent_group: QgsLayerTreeGroup, fc_path: str, machine_code: str, display_label: str, symbology_key: str = None, driver: str = 'ogr') -> QgsVectorLayer:
         """
         Creates a new feature layer for the specified machine code and adds it to the map.
@@ -395,9 +472,7 @@ class RiverscapesMapManager(QObject):
         QgsProject.instance().addMapLayer(layer, False)
 
         # Apply symbology
-        qml = self.get_symbology_qml(symbology_key)
-        if qml is not None:
-            layer.loadNamedStyle(qml)
+        self.load_symbology(layer, symbology_key)
         self.apply_selection_color_override(layer)
 
         # Finally add the new layer here
@@ -437,9 +512,7 @@ class RiverscapesMapManager(QObject):
             layer.setFlags(QgsMapLayer.LayerFlag(QgsMapLayer.Private + QgsMapLayer.Removable))
 
         # Apply symbology
-        qml = self.get_symbology_qml(symbology_key)
-        if qml is not None:
-            layer.loadNamedStyle(qml)
+        self.load_symbology(layer, symbology_key)
         self.apply_selection_color_override(layer)
 
         # Finally add the new layer here
@@ -533,7 +606,9 @@ class RiverscapesMapManager(QObject):
         raster_layer.triggerRepaint()
 
     # Set Fields
-    def set_metadata_virtual_fields(self, feature_layer: QgsVectorLayer, field_config: dict = None, default_photo_path: str = None) -> None:
+    def set_metadata_virtual_fields(self, feature_layer: QgsVectorLayer, field_config: dict = None, default_photo_path: str = None, metadata_field_types: dict = None) -> None:
+        """Add a virtual field for each attribute in the field config and each key found in the feature metadata.
+        Pass metadata_field_types ({key: QMetaType}) when the metadata keys are already known to skip reading every feature."""
 
         field_types = {
             'integer': QMetaType.Int,
@@ -559,8 +634,11 @@ class RiverscapesMapManager(QObject):
                 field_labels.update({field['id']: field_name})
                 metadata_fields['attributes'].update({field['id']: field_type})
 
+        if metadata_field_types is not None:
+            metadata_fields['metadata'].update(metadata_field_types)
+
         # get all the keys from the metadata dictionary by reading all of the features
-        for feature in feature_layer.getFeatures():
+        for feature in (feature_layer.getFeatures() if metadata_field_types is None else []):
             # this is to catch empty metadata fields, which are stored as QVariant
             if isinstance(feature['metadata'], QVariant) or feature['metadata'] is None:
                 continue
@@ -0,0 +1,9 @@
+-- Track a fingerprint of each spatial view definition so that project load only rebuilds views that are missing or changed
+CREATE TABLE spatial_view_fingerprints (
+    view_name TEXT PRIMARY KEY,
+    fingerprint TEXT NOT NULL,
+    updated_on DATETIME DEFAULT CURRENT_TIMESTAMP
+);
+
+INSERT INTO gpkg_contents (table_name, data_type, identifier)
+VALUES ('spatial_view_fingerprints', 'attributes', 'spatial_view_fingerprints');
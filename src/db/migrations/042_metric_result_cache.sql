@@ -0,0 +1,16 @@
+-- Automated metric results keyed by a fingerprint of the metric, its parameters and every input it reads
+-- so that identical calculations are reused across analyses
+CREATE TABLE metric_result_cache (
+    fingerprint TEXT PRIMARY KEY,
+    metric_id INTEGER,
+    metric_function TEXT,
+    value TEXT,
+    hit_count INTEGER NOT NULL DEFAULT 0,
+    created_on DATETIME DEFAULT CURRENT_TIMESTAMP,
+    last_used_on DATETIME DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX ix_metric_result_cache_metric_id ON metric_result_cache(metric_id);
+
+INSERT INTO gpkg_contents (table_name, data_type, identifier)
+VALUES ('metric_result_cache', 'attributes', 'metric_result_cache');
@@ -0,0 +1,21 @@
+-- Sample frame features projected to their UTM zone, with the measurements that metric and zonal
+-- calculations read. geom_hash is a hash of the source geometry so that stale rows are recomputed.
+CREATE TABLE sample_frame_geometries (
+    sample_frame_feature_id INTEGER PRIMARY KEY REFERENCES sample_frame_features(fid) ON DELETE CASCADE ON UPDATE CASCADE,
+    sample_frame_id INTEGER,
+    geom_hash TEXT NOT NULL,
+    utm_epsg INTEGER NOT NULL,
+    area REAL NOT NULL,
+    perimeter REAL NOT NULL,
+    min_x REAL,
+    min_y REAL,
+    max_x REAL,
+    max_y REAL,
+    projected_geom BLOB NOT NULL,
+    updated_on DATETIME DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX ix_sample_frame_geometries_sample_frame_id ON sample_frame_geometries(sample_frame_id);
+
+INSERT INTO gpkg_contents (table_name, data_type, identifier)
+VALUES ('sample_frame_geometries', 'attributes', 'sample_frame_geometries');
@@ -1,20 +1,28 @@
 """Methods for generating analysis metrics."""
 
 import os
+import re
 import math
 import json
 import sqlite3
-from typing import Generator
+from typing import Generator, Iterable, List, Tuple
 from decimal import Decimal, InvalidOperation
 
 from osgeo import ogr, gdal, osr
 
+import numpy as np
+import shapely
+
 from .zonal_statistics import zonal_statistics
+from .metric_profiler import MetricProfiler, profiled
+from .sample_frame_geometry import get_sample_frame_geometry, get_utm_zone_epsg, utm_spatial_reference
 
 from ..model.db_item import DBItem
 from ..model.layer import Layer
 from ..model.profile import Profile
 from ..model.raster import Raster
+from ..model.spatial_index import warn_if_unindexed
+from ..model.connection_manager import get_connection_manager
 
 analysis_metric_unit_type = {
     'count': 'count',
@@ -28,6 +36,9 @@ analysis_metric_unit_type = {
     'manual': None,
 }
 
+# shapely.get_type_id values
+LINE_TYPE_IDS = [1, 2, 5]  # LineString, LinearRing, MultiLineString
+
 class MetricInputMissingError(Exception):
     """Raised when a metric input is missing."""
     def __init__(self, message: str):
@@ -112,20 +123,7 @@ def normalization_factor(project_file: str, sample_frame_feature_id: int, profil
     return length
 
 
-def get_utm_zone_epsg(longitude: float) -> int:
-    """Really crude EPSG lookup method
-
-    Args:
-        longitude (float): [description]
-
-    Returns:
-        int: [description]
-    """
-    zone_number = math.floor((180.0 + longitude) / 6.0)
-    epsg = 26901 + zone_number
-    return epsg
-
-
+@profiled(MetricProfiler.FEATURE_IO)
 def get_sample_frame_geom(project_file: str, sample_frame_feature_id: int) -> ogr.Geometry:
     """Get the geometry of the sample frame feature.
 
@@ -171,9 +169,10 @@ def get_clipped_input_geom(project_file, sample_frame_feature_id, db_item: DBIte
 
     return clipped_geom
 
+@profiled(MetricProfiler.FEATURE_IO)
 def get_dce_layer_source(project_file: str, machine_code: str, event_id: int = None) -> tuple[str, int]:
 
-    with sqlite3.connect(project_file, timeout=10.0) as conn:
+    with get_connection_manager(project_file).read() as conn:
         c = conn.cursor()
         layer_data = None
         if event_id is not None:
@@ -202,12 +201,110 @@ def get_dce_layer_source(project_file: str, machine_code: str, event_id: int = N
     return layer_id, layer_source
 
 
+def _attribute_filter_sql(attribute_filter: dict) -> str:
+    """SQL prefilter for an attribute_filter, evaluated by SQLite against the metadata JSON, or None if it cannot be expressed.
+
+    Features without the attribute or with an empty value are kept so that the check in
+    _check_attribute_filter still reports them. Only features whose value is known not to
+    match are dropped.
+    """
+    field_ref = attribute_filter.get('field_id_ref', None)
+    values = attribute_filter.get('values', None)
+    if not field_ref or not re.fullmatch(r'[A-Za-z0-9_]+', str(field_ref)) or not values:
+        return None
+
+    literals = []
+    for value in values:
+        if isinstance(value, bool):
+            # JSON true/false are extracted as 1/0, which is also how Python compares them
+            literals.append('1' if value else '0')
+        elif isinstance(value, (int, float)) and math.isfinite(value):
+            literals.append(repr(value))
+        elif isinstance(value, str):
+            literals.append("'" + value.replace("'", "''") + "'")
+        else:
+            return None
+
+    attribute = f"json_extract(metadata, '$.attributes.\"{field_ref}\"')"
+    return f"({attribute} IS NULL OR {attribute} IN ('', 'NULL', {', '.join(literals)}))"
+
+
+def _check_attribute_filter(feature: ogr.Feature, attribute_filter: dict) -> bool:
+    """True if the feature passes the attribute filter. Raises MetricCalculationError for missing or NULL attributes."""
+
+    metadata_value = feature.GetField('metadata')
+    if metadata_value is None:
+        return False
+    metadata: dict = json.loads(metadata_value)
+    attributes: dict = metadata.get('attributes', None)
+
+    if attributes is None:
+        attributes = {}
+
+    field_ref = attribute_filter['field_id_ref']
+
+    if field_ref not in attributes:
+        raise MetricCalculationError(f"Feature {feature.GetFID()} is missing required attribute '{field_ref}' for filtering.")
+
+    val = attributes[field_ref]
+    if val is None or val == 'NULL' or val == '':
+        raise MetricCalculationError(f"Feature {feature.GetFID()} has a NULL value for required attribute '{field_ref}'.")
+
+    return val in attribute_filter['values']
+
+
+def _open_metric_layer(project_file: str, metric_layer: dict, event_id: int, sample_frame_geom: ogr.Geometry, analysis_params: dict, columns: Iterable[str]) -> tuple:
+    """Open the layer of a metric input with its filters applied and only the needed columns read.
+
+    Returns (data source, layer), or (None, None) when the metric layer has no features to read.
+    The data source must be kept referenced while the layer is used.
+    """
+    if metric_layer.get('input_ref', None) is not None:
+        if metric_layer['usage'] == 'surface':
+            return None, None
+        analysis_param = analysis_params.get(metric_layer['input_ref'], None)
+        if analysis_param is None:
+            raise MetricInputMissingError(f'Missing input reference {metric_layer["input_ref"]} in analysis parameters. Has this been specified in the analysis paramenters?')
+        db_item = analysis_params[metric_layer['input_ref']]
+        ds: ogr.DataSource = ogr.Open(project_file)
+        layer: ogr.Layer = ds.GetLayerByName(db_item.fc_name)
+        where = f"{db_item.fc_id_column_name} = {db_item.id}"
+    else:
+        layer_id, layer_name = get_dce_layer_source(project_file, metric_layer['layer_id_ref'], event_id)
+        if layer_id is None:
+            return None, None
+        ds: ogr.DataSource = ogr.Open(project_file)
+        layer: ogr.Layer = ds.GetLayerByName(layer_name)
+        where = f"event_id = {event_id} and event_layer_id = {layer_id}"
+        warn_if_unindexed(project_file, layer_name)
+        layer.SetSpatialFilter(sample_frame_geom)
+
+    columns = set(columns)
+    attribute_filter = metric_layer.get('attribute_filter', None)
+    filter_sql = None
+    if attribute_filter is not None:
+        columns.add('metadata')
+        filter_sql = _attribute_filter_sql(attribute_filter)
+
+    # GeoPackage attribute filters are evaluated by SQLite, so the metadata JSON can be filtered there.
+    # Fall back to filtering every feature in Python if the layer rejects the filter.
+    if filter_sql is None or layer.SetAttributeFilter(f'{where} AND {filter_sql}') != ogr.OGRERR_NONE:
+        layer.SetAttributeFilter(where)
+
+    layer_defn = layer.GetLayerDefn()
+    ignored = [layer_defn.GetFieldDefn(i).GetName() for i in range(layer_defn.GetFieldCount())]
+    layer.SetIgnoredFields([name for name in ignored if name not in columns] + ['OGR_STYLE'])
+    return ds, layer
+
+
+@profiled(MetricProfiler.FEATURE_IO)
 def get_metric_layer_features(
     project_file: str,
     metric_layer: dict,
     event_id: int,
     sample_frame_geom: ogr.Geometry,
-    analysis_params: dict
+    analysis_params: dict,
+    columns: Iterable[str] = (),
 ) -> Generator[ogr.Feature, None, None]:
     """Get the features of the metric layer that intersect the sample frame geometry.
 
@@ -217,6 +314,8 @@ def get_metric_layer_features(
         event_id (int): Event ID.
         sample_frame_geom (ogr.Geometry): Sample frame geometry.
         analysis_params (dict): Analysis parameters.
+        columns (Iterable[str]): Fields the caller reads from the features. Other fields are
+            not read from the layer (the fields needed by the attribute filter are always read).
 
     Yields:
         ogr.Feature: Features of the metric layer.
@@ -224,57 +323,112 @@ def get_metric_layer_features(
     ds = None
     layer = None
     try:
-        if metric_layer.get('input_ref', None) is not None:
-            if metric_layer['usage'] == 'surface':
-                return None
-            analysis_param = analysis_params.get(metric_layer['input_ref'], None)
-            if analysis_param is None:
-                raise MetricInputMissingError(f'Missing input reference {metric_layer["input_ref"]} in analysis parameters. Has this been specified in the analysis paramenters?')
-            db_item = analysis_params[metric_layer['input_ref']]
-            ds: ogr.DataSource = ogr.Open(project_file)
-            layer: ogr.Layer = ds.GetLayerByName(db_item.fc_name)
-            layer.SetAttributeFilter(f"{db_item.fc_id_column_name} = {db_item.id}")
-        else:
-            layer_id, layer_name = get_dce_layer_source(project_file, metric_layer['layer_id_ref'], event_id)
-            if layer_id is None:
-                return None
-            ds: ogr.DataSource = ogr.Open(project_file)
-            layer: ogr.Layer = ds.GetLayerByName(layer_name)
-            layer.SetAttributeFilter(f"event_id = {event_id} and event_layer_id = {layer_id}")
-            layer.SetSpatialFilter(sample_frame_geom)
-        
+        ds, layer = _open_metric_layer(project_file, metric_layer, event_id, sample_frame_geom, analysis_params, columns)
+        if layer is None:
+            return None
+
         attribute_filter = metric_layer.get('attribute_filter', None)
         for feature in layer:
-            if attribute_filter is not None:
-                metadata_value = feature.GetField('metadata')
-                if metadata_value is None:
-                    continue
-                metadata: dict = json.loads(metadata_value)
-                attributes: dict = metadata.get('attributes', None)
-                
-                if attributes is None:
-                    attributes = {}
-                
-                field_ref = attribute_filter['field_id_ref']
-                
-                if field_ref not in attributes:
-                    raise MetricCalculationError(f"Feature {feature.GetFID()} is missing required attribute '{field_ref}' for filtering.")
-
-                val = attributes[field_ref]
-                if val is None or val == 'NULL' or val == '':
-                    raise MetricCalculationError(f"Feature {feature.GetFID()} has a NULL value for required attribute '{field_ref}'.")
-
-                if val not in attribute_filter['values']:
-                    continue
+            if attribute_filter is not None and not _check_attribute_filter(feature, attribute_filter):
+                continue
 
             yield feature
             feature = None
-            
+
+    finally:
+        layer = None
+        ds = None
+
+
+@profiled(MetricProfiler.FEATURE_IO)
+def get_metric_layer_geometries(
+    project_file: str,
+    metric_layer: dict,
+    event_id: int,
+    sample_frame_geom: ogr.Geometry,
+    analysis_params: dict,
+) -> Tuple[List[bytes], osr.SpatialReference]:
+    """Get the geometries of the metric layer features as WKB, for vectorized processing with shapely.
+
+    Only the geometry (and the fields needed by the attribute filter) is read from the layer.
+
+    Returns:
+        (list of WKB bytes, spatial reference of the layer). The list is empty when there are no features.
+    """
+    ds = None
+    layer = None
+    try:
+        ds, layer = _open_metric_layer(project_file, metric_layer, event_id, sample_frame_geom, analysis_params, ())
+        if layer is None:
+            return [], None
+
+        srs = layer.GetSpatialRef()
+        if srs is not None:
+            srs = srs.Clone()
+            srs.SetAxisMappingStrategy(osr.OAMS_TRADITIONAL_GIS_ORDER)
+
+        attribute_filter = metric_layer.get('attribute_filter', None)
+        geometries = []
+        for feature in layer:
+            if attribute_filter is not None and not _check_attribute_filter(feature, attribute_filter):
+                continue
+            geom: ogr.Geometry = feature.GetGeometryRef()
+            if geom is not None:
+                geometries.append(bytes(geom.ExportToIsoWkb()))
+        return geometries, srs
+
     finally:
         layer = None
         ds = None
 
 
+def _line_lengths(geometries: np.ndarray) -> np.ndarray:
+    """Length of the line parts of each geometry. Like OGR, polygons and points have no length."""
+    parts, index = shapely.get_parts(geometries, return_index=True)
+    lengths = np.where(np.isin(shapely.get_type_id(parts), LINE_TYPE_IDS), shapely.length(parts), 0.0)
+    return np.bincount(index, weights=lengths, minlength=len(geometries))
+
+
+def _projected_total(geometries: List[bytes], srs: osr.SpatialReference, sample_frame_geom: ogr.Geometry, clip: bool, make_valid: bool, measure) -> float:
+    """Sum a measure of WKB geometries after projecting each one to the UTM zone of its centroid.
+
+    Args:
+        clip (bool): intersect the geometries with the sample frame before they are measured.
+        make_valid (bool): repair invalid geometries first.
+        measure: vectorized shapely function, such as shapely.area, applied to the projected geometries.
+    """
+    if len(geometries) == 0:
+        return 0.0
+    if srs is None:
+        raise MetricCalculationError('Metric layer has no spatial reference.')
+
+    geoms = shapely.force_2d(shapely.from_wkb(geometries))
+    geoms = geoms[~shapely.is_empty(geoms)]
+    if make_valid:
+        invalid = ~shapely.is_valid(geoms)
+        geoms[invalid] = shapely.make_valid(geoms[invalid])
+
+    # UTM zone of each unclipped geometry, as get_utm_zone_epsg
+    zones = np.floor((180.0 + shapely.get_x(shapely.centroid(geoms))) / 6.0).astype(int) + 26901
+
+    if clip:
+        sample_frame = shapely.force_2d(shapely.from_wkb(bytes(sample_frame_geom.ExportToIsoWkb())))
+        intersects = shapely.intersects(geoms, sample_frame)
+        geoms = shapely.intersection(geoms[intersects], sample_frame)
+        zones = zones[intersects]
+
+    total = 0.0
+    for zone in np.unique(zones):
+        in_zone = geoms[zones == zone]
+        coords = shapely.get_coordinates(in_zone)
+        if len(coords) == 0:
+            continue
+        transform = osr.CoordinateTransformation(srs, utm_spatial_reference(int(zone)))
+        projected = np.asarray(transform.TransformPoints(coords.tolist()))[:, :2]
+        total += float(np.sum(measure(shapely.set_coordinates(in_zone, projected))))
+    return total
+
+
 def _get_surface_raster_path(project_file: str, metric_params: dict, analysis_params: dict) -> str:
     surface: Raster = None
     for input_param in metric_params.get('inputs', []):
@@ -378,6 +532,7 @@ def _line_endpoints(union_geom: ogr.Geometry) -> tuple:
     raise MetricCalculationError('Unioned geometry is not a line.')
 
 
+@profiled(MetricProfiler.RASTER_READ)
 def _sample_raster_value(raster_path: str, x: float, y: float, point_srs: osr.SpatialReference = None) -> float:
     ds = gdal.Open(raster_path)
     if ds is None:
@@ -483,13 +638,14 @@ def count(project_file: str, sample_frame_feature_id: int, event_id: int, metric
     for metric_layer in metric_layers:
         if metric_layer.get('usage', None) == 'normalization':
             continue
-        for feature in get_metric_layer_features(project_file, metric_layer, event_id, sample_frame_geom, analysis_params):
+        count_fields = metric_layer.get('count_fields', None)
+        columns = ['metadata'] if count_fields is not None else []
+        for feature in get_metric_layer_features(project_file, metric_layer, event_id, sample_frame_geom, analysis_params, columns):
             if feature is None:
                 continue
             feature_count = 0
 
             # Handle the optional count_field
-            count_fields = metric_layer.get('count_fields', None)
             if count_fields is not None:
                 for count_field in count_fields:
                     count_field_name = count_field.get('field_id_ref', None)
@@ -545,24 +701,11 @@ def length(project_file: str, sample_frame_feature_id: int, event_id: int, metri
     for metric_layer in metric_layers:
         if metric_layer.get('usage', None) == 'normalization':
             continue
-        for feature in get_metric_layer_features(project_file, metric_layer, event_id, sample_frame_geom, analysis_params):
-            if feature is None:
-                continue
-            geom: ogr.Geometry = feature.GetGeometryRef().Clone()
-            epsg = get_utm_zone_epsg(geom.Centroid().GetX())
-            utm_srs = osr.SpatialReference()
-            utm_srs.ImportFromEPSG(epsg)
-            usage = str(metric_layer.get('usage', '')).lower()
-            clip_input_to_sample_frame = usage.startswith('sample_frame')
-            if metric_layer.get('input_ref') is not None and not clip_input_to_sample_frame:
-                # Input (riverscape/profile) metrics: default is full input geometry.
-                geom.TransformTo(utm_srs)
-                total_length += geom.Length()
-            elif geom.Intersects(sample_frame_geom):
-                clipped_geom: ogr.Geometry = geom.Intersection(sample_frame_geom)
-                clipped_geom.TransformTo(utm_srs)
-                total_length += clipped_geom.Length()
-            geom = None
+        geometries, srs = get_metric_layer_geometries(project_file, metric_layer, event_id, sample_frame_geom, analysis_params)
+        usage = str(metric_layer.get('usage', '')).lower()
+        # Input (riverscape/profile) metrics: default is full input geometry.
+        clip = metric_layer.get('input_ref') is None or usage.startswith('sample_frame')
+        total_length += _projected_total(geometries, srs, sample_frame_geom, clip, False, _line_lengths)
 
     for metric_layer in metric_layers:
         if metric_layer.get('usage', None) == 'normalization':
@@ -580,43 +723,23 @@ def area(project_file: str, sample_frame_feature_id: int, event_id: int, metric_
        CalculationID: 3
     """
 
-    sample_frame_geom = get_sample_frame_geom(project_file, sample_frame_feature_id)
-
     total_area = 0
     metric_layers = metric_params.get('dce_layers', []) + metric_params.get('inputs', [])
 
     # Explicit sample-frame mode: report area of the sample-frame polygon itself.
     if any(str(ml.get('usage', '')).lower() == 'sample_frame_area' for ml in metric_layers):
-        epsg = get_utm_zone_epsg(sample_frame_geom.Centroid().GetX())
-        utm_srs = osr.SpatialReference()
-        utm_srs.ImportFromEPSG(epsg)
-        proj_sample_frame_geom = sample_frame_geom.Clone()
-        proj_sample_frame_geom.TransformTo(utm_srs)
-        return proj_sample_frame_geom.GetArea()
+        return get_sample_frame_geometry(project_file, sample_frame_feature_id).area
+
+    sample_frame_geom = get_sample_frame_geom(project_file, sample_frame_feature_id)
 
     for metric_layer in metric_layers:
         if metric_layer.get('usage', None) == 'normalization':
             continue
-        for feature in get_metric_layer_features(project_file, metric_layer, event_id, sample_frame_geom, analysis_params):
-            if feature is None:
-                continue
-            geom: ogr.Geometry = feature.GetGeometryRef().Clone()
-            if not geom.IsValid():
-                geom = geom.MakeValid()
-            epsg = get_utm_zone_epsg(geom.Centroid().GetX())
-            utm_srs = osr.SpatialReference()
-            utm_srs.ImportFromEPSG(epsg)
-            usage = str(metric_layer.get('usage', '')).lower()
-            clip_input_to_sample_frame = usage.startswith('sample_frame')
-            if metric_layer.get('input_ref') is not None and not clip_input_to_sample_frame:
-                # Input (riverscape/profile) metrics: default is full input geometry.
-                geom.TransformTo(utm_srs)
-                total_area += geom.GetArea()
-            elif geom.Intersects(sample_frame_geom):
-                clipped_geom: ogr.Geometry = geom.Intersection(sample_frame_geom)
-                clipped_geom.TransformTo(utm_srs)
-                total_area += clipped_geom.GetArea()
-            geom = None
+        geometries, srs = get_metric_layer_geometries(project_file, metric_layer, event_id, sample_frame_geom, analysis_params)
+        usage = str(metric_layer.get('usage', '')).lower()
+        # Input (riverscape/profile) metrics: default is full input geometry.
+        clip = metric_layer.get('input_ref') is None or usage.startswith('sample_frame')
+        total_area += _projected_total(geometries, srs, sample_frame_geom, clip, True, shapely.area)
 
     for metric_layer in metric_layers:
         if metric_layer.get('usage', None) == 'normalization':
@@ -796,12 +919,7 @@ def area_proportion(project_file: str, sample_frame_feature_id: int, event_id: i
 
     if len(denominator_layers) == 0:
         # use the sample frame area as the denominator
-        epsg = get_utm_zone_epsg(sample_frame_geom.Centroid().GetX())
-        utm_srs = osr.SpatialReference()
-        utm_srs.ImportFromEPSG(epsg)
-        proj_sample_frame_geom = sample_frame_geom.Clone()
-        proj_sample_frame_geom.TransformTo(utm_srs)
-        denominator_area = proj_sample_frame_geom.GetArea()
+        denominator_area = get_sample_frame_geometry(project_file, sample_frame_feature_id).area
     else:
         for metric_layer in denominator_layers:
             for feature in get_metric_layer_features(project_file, metric_layer, event_id, sample_frame_geom, analysis_params):
@@ -875,12 +993,7 @@ def proportion(project_file: str, sample_frame_feature_id: int, event_id: int, m
     denominator_value = 0.0
     if len(denominator_layers) == 0:
         # use the sample frame area as the denominator
-        epsg = get_utm_zone_epsg(sample_frame_geom.Centroid().GetX())
-        utm_srs = osr.SpatialReference()
-        utm_srs.ImportFromEPSG(epsg)
-        proj_sample_frame_geom = sample_frame_geom.Clone()
-        proj_sample_frame_geom.TransformTo(utm_srs)
-        denominator_value = proj_sample_frame_geom.GetArea()
+        denominator_value = get_sample_frame_geometry(project_file, sample_frame_feature_id).area
     else:
         for metric_layer in denominator_layers:
             for feature in get_metric_layer_features(project_file, metric_layer, event_id, sample_frame_geom, analysis_params):
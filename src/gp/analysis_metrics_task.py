@@ -1,6 +1,11 @@
+import os
 import json
+import time
 import sqlite3
+import functools
+from datetime import datetime
 from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from decimal import Decimal, InvalidOperation
 
 from qgis.core import QgsTask, QgsMessageLog, Qgis
@@ -8,7 +13,11 @@ from qgis.PyQt.QtCore import pyqtSignal
 
 from ..gp import analysis_metrics
 from ..gp.analysis_metrics import MetricInputMissingError
-from ..model.metric_value import MetricValue, load_metric_values, INTRINSIC_EVENT_ID
+from ..gp.metric_profiler import MetricProfiler, profiled, profile_section
+from ..gp.metric_cache import MetricFingerprinter, MetricResultCache, metric_cache_available
+from ..gp.metric_scheduler import MetricScheduler, MAX_WORKERS
+from ..model.metric_value import MetricValue, load_metric_values, metric_values_changed, INTRINSIC_EVENT_ID
+from ..model.connection_manager import get_connection_manager
 
 
 MESSAGE_CATEGORY = 'QRiS Metrics Task'
@@ -33,7 +42,18 @@ class AnalysisMetricsTask(QgsTask):
         metric_ids: list,
         overwrite_existing: bool,
         force_active: bool,
+        profile: bool = False,
+        profile_path: str = None,
+        use_cache: bool = True,
     ):
+        """
+        use_cache (bool): reuse automated values from the project metric result cache when the metric,
+            its parameters and all of its inputs are unchanged, and store newly calculated values in it.
+        profile (bool): record per metric function, sample frame, feature I/O, raster read and database
+            timings. The results are added to the summary under 'profile', logged and written to profile_path.
+        profile_path (str): JSON file for the profile. Defaults to a time stamped file in the profiling
+            folder next to the project when profiling is enabled.
+        """
         super().__init__('Calculate Analysis Metrics', QgsTask.CanCancel)
 
         self.qris_project = qris_project
@@ -43,6 +63,11 @@ class AnalysisMetricsTask(QgsTask):
         self.metric_ids = metric_ids
         self.overwrite_existing = overwrite_existing
         self.force_active = force_active
+        self.profiler = MetricProfiler() if profile else None
+        self.profile_path = profile_path
+        self.use_cache = use_cache
+        self.cache = None
+        self.connections = None
 
         self.exception = None
         self.summary = {
@@ -52,11 +77,14 @@ class AnalysisMetricsTask(QgsTask):
             'skipped_not_feasible': 0,
             'skipped_overwrite': 0,
             'skipped_no_function': 0,
+            'cache_hits': 0,
+            'cache_misses': 0,
             'processed': 0,
             'total': 0,
             'messages': [],
             'canceled': False,
             'exception': None,
+            'profile': None,
         }
 
     def _log(self, text: str, level: int = Qgis.Info):
@@ -78,10 +106,18 @@ class AnalysisMetricsTask(QgsTask):
 
         return analysis_params
 
-    def _flush_pending_rows(self, conn: sqlite3.Connection, pending_rows: list):
+    @profiled(MetricProfiler.DB_WRITE)
+    def _flush_pending_rows(self, pending_rows: list):
         if len(pending_rows) < 1:
             return
 
+        # Short write transactions on the project writer so other writers are not blocked for the whole task
+        with self.connections.write() as conn:
+            self._write_pending_rows(conn, pending_rows)
+        pending_rows.clear()
+        metric_values_changed(self.connections.db_path)
+
+    def _write_pending_rows(self, conn: sqlite3.Connection, pending_rows: list):
         curs = conn.cursor()
         curs.executemany(
             """INSERT INTO metric_values (
@@ -106,8 +142,10 @@ class AnalysisMetricsTask(QgsTask):
                     , description = excluded.description""",
             pending_rows,
         )
-        conn.commit()
-        pending_rows.clear()
+        if self.cache is not None:
+            self.cache.flush(conn)
+            self.summary['cache_hits'] = self.cache.hits
+            self.summary['cache_misses'] = self.cache.misses
 
     def _queue_metric_value_row(self, pending_rows: list, event_id: int, sample_frame_id: int, metric_value: MetricValue, unit_id: int = None):
         pending_rows.append((
@@ -124,10 +162,6 @@ class AnalysisMetricsTask(QgsTask):
             metric_value.description,
         ))
 
-    def _checkpoint_wal(self):
-        with sqlite3.connect(self.qris_project.project_file, isolation_level=None) as conn:
-            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
-
     @staticmethod
     def _dependency_key(machine_name: str, protocol_machine_code: str, version=None) -> str:
         version_key = '' if version is None else str(version)
@@ -394,7 +428,192 @@ class AnalysisMetricsTask(QgsTask):
 
         return [available_by_id[mid] for mid in execution_order if mid in requested_set or mid in dependencies_by_metric]
 
+    @staticmethod
+    def plan_metric_dependencies(analysis_metrics: dict, planned_metrics: list) -> dict:
+        """Map the id of each planned metric, in execution order, to the ids of the planned metrics it depends on."""
+        exact_index, loose_index = AnalysisMetricsTask._build_metric_index([am for _, am in analysis_metrics.items()])
+        planned_ids = {am.metric.id for am in planned_metrics}
+
+        dependencies = {}
+        for analysis_metric in planned_metrics:
+            metric = analysis_metric.metric
+            deps = []
+            metric_params = metric.metric_params or {}
+            for dep in metric_params.get('metric_dependencies', []):
+                dep_id = AnalysisMetricsTask._resolve_dependency(dep, metric, exact_index, loose_index).metric.id
+                if dep_id in planned_ids and dep_id not in deps:
+                    deps.append(dep_id)
+            dependencies[metric.id] = deps
+        return dependencies
+
+    def _calculate_metric(self, calculation, sample_frame_id: int, event_id: int, metric, metric_analysis_params: dict) -> tuple:
+        """Run one metric calculation on a worker thread. Returns (result, exception, profiler).
+
+        When profiling, the calculation records against its own profiler, which is merged into the
+        task profiler on the scheduling thread.
+        """
+        profiler = MetricProfiler() if self.profiler is not None else None
+        if profiler is not None:
+            profiler.activate()
+        try:
+            with profile_section(MetricProfiler.METRIC_FUNCTION, metric.metric_function, MetricProfiler.GEOMETRY):
+                result = calculation(
+                    self.qris_project.project_file,
+                    sample_frame_id,
+                    event_id,
+                    metric.metric_params,
+                    metric_analysis_params,
+                )
+            return result, None, profiler
+        except Exception as ex:
+            return None, ex, profiler
+        finally:
+            if profiler is not None:
+                profiler.deactivate()
+
+    def _calculate_metrics(self, scheduler: MetricScheduler, conn: sqlite3.Connection, fingerprinter: MetricFingerprinter, analysis_params: dict,
+                           analysis_metrics_by_id: dict, requested_metric_ids: set, sample_frame_id: int, event_id: int, event,
+                           is_intrinsic_pass: bool, metric_values: dict, pending_rows: list) -> bool:
+        """Calculate the planned metrics of one sample frame and event, running independent metrics concurrently.
+
+        Values are added to metric_values as soon as each metric finishes so that derived metrics can start.
+        The summary, log messages and queued rows follow the execution plan order whatever order the
+        calculations finish in. Returns False if the task was canceled.
+        """
+
+        outcomes = {}
+        calculating = {}
+
+        def complete(metric_id: int, result, exception: Exception):
+            metric = analysis_metrics_by_id[metric_id].metric
+            metric_value, _fingerprint = calculating.pop(metric_id)
+            if metric_value.metadata is None:
+                metric_value.metadata = {}
+
+            if exception is None:
+                metric_value.automated_value = result
+                if self.force_active:
+                    metric_value.is_manual = False
+                metric_value.metadata.pop('calculation_error', None)
+                outcomes[metric_id] = ('success', None, metric_value)
+            else:
+                metric_value.metadata['calculation_error'] = str(exception)
+                metric_value.automated_value = None
+                kind = 'missing_data' if isinstance(exception, MetricInputMissingError) else 'errors'
+                outcomes[metric_id] = (kind, f'Error calculating metric {metric.name}: {exception}', metric_value)
+            metric_values[metric.id] = metric_value
+
+        def finish(metric_id: int, calculated: tuple, exception: Exception):
+            result = None
+            if calculated is not None:
+                result, exception, profiler = calculated
+                if profiler is not None:
+                    self.profiler.merge(profiler)
+                if exception is None and self.cache is not None:
+                    self.cache.put(calculating[metric_id][1], analysis_metrics_by_id[metric_id].metric, result)
+            complete(metric_id, result, exception)
+
+        def start(metric_id: int):
+            self.summary['processed'] += 1
+            self.setProgress((self.summary['processed'] / self.summary['total']) * 100)
+
+            metric = analysis_metrics_by_id[metric_id].metric
+            metric_value = metric_values.get(
+                metric.id,
+                MetricValue(metric, None, None, False, None, None, metric.default_unit_id, None),
+            )
+
+            # Dependencies pulled in by the DAG but not explicitly requested:
+            # skip if they already have any value (manual or automated) so we
+            # don't overwrite manual entries or waste time recalculating them.
+            is_dependency_only = metric.id not in requested_metric_ids
+            if is_dependency_only and metric_value.current_value() is not None:
+                outcomes[metric_id] = ('skipped_overwrite', None, None)
+                return None
+
+            if metric_value.automated_value is not None and not self.overwrite_existing:
+                outcomes[metric_id] = ('skipped_overwrite', None, None)
+                return None
+
+            if metric.metric_function is None:
+                outcomes[metric_id] = ('skipped_no_function', None, None)
+                return None
+
+            # Feasibility: intrinsic metrics skip DCE-layer checks (event is None).
+            if not is_intrinsic_pass and metric.can_calculate_automated(self.qris_project, event_id, self.analysis.id) is False:
+                outcomes[metric_id] = ('skipped_not_feasible', f'Unable to calculate metric {metric.name} for {event.name} due to missing required layer in the data capture event.', None)
+                return None
+
+            calculating[metric_id] = (metric_value, None)
+            try:
+                with profile_section(MetricProfiler.DEPENDENCIES, metric.metric_function):
+                    resolved_dependencies = self._resolve_runtime_dependency_values(metric, metric_values)
+                metric_analysis_params = dict(analysis_params)
+                if resolved_dependencies:
+                    metric_analysis_params['metric_dependencies'] = resolved_dependencies
+
+                result = MetricResultCache.MISS
+                if self.cache is not None:
+                    with profile_section(MetricProfiler.DB_READ, 'metric_cache'):
+                        fingerprint = fingerprinter.fingerprint(conn.cursor(), metric, sample_frame_id, event_id, resolved_dependencies)
+                        result = self.cache.get(fingerprint)
+                    calculating[metric_id] = (metric_value, fingerprint)
+
+                if result is not MetricResultCache.MISS:
+                    complete(metric_id, result, None)
+                    return None
+
+                calculation = getattr(analysis_metrics, metric.metric_function)
+            except Exception as ex:
+                complete(metric_id, None, ex)
+                return None
+
+            return functools.partial(self._calculate_metric, calculation, sample_frame_id, event_id, metric, metric_analysis_params)
+
+        completed = scheduler.run(start, finish, self.isCanceled)
+
+        for metric_id in scheduler.order:
+            if metric_id not in outcomes:
+                continue
+            kind, message, metric_value = outcomes[metric_id]
+            self.summary[kind] += 1
+            if message is not None:
+                self._log(message, Qgis.Warning)
+            if metric_value is not None:
+                self._queue_metric_value_row(pending_rows, event_id, sample_frame_id, metric_value, metric_value.metric.default_unit_id)
+                if len(pending_rows) >= self.BATCH_SIZE:
+                    self._flush_pending_rows(pending_rows)
+
+        return completed
+
     def run(self):
+        if self.profiler is None:
+            return self._run()
+
+        self.profiler.activate()
+        try:
+            return self._run()
+        finally:
+            self.profiler.deactivate()
+            self._save_profile()
+
+    def _save_profile(self):
+        self.summary['profile'] = self.profiler.to_dict()
+        if self.profile_path is None:
+            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+            self.profile_path = os.path.join(os.path.dirname(self.qris_project.project_file), 'profiling', f'analysis_{self.analysis.id}_metrics_{timestamp}.json')
+        try:
+            self.profiler.write_json(self.profile_path, {
+                'analysis_id': self.analysis.id,
+                'sample_frame_ids': len(self.sample_frame_ids),
+                'event_ids': len(self.event_ids),
+                'metric_ids': len(self.metric_ids),
+            })
+        except OSError as ex:
+            self._log(f'Unable to write metric calculation profile to {self.profile_path}: {ex}', Qgis.Warning)
+            self.profile_path = None
+
+    def _run(self):
         try:
             requested_metric_id_set = set(self.metric_ids)
             selected_analysis_metrics = self.plan_metric_execution(
@@ -412,160 +631,56 @@ class AnalysisMetricsTask(QgsTask):
                 return True
 
             analysis_params = self._build_analysis_params()
-            processed = 0
+            fingerprinter = MetricFingerprinter(self.qris_project.project_file, analysis_params)
+            dependencies = self.plan_metric_dependencies(self.analysis.analysis_metrics, selected_analysis_metrics)
+            selected_by_id = {am.metric.id: am for am in selected_analysis_metrics}
             pending_rows = []
 
-            with sqlite3.connect(self.qris_project.project_file, timeout=10.0) as conn:
+            self.connections = get_connection_manager(self.qris_project.project_file)
+            with self.connections.read() as conn, ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+                self.cache = MetricResultCache(conn) if self.use_cache and metric_cache_available(conn) else None
+                scheduler = MetricScheduler(executor, dependencies)
                 for sample_frame_id in self.sample_frame_ids:
                     if self.isCanceled():
                         self.summary['canceled'] = True
-                        self._flush_pending_rows(conn, pending_rows)
+                        self._flush_pending_rows(pending_rows)
                         return False
 
+                    sample_frame_start = time.perf_counter() if self.profiler is not None else None
+
                     for event_id in event_ids:
                         if self.isCanceled():
                             self.summary['canceled'] = True
-                            self._flush_pending_rows(conn, pending_rows)
+                            self._flush_pending_rows(pending_rows)
                             return False
 
                         event = self.qris_project.events.get(event_id, None)
                         # Intrinsic pass: event_id=0 has no real event object, load with None.
                         is_intrinsic_pass = is_intrinsic and event is None
                         if event is None and not is_intrinsic_pass:
-                            processed += len(selected_analysis_metrics)
+                            self.summary['processed'] += len(selected_analysis_metrics)
                             continue
 
-                        metric_values = load_metric_values(
-                            self.qris_project.project_file,
-                            self.analysis,
-                            event if not is_intrinsic_pass else None,
-                            sample_frame_id,
-                            self.qris_project.metrics,
-                        )
-
-                        for analysis_metric in selected_analysis_metrics:
-                            if self.isCanceled():
-                                self.summary['canceled'] = True
-                                self._flush_pending_rows(conn, pending_rows)
-                                return False
-
-                            processed += 1
-                            self.summary['processed'] = processed
-                            self.setProgress((processed / total) * 100)
-
-                            metric = analysis_metric.metric
-                            metric_value = metric_values.get(
-                                metric.id,
-                                MetricValue(metric, None, None, False, None, None, metric.default_unit_id, None),
+                        with profile_section(MetricProfiler.DB_READ, 'load_metric_values'):
+                            metric_values = load_metric_values(
+                                self.qris_project.project_file,
+                                self.analysis,
+                                event if not is_intrinsic_pass else None,
+                                sample_frame_id,
+                                self.qris_project.metrics,
                             )
 
-                            # Dependencies pulled in by the DAG but not explicitly requested:
-                            # skip if they already have any value (manual or automated) so we
-                            # don't overwrite manual entries or waste time recalculating them.
-                            is_dependency_only = metric.id not in requested_metric_id_set
-                            if is_dependency_only and metric_value.current_value() is not None:
-                                self.summary['skipped_overwrite'] += 1
-                                continue
-
-                            if metric_value.automated_value is not None and not self.overwrite_existing:
-                                self.summary['skipped_overwrite'] += 1
-                                continue
-
-                            if metric.metric_function is None:
-                                self.summary['skipped_no_function'] += 1
-                                continue
-
-                            # Feasibility: intrinsic metrics skip DCE-layer checks (event is None).
-                            if not is_intrinsic_pass and metric.can_calculate_automated(self.qris_project, event_id, self.analysis.id) is False:
-                                self.summary['skipped_not_feasible'] += 1
-                                self._log(
-                                    f'Unable to calculate metric {metric.name} for {event.name} due to missing required layer in the data capture event.',
-                                    Qgis.Warning,
-                                )
-                                continue
-
-                            try:
-                                resolved_dependencies = self._resolve_runtime_dependency_values(metric, metric_values)
-                                metric_analysis_params = dict(analysis_params)
-                                if resolved_dependencies:
-                                    metric_analysis_params['metric_dependencies'] = resolved_dependencies
-
-                                metric_calculation = getattr(analysis_metrics, metric.metric_function)
-                                result = metric_calculation(
-                                    self.qris_project.project_file,
-                                    sample_frame_id,
-                                    event_id,
-                                    metric.metric_params,
-                                    metric_analysis_params,
-                                )
-
-                                metric_value.automated_value = result
-                                if self.force_active:
-                                    metric_value.is_manual = False
-
-                                if metric_value.metadata is None:
-                                    metric_value.metadata = {}
-                                metric_value.metadata.pop('calculation_error', None)
-
-                                self._queue_metric_value_row(
-                                    pending_rows,
-                                    event_id,
-                                    sample_frame_id,
-                                    metric_value,
-                                    metric.default_unit_id,
-                                )
-                                metric_values[metric.id] = metric_value
-
-                                if len(pending_rows) >= self.BATCH_SIZE:
-                                    self._flush_pending_rows(conn, pending_rows)
-
-                                self.summary['success'] += 1
-
-                            except MetricInputMissingError as ex:
-                                self.summary['missing_data'] += 1
-                                self._log(f'Error calculating metric {metric.name}: {ex}', Qgis.Warning)
-
-                                if metric_value.metadata is None:
-                                    metric_value.metadata = {}
-                                metric_value.metadata['calculation_error'] = str(ex)
-                                metric_value.automated_value = None
-
-                                self._queue_metric_value_row(
-                                    pending_rows,
-                                    event_id,
-                                    sample_frame_id,
-                                    metric_value,
-                                    metric.default_unit_id,
-                                )
-                                metric_values[metric.id] = metric_value
-
-                                if len(pending_rows) >= self.BATCH_SIZE:
-                                    self._flush_pending_rows(conn, pending_rows)
-
-                            except Exception as ex:
-                                self.summary['errors'] += 1
-                                self._log(f'Error calculating metric {metric.name}: {ex}', Qgis.Warning)
-
-                                if metric_value.metadata is None:
-                                    metric_value.metadata = {}
-                                metric_value.metadata['calculation_error'] = str(ex)
-                                metric_value.automated_value = None
-
-                                self._queue_metric_value_row(
-                                    pending_rows,
-                                    event_id,
-                                    sample_frame_id,
-                                    metric_value,
-                                    metric.default_unit_id,
-                                )
-                                metric_values[metric.id] = metric_value
-
-                                if len(pending_rows) >= self.BATCH_SIZE:
-                                    self._flush_pending_rows(conn, pending_rows)
-
-                self._flush_pending_rows(conn, pending_rows)
-
-            self._checkpoint_wal()
+                        completed = self._calculate_metrics(scheduler, conn, fingerprinter, analysis_params, selected_by_id, requested_metric_id_set,
+                                                            sample_frame_id, event_id, event, is_intrinsic_pass, metric_values, pending_rows)
+                        if not completed:
+                            self.summary['canceled'] = True
+                            self._flush_pending_rows(pending_rows)
+                            return False
+
+                    if sample_frame_start is not None:
+                        self.profiler.record(MetricProfiler.SAMPLE_FRAME, sample_frame_id, time.perf_counter() - sample_frame_start)
+
+                self._flush_pending_rows(pending_rows)
 
             self.setProgress(100)
             return True
@@ -578,6 +693,8 @@ class AnalysisMetricsTask(QgsTask):
     def finished(self, result: bool):
         if result:
             QgsMessageLog.logMessage('Analysis metric calculation task complete.', MESSAGE_CATEGORY, Qgis.Success)
+            if self.cache is not None and self.cache.hits > 0:
+                QgsMessageLog.logMessage(f'{self.cache.hits} metric values reused from the metric result cache, {self.cache.misses} calculated.', MESSAGE_CATEGORY, Qgis.Info)
         elif self.exception is None and self.summary.get('canceled', False):
             QgsMessageLog.logMessage('Analysis metric calculation task canceled.', MESSAGE_CATEGORY, Qgis.Warning)
         elif self.exception is None:
@@ -585,6 +702,12 @@ class AnalysisMetricsTask(QgsTask):
         else:
             QgsMessageLog.logMessage(f'Analysis metric task failed: {self.exception}', MESSAGE_CATEGORY, Qgis.Critical)
 
+        if self.profiler is not None:
+            for line in self.profiler.summary_lines():
+                QgsMessageLog.logMessage(line, MESSAGE_CATEGORY, Qgis.Info)
+            if self.profile_path is not None:
+                QgsMessageLog.logMessage(f'Metric calculation profile written to {self.profile_path}', MESSAGE_CATEGORY, Qgis.Info)
+
         self.on_complete.emit(self.summary)
 
     def cancel(self):
@@ -1,8 +1,8 @@
-import os
-
 from qgis.core import QgsTask, QgsMessageLog, Qgis
 from qgis.PyQt.QtCore import pyqtSignal
-from osgeo.gdal import Warp, Translate
+from osgeo.gdal import Warp
+
+from .raster_output import write_output_raster, warp_options, remove_raster, PREDICTOR_AUTO, DEFAULT_NUM_THREADS
 
 
 MESSAGE_CATEGORY = 'QRiS_CopyRasterTask'
@@ -16,12 +16,17 @@ class CopyRaster(QgsTask):
     # Signal to notify when done and return the PourPoint and whether it should be added to the map
     copy_raster_complete = pyqtSignal(bool)
 
-    def __init__(self, source_path: str, mask_tuple, output_path: str):
+    def __init__(self, source_path: str, mask_tuple, output_path: str, resampling: str = 'near', predictor=PREDICTOR_AUTO, cog: bool = True, num_threads=DEFAULT_NUM_THREADS):
         super().__init__(f'Copy Raster Task', QgsTask.CanCancel)
 
         self.source_path = source_path
         self.mask_tuple = mask_tuple
         self.output_path = output_path
+        self.resampling = resampling
+        self.predictor = predictor
+        self.cog = cog
+        self.num_threads = num_threads
+        self.exception = None
 
     def run(self):
         """
@@ -30,17 +35,25 @@ class CopyRaster(QgsTask):
 
         Compression Steps:
         https://trac.osgeo.org/gdal/wiki/UserDocs/GdalWarp#GeoTIFFoutput-coCOMPRESSisbroken
+
+        The warp writes an uncompressed tiled GTiff so that the multithreaded warper is
+        not throttled by compression, then the final copy compresses with NUM_THREADS
+        and adds internal overviews (Cloud-Optimized GeoTIFF where available).
         """
 
-        es_obj = {}
+        # Warp progress is the first half of the task, compression and overviews the second
+        es_obj = {'offset': 0.0}
 
         kwargs = {
             'format': 'GTiff',
+            'creationOptions': ['TILED=YES', 'BIGTIFF=IF_SAFER'],
+            'resampleAlg': self.resampling,
             'callback': self.progress_callback,
             'callback_data': es_obj
         }
+        kwargs.update(warp_options(self.num_threads))
 
-        temp_path = self.output_path + '.temp'
+        temp_path = self.output_path + '.temp.tif'
 
         if self.mask_tuple is not None:
             kwargs['cutlineDSName'] = self.mask_tuple[0]
@@ -54,17 +67,28 @@ class CopyRaster(QgsTask):
 
         try:
             Warp(temp_path, self.source_path, **kwargs)
-            Translate(self.output_path, temp_path, format='GTiff', creationOptions=['COMPRESS=LZW'])
-            os.remove(temp_path)
+            if self.isCanceled():
+                remove_raster(temp_path)
+                return False
+
+            es_obj['offset'] = 50.0
+            write_output_raster(self.output_path, temp_path, self.cog, self.predictor, self.num_threads, callback=self.progress_callback, callback_data=es_obj)
+            remove_raster(temp_path)
 
         except Exception as ex:
+            remove_raster(temp_path)
+            if self.isCanceled():
+                # GDAL raises when the progress callback aborts the operation
+                return False
             self.exception = ex
             return False
 
         return True
 
-    def progress_callback(self, complete, message, unknown):
-        self.setProgress(complete * 100)
+    def progress_callback(self, complete, message, data):
+        self.setProgress(data['offset'] + complete * 50)
+        # Returning 0 tells GDAL to abort the operation
+        return 0 if self.isCanceled() else 1
 
     def finished(self, result: bool):
         """
@@ -1,10 +1,14 @@
+import threading
 from math import radians, cos, sin, asin, sqrt
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 from osgeo import gdal, osr
 
 from qgis.core import QgsTask, QgsMessageLog, Qgis
 from qgis.PyQt.QtCore import pyqtSignal
 
+from .raster_output import write_output_raster, tile_windows, remove_raster, DEFAULT_NUM_THREADS
+
 
 MESSAGE_CATEGORY = 'QRiS_HillshadeTask'
 
@@ -17,29 +21,29 @@ class Hillshade(QgsTask):
     # Signal to notify when done and return the PourPoint and whether it should be added to the map
     hillshade_complete = pyqtSignal(bool)
 
-    def __init__(self, source_path: str, output_path: str):
+    def __init__(self, source_path: str, output_path: str, cog: bool = True, num_threads=DEFAULT_NUM_THREADS, tile_size: int = 2048):
+        """
+        source_path should be the DEM that was already copied (and clipped) into the project
+        so that the source dataset is not read a second time.
+        """
         super().__init__(f'Hillshade Task', QgsTask.CanCancel)
 
         self.dem = source_path
         self.output_path = output_path
+        self.cog = cog
+        self.num_threads = num_threads
+        self.tile_size = tile_size
+        self.exception = None
 
     def run(self):
         """
         https://gdal.org/python/osgeo.gdal-module.html#WarpOptions
         https://gis.stackexchange.com/questions/278627/using-gdal-warp-and-gdal-warpoptions-of-gdal-python-api
-        """
 
-        # You can use this WarpOptions to get a list of the possible options
-        # wo = WarpOptions(format: 'GTiff', cutl)
-
-        # user defined callback object
-        es_obj = {}
-
-        kwargs = {
-            'format': 'GTiff',
-            'callback': self.progress_callback,
-            'callback_data': es_obj
-        }
+        The hillshade is computed tile by tile on a thread pool. Each tile is read with a one
+        pixel buffer so the 3x3 kernel is seamless across tile boundaries. The tiles are written
+        to an uncompressed temporary raster that is then compressed with overviews.
+        """
 
         # set the z factor for the hillshade
         zfactor = 1
@@ -53,21 +57,78 @@ class Hillshade(QgsTask):
             length_km = haversine(uly, ulx, lry, ulx)
             length_deg = uly - lry
             zfactor = (length_km * 1000) / length_deg
+        x_size, y_size = src.RasterXSize, src.RasterYSize
         src = None
 
         QgsMessageLog.logMessage(f'Started hillshade request', MESSAGE_CATEGORY, Qgis.Info)
         self.setProgress(0)
 
+        temp_path = self.output_path + '.temp.tif'
         try:
-            gdal.DEMProcessing(self.output_path, self.dem, 'hillshade', scale=zfactor, creationOptions=["COMPRESS=DEFLATE"], **kwargs)
+            windows = list(tile_windows(x_size, y_size, self.tile_size, overlap=1))
+            if len(windows) == 1:
+                gdal.DEMProcessing(temp_path, self.dem, 'hillshade', scale=zfactor, computeEdges=True, format='GTiff', creationOptions=['TILED=YES'], callback=self.progress_callback)
+            else:
+                self._tiled_hillshade(temp_path, windows, zfactor)
+
+            if self.isCanceled():
+                remove_raster(temp_path)
+                return False
+
+            self.setProgress(80)
+            write_output_raster(self.output_path, temp_path, self.cog, predictor=None, num_threads=self.num_threads)
+            remove_raster(temp_path)
         except Exception as ex:
+            remove_raster(temp_path)
+            if self.isCanceled():
+                return False
             self.exception = ex
             return False
 
         return True
 
+    def _tiled_hillshade(self, temp_path: str, windows: list, zfactor: float):
+
+        src = gdal.Open(self.dem)
+        driver = gdal.GetDriverByName('GTiff')
+        dst = driver.Create(temp_path, src.RasterXSize, src.RasterYSize, 1, gdal.GDT_Byte, ['TILED=YES', 'BIGTIFF=IF_SAFER'])
+        dst.SetGeoTransform(src.GetGeoTransform())
+        dst.SetProjection(src.GetProjection())
+        dst_band = dst.GetRasterBand(1)
+        dst_band.SetNoDataValue(0)
+        src = None
+
+        write_lock = threading.Lock()
+
+        def process_tile(window):
+            x_off, y_off, width, height, read_x, read_y, read_width, read_height = window
+            if self.isCanceled():
+                return
+            # GDAL datasets are not thread safe so every tile opens its own view of the DEM
+            tile_src = gdal.Translate('', self.dem, format='VRT', srcWin=[read_x, read_y, read_width, read_height])
+            tile_hs = gdal.DEMProcessing('', tile_src, 'hillshade', format='MEM', scale=zfactor, computeEdges=True)
+            data = tile_hs.GetRasterBand(1).ReadRaster(x_off - read_x, y_off - read_y, width, height)
+            tile_hs = None
+            tile_src = None
+            with write_lock:
+                dst_band.WriteRaster(x_off, y_off, width, height, data)
+
+        max_workers = None if self.num_threads == DEFAULT_NUM_THREADS else int(self.num_threads)
+        try:
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                futures = [executor.submit(process_tile, window) for window in windows]
+                for completed, future in enumerate(as_completed(futures), start=1):
+                    # Raise any exception from the worker
+                    future.result()
+                    self.setProgress(completed / len(windows) * 80)
+        finally:
+            dst_band.FlushCache()
+            dst_band = None
+            dst = None
+
     def progress_callback(self, complete, message, unknown):
-        self.setProgress(complete * 100)
+        self.setProgress(complete * 80)
+        return 0 if self.isCanceled() else 1
 
     def finished(self, result: bool):
         """
@@ -10,6 +10,7 @@ from qgis.PyQt.QtCore import pyqtSignal
 
 from ..lib.climate_engine import CLIMATE_ENGINE_API, get_api_key
 from ..model.project import Project
+from ..model.connection_manager import request_checkpoint
 
 from typing import List
 
@@ -152,8 +153,7 @@ class DownloadClimateEngineTimeseriesTask(QgsTask):
                 current_step += 1
                 self.setProgress(100 * current_step / steps)
 
-            with sqlite3.connect(self.qris_project.project_file, isolation_level=None) as conn:
-                conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            request_checkpoint(self.qris_project.project_file)
 
             return True
         
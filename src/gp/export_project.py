@@ -0,0 +1,78 @@
+"""Pruning of a copied QRiS GeoPackage down to the items selected for export."""
+
+import sqlite3
+
+from osgeo import ogr
+
+from ..model.spatial_index import ensure_spatial_indexes
+
+# Tables that are filtered by the keep list. Any table in this list that has no
+# entry in the keep list is emptied entirely.
+EXPORT_PRUNE_LAYERS = [
+    'analyses',
+    'catchments',
+    'cross_sections',
+    'cross_section_features',
+    'dce_lines',
+    'dce_points',
+    'dce_polygons',
+    'events',
+    'event_layers',
+    'pour_points',
+    'profile_centerlines',
+    'profile_features',
+    'profiles',
+    'rasters',
+    'scratch_vectors',
+    'sample_frame_features',
+    'sample_frames',
+    'attachments',
+    'planning_containers',
+]
+
+
+def prune_export_geopackage(out_geopackage: str, keep_layers: dict, project_name: str, project_description: str) -> None:
+    """Remove everything from an exported copy of the project that was not selected for export.
+
+    Args:
+        out_geopackage (str): path to the copied project GeoPackage that will be modified in place
+        keep_layers (dict): {layer_name: {id_field: id_field_name, id_values: [id_values]}}
+        project_name (str): name written to the projects table
+        project_description (str): description written to the projects table
+    """
+
+    # open the geopackage using ogr
+    ds_gpkg: ogr.DataSource = ogr.Open(out_geopackage, 1)
+    for layer in EXPORT_PRUNE_LAYERS:
+        # get the layer
+        lyr: ogr.Layer = ds_gpkg.GetLayerByName(layer)
+        # remove all features that are not in the keep list
+        if layer in keep_layers:
+            keep_layer = keep_layers[layer]
+            lyr.SetAttributeFilter(f"{keep_layer['id_field']} NOT IN ({', '.join(keep_layer['id_values'])})")
+        if lyr.GetFeatureCount() != 0:
+            for feat in lyr:
+                lyr.DeleteFeature(feat.GetFID())
+        lyr.SetAttributeFilter(None)
+        lyr = None
+    ds_gpkg = None
+
+    # Rebuild the R-trees of the pruned layers so the exported copy is not left with sparse indexes
+    for _msg in ensure_spatial_indexes(out_geopackage, EXPORT_PRUNE_LAYERS, rebuild=True):
+        pass
+
+    # use sqlite3 to vacuum the geopackage
+    with sqlite3.connect(out_geopackage) as conn:
+
+        # Delete orphaned records
+        curs = conn.cursor()
+        curs.execute("DELETE FROM event_rasters WHERE event_id NOT IN (SELECT id FROM events)")
+        curs.execute("DELETE FROM planning_container_events WHERE planning_container_id NOT IN (SELECT id FROM planning_containers)")
+        curs.execute("DELETE FROM metric_values WHERE analysis_id NOT IN (SELECT id FROM analyses)")
+        curs.execute("DELETE FROM analysis_metrics WHERE analysis_id NOT IN (SELECT id FROM analyses)")
+        conn.commit()  # Commit the transaction before executing VACUUM
+
+        # Write project name and description
+        conn.execute("UPDATE projects SET name = ?, description = ? WHERE id = 1", (project_name, project_description))
+        conn.commit()
+        conn.execute("VACUUM")
@@ -0,0 +1,274 @@
+"""
+Hypsometric (cumulative area by elevation) cache for rasters.
+
+The histogram is computed once by streaming the raster in blocks (a min/max pass then a
+histogram pass) and saved next to the raster as <raster>.hypsometry.json. Large rasters are read from the overview whose
+resolution keeps the pass under MAX_HISTOGRAM_CELLS. Once loaded, the area above or
+below any threshold is an interpolated lookup into the cumulative histogram.
+"""
+
+import os
+import json
+import math
+import tempfile
+
+import numpy as np
+from osgeo import gdal, ogr, osr
+
+from qgis.core import QgsTask, QgsMessageLog, Qgis
+from qgis.PyQt.QtCore import pyqtSignal
+
+MESSAGE_CATEGORY = 'QRiS_HypsometryTask'
+
+HYPSOMETRY_SUFFIX = '.hypsometry.json'
+HYPSOMETRY_FORMAT_VERSION = 1
+HISTOGRAM_BINS = 2048
+# Rasters larger than this are histogrammed from the closest overview that is smaller
+MAX_HISTOGRAM_CELLS = 50000000
+BLOCK_READ_CELLS = 4 * 1024 * 1024
+PREVIEW_MAX_SIZE = 1024
+
+# Approximate metres per degree of latitude, used to express geographic cell areas in m2
+METRES_PER_DEGREE = 111320.0
+
+
+def hypsometry_path(raster_path: str) -> str:
+    return raster_path + HYPSOMETRY_SUFFIX
+
+
+def _raster_signature(raster_path: str) -> dict:
+    stat = os.stat(raster_path)
+    return {'size': stat.st_size, 'mtime': stat.st_mtime}
+
+
+def _cell_area(ds: gdal.Dataset, x_size: int, y_size: int) -> tuple:
+    """Area of one cell when the raster is read at x_size by y_size, and the area units."""
+
+    gt = ds.GetGeoTransform()
+    pixel_width = abs(gt[1]) * ds.RasterXSize / x_size
+    pixel_height = abs(gt[5]) * ds.RasterYSize / y_size
+
+    srs = ds.GetSpatialRef()
+    if srs is not None and srs.IsGeographic():
+        centre_lat = gt[3] + gt[5] * ds.RasterYSize / 2
+        return pixel_width * pixel_height * METRES_PER_DEGREE * METRES_PER_DEGREE * math.cos(math.radians(centre_lat)), 'm2'
+
+    units = srs.GetLinearUnitsName() if srs is not None else 'unknown'
+    return pixel_width * pixel_height, 'ft2' if units.lower() in ('foot', 'us survey foot', 'foot_us') else 'm2'
+
+
+def _read_band(ds: gdal.Dataset):
+    """Return (band to read, x_size, y_size, overview level) keeping the cell count manageable."""
+
+    band = ds.GetRasterBand(1)
+    if band.XSize * band.YSize <= MAX_HISTOGRAM_CELLS:
+        return band, band.XSize, band.YSize, None
+
+    for level in range(band.GetOverviewCount()):
+        overview = band.GetOverview(level)
+        if overview.XSize * overview.YSize <= MAX_HISTOGRAM_CELLS:
+            return overview, overview.XSize, overview.YSize, level
+
+    # No suitable overview. Stream the full resolution band.
+    return band, band.XSize, band.YSize, None
+
+
+def _iterate_blocks(band: gdal.Band, nodata):
+    """Yield 1D arrays of the valid values in each block of the band."""
+
+    block_x, block_y = band.GetBlockSize()
+    rows = max(block_y, 1)
+    # Read block aligned windows of at most BLOCK_READ_CELLS cells
+    cols = band.XSize if band.XSize * rows <= BLOCK_READ_CELLS else max(block_x, (BLOCK_READ_CELLS // rows) // block_x * block_x)
+    for y_off in range(0, band.YSize, rows):
+        height = min(rows, band.YSize - y_off)
+        for x_off in range(0, band.XSize, cols):
+            width = min(cols, band.XSize - x_off)
+            values = band.ReadAsArray(x_off, y_off, width, height)
+            if values is None:
+                continue
+            values = values.ravel()
+            valid = np.isfinite(values) if np.issubdtype(values.dtype, np.floating) else np.ones(values.shape, dtype=bool)
+            if nodata is not None:
+                valid &= values != nodata
+            yield values[valid]
+
+
+def compute_hypsometry(raster_path: str, bins: int = HISTOGRAM_BINS) -> dict:
+    """Compute the cumulative histogram of the first band of a raster."""
+
+    ds = gdal.Open(raster_path)
+    full_band = ds.GetRasterBand(1)
+    nodata = full_band.GetNoDataValue()
+    band, x_size, y_size, overview = _read_band(ds)
+
+    minimum = None
+    maximum = None
+    for values in _iterate_blocks(band, nodata):
+        if values.size == 0:
+            continue
+        block_min, block_max = float(values.min()), float(values.max())
+        minimum = block_min if minimum is None else min(minimum, block_min)
+        maximum = block_max if maximum is None else max(maximum, block_max)
+
+    if minimum is None:
+        raise ValueError(f'Raster {raster_path} does not contain any valid cells')
+    if maximum == minimum:
+        maximum = minimum + 1.0
+
+    edges = np.linspace(minimum, maximum, bins + 1)
+    counts = np.zeros(bins, dtype=np.int64)
+    for values in _iterate_blocks(band, nodata):
+        if values.size > 0:
+            counts += np.histogram(values, bins=edges)[0]
+
+    cell_area, area_units = _cell_area(ds, x_size, y_size)
+    ds = None
+
+    return {
+        'format_version': HYPSOMETRY_FORMAT_VERSION,
+        'source': _raster_signature(raster_path),
+        'overview': overview,
+        'minimum': minimum,
+        'maximum': maximum,
+        'edges': edges.tolist(),
+        'cumulative_counts': np.cumsum(counts).tolist(),
+        'cell_area': cell_area,
+        'area_units': area_units,
+    }
+
+
+def load_hypsometry(raster_path: str):
+    """Return the cached Hypsometry for a raster, or None if there is no up to date cache."""
+
+    cache_path = hypsometry_path(raster_path)
+    if not os.path.isfile(cache_path):
+        return None
+    try:
+        with open(cache_path) as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+
+    if data.get('format_version') != HYPSOMETRY_FORMAT_VERSION or data.get('source') != _raster_signature(raster_path):
+        return None
+    return Hypsometry(data)
+
+
+def build_hypsometry(raster_path: str):
+    """Compute, save and return the Hypsometry for a raster."""
+
+    data = compute_hypsometry(raster_path)
+    with open(hypsometry_path(raster_path), 'w') as f:
+        json.dump(data, f)
+    return Hypsometry(data)
+
+
+class Hypsometry:
+    """Cumulative area below (or above) an elevation threshold, interpolated within bins."""
+
+    def __init__(self, data: dict):
+        self.minimum = data['minimum']
+        self.maximum = data['maximum']
+        self.cell_area = data['cell_area']
+        self.area_units = data['area_units']
+        self.edges = np.asarray(data['edges'], dtype=np.float64)
+        # Cells at or below each edge. The first edge has no cells below it.
+        self.cumulative = np.concatenate(([0], np.asarray(data['cumulative_counts'], dtype=np.float64)))
+
+    @property
+    def total_cells(self) -> float:
+        return float(self.cumulative[-1])
+
+    @property
+    def total_area(self) -> float:
+        return self.total_cells * self.cell_area
+
+    def cells_below(self, threshold: float) -> float:
+        return float(np.interp(threshold, self.edges, self.cumulative))
+
+    def area(self, threshold: float, above: bool = False) -> float:
+        cells = self.cells_below(threshold)
+        if above:
+            cells = self.total_cells - cells
+        return cells * self.cell_area
+
+    def percent(self, threshold: float, above: bool = False) -> float:
+        if self.total_cells == 0:
+            return 0.0
+        return 100.0 * self.area(threshold, above) / self.total_area
+
+
+class HypsometryTask(QgsTask):
+    """Builds the hypsometry cache for a raster in the background."""
+
+    # raster path, Hypsometry or None
+    hypsometry_complete = pyqtSignal(str, object)
+
+    def __init__(self, raster_path: str):
+        super().__init__('Hypsometry Task', QgsTask.CanCancel)
+
+        self.raster_path = raster_path
+        self.hypsometry = None
+        self.exception = None
+
+    def run(self):
+        try:
+            self.hypsometry = build_hypsometry(self.raster_path)
+        except Exception as ex:
+            self.exception = ex
+            return False
+        return True
+
+    def finished(self, result: bool):
+        if result:
+            QgsMessageLog.logMessage(f'Hypsometry cache built for {self.raster_path}', MESSAGE_CATEGORY, Qgis.Success)
+        elif self.exception is not None:
+            QgsMessageLog.logMessage(f'Hypsometry Exception: {self.exception}', MESSAGE_CATEGORY, Qgis.Warning)
+        self.hypsometry_complete.emit(self.raster_path, self.hypsometry)
+
+
+def threshold_preview(raster_path: str, threshold: float, above: bool = False, max_size: int = PREVIEW_MAX_SIZE) -> str:
+    """Polygonize a decimated copy of the thresholded raster and return the path of a
+    temporary GeoPackage with the preview polygons (layer 'preview')."""
+
+    ds = gdal.Open(raster_path)
+    band = ds.GetRasterBand(1)
+    scale = max(1.0, max(ds.RasterXSize, ds.RasterYSize) / max_size)
+    x_size = max(1, int(ds.RasterXSize / scale))
+    y_size = max(1, int(ds.RasterYSize / scale))
+
+    # GDAL reads from the overviews when they exist
+    values = band.ReadAsArray(buf_xsize=x_size, buf_ysize=y_size, resample_alg=gdal.GRIORA_Average)
+    nodata = band.GetNoDataValue()
+    mask = values >= threshold if above else values <= threshold
+    if nodata is not None:
+        mask &= values != nodata
+    if np.issubdtype(values.dtype, np.floating):
+        mask &= np.isfinite(values)
+
+    gt = ds.GetGeoTransform()
+    mem_ds = gdal.GetDriverByName('MEM').Create('', x_size, y_size, 1, gdal.GDT_Byte)
+    mem_ds.SetGeoTransform((gt[0], gt[1] * ds.RasterXSize / x_size, gt[2], gt[3], gt[4], gt[5] * ds.RasterYSize / y_size))
+    mem_ds.SetProjection(ds.GetProjection())
+    mem_band = mem_ds.GetRasterBand(1)
+    mem_band.WriteArray(mask.astype(np.uint8))
+    mem_band.SetNoDataValue(0)
+
+    fd, preview_path = tempfile.mkstemp(prefix='qris_slider_preview_', suffix='.gpkg')
+    os.close(fd)
+    os.remove(preview_path)
+    out_ds = ogr.GetDriverByName('GPKG').CreateDataSource(preview_path)
+    srs = osr.SpatialReference(wkt=ds.GetProjection()) if ds.GetProjection() else None
+    out_layer = out_ds.CreateLayer('preview', srs, ogr.wkbPolygon)
+    out_layer.CreateField(ogr.FieldDefn('DN', ogr.OFTInteger))
+    out_layer.StartTransaction()
+    # The band is its own mask so only the thresholded cells are polygonized
+    gdal.Polygonize(mem_band, mem_band, out_layer, 0)
+    out_layer.CommitTransaction()
+
+    out_layer = None
+    out_ds = None
+    mem_ds = None
+    ds = None
+    return preview_path
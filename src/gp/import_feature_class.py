@@ -8,6 +8,7 @@ from qgis.core import QgsTask, QgsMessageLog, Qgis
 from qgis.PyQt.QtCore import pyqtSignal, QVariant
 
 from ..gp.feature_class_functions import layer_path_parser
+from ..model.spatial_index import ensure_spatial_indexes
 
 MESSAGE_CATEGORY = 'QRiS_ImportFeatureClassTask'
 
@@ -44,6 +45,7 @@ class ImportFeatureClass(QgsTask):
         self.explode_geometries = explode_geometries
         self.message = None
         self.exception = None
+        self.spatial_index_messages = []
 
     def run(self):
 
@@ -246,6 +248,12 @@ class ImportFeatureClass(QgsTask):
                 src_dataset = None
             if dst_dataset is not None:
                 dst_dataset = None
+            # Appending to an existing layer does not repair a missing or stale R-tree
+            if result is True and dst_path.lower().endswith('.gpkg'):
+                try:
+                    self.spatial_index_messages = list(ensure_spatial_indexes(dst_path, [dst_layer_name]))
+                except Exception as ex:
+                    self.spatial_index_messages = [f'Unable to check the spatial index for {dst_layer_name}: {ex}']
             return result
 
     def progress_callback(self, complete, message, unknown):
@@ -261,6 +269,8 @@ class ImportFeatureClass(QgsTask):
 
         if result:
             QgsMessageLog.logMessage('Import Feature Class completed', MESSAGE_CATEGORY, Qgis.Success)
+            for message in self.spatial_index_messages:
+                QgsMessageLog.logMessage(message, MESSAGE_CATEGORY, Qgis.Info)
         else:
             if self.exception is None:
                 if self.message is not None:
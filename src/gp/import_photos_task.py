@@ -0,0 +1,383 @@
+import os
+import json
+import shutil
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+
+from osgeo import ogr, osr
+
+from qgis.core import QgsTask, QgsMessageLog, Qgis, QgsExifTools
+from qgis.PyQt.QtCore import pyqtSignal, Qt, QDateTime, QSize
+from qgis.PyQt.QtGui import QImageReader
+
+MESSAGE_CATEGORY = 'QRiS_ImportPhotosTask'
+
+PHOTO_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+THUMBNAIL_SIZE = 512
+HASH_CHUNK_SIZE = 1024 * 1024
+MAX_WORKERS = min(8, (os.cpu_count() or 1) + 4)
+
+# The cache lives beside (not inside) the DCE photo folders because the photo folders
+# are listed verbatim when the project is exported to the data exchange.
+PHOTO_CACHE_FOLDER = '.cache'
+HASH_INDEX_FILE = 'content_hashes.json'
+THUMBNAIL_FOLDER = 'thumbnails'
+
+# (photo folder, thumbnail folder) -> (folder modification times, viewer folder)
+_viewer_folders = {}
+
+
+def dce_photo_folder(project_file: str, event_id: int) -> str:
+    return os.path.join(os.path.dirname(project_file), 'photos', f'dce_{str(event_id).zfill(3)}')
+
+
+def dce_photo_cache_folder(project_file: str, event_id: int) -> str:
+    return os.path.join(os.path.dirname(project_file), 'photos', PHOTO_CACHE_FOLDER, f'dce_{str(event_id).zfill(3)}')
+
+
+def dce_thumbnail_folder(project_file: str, event_id: int) -> str:
+    """Folder of thumbnails for a DCE. Thumbnails use the same file names as the photos."""
+    return os.path.join(dce_photo_cache_folder(project_file, event_id), THUMBNAIL_FOLDER)
+
+
+def dce_photo_viewer_folder(project_file: str, event_id: int) -> str:
+    """Folder the attachment viewer should display photos from. This is the thumbnail cache
+    when every photo in the DCE has a thumbnail, otherwise the full size photo folder."""
+
+    photo_folder = dce_photo_folder(project_file, event_id)
+    thumbnail_folder = dce_thumbnail_folder(project_file, event_id)
+    if not os.path.isdir(thumbnail_folder):
+        return photo_folder
+
+    # The folders are only listed again after photos or thumbnails are added or removed
+    key = (photo_folder, thumbnail_folder)
+    mtimes = (_folder_mtime(photo_folder), _folder_mtime(thumbnail_folder))
+    cached = _viewer_folders.get(key)
+    if cached is not None and cached[0] == mtimes:
+        return cached[1]
+
+    thumbnails = set(os.listdir(thumbnail_folder))
+    if all(file_name in thumbnails for file_name in list_photos(photo_folder)):
+        viewer_folder = thumbnail_folder
+    else:
+        viewer_folder = photo_folder
+    _viewer_folders[key] = (mtimes, viewer_folder)
+    return viewer_folder
+
+
+def _folder_mtime(folder: str) -> int:
+    try:
+        return os.stat(folder).st_mtime_ns
+    except OSError:
+        return None
+
+
+def is_photo(file_name: str) -> bool:
+    return file_name.lower().endswith(PHOTO_EXTENSIONS)
+
+
+def list_photos(folder: str) -> list:
+    if not os.path.isdir(folder):
+        return []
+    return sorted(file_name for file_name in os.listdir(folder) if is_photo(file_name) and os.path.isfile(os.path.join(folder, file_name)))
+
+
+def file_content_hash(path: str) -> str:
+    """SHA-256 of the file contents."""
+
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def unique_file_name(file_name: str, used_names: set) -> str:
+    """Return file_name, or file_name with a numeric suffix if it is already in used_names (case insensitive)."""
+
+    used = {name.lower() for name in used_names}
+    if file_name.lower() not in used:
+        return file_name
+    stem, ext = os.path.splitext(file_name)
+    suffix = 1
+    while f'{stem}_{suffix}{ext}'.lower() in used:
+        suffix += 1
+    return f'{stem}_{suffix}{ext}'
+
+
+def load_hash_index(cache_folder: str, photo_folder: str, executor: ThreadPoolExecutor = None) -> dict:
+    """Return {file name: {size, mtime, hash}} for every photo in photo_folder.
+
+    Hashes are cached in the photo cache folder keyed by file name, size and modification
+    time, so only photos that are new or have changed since the last import are read."""
+
+    index_path = os.path.join(cache_folder, HASH_INDEX_FILE)
+    cached = {}
+    if os.path.isfile(index_path):
+        try:
+            with open(index_path) as f:
+                cached = json.load(f)
+        except (OSError, ValueError):
+            cached = {}
+
+    index = {}
+    stale = []
+    for file_name in list_photos(photo_folder):
+        stat = os.stat(os.path.join(photo_folder, file_name))
+        entry = cached.get(file_name)
+        if entry is not None and entry['size'] == stat.st_size and entry['mtime'] == stat.st_mtime:
+            index[file_name] = entry
+        else:
+            stale.append((file_name, stat))
+
+    paths = [os.path.join(photo_folder, file_name) for file_name, _stat in stale]
+    hashes = executor.map(file_content_hash, paths) if executor is not None else map(file_content_hash, paths)
+    for (file_name, stat), content_hash in zip(stale, hashes):
+        index[file_name] = {'size': stat.st_size, 'mtime': stat.st_mtime, 'hash': content_hash}
+
+    return index
+
+
+def save_hash_index(cache_folder: str, index: dict):
+    os.makedirs(cache_folder, exist_ok=True)
+    with open(os.path.join(cache_folder, HASH_INDEX_FILE), 'w') as f:
+        json.dump(index, f, indent=2)
+
+
+def create_thumbnail(photo_path: str, thumbnail_path: str, size: int = THUMBNAIL_SIZE) -> bool:
+    """Write a scaled copy of a photo. QImageReader decodes JPEGs directly at the reduced size."""
+
+    reader = QImageReader(photo_path)
+    reader.setAutoTransform(True)
+    original = reader.size()
+    if original.isValid() and max(original.width(), original.height()) > size:
+        reader.setScaledSize(original.scaled(QSize(size, size), Qt.KeepAspectRatio))
+    image = reader.read()
+    if image.isNull():
+        return False
+    return image.save(thumbnail_path)
+
+
+def read_photo_exif(photo_path: str) -> tuple:
+    """Return (metadata dict, (longitude, latitude, altitude) or None) for a photo.
+
+    The metadata keys match the fields of the QGIS 'Import geotagged photos' algorithm so
+    features created by earlier versions of QRiS carry the same attributes."""
+
+    tags = QgsExifTools.readTags(photo_path)
+    point, ok = QgsExifTools.getGeoTag(photo_path)
+
+    metadata = {
+        'photo': photo_path,
+        'filename': os.path.basename(photo_path),
+        'directory': os.path.dirname(photo_path),
+    }
+
+    location = None
+    if ok:
+        location = (point.x(), point.y(), point.z() if point.is3D() else None)
+        metadata['longitude'] = point.x()
+        metadata['latitude'] = point.y()
+        if point.is3D():
+            metadata['altitude'] = point.z()
+
+    direction = tags.get('Exif.GPSInfo.GPSImgDirection')
+    if direction is not None:
+        metadata['direction'] = direction
+
+    rotation = {1: 0, 3: 180, 6: 90, 8: 270}.get(tags.get('Exif.Image.Orientation'))
+    if rotation is not None:
+        metadata['rotation'] = rotation
+
+    timestamp = tags.get('Exif.Photo.DateTimeOriginal', tags.get('Exif.Image.DateTime'))
+    if isinstance(timestamp, QDateTime):
+        metadata['timestamp'] = timestamp.toString(Qt.ISODate)
+    elif timestamp is not None:
+        metadata['timestamp'] = str(timestamp)
+
+    metadata = {key: value for key, value in metadata.items() if value is not None}
+    return metadata, location
+
+
+class ImportPhotosTask(QgsTask):
+    """
+    Import a folder of photos into a DCE point layer.
+
+    Photos are deduplicated against the DCE photo folder by content hash, copied in
+    parallel, their EXIF tags and GPS positions are read on a worker pool (new photos
+    only), thumbnails are cached for the attachment viewer and the new points are written
+    to dce_points in a single transaction.
+    """
+
+    # Signal to notify when done: (success, photos imported, duplicate photos skipped, photos without a GPS location)
+    import_complete = pyqtSignal(bool, int, int, int)
+
+    def __init__(self, project_file: str, source_folder: str, event_id: int, event_layer_id: int):
+        super().__init__('Import Photos Task', QgsTask.CanCancel)
+
+        self.project_file = project_file
+        self.source_folder = source_folder
+        self.event_id = event_id
+        self.event_layer_id = event_layer_id
+
+        self.imported = 0
+        self.duplicates = 0
+        self.invalid = 0
+        self.exception = None
+
+    def run(self):
+
+        self.setProgress(0)
+        photo_folder = dce_photo_folder(self.project_file, self.event_id)
+        cache_folder = dce_photo_cache_folder(self.project_file, self.event_id)
+        thumbnail_folder = dce_thumbnail_folder(self.project_file, self.event_id)
+        os.makedirs(photo_folder, exist_ok=True)
+        os.makedirs(thumbnail_folder, exist_ok=True)
+
+        copied = []
+        try:
+            with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+
+                # 1. Hash the photos already in the DCE and the photos being imported
+                existing_index = load_hash_index(cache_folder, photo_folder, executor)
+                source_photos = list_photos(self.source_folder)
+                source_paths = [os.path.join(self.source_folder, file_name) for file_name in source_photos]
+                source_hashes = list(executor.map(file_content_hash, source_paths))
+                self.setProgress(20)
+                if self.isCanceled():
+                    return False
+
+                # 2. Keep only content that is not already in the DCE (or repeated within this import)
+                known_hashes = {entry['hash'] for entry in existing_index.values()}
+                used_names = set(existing_index.keys())
+                new_photos = []  # (source path, destination file name, content hash)
+                for source_path, content_hash in zip(source_paths, source_hashes):
+                    if content_hash in known_hashes:
+                        self.duplicates += 1
+                        continue
+                    known_hashes.add(content_hash)
+                    file_name = unique_file_name(os.path.basename(source_path), used_names)
+                    used_names.add(file_name)
+                    new_photos.append((source_path, file_name, content_hash))
+
+                # 3. Copy the new photos
+                def copy_photo(item):
+                    source_path, file_name, _content_hash = item
+                    destination = os.path.join(photo_folder, file_name)
+                    shutil.copy2(source_path, destination)
+                    return destination
+
+                for destination in executor.map(copy_photo, new_photos):
+                    copied.append(destination)
+                self.setProgress(40)
+                if self.isCanceled():
+                    self._remove_copied(copied)
+                    return False
+
+                # 4. EXIF and GPS for the new photos only
+                exif = list(executor.map(read_photo_exif, copied))
+                self.setProgress(60)
+                if self.isCanceled():
+                    self._remove_copied(copied)
+                    return False
+
+                # 5. Thumbnails for every photo in the DCE that does not have one yet
+                missing_thumbnails = [file_name for file_name in list_photos(photo_folder) if not os.path.isfile(os.path.join(thumbnail_folder, file_name))]
+                list(executor.map(lambda file_name: create_thumbnail(os.path.join(photo_folder, file_name), os.path.join(thumbnail_folder, file_name)), missing_thumbnails))
+                self.setProgress(80)
+
+            # 6. Write all of the new points in one transaction
+            self._insert_points(new_photos, exif)
+
+            for (_source_path, file_name, content_hash), destination in zip(new_photos, copied):
+                stat = os.stat(destination)
+                existing_index[file_name] = {'size': stat.st_size, 'mtime': stat.st_mtime, 'hash': content_hash}
+            save_hash_index(cache_folder, existing_index)
+            self.imported = len(new_photos) - self.invalid
+
+        except Exception as ex:
+            self._remove_copied(copied)
+            self.exception = ex
+            return False
+
+        self.setProgress(100)
+        return True
+
+    def _insert_points(self, new_photos: list, exif: list):
+
+        if len(new_photos) == 0:
+            return
+
+        dataset: ogr.DataSource = ogr.Open(self.project_file, 1)
+        if dataset is None:
+            raise Exception(f'Unable to open {self.project_file} for writing')
+        layer: ogr.Layer = dataset.GetLayerByName('dce_points')
+        layer_def = layer.GetLayerDefn()
+
+        wgs84 = osr.SpatialReference()
+        wgs84.ImportFromEPSG(4326)
+        wgs84.SetAxisMappingStrategy(osr.OAMS_TRADITIONAL_GIS_ORDER)
+        transform = None
+        layer_srs = layer.GetSpatialRef()
+        if layer_srs is not None and not layer_srs.IsSame(wgs84):
+            transform = osr.CoordinateTransformation(wgs84, layer_srs)
+
+        layer.StartTransaction()
+        try:
+            for (_source_path, file_name, content_hash), (metadata, location) in zip(new_photos, exif):
+                # Photos without a GPS position are not added to the layer (the INVALID output of native:importphotos)
+                if location is None:
+                    self.invalid += 1
+                    continue
+
+                metadata['Photo Path'] = file_name
+                metadata['Content Hash'] = content_hash
+                metadata['Observation Type'] = 'Photo Observation'
+
+                feature = ogr.Feature(layer_def)
+                geom = ogr.Geometry(ogr.wkbPoint)
+                geom.AddPoint_2D(location[0], location[1])
+                if transform is not None:
+                    geom.Transform(transform)
+                feature.SetGeometry(geom)
+                feature.SetField('event_id', self.event_id)
+                feature.SetField('event_layer_id', self.event_layer_id)
+                feature.SetField('metadata', json.dumps(metadata))
+                if layer.CreateFeature(feature) != ogr.OGRERR_NONE:
+                    raise Exception(f'Unable to create the dce_points feature for photo {file_name}')
+            layer.CommitTransaction()
+        except Exception:
+            layer.RollbackTransaction()
+            raise
+        finally:
+            layer = None
+            dataset = None
+
+    def _remove_copied(self, copied: list):
+        for destination in copied:
+            try:
+                os.remove(destination)
+            except OSError as ex:
+                QgsMessageLog.logMessage(f'Unable to remove partially imported photo {destination}: {ex}', MESSAGE_CATEGORY, Qgis.Warning)
+
+    def finished(self, result: bool):
+        """
+        This function is automatically called when the task has completed (successfully or not).
+        You implement finished() to do whatever follow-up stuff should happen after the task is complete.
+        finished is always called from the main thread, so it's safe to do GUI operations and raise Python exceptions here.
+        result is the return value from self.run.
+        """
+
+        if result:
+            QgsMessageLog.logMessage(f'Import Photos completed: {self.imported} imported, {self.duplicates} duplicates skipped, {self.invalid} without a GPS location', MESSAGE_CATEGORY, Qgis.Success)
+        else:
+            if self.exception is None:
+                QgsMessageLog.logMessage('Import Photos not successful but without exception (probably the task was canceled by the user)', MESSAGE_CATEGORY, Qgis.Warning)
+            else:
+                QgsMessageLog.logMessage(f'Import Photos Exception: {self.exception}', MESSAGE_CATEGORY, Qgis.Critical)
+
+        self.import_complete.emit(result, self.imported, self.duplicates, self.invalid)
+
+    def cancel(self):
+        QgsMessageLog.logMessage('Import Photos was canceled', MESSAGE_CATEGORY, Qgis.Info)
+        super().cancel()
@@ -31,9 +31,10 @@ class LoadProjectTask(QgsTask):
             self.setDescription("Loading project data...")
             self.qris_project = Project(self.db_path)
 
+            # Fingerprinted, so only views that are missing or out of date are rebuilt
             self.setProgress(90)
             self.setDescription("Refreshing spatial views...")
-            self.qris_project.refresh_spatial_views()
+            self.qris_project.ensure_spatial_views()
 
             self.setDescription("QRiS project loaded successfully.")
             self.setProgress(100)
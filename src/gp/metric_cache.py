@@ -0,0 +1,194 @@
+"""
+Content addressed cache of automated metric results.
+
+Each result is stored in the metric_result_cache table under a fingerprint of everything
+the metric calculation reads:
+
+    - the metric calculation code (a hash of the analysis_metrics module source)
+    - the metric function name and metric_params
+    - the event id and a hash of the event's DCE features (geometry, layer and attributes)
+    - a hash of the sample frame feature geometry
+    - the analysis inputs referenced by the metric (centerline, valley bottom geometry, raster files)
+    - the resolved values of any metric dependencies
+
+Because the fingerprint changes whenever any of these change, a cached value can be
+reused by any analysis in the project without checking how old it is.
+"""
+
+import os
+import json
+import sqlite3
+import hashlib
+
+from ..model.raster import Raster
+from ..model.connection_manager import get_connection_manager
+
+CACHE_TABLE = 'metric_result_cache'
+DCE_TABLES = ['dce_points', 'dce_lines', 'dce_polygons']
+
+_code_version = None
+
+
+def metric_code_version() -> str:
+    """Hash of the metric calculation source. Editing the calculations invalidates every cached result."""
+
+    global _code_version
+    if _code_version is None:
+        from . import analysis_metrics
+        with open(analysis_metrics.__file__, 'rb') as f:
+            _code_version = hashlib.sha256(f.read()).hexdigest()
+    return _code_version
+
+
+def _hash_rows(curs: sqlite3.Cursor, sql: str, params) -> str:
+    digest = hashlib.sha256()
+    curs.execute(sql, params)
+    for row in curs:
+        for value in row:
+            digest.update(repr(value).encode('utf-8') if not isinstance(value, bytes) else value)
+            digest.update(b'\x1f')
+        digest.update(b'\x1e')
+    return digest.hexdigest()
+
+
+def _referenced_inputs(metric_params) -> set:
+    """All input_ref values in the metric parameters."""
+
+    refs = set()
+    if isinstance(metric_params, dict):
+        for key, value in metric_params.items():
+            if key == 'input_ref' and isinstance(value, str):
+                refs.add(value)
+            else:
+                refs |= _referenced_inputs(value)
+    elif isinstance(metric_params, list):
+        for value in metric_params:
+            refs |= _referenced_inputs(value)
+    return refs
+
+
+def metric_cache_available(conn: sqlite3.Connection) -> bool:
+    """True if the project has the cache table. Projects that predate the migration are calculated without it."""
+
+    curs = conn.cursor()
+    curs.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", [CACHE_TABLE])
+    return curs.fetchone() is not None
+
+
+class MetricFingerprinter:
+    """Builds metric result fingerprints, hashing each sample frame, event and input only once."""
+
+    def __init__(self, project_file: str, analysis_params: dict):
+        self.project_file = project_file
+        self.analysis_params = analysis_params
+        self._sample_frame_hashes = {}
+        self._dce_hashes = {}
+        self._input_hashes = {}
+
+    def sample_frame_hash(self, curs: sqlite3.Cursor, sample_frame_id: int) -> str:
+        if sample_frame_id not in self._sample_frame_hashes:
+            self._sample_frame_hashes[sample_frame_id] = _hash_rows(curs, 'SELECT geom FROM sample_frame_features WHERE fid = ?', [sample_frame_id])
+        return self._sample_frame_hashes[sample_frame_id]
+
+    def dce_hash(self, curs: sqlite3.Cursor, event_id: int) -> str:
+        if event_id not in self._dce_hashes:
+            digest = hashlib.sha256()
+            for table in DCE_TABLES:
+                digest.update(_hash_rows(curs, f'SELECT fid, event_layer_id, geom, metadata FROM {table} WHERE event_id = ? ORDER BY fid', [event_id]).encode('utf-8'))  # nosec B608 - table is one of the fixed DCE table names
+            self._dce_hashes[event_id] = digest.hexdigest()
+        return self._dce_hashes[event_id]
+
+    def input_hash(self, curs: sqlite3.Cursor, input_ref: str) -> str:
+        if input_ref not in self._input_hashes:
+            db_item = self.analysis_params.get(input_ref, None)
+            if db_item is None:
+                value = 'missing'
+            elif isinstance(db_item, Raster):
+                raster_path = os.path.join(os.path.dirname(self.project_file), db_item.path)
+                stat = os.stat(raster_path) if os.path.isfile(raster_path) else None
+                value = f'raster:{db_item.path}:{stat.st_size}:{stat.st_mtime}' if stat is not None else f'raster:{db_item.path}:missing'
+            else:
+                value = f'{db_item.fc_name}:{db_item.id}:' + _hash_rows(curs, f'SELECT * FROM {db_item.fc_name} WHERE {db_item.fc_id_column_name} = ? ORDER BY fid', [db_item.id])  # nosec B608 - fc_name and fc_id_column_name are fixed schema values
+            self._input_hashes[input_ref] = value
+        return self._input_hashes[input_ref]
+
+    def fingerprint(self, curs: sqlite3.Cursor, metric, sample_frame_id: int, event_id: int, resolved_dependencies: dict = None) -> str:
+
+        metric_params = metric.metric_params or {}
+        inputs = {input_ref: self.input_hash(curs, input_ref) for input_ref in sorted(_referenced_inputs(metric_params))}
+        key = {
+            'code': metric_code_version(),
+            'function': metric.metric_function,
+            'params': metric_params,
+            'event_id': event_id,
+            'dce': self.dce_hash(curs, event_id),
+            'sample_frame': self.sample_frame_hash(curs, sample_frame_id),
+            'inputs': inputs,
+            'dependencies': resolved_dependencies or {},
+        }
+        return hashlib.sha256(json.dumps(key, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+
+class MetricResultCache:
+    """Lookups and batched writes against the metric_result_cache table on an open connection."""
+
+    MISS = object()
+
+    def __init__(self, conn: sqlite3.Connection):
+        self.conn = conn
+        self.hits = 0
+        self.misses = 0
+        self._pending_results = []
+        self._pending_hits = []
+
+    def get(self, fingerprint: str):
+        """Return the cached value or MetricResultCache.MISS."""
+
+        curs = self.conn.cursor()
+        curs.execute(f'SELECT value FROM {CACHE_TABLE} WHERE fingerprint = ?', [fingerprint])  # nosec B608 - CACHE_TABLE is a module constant
+        row = curs.fetchone()
+        if row is None:
+            self.misses += 1
+            return MetricResultCache.MISS
+
+        self.hits += 1
+        self._pending_hits.append((fingerprint,))
+        return json.loads(row[0])
+
+    def put(self, fingerprint: str, metric, value):
+        self._pending_results.append((fingerprint, metric.id, metric.metric_function, json.dumps(value)))
+
+    def flush(self, conn: sqlite3.Connection = None):
+        """Write the pending results and hit counts, on conn if specified. The caller commits."""
+
+        curs = (conn or self.conn).cursor()
+        if len(self._pending_results) > 0:
+            curs.executemany(f'INSERT OR REPLACE INTO {CACHE_TABLE} (fingerprint, metric_id, metric_function, value) VALUES (?, ?, ?, ?)', self._pending_results)  # nosec B608 - CACHE_TABLE is a module constant
+            self._pending_results.clear()
+        if len(self._pending_hits) > 0:
+            curs.executemany(f'UPDATE {CACHE_TABLE} SET hit_count = hit_count + 1, last_used_on = CURRENT_TIMESTAMP WHERE fingerprint = ?', self._pending_hits)  # nosec B608 - CACHE_TABLE is a module constant
+            self._pending_hits.clear()
+
+
+def metric_cache_stats(project_file: str) -> dict:
+    """Number of cached results, total reuse count and approximate size in bytes."""
+
+    with get_connection_manager(project_file).read() as conn:
+        curs = conn.cursor()
+        curs.execute(f'SELECT COUNT(*), COALESCE(SUM(hit_count), 0), COALESCE(SUM(LENGTH(fingerprint) + LENGTH(value) + LENGTH(metric_function)), 0), COUNT(DISTINCT metric_id) FROM {CACHE_TABLE}')  # nosec B608 - CACHE_TABLE is a module constant
+        entries, hits, size, metrics = curs.fetchone()
+    return {'entries': entries, 'hits': hits, 'size': size, 'metrics': metrics}
+
+
+def purge_metric_cache(project_file: str, metric_ids: list = None) -> int:
+    """Delete cached results (all of them, or those for the specified metrics). Returns the number deleted."""
+
+    with get_connection_manager(project_file).write() as conn:
+        curs = conn.cursor()
+        if metric_ids is None:
+            curs.execute(f'DELETE FROM {CACHE_TABLE}')  # nosec B608 - CACHE_TABLE is a module constant
+        else:
+            placeholders = ', '.join('?' for _ in metric_ids)
+            curs.execute(f'DELETE FROM {CACHE_TABLE} WHERE metric_id IN ({placeholders})', metric_ids)  # nosec B608 - placeholders are generated as '?,?,...' from list length
+        deleted = curs.rowcount
+    return deleted
@@ -0,0 +1,172 @@
+"""Optional timing instrumentation for analysis metric calculations.
+
+A MetricProfiler is activated on the thread that runs the metric calculations. Helper
+functions decorated with @profiled record their wall time and call count against the
+active profiler. When no profiler is active the decorators call straight through to the
+wrapped function, so instrumentation costs a single thread-local lookup per call.
+Calculations run on worker threads record against their own profiler, which is merged
+into the task's profiler when they finish.
+"""
+
+import os
+import json
+import time
+import inspect
+import functools
+import threading
+from contextlib import contextmanager, nullcontext
+
+_local = threading.local()
+
+
+def get_active_profiler():
+    """Return the profiler active on the current thread, or None."""
+    return getattr(_local, 'profiler', None)
+
+
+def profile_section(category: str, name: str, exclusive_category: str = None):
+    """Context manager that times a block against the active profiler, or does nothing."""
+    profiler = get_active_profiler()
+    if profiler is None:
+        return nullcontext()
+    return profiler.section(category, name, exclusive_category)
+
+
+def profiled(category: str, name: str = None):
+    """Decorator that records the wall time of a function (or of iterating a generator) under category."""
+
+    def decorator(func):
+        label = name if name is not None else func.__name__
+
+        if inspect.isgeneratorfunction(func):
+            @functools.wraps(func)
+            def generator_wrapper(*args, **kwargs):
+                profiler = get_active_profiler()
+                if profiler is None:
+                    return func(*args, **kwargs)
+                return profiler.profile_generator(category, label, func(*args, **kwargs))
+            return generator_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            profiler = get_active_profiler()
+            if profiler is None:
+                return func(*args, **kwargs)
+            with profiler.section(category, label):
+                return func(*args, **kwargs)
+        return wrapper
+
+    return decorator
+
+
+class MetricProfiler:
+    """Accumulates wall time and call counts per category and name."""
+
+    METRIC_FUNCTION = 'metric_function'
+    SAMPLE_FRAME = 'sample_frame'
+    FEATURE_IO = 'feature_io'
+    # Time inside metric functions that is not spent on feature I/O or raster reads
+    GEOMETRY = 'geometry'
+    RASTER_READ = 'raster_read'
+    DB_READ = 'db_read'
+    DB_WRITE = 'db_write'
+    DEPENDENCIES = 'dependencies'
+
+    def __init__(self):
+        self.timings = {}  # {category: {name: [calls, seconds]}}
+        self.total_seconds = 0.0
+        self._started = None
+        # Time spent in nested sections, one accumulator per open section
+        self._child_seconds = []
+
+    def activate(self):
+        self._started = time.perf_counter()
+        _local.profiler = self
+
+    def deactivate(self):
+        if get_active_profiler() is self:
+            _local.profiler = None
+        if self._started is not None:
+            self.total_seconds += time.perf_counter() - self._started
+            self._started = None
+
+    def record(self, category: str, name: str, seconds: float, calls: int = 1):
+        entry = self.timings.setdefault(category, {}).setdefault(str(name), [0, 0.0])
+        entry[0] += calls
+        entry[1] += seconds
+
+    def merge(self, other: 'MetricProfiler'):
+        """Add the timings recorded by a profiler that was active on another thread. The total time is not changed."""
+        for category, names in other.timings.items():
+            for name, (calls, seconds) in names.items():
+                self.record(category, name, seconds, calls)
+
+    def _close(self, start: float) -> tuple:
+        elapsed = time.perf_counter() - start
+        child_seconds = self._child_seconds.pop()
+        if len(self._child_seconds) > 0:
+            self._child_seconds[-1] += elapsed
+        return elapsed, child_seconds
+
+    @contextmanager
+    def section(self, category: str, name: str, exclusive_category: str = None):
+        """Time a block. When exclusive_category is given, the block's time minus the time of
+        nested sections is also recorded under that category."""
+        self._child_seconds.append(0.0)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed, child_seconds = self._close(start)
+            self.record(category, name, elapsed)
+            if exclusive_category is not None:
+                self.record(exclusive_category, name, elapsed - child_seconds)
+
+    def profile_generator(self, category: str, name: str, generator):
+        """Yield from generator, recording the time spent producing items as one call."""
+        seconds = 0.0
+        try:
+            while True:
+                self._child_seconds.append(0.0)
+                start = time.perf_counter()
+                try:
+                    item = next(generator)
+                except StopIteration:
+                    return
+                finally:
+                    elapsed, _child_seconds = self._close(start)
+                    seconds += elapsed
+                yield item
+        finally:
+            generator.close()
+            self.record(category, name, seconds)
+
+    def to_dict(self) -> dict:
+        categories = {}
+        for category, names in self.timings.items():
+            categories[category] = {
+                name: {'calls': calls, 'seconds': seconds, 'mean_seconds': seconds / calls if calls > 0 else 0.0}
+                for name, (calls, seconds) in sorted(names.items(), key=lambda item: item[1][1], reverse=True)
+            }
+        return {'total_seconds': self.total_seconds, 'categories': categories}
+
+    def summary_lines(self, top: int = 5) -> list:
+        """Human readable lines with the category totals and the slowest names in each category."""
+        lines = [f'Metric calculation profile: {self.total_seconds:.3f} s total']
+        totals = {category: sum(seconds for _calls, seconds in names.values()) for category, names in self.timings.items()}
+        for category, total in sorted(totals.items(), key=lambda item: item[1], reverse=True):
+            calls = sum(calls for calls, _seconds in self.timings[category].values())
+            lines.append(f'  {category}: {total:.3f} s in {calls} calls')
+            slowest = sorted(self.timings[category].items(), key=lambda item: item[1][1], reverse=True)[:top]
+            for name, (name_calls, seconds) in slowest:
+                lines.append(f'    {name}: {seconds:.3f} s, {name_calls} calls, {seconds / name_calls:.4f} s/call')
+        return lines
+
+    def write_json(self, path: str, metadata: dict = None):
+        output = self.to_dict()
+        if metadata is not None:
+            output['metadata'] = metadata
+        if os.path.dirname(path) and not os.path.exists(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path))
+        with open(path, 'w') as f:
+            json.dump(output, f, indent=2)
@@ -0,0 +1,86 @@
+"""
+Dependency aware concurrent scheduling of the metrics of one sample frame and event.
+
+AnalysisMetricsTask.plan_metric_execution orders the metrics so that dependencies come
+first. The MetricScheduler runs that plan as a DAG: every metric whose dependencies have
+finished is started, in plan order, and metrics that need a calculation run on a shared
+thread pool. Metric calculations spend most of their time in GDAL/GEOS calls that release
+the GIL, so independent metrics (several areas on different DCE layers, say) overlap.
+Derived metrics are started as soon as the last of their dependencies finishes.
+
+Starting and finishing metrics happens on the thread that calls run(), so the callbacks can
+use the task's database connection, cache and metric values without locking. Only the
+calculation itself runs on the pool.
+"""
+
+import os
+from concurrent.futures import Executor, FIRST_COMPLETED, wait
+from typing import Callable, Dict, List, Optional
+
+# GDAL/GEOS calculations release the GIL, but each one opens its own datasets
+MAX_WORKERS = min(4, os.cpu_count() or 1)
+
+
+class MetricScheduler:
+    """Runs metrics as a DAG. dependencies maps each metric id, in plan order, to the ids it depends on."""
+
+    def __init__(self, executor: Executor, dependencies: Dict[int, List[int]]):
+        self.executor = executor
+        self.order = {metric_id: i for i, metric_id in enumerate(dependencies)}
+        self.dependencies = {metric_id: [dep_id for dep_id in deps if dep_id in self.order] for metric_id, deps in dependencies.items()}
+        self.dependents = {metric_id: [] for metric_id in self.order}
+        for metric_id, deps in self.dependencies.items():
+            for dep_id in deps:
+                self.dependents[dep_id].append(metric_id)
+
+    def run(self, start: Callable[[int], Optional[Callable[[], object]]], finish: Callable[[int, object, Exception], None],
+            is_canceled: Callable[[], bool] = None) -> bool:
+        """Run every metric once its dependencies have finished.
+
+        start(metric_id) returns a calculation to run on the pool, or None when the metric needs no
+        calculation (skipped, cached, failed before calculating). finish(metric_id, result, exception)
+        is called with the outcome of each calculation. Both are called on this thread.
+
+        Returns False if is_canceled() stopped the run. Calculations already running are allowed to
+        finish, and metrics that were not started are neither started nor finished.
+        """
+
+        remaining = {metric_id: len(deps) for metric_id, deps in self.dependencies.items()}
+        ready = [metric_id for metric_id, count in remaining.items() if count == 0]
+        running = {}
+        canceled = False
+
+        def release(metric_id):
+            for dependent in self.dependents[metric_id]:
+                remaining[dependent] -= 1
+                if remaining[dependent] == 0:
+                    ready.append(dependent)
+            ready.sort(key=self.order.get)
+
+        while (ready and not canceled) or running:
+            while ready and not canceled:
+                if is_canceled is not None and is_canceled():
+                    canceled = True
+                    break
+                metric_id = ready.pop(0)
+                calculation = start(metric_id)
+                if calculation is None:
+                    release(metric_id)
+                else:
+                    running[self.executor.submit(calculation)] = metric_id
+
+            if not running:
+                break
+
+            done, _not_done = wait(running, return_when=FIRST_COMPLETED)
+            # Calculations that finish together are handled in plan order
+            for future in sorted(done, key=lambda f: self.order[running[f]]):
+                metric_id = running.pop(future)
+                try:
+                    result, exception = future.result(), None
+                except Exception as ex:
+                    result, exception = None, ex
+                finish(metric_id, result, exception)
+                release(metric_id)
+
+        return not canceled
@@ -0,0 +1,153 @@
+"""Creation options and writers shared by the raster import and hillshade tasks.
+
+Project rasters are written as tiled, compressed GeoTIFFs with internal overviews,
+using the COG driver when the GDAL build provides it. Warping, compression and
+overview generation all use NUM_THREADS so large DEMs make use of every core.
+"""
+
+import os
+
+from osgeo import gdal
+
+# Display name: GDAL resampling algorithm name
+RESAMPLING_METHODS = {
+    'Nearest Neighbour': 'near',
+    'Bilinear': 'bilinear',
+    'Cubic': 'cubic',
+    'Cubic Spline': 'cubicspline',
+    'Average': 'average',
+    'Mode': 'mode',
+}
+
+PREDICTOR_AUTO = 'auto'
+# Display name: GeoTIFF PREDICTOR value (None disables the predictor)
+PREDICTORS = {
+    'Automatic': PREDICTOR_AUTO,
+    'None': None,
+    'Horizontal Differencing': 2,
+    'Floating Point': 3,
+}
+
+DEFAULT_COMPRESSION = 'DEFLATE'
+DEFAULT_BLOCK_SIZE = 512
+DEFAULT_NUM_THREADS = 'ALL_CPUS'
+
+_FLOAT_TYPES = (gdal.GDT_Float32, gdal.GDT_Float64)
+
+
+def resolve_predictor(predictor, data_type: int):
+    """Return the GeoTIFF predictor to use for a band data type.
+
+    Automatic selection uses floating point prediction for float rasters and
+    horizontal differencing for integer rasters. An explicit floating point
+    predictor on an integer raster falls back to horizontal differencing because
+    GDAL rejects that combination.
+    """
+
+    if predictor == PREDICTOR_AUTO:
+        return 3 if data_type in _FLOAT_TYPES else 2
+    if predictor == 3 and data_type not in _FLOAT_TYPES:
+        return 2
+    return predictor
+
+
+def creation_options(data_type: int, cog: bool = True, predictor=PREDICTOR_AUTO, compression: str = DEFAULT_COMPRESSION,
+                     num_threads=DEFAULT_NUM_THREADS, block_size: int = DEFAULT_BLOCK_SIZE, overview_resampling: str = 'average') -> list:
+    """Build creation options for either the COG driver or a tiled GTiff."""
+
+    options = [f'COMPRESS={compression}', f'NUM_THREADS={num_threads}', 'BIGTIFF=IF_SAFER']
+    predictor = resolve_predictor(predictor, data_type)
+    if predictor is not None:
+        options.append(f'PREDICTOR={predictor}')
+
+    if cog is True:
+        options += [f'BLOCKSIZE={block_size}', f'OVERVIEW_RESAMPLING={overview_resampling.upper()}']
+    else:
+        options += ['TILED=YES', f'BLOCKXSIZE={block_size}', f'BLOCKYSIZE={block_size}']
+
+    return options
+
+
+def cog_driver_available() -> bool:
+    return gdal.GetDriverByName('COG') is not None
+
+
+def warp_options(num_threads=DEFAULT_NUM_THREADS) -> dict:
+    """Keyword arguments for gdal.Warp that enable multithreaded warping."""
+
+    return {
+        'multithread': True,
+        'warpOptions': [f'NUM_THREADS={num_threads}'],
+        'warpMemoryLimit': 512,
+    }
+
+
+def write_output_raster(output_path: str, source_path: str, cog: bool = True, predictor=PREDICTOR_AUTO,
+                        num_threads=DEFAULT_NUM_THREADS, overview_resampling: str = 'average', callback=None, callback_data=None):
+    """Write source_path to output_path as a compressed, tiled GeoTIFF with internal overviews.
+
+    When cog is True and the COG driver is available the output is a Cloud-Optimized
+    GeoTIFF. Otherwise a tiled GTiff is written and overviews are added afterwards.
+    """
+
+    src = gdal.Open(source_path)
+    data_type = src.GetRasterBand(1).DataType
+    src = None
+
+    use_cog = cog is True and cog_driver_available()
+    options = creation_options(data_type, use_cog, predictor, num_threads=num_threads, overview_resampling=overview_resampling)
+    gdal.Translate(output_path, source_path, format='COG' if use_cog else 'GTiff', creationOptions=options, callback=callback, callback_data=callback_data)
+
+    if not use_cog:
+        build_overviews(output_path, overview_resampling, num_threads)
+
+
+def build_overviews(raster_path: str, resampling: str = 'average', num_threads=DEFAULT_NUM_THREADS, min_size: int = 256):
+    """Add internal overviews, halving the resolution until the raster fits within min_size."""
+
+    ds = gdal.Open(raster_path, gdal.GA_Update)
+    factors = []
+    factor = 2
+    while max(ds.RasterXSize, ds.RasterYSize) / factor >= min_size:
+        factors.append(factor)
+        factor *= 2
+
+    if len(factors) > 0:
+        config = {'GDAL_NUM_THREADS': str(num_threads), 'COMPRESS_OVERVIEW': DEFAULT_COMPRESSION}
+        previous = {key: gdal.GetConfigOption(key) for key in config}
+        try:
+            for key, value in config.items():
+                gdal.SetConfigOption(key, value)
+            ds.BuildOverviews(resampling.upper(), factors)
+        finally:
+            for key, value in previous.items():
+                gdal.SetConfigOption(key, value)
+    ds = None
+
+
+def tile_windows(x_size: int, y_size: int, tile_size: int, overlap: int = 0):
+    """Yield (x_off, y_off, width, height, read_x_off, read_y_off, read_width, read_height)
+    covering the raster. The read window extends each tile by overlap pixels where
+    possible so neighbourhood operations are seamless across tile edges."""
+
+    for y_off in range(0, y_size, tile_size):
+        height = min(tile_size, y_size - y_off)
+        for x_off in range(0, x_size, tile_size):
+            width = min(tile_size, x_size - x_off)
+            read_x_off = max(0, x_off - overlap)
+            read_y_off = max(0, y_off - overlap)
+            read_x_end = min(x_size, x_off + width + overlap)
+            read_y_end = min(y_size, y_off + height + overlap)
+            yield x_off, y_off, width, height, read_x_off, read_y_off, read_x_end - read_x_off, read_y_end - read_y_off
+
+
+def remove_raster(raster_path: str):
+    """Delete a raster and any sidecar files, ignoring rasters that do not exist."""
+
+    if not os.path.exists(raster_path):
+        return
+    try:
+        gdal.GetDriverByName('GTiff').Delete(raster_path)
+    except Exception:
+        # A partially written file may not open as a raster
+        os.remove(raster_path)
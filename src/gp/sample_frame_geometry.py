@@ -0,0 +1,251 @@
+"""
+Projected sample frame geometry store.
+
+Metric and zonal calculations measure sample frame features in the UTM zone of each
+feature. The projected polygon, its area and perimeter (m), its bounding box in the
+project CRS and the UTM EPSG code are stored per sample frame feature in the
+sample_frame_geometries table when sample frames are created, imported or edited, so
+that calculations read them instead of re-projecting the sample frame on every call.
+
+Each row records a hash of the source geometry. Lookups compare it with the current
+geometry in sample_frame_features, so rows made stale by edits outside QRiS are
+recomputed when read, and projects that predate the table compute the values in memory.
+"""
+
+import os
+import math
+import struct
+import hashlib
+import sqlite3
+import threading
+from dataclasses import dataclass
+from typing import Dict, List, Tuple
+
+from osgeo import ogr, osr
+
+from ..model.connection_manager import get_connection_manager
+
+GEOMETRY_TABLE = 'sample_frame_geometries'
+
+# Size of the optional envelope in the GeoPackage geometry header, by envelope indicator
+ENVELOPE_SIZES = {0: 0, 1: 32, 2: 48, 3: 48, 4: 64}
+# Feature ids bound to one IN (...) query
+MAX_SQL_PARAMS = 500
+
+_cache: Dict[Tuple[str, int], Tuple[str, 'SampleFrameGeometry']] = {}
+_cache_lock = threading.Lock()
+
+
+@dataclass(frozen=True)
+class SampleFrameGeometry:
+    """A sample frame feature projected to its UTM zone."""
+
+    fid: int
+    utm_epsg: int
+    area: float
+    perimeter: float
+    # min_x, min_y, max_x, max_y in the project CRS
+    bbox: Tuple[float, float, float, float]
+    projected_wkb: bytes
+
+    def projected_geometry(self) -> ogr.Geometry:
+        """A new OGR geometry in the UTM zone, with its spatial reference assigned."""
+        geom = ogr.CreateGeometryFromWkb(self.projected_wkb)
+        geom.AssignSpatialReference(utm_spatial_reference(self.utm_epsg))
+        return geom
+
+
+def get_utm_zone_epsg(longitude: float) -> int:
+    """Really crude EPSG lookup method
+
+    Args:
+        longitude (float): [description]
+
+    Returns:
+        int: [description]
+    """
+    zone_number = math.floor((180.0 + longitude) / 6.0)
+    epsg = 26901 + zone_number
+    return epsg
+
+
+def utm_spatial_reference(epsg: int) -> osr.SpatialReference:
+    utm_srs = osr.SpatialReference()
+    utm_srs.ImportFromEPSG(epsg)
+    utm_srs.SetAxisMappingStrategy(osr.OAMS_TRADITIONAL_GIS_ORDER)
+    return utm_srs
+
+
+def geometry_hash(blob: bytes) -> str:
+    return hashlib.sha256(blob).hexdigest()
+
+
+def _parse_gpkg_geometry(blob: bytes) -> Tuple[int, bytes]:
+    """The srs_id and WKB of a GeoPackage geometry blob, or (None, None) for an empty geometry."""
+
+    if blob is None or len(blob) < 8 or blob[0:2] != b'GP':
+        raise ValueError('Not a GeoPackage geometry blob.')
+    flags = blob[3]
+    if flags & 0x10:
+        return None, None
+    srs_id = struct.unpack('<i' if flags & 0x01 else '>i', blob[4:8])[0]
+    envelope_size = ENVELOPE_SIZES.get((flags >> 1) & 0x07, 0)
+    return srs_id, bytes(blob[8 + envelope_size:])
+
+
+def _read_spatial_ref_sys(conn: sqlite3.Connection) -> Dict[int, tuple]:
+    """(organization, organization_coordsys_id, definition) of each gpkg_spatial_ref_sys row, keyed by srs_id."""
+
+    try:
+        curs = conn.execute('SELECT srs_id, organization, organization_coordsys_id, definition FROM gpkg_spatial_ref_sys')
+    except sqlite3.OperationalError:
+        return {}
+    return {srs_id: (organization, coordsys_id, definition) for srs_id, organization, coordsys_id, definition in curs}
+
+
+def spatial_reference(srs_id: int, spatial_ref_sys: Dict[int, tuple]) -> osr.SpatialReference:
+    """Spatial reference of a GeoPackage srs_id.
+
+    The srs_id is a key into gpkg_spatial_ref_sys and is only the EPSG code by convention, so the
+    organization code is used when the organization is EPSG and the WKT definition otherwise.
+    Undefined systems (srs_id 0 and -1) and missing rows fall back to WGS84.
+    """
+
+    srs = osr.SpatialReference()
+    organization, coordsys_id, definition = spatial_ref_sys.get(srs_id, (None, None, None))
+    if str(organization).upper() == 'EPSG' and coordsys_id is not None and coordsys_id > 0:
+        srs.ImportFromEPSG(coordsys_id)
+    elif definition and definition.lower() != 'undefined' and srs_id > 0:
+        srs.ImportFromWkt(definition)
+    else:
+        srs.ImportFromEPSG(4326)
+    srs.SetAxisMappingStrategy(osr.OAMS_TRADITIONAL_GIS_ORDER)
+    return srs
+
+
+def compute_sample_frame_geometry(fid: int, blob: bytes, spatial_ref_sys: Dict[int, tuple] = None) -> SampleFrameGeometry:
+    """Project a sample_frame_features geometry blob to the UTM zone of its centroid and measure it.
+
+    spatial_ref_sys is the content of the GeoPackage's gpkg_spatial_ref_sys table, keyed by srs_id.
+    """
+
+    srs_id, wkb = _parse_gpkg_geometry(blob)
+    if wkb is None:
+        return None
+
+    geom: ogr.Geometry = ogr.CreateGeometryFromWkb(wkb)
+    geom.AssignSpatialReference(spatial_reference(srs_id, spatial_ref_sys or {}))
+
+    min_x, max_x, min_y, max_y = geom.GetEnvelope()
+    epsg = get_utm_zone_epsg(geom.Centroid().GetX())
+    geom.TransformTo(utm_spatial_reference(epsg))
+    if geom.IsMeasured() > 0 or geom.Is3D() > 0:
+        geom.FlattenTo2D()
+
+    boundary = geom.Boundary()
+    perimeter = boundary.Length() if boundary is not None else 0.0
+    return SampleFrameGeometry(fid, epsg, geom.GetArea(), perimeter, (min_x, min_y, max_x, max_y), bytes(geom.ExportToWkb()))
+
+
+def _store_available(conn: sqlite3.Connection) -> bool:
+    curs = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", [GEOMETRY_TABLE])
+    return curs.fetchone() is not None
+
+
+def _store(project_file: str, rows: list) -> None:
+    """Write computed geometries. A project without the table, or one that is locked, keeps them in memory only."""
+
+    try:
+        with get_connection_manager(project_file).write() as conn:
+            if _store_available(conn):
+                conn.executemany(f"""INSERT OR REPLACE INTO {GEOMETRY_TABLE} (sample_frame_feature_id, sample_frame_id, geom_hash, utm_epsg, area, perimeter, min_x, min_y, max_x, max_y, projected_geom, updated_on)
+                                     VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)""", rows)  # nosec B608 - GEOMETRY_TABLE is a constant
+    except sqlite3.OperationalError:
+        pass
+
+
+def _load(project_file: str, where: str, params: list) -> Dict[int, SampleFrameGeometry]:
+    """Geometries of the sample_frame_features rows matching the where clause, recomputing and storing any that are missing or stale."""
+
+    stored = {}
+    with get_connection_manager(project_file).read() as conn:
+        try:
+            source = conn.execute(f'SELECT fid, sample_frame_id, geom FROM sample_frame_features WHERE {where}', params).fetchall()  # nosec B608 - where is built from placeholders by the callers below
+        except sqlite3.OperationalError:
+            # Stand alone sample frame layers without a sample_frame_id column
+            source = [(fid, None, blob) for fid, blob in conn.execute(f'SELECT fid, geom FROM sample_frame_features WHERE {where}', params)]  # nosec B608
+        spatial_ref_sys = _read_spatial_ref_sys(conn)
+        if _store_available(conn) and len(source) > 0:
+            fids = [row[0] for row in source]
+            for i in range(0, len(fids), MAX_SQL_PARAMS):
+                chunk = fids[i:i + MAX_SQL_PARAMS]
+                curs = conn.execute(f"""SELECT sample_frame_feature_id, geom_hash, utm_epsg, area, perimeter, min_x, min_y, max_x, max_y, projected_geom
+                                        FROM {GEOMETRY_TABLE} WHERE sample_frame_feature_id IN ({', '.join('?' * len(chunk))})""", chunk)  # nosec B608 - GEOMETRY_TABLE is a constant and the IN list is placeholders
+                for fid, geom_hash, utm_epsg, area, perimeter, min_x, min_y, max_x, max_y, projected_geom in curs:
+                    stored[fid] = (geom_hash, SampleFrameGeometry(fid, utm_epsg, area, perimeter, (min_x, min_y, max_x, max_y), bytes(projected_geom)))
+
+    cache_key = os.path.normcase(os.path.abspath(project_file))
+    geometries = {}
+    computed = []
+    for fid, sample_frame_id, blob in source:
+        if blob is None:
+            continue
+        blob_hash = geometry_hash(blob)
+        with _cache_lock:
+            cached = _cache.get((cache_key, fid))
+        if cached is None or cached[0] != blob_hash:
+            cached = stored.get(fid)
+            if cached is None or cached[0] != blob_hash:
+                geometry = compute_sample_frame_geometry(fid, blob, spatial_ref_sys)
+                if geometry is None:
+                    continue
+                cached = (blob_hash, geometry)
+                computed.append((fid, sample_frame_id, blob_hash, geometry.utm_epsg, geometry.area, geometry.perimeter, *geometry.bbox, geometry.projected_wkb))
+            with _cache_lock:
+                _cache[(cache_key, fid)] = cached
+        geometries[fid] = cached[1]
+
+    if len(computed) > 0:
+        _store(project_file, computed)
+    return geometries
+
+
+def get_sample_frame_geometries(project_file: str, fids: List[int]) -> Dict[int, SampleFrameGeometry]:
+    """Projected geometries of the sample frame features, keyed by fid. Features without geometry are omitted."""
+
+    geometries = {}
+    fids = list(fids)
+    for i in range(0, len(fids), MAX_SQL_PARAMS):
+        chunk = fids[i:i + MAX_SQL_PARAMS]
+        geometries.update(_load(project_file, f"fid IN ({', '.join('?' * len(chunk))})", chunk))
+    return geometries
+
+
+def get_sample_frame_geometry(project_file: str, sample_frame_feature_id: int) -> SampleFrameGeometry:
+    """Projected geometry of one sample frame feature."""
+
+    geometry = get_sample_frame_geometries(project_file, [sample_frame_feature_id]).get(sample_frame_feature_id)
+    if geometry is None:
+        raise ValueError(f'Sample frame feature {sample_frame_feature_id} does not exist or has no geometry.')
+    return geometry
+
+
+def update_sample_frame_geometries(project_file: str, sample_frame_id: int) -> Dict[int, SampleFrameGeometry]:
+    """Bring the stored geometries of every feature in a sample frame up to date after it is created or edited.
+
+    Features whose geometry is unchanged are not recomputed, and rows for deleted features are removed.
+    """
+
+    geometries = _load(project_file, 'sample_frame_id = ?', [sample_frame_id])
+    try:
+        with get_connection_manager(project_file).write() as conn:
+            if _store_available(conn):
+                conn.execute(f'DELETE FROM {GEOMETRY_TABLE} WHERE sample_frame_id = ? AND sample_frame_feature_id NOT IN (SELECT fid FROM sample_frame_features WHERE sample_frame_id = ?)', [sample_frame_id, sample_frame_id])  # nosec B608 - GEOMETRY_TABLE is a constant
+    except sqlite3.OperationalError:
+        pass
+    return geometries
+
+
+def clear_sample_frame_geometry_cache():
+    with _cache_lock:
+        _cache.clear()
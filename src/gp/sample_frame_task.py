@@ -2,6 +2,8 @@ from qgis.PyQt.QtCore import pyqtSignal
 from qgis.core import QgsTask, QgsMessageLog, Qgis, QgsVectorLayer, QgsFeature, QgsProject, QgsCoordinateTransform
 from qgis import processing
 
+from .sample_frame_geometry import update_sample_frame_geometries
+
 
 MESSAGE_CATEGORY = 'SampleFrameTask'
 
@@ -84,6 +86,9 @@ class SampleFrameTask(QgsTask):
                     'Sample Frame split completed with zero output features.',
                     MESSAGE_CATEGORY, Qgis.Warning)
 
+            # Project and measure the new features once, here in the background
+            update_sample_frame_geometries(self.sample_frame.split('|')[0], self.id)
+
             return True
         except Exception as ex:
             self.exception = ex
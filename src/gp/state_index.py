@@ -0,0 +1,142 @@
+"""
+Offline point in US state lookups against the state boundaries bundled in resources/.
+
+Each boundary file is read once, on first use, into an STRtree of prepared shapely
+geometries. The index is shared by every caller (and thread) for the rest of the
+session, so a lookup is an R-tree query and a prepared point in polygon test rather
+than a QgsVectorLayer load or a reverse geocoding request.
+
+STREAMSTATS_STATES (us_states.gpkg, WGS84) carries the StreamStats implementation
+STATUS of each state. VICINITY_STATES (us_states_simplified.geojson, EPSG:5070) has
+lighter geometries and the state names used to draw vicinity maps.
+"""
+
+import threading
+from dataclasses import dataclass, field
+from typing import Dict, List, Tuple
+
+import shapely
+from shapely.wkb import loads as wkbload
+from osgeo import ogr, osr
+
+from ..QRiS.settings import Settings
+
+STREAMSTATS_STATES = ('us_states.gpkg', 'states')
+VICINITY_STATES = ('us_states_simplified.geojson', None)
+
+# {(resource file, layer name): StateIndex}
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+@dataclass
+class State:
+    abbr: str
+    attributes: Dict[str, object] = field(default_factory=dict)
+    # Boundary in the CRS of the source file (StateIndex.srs_wkt)
+    geometry: object = None
+
+    @property
+    def name(self) -> str:
+        return self.attributes.get('STATE_NAME')
+
+    @property
+    def status(self) -> str:
+        return self.attributes.get('STATUS')
+
+
+class StateIndex:
+    """Lazily built spatial index over the features of one state boundary file."""
+
+    def __init__(self, path: str, layer_name: str = None):
+        self.path = path
+        self.layer_name = layer_name
+        self.srs_wkt = None
+        self.states: List[State] = []
+        self._tree = None
+        self._to_source = None
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self._tree is not None
+
+    def load(self):
+        """Read the boundaries and build the tree. Safe to call from several threads at once."""
+
+        with self._lock:
+            if self._tree is not None:
+                return
+
+            ds: ogr.DataSource = ogr.Open(self.path)
+            if ds is None:
+                raise Exception(f'Unable to open US state boundaries at {self.path}')
+            try:
+                layer: ogr.Layer = ds.GetLayerByName(self.layer_name) if self.layer_name is not None else ds.GetLayer(0)
+                if layer is None:
+                    raise Exception(f'Unable to find layer {self.layer_name} in {self.path}')
+
+                layer_defn = layer.GetLayerDefn()
+                field_names = [layer_defn.GetFieldDefn(i).GetName() for i in range(layer_defn.GetFieldCount())]
+                states = []
+                for feature in layer:
+                    geom = feature.GetGeometryRef()
+                    if geom is None or geom.IsEmpty():
+                        continue
+                    attributes = {name: feature.GetField(name) for name in field_names}
+                    states.append(State(attributes.get('STATE_ABBR'), attributes, wkbload(bytes(geom.ExportToWkb()))))
+
+                source_srs: osr.SpatialReference = layer.GetSpatialRef()
+                to_source = None
+                if source_srs is not None:
+                    source_srs = source_srs.Clone()
+                    source_srs.SetAxisMappingStrategy(osr.OAMS_TRADITIONAL_GIS_ORDER)
+                    wgs84 = osr.SpatialReference()
+                    wgs84.ImportFromEPSG(4326)
+                    wgs84.SetAxisMappingStrategy(osr.OAMS_TRADITIONAL_GIS_ORDER)
+                    if not source_srs.IsSame(wgs84):
+                        to_source = osr.CoordinateTransformation(wgs84, source_srs)
+                    self.srs_wkt = source_srs.ExportToWkt()
+            finally:
+                ds = None
+
+            geometries = [state.geometry for state in states]
+            shapely.prepare(geometries)
+            self.states = states
+            self._to_source = to_source
+            self._tree = shapely.STRtree(geometries)
+
+    def find(self, latitude: float, longitude: float) -> State:
+        """The state containing (or touching) the WGS84 point, or None if the point is outside every state."""
+
+        self.load()
+        x, y = float(longitude), float(latitude)
+        if self._to_source is not None:
+            x, y, _z = self._to_source.TransformPoint(x, y)
+
+        point = shapely.Point(x, y)
+        # Tree order is arbitrary. Take the lowest feature index so that border points are deterministic.
+        for index in sorted(self._tree.query(point)):
+            state = self.states[index]
+            if shapely.intersects(state.geometry, point):
+                return state
+        return None
+
+
+def get_state_index(resource: Tuple[str, str] = STREAMSTATS_STATES) -> StateIndex:
+    """The shared index for one of the bundled boundary files. The boundaries are read on the first lookup."""
+
+    with _indexes_lock:
+        if resource not in _indexes:
+            file_name, layer_name = resource
+            _indexes[resource] = StateIndex(Settings().resource_path(file_name), layer_name)
+        return _indexes[resource]
+
+
+def find_state(latitude: float, longitude: float, resource: Tuple[str, str] = STREAMSTATS_STATES) -> State:
+    try:
+        latitude = float(latitude)
+        longitude = float(longitude)
+    except (ValueError, TypeError):
+        return None
+    return get_state_index(resource).find(latitude, longitude)
@@ -5,6 +5,8 @@ import requests
 from qgis.core import QgsTask, QgsMessageLog, Qgis
 from qgis.PyQt.QtCore import pyqtSignal
 
+from ..model.connection_manager import request_checkpoint
+
 MESSAGE_CATEGORY = 'QRiS_StreamGageTask'
 DOWNLOAD_TIMEOUT = 120  # seconds (2 minutes)
 
@@ -121,11 +123,11 @@ class StreamGageDischargeTask(QgsTask):
                         gage_height_code = excluded.gage_height_code""", sql_data)
 
                     conn.commit()
-                    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
 
                     count_after = self.get_discharge_record_count(curs)
 
                 self.inserted_discharge_records = count_after - count_before
+                request_checkpoint(self.db_path)
 
         except Exception as ex:
             self.exception = ex
@@ -9,6 +9,9 @@ from osgeo import ogr
 from qgis.core import QgsCoordinateTransform, QgsCoordinateReferenceSystem, QgsProject, QgsTask, QgsMessageLog, Qgis
 from qgis.PyQt.QtCore import pyqtSignal
 
+from ..model.connection_manager import request_checkpoint
+from .state_index import STREAMSTATS_STATES, find_state
+
 MESSAGE_CATEGORY = 'QRiS_StreamGageTask'
 DOWNLOAD_TIMEOUT = 120  # seconds (2 minutes)
 
@@ -134,8 +137,7 @@ class StreamGageTask(QgsTask):
         src_dataset = None
         dst_dataset = None
 
-        with sqlite3.connect(self.db_path, isolation_level=None) as conn:
-            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        request_checkpoint(self.db_path)
 
     def finished(self, result: bool):
         """
@@ -258,26 +260,7 @@ def save_json(dict, directory, file_name):
         json.dump(dict, file)
 
 
-# Uses coordinates to determine U.S. state using API
+# Uses coordinates to determine U.S. state from the bundled state boundaries
 def get_state_from_coordinates(latitude: float, longitude: float):
-    url = "https://nominatim.openstreetmap.org/reverse"
-    parameters = {
-        "lat": latitude,
-        "lon": longitude,
-        "format": "json"
-    }
-
-    response = requests.get(url, params=parameters, timeout=DOWNLOAD_TIMEOUT)
-    location_data = response.json()
-
-    if location_data is None:
-        raise Exception('Unable to determine US State. No response from Open Street Map.')
-    elif 'error' in location_data:
-        if 'geocode' in location_data['error']:
-            return None
-        else:
-            raise Exception(location_data['error'])
-    else:
-        location_code = location_data["address"]["ISO3166-2-lvl4"]
-        # Extracts state abbreviation from location code
-        return location_code[location_code.index("-") + 1:]
+    state = find_state(latitude, longitude, STREAMSTATS_STATES)
+    return state.abbr if state is not None else None
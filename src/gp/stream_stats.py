@@ -1,16 +1,30 @@
 import requests
 import json
 import os
+import time
+import threading
+from contextlib import contextmanager
 
-from qgis.core import QgsCoordinateTransform, QgsCoordinateReferenceSystem, QgsProject, QgsTask, QgsMessageLog, Qgis, QgsVectorLayer, QgsPointXY, QgsGeometry
+from qgis.core import QgsCoordinateTransform, QgsCoordinateReferenceSystem, QgsProject, QgsTask, QgsMessageLog, Qgis
 from qgis.PyQt.QtCore import pyqtSignal
 
 from ..model.pour_point import save_pour_point, PourPoint
-from ..QRiS.settings import Settings
+from .state_index import STREAMSTATS_STATES, find_state
 
 MESSAGE_CATEGORY = 'QRiS'
 # Global timeout for API requests
 API_TIMEOUT = 30
+# Root of the StreamStats services. Replaced by a local stand-in service for testing.
+STREAMSTATS_URL = 'https://streamstats.usgs.gov'
+# Transient failures (connection errors, timeouts, 429 and 5xx responses) are retried with exponential backoff
+MAX_RETRIES = 3
+RETRY_BACKOFF_SECONDS = 2.0
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+# How often a retry wait checks whether the task was canceled
+RETRY_POLL_SECONDS = 0.25
+
+# Cancellation check for the requests made on each thread (see cancelable_requests)
+_retry_context = threading.local()
 
 
 class StreamStats(QgsTask):
@@ -168,13 +182,69 @@ def transform_geometry(geometry, map_epsg: int, output_epsg: int):
 #     return (watershed_data, basin_characteristics, flow_statistics)
 
 
+@contextmanager
+def cancelable_requests(is_canceled):
+    """Give up the retry waits of requests made on this thread as soon as is_canceled() returns True."""
+
+    previous = getattr(_retry_context, 'is_canceled', None)
+    _retry_context.is_canceled = is_canceled
+    try:
+        yield
+    finally:
+        _retry_context.is_canceled = previous
+
+
+def _wait_for_retry(delay: float) -> bool:
+    """Sleep before a retry. Returns False if the request was canceled while waiting."""
+
+    is_canceled = getattr(_retry_context, 'is_canceled', None)
+    deadline = time.monotonic() + delay
+    while True:
+        if is_canceled is not None and is_canceled():
+            return False
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return True
+        time.sleep(min(remaining, RETRY_POLL_SECONDS))
+
+
+def request_with_retry(method: str, url: str, retries: int = None, backoff: float = None, **kwargs) -> requests.Response:
+    """Send a request and raise for error status codes, retrying transient failures with exponential backoff.
+
+    Inside cancelable_requests(), canceling stops the retries and raises the last failure.
+    """
+
+    retries = MAX_RETRIES if retries is None else retries
+    backoff = RETRY_BACKOFF_SECONDS if backoff is None else backoff
+    kwargs.setdefault('timeout', API_TIMEOUT)
+    attempt = 0
+    while True:
+        try:
+            response = requests.request(method, url, **kwargs)
+            response.raise_for_status()
+            return response
+        except (requests.ConnectionError, requests.Timeout, requests.HTTPError) as ex:
+            status_code = ex.response.status_code if isinstance(ex, requests.HTTPError) and ex.response is not None else None
+            if attempt >= retries or (isinstance(ex, requests.HTTPError) and status_code not in RETRY_STATUS_CODES):
+                raise
+
+            delay = backoff * (2 ** attempt)
+            retry_after = ex.response.headers.get('Retry-After') if status_code is not None else None
+            if retry_after is not None and retry_after.isdigit():
+                delay = max(delay, float(retry_after))
+            attempt += 1
+            QgsMessageLog.logMessage(f'StreamStats request to {url} failed ({ex}). Retry {attempt} of {retries} in {delay:.1f} seconds.', MESSAGE_CATEGORY, Qgis.Warning)
+            if not _wait_for_retry(delay):
+                raise
+
+
 # Returns dictionary of watershed info based on coordinates and U.S. state
-def delineate_watershed(lat, lon, rcode, file_dir=None):
+def delineate_watershed(lat, lon, rcode, file_dir=None, base_url: str = STREAMSTATS_URL):
     if not rcode:
         raise Exception("Could not determine state code ('rcode') for the given coordinates.")
 
     # New API: SS-Delineate
-    url = f"https://streamstats.usgs.gov/ss-delineate/v1/delineate/sshydro/{rcode}"
+    url = f"{base_url}/ss-delineate/v1/delineate/sshydro/{rcode}"
 
     parameters = {
         "lat": lat,
@@ -184,8 +254,7 @@ def delineate_watershed(lat, lon, rcode, file_dir=None):
     QgsMessageLog.logMessage(f'Delineating watershed via {url}', MESSAGE_CATEGORY, Qgis.Info)
 
     try:
-        response = requests.get(url, params=parameters, timeout=API_TIMEOUT)
-        response.raise_for_status()
+        response = request_with_retry('GET', url, params=parameters)
         watershed_data = response.json()
         # Response structure: {"stateAbbreviation": "RR", "bcrequest": { ... }}
         
@@ -213,7 +282,9 @@ def delineate_watershed(lat, lon, rcode, file_dir=None):
 
     except Exception as e:
         error_msg = f"Error in delineate_watershed: {str(e)}"
-        if 'response' in locals() and hasattr(response, 'text'):
+        if 'response' not in locals():
+            response = getattr(e, 'response', None)
+        if hasattr(response, 'text'):
             error_msg += f". Response: {response.text}"
         raise Exception(error_msg)
 
@@ -223,9 +294,9 @@ def delineate_watershed(lat, lon, rcode, file_dir=None):
 
 
 # Returns dictionary of river basin characteristics
-def retrieve_basin_characteristics(delineation_data, file_dir=None):
+def retrieve_basin_characteristics(delineation_data, file_dir=None, base_url: str = STREAMSTATS_URL):
     # New API: SS-Hydro
-    url = "https://streamstats.usgs.gov/ss-hydro/v1/basin-characteristics/calculate"
+    url = f"{base_url}/ss-hydro/v1/basin-characteristics/calculate"
     
     # Payload: The Delineation Response matches the SSHydroRequest schema
     payload = delineation_data.copy()
@@ -237,8 +308,7 @@ def retrieve_basin_characteristics(delineation_data, file_dir=None):
     QgsMessageLog.logMessage(f'Calculating Basin Characteristics via {url}', MESSAGE_CATEGORY, Qgis.Info)
 
     try:
-        response = requests.post(url, json=payload, timeout=API_TIMEOUT)
-        response.raise_for_status()
+        response = request_with_retry('POST', url, json=payload)
         basin_data = response.json()
         
         # The API returns a list of parameters, but the application expects a dictionary with a 'parameters' key.
@@ -247,7 +317,9 @@ def retrieve_basin_characteristics(delineation_data, file_dir=None):
             
     except Exception as ex:
         error_msg = f'Error retrieving basin characteristics: {str(ex)}'
-        if 'response' in locals() and hasattr(response, 'text'):
+        if 'response' not in locals():
+            response = getattr(ex, 'response', None)
+        if hasattr(response, 'text'):
             error_msg += f". Response: {response.text}"
         raise Exception(error_msg)
 
@@ -257,11 +329,11 @@ def retrieve_basin_characteristics(delineation_data, file_dir=None):
 
 
 # Returns dictionary of river flow stats
-def retrieve_flow_scenarios(delineation_data, basin_chars=None, file_dir=None):
+def retrieve_flow_scenarios(delineation_data, basin_chars=None, file_dir=None, base_url: str = STREAMSTATS_URL):
     # New API: NSS Services
     # Step 1: Get Regression Regions
-    rr_url = "https://streamstats.usgs.gov/nssservices/regressionregions/bylocation"
-    scenarios_url = "https://streamstats.usgs.gov/nssservices/scenarios"
+    rr_url = f"{base_url}/nssservices/regressionregions/bylocation"
+    scenarios_url = f"{base_url}/nssservices/scenarios"
 
     try:
         # Extract geometry from delineation_data
@@ -293,8 +365,7 @@ def retrieve_flow_scenarios(delineation_data, basin_chars=None, file_dir=None):
                 raise Exception("Could not extract geometry from watershed feature.")
 
         QgsMessageLog.logMessage(f'Retrieving Regression Regions via {rr_url}', MESSAGE_CATEGORY, Qgis.Info)
-        rr_response = requests.post(rr_url, json=rr_payload, timeout=API_TIMEOUT)
-        rr_response.raise_for_status()
+        rr_response = request_with_retry('POST', rr_url, json=rr_payload)
         regression_regions = rr_response.json()
         QgsMessageLog.logMessage(f"DEBUG: regression_regions response: {json.dumps(regression_regions)}", MESSAGE_CATEGORY, Qgis.Info)
 
@@ -350,9 +421,9 @@ def retrieve_flow_scenarios(delineation_data, basin_chars=None, file_dir=None):
         QgsMessageLog.logMessage(error_msg, MESSAGE_CATEGORY, Qgis.Warning)
         return {"error": "Flow Scenarios not fully migrated to new API", "details": str(ex)}
 
-def calculate_flow_statistics(flow_scenarios: dict, basin_chars: dict, file_dir: str = None):
+def calculate_flow_statistics(flow_scenarios: dict, basin_chars: dict, file_dir: str = None, base_url: str = STREAMSTATS_URL):
 
-    estimates_url = "https://streamstats.usgs.gov/nssservices/scenarios/estimate"
+    estimates_url = f"{base_url}/nssservices/scenarios/estimate"
     estimates = []
     
     # Basin chars lookup mapped by uppercase code
@@ -375,8 +446,7 @@ def calculate_flow_statistics(flow_scenarios: dict, basin_chars: dict, file_dir:
         payload = [scenario]
         
         try:
-            response = requests.post(estimates_url, json=payload, timeout=API_TIMEOUT)
-            response.raise_for_status()
+            response = request_with_retry('POST', estimates_url, json=payload)
             
             # The API returns a list; take the first one
             results = response.json()
@@ -409,29 +479,11 @@ def save_json(dict, directory, file_name):
         json.dump(dict, file)
 
 
-# Uses coordinates to determine U.S. state using API
+# Uses coordinates to determine U.S. state from the bundled state boundaries
 def get_state_from_coordinates(latitude: float, longitude: float):
     """https://www.usgs.gov/streamstats/about"""
-    try:
-        latitude = float(latitude)
-        longitude = float(longitude)
-    except (ValueError, TypeError):
+    state = find_state(latitude, longitude, STREAMSTATS_STATES)
+    if state is None:
         return None, None
 
-    # Get the states layer from the resources gpkg
-    db_path = Settings().resource_path('us_states.gpkg')
-
-    # Load the layer
-    states_layer = QgsVectorLayer(f"{db_path}|layername=states", "states", "ogr")
-
-    # Create a point geometry
-    point = QgsGeometry.fromPointXY(QgsPointXY(longitude, latitude))
-
-    # Intersect the point with the states layer
-    states_layer.selectByRect(point.boundingBox())
-    for feature in states_layer.selectedFeatures():
-        if feature.geometry().intersects(point):
-            return feature['STATE_ABBR'], feature['STATUS']
-
-    return None, None
-
+    return state.abbr, state.status
@@ -0,0 +1,288 @@
+"""
+Batch StreamStats delineation for every point in a point layer.
+
+Points are delineated concurrently, but by no more than MAX_WORKERS at a time so as not
+to overwhelm the shared USGS service. Each request is retried with backoff (see
+stream_stats.request_with_retry). Responses are cached on disk by state code and
+coordinates, so rerunning a batch (or the points that failed) only requests the points
+that are not already cached. The successful pour points and their catchments are saved
+to the project in one transaction once every point has been processed. Points whose
+response cannot be saved are reported as failures without affecting the others.
+"""
+
+import os
+import copy
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+from typing import Callable, List
+
+from qgis.core import QgsTask, QgsMessageLog, Qgis, QgsCoordinateTransform, QgsCoordinateReferenceSystem, QgsProject, QgsVectorLayer, QgsFeatureRequest
+from qgis.PyQt.QtCore import pyqtSignal
+
+from ..model.pour_point import save_pour_points
+from .stream_stats import STREAMSTATS_URL, cancelable_requests, delineate_watershed, retrieve_basin_characteristics, retrieve_flow_scenarios, calculate_flow_statistics, get_state_from_coordinates
+
+MESSAGE_CATEGORY = 'QRiS'
+# StreamStats is a shared public service. Keep the number of simultaneous delineations small.
+MAX_WORKERS = 4
+STREAMSTATS_CACHE_FOLDER = 'streamstats_cache'
+
+
+def streamstats_cache_folder(project_file: str) -> str:
+    return os.path.join(os.path.dirname(project_file), STREAMSTATS_CACHE_FOLDER)
+
+
+@dataclass
+class BatchPourPoint:
+    name: str
+    latitude: float
+    longitude: float
+    description: str = None
+    state_code: str = None
+    watershed_data: dict = None
+    basin_chars: dict = None
+    flow_scenarios: dict = None
+    flow_stats: list = None
+    cached: bool = False
+    error: str = None
+
+
+class StreamStatsCache:
+    """StreamStats responses stored as one JSON file per (rcode, latitude, longitude)."""
+
+    def __init__(self, folder: str):
+        self.folder = folder
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(rcode: str, latitude: float, longitude: float) -> str:
+        # Six decimal places is about 0.1 m, well inside the precision of a pour point
+        return f'{rcode.upper()}_{float(latitude):.6f}_{float(longitude):.6f}'
+
+    def path(self, rcode: str, latitude: float, longitude: float) -> str:
+        return os.path.join(self.folder, f'{self.key(rcode, latitude, longitude)}.json')
+
+    def get(self, rcode: str, latitude: float, longitude: float) -> dict:
+        """The cached responses for the point, or None if the point has not been delineated."""
+
+        path = self.path(rcode, latitude, longitude)
+        responses = None
+        if os.path.isfile(path):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    responses = json.load(f)
+            except (OSError, ValueError):
+                # A partially written or corrupt file is treated as a miss and overwritten
+                responses = None
+
+        with self._lock:
+            if responses is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return responses
+
+    def put(self, rcode: str, latitude: float, longitude: float, responses: dict):
+        os.makedirs(self.folder, exist_ok=True)
+        path = self.path(rcode, latitude, longitude)
+        # Write then rename so that a concurrent or interrupted run never reads half a file
+        temp_path = f'{path}.{threading.get_ident()}.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(responses, f)
+        os.replace(temp_path, path)
+
+
+def delineate_pour_point(point: BatchPourPoint, get_basin_chars: bool, get_flow_stats: bool, cache: StreamStatsCache = None, base_url: str = STREAMSTATS_URL,
+                         is_canceled: Callable[[], bool] = None) -> BatchPourPoint:
+    """Delineate one point (and optionally retrieve its basin characteristics and flow statistics), using the cache when possible.
+
+    Retries stop waiting as soon as is_canceled() returns True.
+    """
+
+    with cancelable_requests(is_canceled):
+        return _delineate_pour_point(point, get_basin_chars, get_flow_stats, cache, base_url)
+
+
+def _delineate_pour_point(point: BatchPourPoint, get_basin_chars: bool, get_flow_stats: bool, cache: StreamStatsCache, base_url: str) -> BatchPourPoint:
+
+    state_code, _status = get_state_from_coordinates(point.latitude, point.longitude)
+    if state_code is None:
+        raise Exception('Failed to determine US State of the point. Ensure that the point within the United States.')
+    point.state_code = state_code
+
+    cached = cache.get(state_code, point.latitude, point.longitude) if cache is not None else None
+    responses = dict(cached) if cached is not None else {}
+
+    if 'watershed' not in responses:
+        responses['watershed'] = delineate_watershed(point.latitude, point.longitude, state_code, base_url=base_url)
+
+    if (get_basin_chars or get_flow_stats) and 'basin_chars' not in responses:
+        responses['basin_chars'] = retrieve_basin_characteristics(responses['watershed'], base_url=base_url)
+
+    if get_flow_stats and 'flow_scenarios' not in responses:
+        flow_scenarios = retrieve_flow_scenarios(responses['watershed'], responses['basin_chars'], base_url=base_url)
+        # Failures are returned rather than raised. Only cache flow statistics that succeeded.
+        if 'error' not in flow_scenarios:
+            responses['flow_scenarios'] = flow_scenarios
+            responses['flow_stats'] = calculate_flow_statistics(copy.deepcopy(flow_scenarios), responses['basin_chars'], base_url=base_url)
+
+    if cache is not None and responses != cached:
+        cache.put(state_code, point.latitude, point.longitude, responses)
+
+    point.cached = cached is not None and responses == cached
+    point.watershed_data = responses['watershed']
+    point.basin_chars = responses.get('basin_chars') if get_basin_chars or get_flow_stats else None
+    point.flow_scenarios = responses.get('flow_scenarios') if get_flow_stats else None
+    point.flow_stats = responses.get('flow_stats') if get_flow_stats else None
+    return point
+
+
+def run_batch(points: List[BatchPourPoint], get_basin_chars: bool, get_flow_stats: bool, cache: StreamStatsCache = None, base_url: str = STREAMSTATS_URL,
+              max_workers: int = MAX_WORKERS, is_canceled: Callable[[], bool] = None, progress: Callable[[int, int], None] = None) -> List[BatchPourPoint]:
+    """Delineate the points with bounded concurrency. Failures are recorded on each point rather than raised.
+
+    Returns the points in their original order. Points that were not started before the batch was canceled have neither results nor an error.
+    """
+
+    completed = 0
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(delineate_pour_point, point, get_basin_chars, get_flow_stats, cache, base_url, is_canceled): point for point in points}
+        for future in as_completed(futures):
+            point = futures[future]
+            if future.cancelled():
+                continue
+            try:
+                future.result()
+            except Exception as ex:
+                point.error = str(ex)
+                QgsMessageLog.logMessage(f'StreamStats failed for pour point {point.name}: {ex}', MESSAGE_CATEGORY, Qgis.Warning)
+
+            completed += 1
+            if progress is not None:
+                progress(completed, len(points))
+            if is_canceled is not None and is_canceled():
+                for pending in futures:
+                    pending.cancel()
+
+    return points
+
+
+def read_point_layer(layer: QgsVectorLayer, name_field: str = None, selected_only: bool = False) -> List[BatchPourPoint]:
+    """Snapshot the points of a map layer in WGS84. Must be called on the main thread."""
+
+    to_wgs84 = None
+    wgs84 = QgsCoordinateReferenceSystem('EPSG:4326')
+    if layer.crs() != wgs84:
+        to_wgs84 = QgsCoordinateTransform(layer.crs(), wgs84, QgsProject.instance().transformContext())
+
+    request = QgsFeatureRequest()
+    if name_field is not None and len(name_field) > 0:
+        request.setSubsetOfAttributes([name_field], layer.fields())
+    else:
+        request.setNoAttributes()
+
+    features = layer.getSelectedFeatures(request) if selected_only else layer.getFeatures(request)
+    points = []
+    for feature in features:
+        geom = feature.geometry()
+        if geom is None or geom.isEmpty():
+            continue
+        # Multipoints contribute their first point
+        point = geom.vertexAt(0)
+        if to_wgs84 is not None:
+            point = to_wgs84.transform(point.x(), point.y())
+        name = feature[name_field] if name_field is not None and len(name_field) > 0 else None
+        name = str(name) if name is not None and str(name) not in ('', 'NULL') else f'{layer.name()} {feature.id()}'
+        points.append(BatchPourPoint(name, point.y(), point.x()))
+    return points
+
+
+class StreamStatsBatchTask(QgsTask):
+
+    # Signal to notify when done and return the saved PourPoints and whether they should be added to the map
+    batch_complete = pyqtSignal(list, bool)
+
+    def __init__(self, db_path: str, points: List[BatchPourPoint], get_basin_chars: bool, get_flow_stats: bool, add_to_map: bool, metadata: dict = None, cache_folder: str = None, base_url: str = STREAMSTATS_URL):
+        super().__init__(f'Stream Stats Batch Request for {len(points)} pour points', QgsTask.CanCancel)
+        self.db_path = db_path
+        self.points = points
+        self.get_basin_chars = get_basin_chars
+        self.get_flow_stats = get_flow_stats
+        self.add_to_map = add_to_map
+        self.metadata = metadata
+        self.cache = StreamStatsCache(cache_folder if cache_folder is not None else streamstats_cache_folder(db_path))
+        self.base_url = base_url
+        self.pour_points = []
+        self.failed = []
+        self.exception = None
+
+    def run(self):
+        """Heavy lifting and periodically check for isCanceled() and gracefully abort.
+        Must return True or False. Raising exceptions will crash QGIS"""
+
+        QgsMessageLog.logMessage(f'Started {self.description()}', MESSAGE_CATEGORY, Qgis.Info)
+
+        try:
+            run_batch(self.points, self.get_basin_chars, self.get_flow_stats, self.cache, self.base_url,
+                      is_canceled=self.isCanceled, progress=lambda completed, total: self.setProgress(100.0 * completed / total))
+
+            if self.isCanceled():
+                return False
+
+            values = []
+            value_points = {}
+            for point in self.points:
+                if point.watershed_data is None:
+                    continue
+                metadata = copy.deepcopy(self.metadata) if self.metadata is not None else {}
+                metadata.setdefault('system', {})['state_code'] = point.state_code
+                values.append({
+                    'latitude': point.latitude,
+                    'longitude': point.longitude,
+                    'catchment': point.watershed_data,
+                    'name': point.name,
+                    'description': point.description,
+                    'basin_chars': point.basin_chars,
+                    'flow_stats': point.flow_stats,
+                    'flow_scenarios': point.flow_scenarios,
+                    'metadata': metadata,
+                })
+                value_points[id(values[-1])] = point
+
+            if len(values) > 0:
+                failures = []
+                self.pour_points = save_pour_points(self.db_path, values, failures)
+                for failed_values, message in failures:
+                    value_points[id(failed_values)].error = f'Unable to save the pour point: {message}'
+                    value_points[id(failed_values)].watershed_data = None
+
+            self.failed = [point for point in self.points if point.watershed_data is None]
+
+        except Exception as ex:
+            self.exception = ex
+            return False
+
+        return True
+
+    def finished(self, result: bool):
+        if result is True:
+            QgsMessageLog.logMessage(
+                f'{self.description()} completed. {len(self.pour_points)} saved, {len(self.failed)} failed, '
+                f'{self.cache.hits} cached and {self.cache.misses} requested from Stream Stats.',
+                MESSAGE_CATEGORY, Qgis.Success if len(self.failed) == 0 else Qgis.Warning)
+            for point in self.failed:
+                QgsMessageLog.logMessage(f'Stream Stats failed for {point.name} ({point.latitude}, {point.longitude}): {point.error}', MESSAGE_CATEGORY, Qgis.Warning)
+        elif self.exception is None:
+            QgsMessageLog.logMessage(f'{self.description()} was canceled. Completed delineations are cached and will not be requested again.', MESSAGE_CATEGORY, Qgis.Warning)
+        else:
+            QgsMessageLog.logMessage(f'{self.description()} Exception: {self.exception}', MESSAGE_CATEGORY, Qgis.Critical)
+
+        self.batch_complete.emit(self.pour_points, self.add_to_map)
+
+    def cancel(self):
+        QgsMessageLog.logMessage(f'{self.description()} was canceled', MESSAGE_CATEGORY, Qgis.Info)
+        super().cancel()
@@ -6,8 +6,10 @@ from qgis.PyQt.QtCore import pyqtSignal, QVariant, QSize, QRect
 from qgis.PyQt.QtGui import QColor, QImage, QPainter
 from qgis.PyQt.QtSvg import QSvgGenerator
 
+import shapely
+
 from .map_centroid import build_aoi_centroids_layer
-from ..QRiS.settings import Settings
+from .state_index import VICINITY_STATES, get_state_index
 
 MESSAGE_CATEGORY = 'QRiS'
 
@@ -109,33 +111,15 @@ class VicinityMapExportTask(QgsTask):
 
     def _resolve_intersecting_state(self, centroid_point_wgs84: QgsPointXY) -> Tuple[str, QgsGeometry]:
         """Return (region_label, region_geometry) for the region containing the centroid point, or (None, None) if not found."""
-        states_path = Settings().resource_path('us_states_simplified.geojson')
-        states_layer = QgsVectorLayer(states_path, "states", "ogr")
-        if not states_layer.isValid():
-            raise Exception('Could not load states layer from us_states_simplified.geojson.')
-
-        point_in_layer_crs = QgsPointXY(centroid_point_wgs84.x(), centroid_point_wgs84.y())
-        states_crs = states_layer.crs()
-        wgs84 = QgsCoordinateReferenceSystem('EPSG:4326')
-        if states_crs.isValid() and states_crs != wgs84:
-            to_states = QgsCoordinateTransform(
-                wgs84,
-                states_crs,
-                QgsProject.instance().transformContext()
-            )
-            point_in_layer_crs = to_states.transform(point_in_layer_crs)
-
-        point_geom = QgsGeometry.fromPointXY(point_in_layer_crs)
-
-        states_layer.selectByRect(point_geom.boundingBox())
-        for state_feature in states_layer.selectedFeatures():
-            state_geom = state_feature.geometry()
-            if state_geom is None or state_geom.isEmpty() or not state_geom.intersects(point_geom):
-                continue
-
-            state_name = self._extract_region_label(state_feature)
-
-            result_geom = QgsGeometry(state_geom)
+        states = get_state_index(VICINITY_STATES)
+        state = states.find(centroid_point_wgs84.y(), centroid_point_wgs84.x())
+        if state is not None:
+            state_name = self._extract_region_label(state.attributes)
+
+            result_geom = QgsGeometry()
+            result_geom.fromWkb(shapely.to_wkb(state.geometry))
+            states_crs = QgsCoordinateReferenceSystem.fromWkt(states.srs_wkt) if states.srs_wkt is not None else QgsCoordinateReferenceSystem()
+            wgs84 = QgsCoordinateReferenceSystem('EPSG:4326')
             if states_crs.isValid() and states_crs != wgs84:
                 to_wgs84 = QgsCoordinateTransform(
                     states_crs,
@@ -257,10 +241,9 @@ class VicinityMapExportTask(QgsTask):
         raise Exception(f'Unsupported label placement: modern={modern}, legacy={legacy}')
 
     @staticmethod
-    def _extract_region_label(feature: QgsFeature) -> str:
-        """Extract the best available region label from a feature using case-insensitive field matching."""
-        fields = feature.fields()
-        field_name_map = {name.lower(): name for name in fields.names()}
+    def _extract_region_label(attributes: dict) -> str:
+        """Extract the best available region label from feature attributes using case-insensitive field matching."""
+        field_name_map = {name.lower(): name for name in attributes}
 
         preferred_fields = ['state_name', 'name', 'state', 'province', 'region']
         for candidate in preferred_fields:
@@ -268,19 +251,18 @@ class VicinityMapExportTask(QgsTask):
             if not actual_name:
                 continue
 
-            value = feature[actual_name]
+            value = attributes[actual_name]
             text = str(value).strip() if value is not None else ''
             if text and any(ch.isalpha() for ch in text):
                 return text
 
         # Fallback: first non-empty, non-ID-like text field value that contains letters.
         disallowed_field_names = {'fid', 'id', 'objectid', 'oid', 'gid', 'pk'}
-        for field in fields:
-            field_name = field.name().strip().lower()
+        for name, value in attributes.items():
+            field_name = name.strip().lower()
             if field_name in disallowed_field_names or field_name.endswith('_id') or field_name.endswith('id'):
                 continue
 
-            value = feature[field.name()]
             text = str(value).strip() if value is not None else ''
             if text and text.lower() != 'none' and any(ch.isalpha() for ch in text):
                 return text
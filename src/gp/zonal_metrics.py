@@ -1,12 +1,21 @@
-import math
-
 import osgeo
 from osgeo import ogr, gdal, osr
 
+import numpy as np
+import shapely
 from shapely.wkb import loads as wkbload
 
 from ..model.sample_frame import SampleFrame
-from .zonal_statistics import zonal_statistics
+from ..model.connection_manager import get_connection_manager
+from .zonal_statistics import zonal_statistics, categorical_zonal_statistics
+from .sample_frame_geometry import get_sample_frame_geometries, utm_spatial_reference
+
+# Features read from a context layer before they are projected and intersected as a batch
+VECTOR_CHUNK_SIZE = 50000
+
+# shapely.get_type_id values
+LINE_TYPE_IDS = [1, 5]  # LineString, MultiLineString
+AREA_TYPE_IDS = [3, 6]  # Polygon, MultiPolygon
 
 
 class ZonalMetrics:
@@ -23,82 +32,66 @@ class ZonalMetrics:
         # print(json.dumps(mapping(self.polygons[2]['geometry'])))
 
     def load_polygons(self, project_file: str, aoi: SampleFrame, aoi_layer: str = 'sample_frame_features') -> dict:
+        """Sample frame polygons projected to the UTM zone of the first polygon, read from the sample frame geometry store."""
 
-        driver = ogr.GetDriverByName("GPKG")
-        ds = driver.Open(project_file)
-        layer = ds.GetLayerByName(aoi_layer)
-        layer.SetAttributeFilter(f'sample_frame_id = {aoi.id}')
-        src_srs = layer.GetSpatialRef()
+        with get_connection_manager(project_file).read() as conn:
+            labels = conn.execute(f'SELECT fid, display_label FROM {aoi_layer} WHERE sample_frame_id = ? ORDER BY fid', [aoi.id]).fetchall()  # nosec B608 - aoi_layer is the fixed sample frame feature table
+
+        geometries = get_sample_frame_geometries(project_file, [fid for fid, _label in labels])
 
         # Target transform to most appropriate UTM zone
-        utm_transform = None
+        utm_srs = None
         epsg = None
 
         polygons = {}
-        for feature in layer:
-            geom = feature.GetGeometryRef()
+        for fid, display_label in labels:
+            sample_frame_geometry = geometries.get(fid)
+            if sample_frame_geometry is None:
+                continue
 
-            if utm_transform is None:
-                temp_temp = geom.Clone()
+            if epsg is None:
+                epsg = sample_frame_geometry.utm_epsg
+                utm_srs = utm_spatial_reference(epsg)
 
-                # Temporarily transform to WGS84 to determine best UTM zone
-                wgs_srs = osr.SpatialReference()
-                wgs_srs.ImportFromEPSG(4326)
-                wgs_transform = osr.CoordinateTransformation(src_srs, wgs_srs)
-                temp_temp.Transform(wgs_transform)
-
-                epsg = self.get_utm_zone_epsg(geom.Centroid().GetX())
-                utm_srs = osr.SpatialReference()
-                utm_srs.ImportFromEPSG(epsg)
-                utm_transform = osr.CoordinateTransformation(src_srs, utm_srs)
-
-            geom.Transform(utm_transform)
-
-            if geom.IsMeasured() > 0 or geom.Is3D() > 0:
-                geom.FlattenTo2D()
-            geom.MakeValid()
-            polygons[feature.GetFID()] = {
-                'geometry': wkbload(bytes(geom.ExportToWkb())),
-                'display_label': feature.GetField('display_label') if aoi.sample_frame_type == SampleFrame.SAMPLE_FRAME_TYPE else f'AOI {aoi.name}'
+            if sample_frame_geometry.utm_epsg == epsg:
+                wkb = sample_frame_geometry.projected_wkb
+            else:
+                # Sample frames that straddle a zone boundary are measured in the zone of the first polygon
+                geom = sample_frame_geometry.projected_geometry()
+                geom.TransformTo(utm_srs)
+                wkb = bytes(geom.ExportToWkb())
+
+            polygons[fid] = {
+                'geometry': wkbload(wkb),
+                'display_label': display_label if aoi.sample_frame_type == SampleFrame.SAMPLE_FRAME_TYPE else f'AOI {aoi.name}'
             }
 
-        layer = None
-        ds = None
-
         if len(polygons) < 1:
             raise Exception('Mask Feature Class is empty. No polygons loaded.')
 
         return polygons, epsg
 
-    def get_utm_zone_epsg(self, longitude: float) -> int:
-        """Really crude EPSG lookup method
-
-        Args:
-            longitude (float): [description]
-
-        Returns:
-            int: [description]
-        """
-        zone_number = math.floor((180.0 + longitude) / 6.0)
-        epsg = 26901 + zone_number
-        return epsg
-
     def run(self) -> dict:
 
         metrics = {}
         for layer in self.layers:
-            if layer['type'] == 'vector':
-                metric = self.process_vector(layer)
-                if metric is not None:
-                    metrics[layer['name']] = metric
-            else:
-                metric = self.process_raster(layer)
-                if metric is not None:
-                    metrics[layer['name']] = metric
+            metric = self.process_layer(layer)
+            if metric is not None:
+                metrics[layer['name']] = metric
 
         return metrics
 
-    def process_vector(self, layer_def):
+    def process_layer(self, layer_def, is_canceled=None):
+        """Metrics for one map layer, or None if the layer cannot be summarized or is_canceled() returns True.
+
+        Layers share nothing but the polygons, so different layers can be processed on different threads.
+        """
+
+        if layer_def['type'] == 'vector':
+            return self.process_vector(layer_def, is_canceled)
+        return self.process_raster(layer_def, is_canceled)
+
+    def process_vector(self, layer_def, is_canceled=None):
 
         url = layer_def['url']
 
@@ -123,46 +116,104 @@ class ZonalMetrics:
         src_srs = layer.GetSpatialRef()
         if src_srs is None:
             return None
+        if layer.GetFeatureCount() == 0:
+            return None
+
+        return self.vector_metrics(layer, src_srs, is_canceled)
+
+    def vector_metrics(self, layer: ogr.Layer, src_srs: osr.SpatialReference, is_canceled=None) -> dict:
+        """Count, length and area of the layer features within each polygon.
 
+        The layer is read once, in chunks of VECTOR_CHUNK_SIZE features, and each chunk is
+        projected to UTM and intersected with every polygon it overlaps using vectorized
+        shapely operations against an STRtree of the polygons.
+        """
+
+        src_srs = src_srs.Clone()
+        src_srs.SetAxisMappingStrategy(osr.OAMS_TRADITIONAL_GIS_ORDER)
         dst_srs = osr.SpatialReference()
         dst_srs.ImportFromEPSG(self.utm_epsg)
+        dst_srs.SetAxisMappingStrategy(osr.OAMS_TRADITIONAL_GIS_ORDER)
         transform_src_to_utm = osr.CoordinateTransformation(src_srs, dst_srs)
 
-        # Used for transforming polygons onto the layer SRS for spatial filter
-        transform_utm_to_src = osr.CoordinateTransformation(dst_srs, src_srs)
+        polygon_ids = list(self.polygons.keys())
+        polygons = np.array([self.polygons[polygon_id]['geometry'] for polygon_id in polygon_ids], dtype=object)
+        tree = shapely.STRtree(polygons)
+
+        # Only read the features inside the polygons' extent, and only their geometry
+        layer.SetSpatialFilterRect(*self._layer_extent(polygons, dst_srs, src_srs))
+        layer_defn = layer.GetLayerDefn()
+        layer.SetIgnoredFields([layer_defn.GetFieldDefn(i).GetName() for i in range(layer_defn.GetFieldCount())])
+
+        counts = np.zeros(len(polygons), dtype=np.int64)
+        lengths = np.zeros(len(polygons), dtype=np.float64)
+        areas = np.zeros(len(polygons), dtype=np.float64)
+        has_length = np.zeros(len(polygons), dtype=bool)
+        has_area = np.zeros(len(polygons), dtype=bool)
+
+        def transform_coords(coords: np.ndarray) -> np.ndarray:
+            if len(coords) == 0:
+                return coords
+            return np.array(transform_src_to_utm.TransformPoints(coords), dtype=np.float64)[:, :2]
+
+        def process_chunk(wkbs: list):
+            shapes = shapely.force_2d(shapely.from_wkb(wkbs))
+            shapes = shapely.make_valid(shapely.transform(shapes, transform_coords))
+            shape_index, polygon_index = tree.query(shapes, predicate='intersects')
+            if len(shape_index) == 0:
+                return
+
+            intersections = shapely.intersection(polygons[polygon_index], shapes[shape_index])
+            type_ids = shapely.get_type_id(intersections)
+            is_line = np.isin(type_ids, LINE_TYPE_IDS)
+            is_area = np.isin(type_ids, AREA_TYPE_IDS)
+
+            counts[:] += np.bincount(polygon_index, minlength=len(polygons))
+            lengths[:] += np.bincount(polygon_index[is_line], weights=shapely.length(intersections[is_line]), minlength=len(polygons))
+            areas[:] += np.bincount(polygon_index[is_area], weights=shapely.area(intersections[is_area]), minlength=len(polygons))
+            has_length[polygon_index[is_line]] = True
+            has_area[polygon_index[is_area]] = True
+
+        wkbs = []
+        for feature in layer:
+            geom = feature.GetGeometryRef()
+            if geom is None or geom.IsEmpty():
+                continue
+            wkbs.append(bytes(geom.ExportToIsoWkb()))
+            if len(wkbs) >= VECTOR_CHUNK_SIZE:
+                process_chunk(wkbs)
+                wkbs = []
+                if is_canceled is not None and is_canceled():
+                    return None
+        if len(wkbs) > 0:
+            process_chunk(wkbs)
+
+        layer.SetSpatialFilter(None)
+        layer.SetIgnoredFields([])
 
         metrics = {}
-        for polygon_id, polygon_data in self.polygons.items():
-            polygon = polygon_data['geometry']
-            polygon_geom = ogr.CreateGeometryFromWkb(polygon.wkb)
-            polygon_geom.Transform(transform_utm_to_src)
-            polygon_geom.MakeValid()
-
-            polygon_metrics = {'count': 0}
-            layer.SetSpatialFilter(polygon_geom)
-            for feature in layer:
-                geom = feature.GetGeometryRef()
-                geom.Transform(transform_src_to_utm)
-
-                if geom.IsMeasured() > 0 or geom.Is3D() > 0:
-                    geom.FlattenTo2D()
-                geom.MakeValid()
-
-                shape = wkbload(bytes(geom.ExportToWkb()))
-                if polygon.intersects(shape):
-                    inter = polygon.intersection(shape)
-                    polygon_metrics['count'] += 1
-
-                    if inter.geom_type == 'LineString' or inter.geom_type == 'MultiLineString':
-                        polygon_metrics['length (m)'] = inter.length if 'length (m)' not in polygon_metrics else inter.length + polygon_metrics['length (m)']
-                    elif inter.geom_type == 'Polygon' or inter.geom_type == 'MultiPolygon':
-                        polygon_metrics['area (m²)'] = inter.area if 'area (m²)' not in polygon_metrics else inter.area + polygon_metrics['area (m²)']
-
+        for i, polygon_id in enumerate(polygon_ids):
+            polygon_metrics = {'count': int(counts[i])}
+            if has_length[i]:
+                polygon_metrics['length (m)'] = float(lengths[i])
+            if has_area[i]:
+                polygon_metrics['area (m²)'] = float(areas[i])
             metrics[polygon_id] = polygon_metrics
 
         return metrics
 
-    def process_raster(self, layer_def):
+    def _layer_extent(self, polygons: np.ndarray, dst_srs: osr.SpatialReference, src_srs: osr.SpatialReference) -> tuple:
+        """(min x, min y, max x, max y) of the polygons in the layer SRS."""
+
+        min_x, min_y, max_x, max_y = shapely.total_bounds(polygons)
+        extent = ogr.CreateGeometryFromWkb(shapely.to_wkb(shapely.box(min_x, min_y, max_x, max_y)))
+        # Densify so that the projected extent still covers the polygons where the projection curves the edges
+        extent.Segmentize(max(max_x - min_x, max_y - min_y, 1.0) / 32)
+        extent.Transform(osr.CoordinateTransformation(dst_srs, src_srs))
+        env_min_x, env_max_x, env_min_y, env_max_y = extent.GetEnvelope()
+        return env_min_x, env_min_y, env_max_x, env_max_y
+
+    def process_raster(self, layer_def, is_canceled=None):
 
         url = layer_def['url'].lower()
 
@@ -184,6 +235,7 @@ class ZonalMetrics:
         raster = gdal.Open(layer_def['url'])
         if raster is None:
             return None
+        categorical = layer_def.get('categorical', False) or is_categorical_raster(raster)
         src_srs = osr.SpatialReference()
         src_srs.ImportFromWkt(raster.GetProjection())
 
@@ -200,9 +252,14 @@ class ZonalMetrics:
         dst_srs.ImportFromEPSG(self.utm_epsg)
         transform_utm_to_src = osr.CoordinateTransformation(dst_srs, src_srs)
 
+        if categorical:
+            return self.process_categorical_raster(layer_def, transform_utm_to_src, is_canceled)
+
         results = {}
 
         for polygon_id, polygon_data in self.polygons.items():
+            if is_canceled is not None and is_canceled():
+                return None
             polygon = polygon_data['geometry']
             polygon_geom = ogr.CreateGeometryFromWkb(polygon.wkb)
             polygon_geom.Transform(transform_utm_to_src)
@@ -210,22 +267,45 @@ class ZonalMetrics:
 
         return results
 
-    # def categorical_raster_metrics(self, dataset_name, raster_path):
+    def process_categorical_raster(self, layer_def, transform_utm_to_src: osr.CoordinateTransformation, is_canceled=None):
+        """Cell count and area of each class in each polygon, from one pass over the raster.
+
+        Metric names use the class labels in layer_def['classes'] ({value: label}) when available.
+        """
+
+        zones = {}
+        for polygon_id, polygon_data in self.polygons.items():
+            polygon_geom = ogr.CreateGeometryFromWkb(polygon_data['geometry'].wkb)
+            polygon_geom.Transform(transform_utm_to_src)
+            zones[polygon_id] = polygon_geom
+
+        class_stats = categorical_zonal_statistics(layer_def['url'], zones, is_canceled)
+        if class_stats is None:
+            return None
+
+        labels = layer_def.get('classes', {})
+        results = {}
+        for polygon_id, classes in class_stats.items():
+            polygon_metrics = {}
+            for value in sorted(classes.keys()):
+                label = labels.get(value, None) or class_label(value)
+                polygon_metrics[f'{label} area (m²)'] = classes[value]['area']
+                polygon_metrics[f'{label} count'] = classes[value]['count']
+            results[polygon_id] = polygon_metrics
+
+        return results
 
-    #     cell_area = get_raster_cell_area(raster_path)
 
-    #     cats = {key: {} for key in self.polygons.keys()}
-    #     with rasterio.open(raster_path) as src:
+def class_label(value) -> str:
+    """Display text for a raster class value without a label (integral values without decimals)."""
 
-    #         for poly_id, polygon in self.polygons.items():
+    return str(int(value)) if float(value).is_integer() else str(value)
 
-    #             raw_raster, _out_transform = mask(src, [polygon], crop=True)
-    #             # mask_raster = np.ma.masked_values(raw_raster, src.nodata)
 
-    #             for val in np.unique(raw_raster):
-    #                 if val != src.nodata:
-    #                     cats[poly_id][str(val)] = {'area': np.count_nonzero(raw_raster == val) * cell_area,
-    #                                                'count': np.count_nonzero(raw_raster == val)}
+def is_categorical_raster(raster: gdal.Dataset) -> bool:
+    """True for integer rasters with a color table or raster attribute table (land cover, vegetation type etc.)."""
 
-    #     for key in cats.keys():
-    #         self.metrics['project']['huc12'][key]['metrics']['raster']['categorical'].append({dataset_name: {'cellSize': np.sqrt(cell_area), 'categories': cats[key]}})
+    band = raster.GetRasterBand(1)
+    if band is None or band.DataType not in (gdal.GDT_Byte, gdal.GDT_UInt16, gdal.GDT_Int16, gdal.GDT_UInt32, gdal.GDT_Int32):
+        return False
+    return band.GetColorTable() is not None or band.GetDefaultRAT() is not None
@@ -16,9 +16,12 @@ import osgeo
 from osgeo import gdal, ogr, osr
 import numpy as np
 
+from .metric_profiler import MetricProfiler, profiled
+
 TEMP_FEATURE_CLASS_NAME = 'temp_fc'
 
 
+@profiled(MetricProfiler.RASTER_READ)
 def zonal_statistics(raster_path: str, geom: ogr.Geometry) -> dict:
     """
     raster_path: Full path to existing raster for which zonal statistics are needed
@@ -108,6 +111,143 @@ def zonal_statistics(raster_path: str, geom: ogr.Geometry) -> dict:
     return results
 
 
+# Earth radius used for the area of geographic (degree) raster cells
+EARTH_RADIUS_M = 6371008.8
+
+
+def cell_areas(raster_gt, raster_srs: osr.SpatialReference, row_offset: int, rows: int) -> np.ndarray:
+    """Area in square metres of the cells in each of the rows, starting at row_offset."""
+
+    if raster_srs is not None and raster_srs.IsGeographic():
+        # Spherical area between the top and bottom latitude of each row
+        top = np.radians(raster_gt[3] + (row_offset + np.arange(rows)) * raster_gt[5])
+        bottom = top + np.radians(raster_gt[5])
+        return EARTH_RADIUS_M ** 2 * abs(np.radians(raster_gt[1])) * np.abs(np.sin(top) - np.sin(bottom))
+
+    units = raster_srs.GetLinearUnits() if raster_srs is not None else 1.0
+    return np.full(rows, abs(raster_gt[1] * raster_gt[5]) * units ** 2)
+
+
+@profiled(MetricProfiler.RASTER_READ)
+def categorical_zonal_statistics(raster_path: str, zones: dict, is_canceled=None) -> dict:
+    """
+    Cell count and area of each raster class within each zone, in a single pass over the raster.
+
+    raster_path: Full path to existing categorical (integer class) raster
+    zones: {zone_id: OGR polygon geometry}. MUST BE IN SAME SRS as raster!! Zones should not overlap;
+        where they do the cells belong to the zone rasterized last.
+    is_canceled: optional callable checked between blocks. Returns None when it returns True.
+
+    Returns {zone_id: {class value: {'count': cells, 'area': square metres}}}
+    """
+
+    raster_ds = gdal.Open(raster_path)
+    raster_gt = raster_ds.GetGeoTransform()
+    raster_band = raster_ds.GetRasterBand(1)
+    raster_nd = raster_band.GetNoDataValue()
+    raster_srs = raster_ds.GetSpatialRef()
+
+    zone_ids = list(zones.keys())
+    results = {zone_id: {} for zone_id in zone_ids}
+    if len(zone_ids) == 0:
+        # No zones (e.g. a sample frame without features), so there is no window to read
+        return results
+
+    # All the zones in one in-memory layer, burned with their 1-based index (0 is outside every zone)
+    ogr_mem_driver = ogr.GetDriverByName('MEM') or ogr.GetDriverByName('Memory')
+    ogr_mem_ds = ogr_mem_driver.CreateDataSource('categorical_zones')
+    ogr_mem_lyr = ogr_mem_ds.CreateLayer('zones', raster_srs, ogr.wkbPolygon)
+    ogr_mem_lyr.CreateField(ogr.FieldDefn('zone', ogr.OFTInteger))
+    envelopes = []
+    for zone_index, zone_id in enumerate(zone_ids, start=1):
+        out_geom = zones[zone_id].Clone()
+        out_geom.MakeValid()
+        feature = ogr.Feature(ogr_mem_lyr.GetLayerDefn())
+        feature.SetField('zone', zone_index)
+        feature.SetGeometry(out_geom)
+        ogr_mem_lyr.CreateFeature(feature)
+        envelopes.append(out_geom.GetEnvelope())
+
+    # Window covering all the zones, clipped to the raster
+    r_minX = raster_gt[0]
+    r_maxY = raster_gt[3]
+    r_maxX = r_minX + raster_gt[1] * raster_ds.RasterXSize
+    r_minY = r_maxY + raster_gt[5] * raster_ds.RasterYSize
+    extents = (max(min(e[0] for e in envelopes), r_minX), min(max(e[1] for e in envelopes), r_maxX),
+               max(min(e[2] for e in envelopes), r_minY), min(max(e[3] for e in envelopes), r_maxY))
+    if extents[0] >= extents[1] or extents[2] >= extents[3]:
+        return results
+
+    offsets = boundingBoxToOffsets(extents, raster_gt)
+    offsets[1] = min(offsets[1], raster_ds.RasterYSize)
+    offsets[3] = min(offsets[3], raster_ds.RasterXSize)
+    row_offset, col_offset = offsets[0], offsets[2]
+    rows, cols = offsets[1] - offsets[0], offsets[3] - offsets[2]
+
+    # Rasterize every zone once onto the raster grid
+    zone_ds = gdal.GetDriverByName('MEM').Create('', cols, rows, 1, gdal.GDT_Int32)
+    zone_ds.SetGeoTransform(geotFromOffsets(row_offset, col_offset, raster_gt))
+    gdal.RasterizeLayer(zone_ds, [1], ogr_mem_lyr, options=['ATTRIBUTE=zone'])
+    zone_band = zone_ds.GetRasterBand(1)
+
+    n_zones = len(zone_ids) + 1
+    class_values = []
+    class_columns = {}
+    counts = np.zeros((n_zones, 0), dtype=np.int64)
+    areas = np.zeros((n_zones, 0), dtype=np.float64)
+
+    # Stream strips that are one raster block high across the window
+    block_rows = max(raster_band.GetBlockSize()[1], 1)
+    for strip_row in range(0, rows, block_rows):
+        if is_canceled is not None and is_canceled():
+            return None
+
+        strip_height = min(block_rows, rows - strip_row)
+        values = raster_band.ReadAsArray(col_offset, row_offset + strip_row, cols, strip_height)
+        strip_zones = zone_band.ReadAsArray(0, strip_row, cols, strip_height)
+
+        valid = strip_zones > 0
+        if raster_nd is not None:
+            valid &= values != raster_nd
+        if np.issubdtype(values.dtype, np.floating):
+            valid &= np.isfinite(values)
+        if not valid.any():
+            continue
+
+        strip_values, class_index = np.unique(values[valid], return_inverse=True)
+        zone_index = strip_zones[valid].astype(np.int64)
+        row_areas = cell_areas(raster_gt, raster_srs, row_offset + strip_row, strip_height)
+        weights = np.broadcast_to(row_areas[:, None], values.shape)[valid]
+
+        # One key per (zone, class) pair
+        keys = zone_index * len(strip_values) + class_index.ravel()
+        strip_counts = np.bincount(keys, minlength=n_zones * len(strip_values)).reshape(n_zones, len(strip_values))
+        strip_areas = np.bincount(keys, weights=weights, minlength=n_zones * len(strip_values)).reshape(n_zones, len(strip_values))
+
+        new_values = [value for value in strip_values.tolist() if value not in class_columns]
+        if len(new_values) > 0:
+            for value in new_values:
+                class_columns[value] = len(class_values)
+                class_values.append(value)
+            counts = np.hstack((counts, np.zeros((n_zones, len(new_values)), dtype=np.int64)))
+            areas = np.hstack((areas, np.zeros((n_zones, len(new_values)), dtype=np.float64)))
+
+        columns = [class_columns[value] for value in strip_values.tolist()]
+        counts[:, columns] += strip_counts
+        areas[:, columns] += strip_areas
+
+    for zone_index, zone_id in enumerate(zone_ids, start=1):
+        for column, value in enumerate(class_values):
+            if counts[zone_index, column] > 0:
+                results[zone_id][value] = {'count': int(counts[zone_index, column]), 'area': float(areas[zone_index, column])}
+
+    # Discard the in-memory datasets
+    zone_ds = None
+    ogr_mem_ds = None
+    raster_ds = None
+    return results
+
+
 def boundingBoxToOffsets(bbox, geot):
     col1 = int((bbox[0] - geot[0]) / geot[1])
     col2 = int((bbox[1] - geot[0]) / geot[1]) + 1
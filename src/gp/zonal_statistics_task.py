@@ -1,3 +1,7 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
 from qgis.core import QgsTask, QgsMessageLog, Qgis, QgsProject, QgsVectorLayer, QgsRasterLayer, QgsWkbTypes
 from qgis.PyQt.QtCore import pyqtSignal
 
@@ -6,24 +10,48 @@ from ..model.sample_frame import SampleFrame
 from .zonal_metrics import ZonalMetrics
 
 MESSAGE_CATEGORY = 'QRiS Zonal Statistics Task'
+MAX_WORKERS = min(8, os.cpu_count() or 1)
 
 
 class ZonalMetricsTask(QgsTask):
     """
     https://docs.qgis.org/3.22/en/docs/pyqgis_developer_cookbook/tasks.html
+
+    Only the visible map layer sources are read on the GUI thread. The sample frame polygons
+    are loaded in run() and each layer is then summarized independently on a worker pool.
+    Results are emitted per layer as they finish.
     """
 
     # Signal to notify when done and return the PourPoint and whether it should be added to the map
     on_complete = pyqtSignal(bool, SampleFrame, dict or None, dict or None)
+    # Polygons loaded and the names of the layers that will be summarized
+    polygons_loaded = pyqtSignal(dict, list)
+    # Layer name and one of the LAYER_ statuses
+    layer_status = pyqtSignal(str, str)
+    # Layer name and {polygon_id: metrics}
+    layer_complete = pyqtSignal(str, dict)
+
+    LAYER_QUEUED = 'Queued'
+    LAYER_PROCESSING = 'Processing'
+    LAYER_COMPLETE = 'Complete'
+    LAYER_SKIPPED = 'Skipped'
+    LAYER_CANCELED = 'Canceled'
+    LAYER_FAILED = 'Failed'
 
     def __init__(self, project: Project, mask: SampleFrame):
         super().__init__(MESSAGE_CATEGORY, QgsTask.CanCancel)
 
         self.polygons = {}
         self.data = {}
+        self.metrics = None
+        self.exception = None
+        self.layer_errors = {}
+        self._canceled_layers = set()
+        self._lock = threading.Lock()
 
         mask_guid = f'QRiS::{project.map_guid}::{mask.db_table_name}::{mask.id}'
 
+        # Snapshot of the visible layer sources. Counting features and opening the sources happens in run().
         self.map_layers = []
         for layer in QgsProject.instance().mapLayers().values():
             layer_node = QgsProject.instance().layerTreeRoot().findLayer(layer.id())
@@ -37,18 +65,60 @@ class ZonalMetricsTask(QgsTask):
                 layer_def = {'name': layer.name(), 'url': layer.dataProvider().dataSourceUri()}
                 if isinstance(layer, QgsRasterLayer):
                     layer_def['type'] = 'raster'
+                    # Paletted (unique values) rasters are summarized by class
+                    renderer = layer.renderer()
+                    if renderer is not None and renderer.type() == 'paletted':
+                        layer_def['categorical'] = True
+                        layer_def['classes'] = {item.value: item.label for item in renderer.classes() if item.label}
                     self.map_layers.append(layer_def)
                 elif isinstance(layer, QgsVectorLayer):
                     # Skip non-spatial tables (e.g., attribute-only layers) that cannot be transformed.
-                    if layer.wkbType() != QgsWkbTypes.NoGeometry and layer.featureCount() > 0:
+                    if layer.wkbType() != QgsWkbTypes.NoGeometry:
                         layer_def['type'] = 'vector'
                         self.map_layers.append(layer_def)
 
         self.project = project
         self.mask = mask
         self.config = {}
-        mask_layer = 'sample_frame_features'
-        self.metrics = ZonalMetrics(project.project_file, mask, self.map_layers, mask_layer)
+        self.mask_layer = 'sample_frame_features'
+
+    def cancel_layer(self, layer_name: str):
+        """Skip a queued layer, or stop a layer that is being processed at its next chunk or polygon."""
+
+        with self._lock:
+            self._canceled_layers.add(layer_name)
+
+    def layer_canceled(self, layer_name: str) -> bool:
+        if self.isCanceled():
+            return True
+        with self._lock:
+            return layer_name in self._canceled_layers
+
+    def process_layer(self, layer_def: dict):
+
+        layer_name = layer_def['name']
+        if self.layer_canceled(layer_name):
+            self.layer_status.emit(layer_name, self.LAYER_CANCELED)
+            return
+
+        self.layer_status.emit(layer_name, self.LAYER_PROCESSING)
+        try:
+            layer_metrics = self.metrics.process_layer(layer_def, lambda: self.layer_canceled(layer_name))
+        except Exception as ex:
+            with self._lock:
+                self.layer_errors[layer_name] = ex
+            self.layer_status.emit(layer_name, self.LAYER_FAILED)
+            return
+
+        if self.layer_canceled(layer_name):
+            self.layer_status.emit(layer_name, self.LAYER_CANCELED)
+        elif layer_metrics is None:
+            self.layer_status.emit(layer_name, self.LAYER_SKIPPED)
+        else:
+            with self._lock:
+                self.data[layer_name] = layer_metrics
+            self.layer_complete.emit(layer_name, layer_metrics)
+            self.layer_status.emit(layer_name, self.LAYER_COMPLETE)
 
     def run(self):
         """
@@ -59,14 +129,26 @@ class ZonalMetricsTask(QgsTask):
         https://subscription.packtpub.com/book/application-development/9781787124837/3/ch03lvl1sec58/exporting-a-layer-to-the-geopackage-format
         """
         try:
-            self.data = self.metrics.run()
+            self.setProgress(0)
+            self.metrics = ZonalMetrics(self.project.project_file, self.mask, self.map_layers, self.mask_layer)
             self.polygons = self.metrics.polygons
+            self.polygons_loaded.emit(self.polygons, [layer_def['name'] for layer_def in self.map_layers])
+
+            if len(self.map_layers) > 0:
+                with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+                    futures = [executor.submit(self.process_layer, layer_def) for layer_def in self.map_layers]
+                    for completed, future in enumerate(as_completed(futures), start=1):
+                        future.result()
+                        self.setProgress(completed / len(futures) * 100)
+
+            for layer_name, ex in self.layer_errors.items():
+                QgsMessageLog.logMessage(f'Geospatial metrics for layer {layer_name} failed: {ex}', MESSAGE_CATEGORY, Qgis.Warning)
 
         except Exception as ex:
             self.exception = ex
             return False
 
-        return True
+        return not self.isCanceled()
 
     def finished(self, result: bool):
         """
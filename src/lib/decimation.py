@@ -0,0 +1,142 @@
+"""
+Screen resolution decimation for time series charts.
+
+Series are held as NumPy arrays (datetime64 dates converted once to matplotlib date
+numbers, float values) and only the points needed to draw the visible window at the
+width of the canvas are handed to matplotlib. Two methods are available:
+
+    minmax  Keeps the minimum and maximum of each pixel bucket. Exact envelope, best for
+            noisy daily data such as discharge.
+    lttb    Largest-Triangle-Three-Buckets. One point per bucket chosen to preserve the
+            visual shape of the line.
+"""
+
+import numpy as np
+
+DECIMATION_MINMAX = 'minmax'
+DECIMATION_LTTB = 'lttb'
+
+
+def to_datetime64(dates) -> np.ndarray:
+    """Convert ISO date strings (YYYY-MM-DD) or dates to a datetime64[D] array."""
+    return np.asarray(dates, dtype='datetime64[D]')
+
+
+def to_float_array(values) -> np.ndarray:
+    """Convert values to float64, with None, empty strings and non numeric values as NaN."""
+
+    try:
+        # None converts to NaN
+        return np.asarray(values, dtype=np.float64)
+    except (TypeError, ValueError):
+        pass
+
+    array = np.asarray(values, dtype=object)
+    numeric = np.fromiter((isinstance(value, (int, float)) and not isinstance(value, bool) for value in array), dtype=bool, count=array.size)
+    result = np.full(array.shape, np.nan, dtype=np.float64)
+    result[numeric] = array[numeric].astype(np.float64)
+    return result
+
+
+def series_from_rows(rows, key_index: int = None, date_index: int = 0, value_index: int = 1) -> dict:
+    """Build {key: (dates, values)} NumPy arrays from database rows.
+
+    Rows must be ordered by key then date. When key_index is None all rows belong to a
+    single series with the key None.
+    """
+
+    if len(rows) == 0:
+        return {}
+
+    columns = list(zip(*rows))
+    dates = to_datetime64(columns[date_index])
+    values = to_float_array(columns[value_index])
+    if key_index is None:
+        return {None: (dates, values)}
+
+    keys = np.asarray(columns[key_index], dtype=object)
+    # Start index of each run of identical keys
+    starts = np.flatnonzero(np.concatenate(([True], keys[1:] != keys[:-1])))
+    ends = np.append(starts[1:], len(keys))
+    return {keys[start]: (dates[start:end], values[start:end]) for start, end in zip(starts, ends)}
+
+
+def _visible_slice(x: np.ndarray, x_min: float, x_max: float) -> slice:
+    """Slice of sorted x covering the window plus one point either side so lines reach the edges."""
+
+    start = max(int(np.searchsorted(x, x_min, side='left')) - 1, 0)
+    end = min(int(np.searchsorted(x, x_max, side='right')) + 1, len(x))
+    return slice(start, end)
+
+
+def minmax_decimate(x: np.ndarray, y: np.ndarray, buckets: int):
+    """Return the points holding the minimum and maximum of each of the equal width x buckets."""
+
+    if len(x) <= 2 * buckets or buckets < 1:
+        return x, y
+
+    span = x[-1] - x[0]
+    if span <= 0:
+        return x[[0, -1]], y[[0, -1]]
+
+    bucket = np.minimum(((x - x[0]) / span * buckets).astype(np.int64), buckets - 1)
+    # Within each bucket the first index sorted by value is the minimum and the last is the maximum
+    order = np.lexsort((y, bucket))
+    sorted_buckets = bucket[order]
+    firsts = np.flatnonzero(np.concatenate(([True], sorted_buckets[1:] != sorted_buckets[:-1])))
+    lasts = np.append(firsts[1:] - 1, len(order) - 1)
+
+    keep = np.unique(np.concatenate((order[firsts], order[lasts], [0, len(x) - 1])))
+    return x[keep], y[keep]
+
+
+def lttb_decimate(x: np.ndarray, y: np.ndarray, threshold: int):
+    """Largest-Triangle-Three-Buckets downsampling to threshold points."""
+
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return x, y
+
+    bucket_size = (n - 2) / (threshold - 2)
+    keep = np.empty(threshold, dtype=np.int64)
+    keep[0] = 0
+    keep[-1] = n - 1
+
+    previous = 0
+    for i in range(threshold - 2):
+        start = int(i * bucket_size) + 1
+        end = int((i + 1) * bucket_size) + 1
+        next_start = end
+        next_end = min(int((i + 2) * bucket_size) + 1, n)
+        if next_start >= next_end:
+            avg_x, avg_y = x[n - 1], y[n - 1]
+        else:
+            avg_x = x[next_start:next_end].mean()
+            avg_y = y[next_start:next_end].mean()
+
+        # Twice the triangle area formed by the previous point, each candidate and the next bucket average
+        areas = np.abs((x[previous] - avg_x) * (y[start:end] - y[previous]) - (x[previous] - x[start:end]) * (avg_y - y[previous]))
+        previous = start + int(np.argmax(areas))
+        keep[i + 1] = previous
+
+    return x[keep], y[keep]
+
+
+def decimate(x: np.ndarray, y: np.ndarray, x_min: float = None, x_max: float = None, pixels: int = 1000, method: str = DECIMATION_MINMAX):
+    """Decimate the part of a sorted series visible between x_min and x_max to the pixel width.
+
+    Non finite values are dropped before decimating.
+    """
+
+    valid = np.isfinite(y)
+    if not valid.all():
+        x, y = x[valid], y[valid]
+    if len(x) == 0:
+        return x, y
+
+    window = _visible_slice(x, x[0] if x_min is None else x_min, x[-1] if x_max is None else x_max)
+    x, y = x[window], y[window]
+
+    if method == DECIMATION_LTTB:
+        return lttb_decimate(x, y, 2 * pixels)
+    return minmax_decimate(x, y, pixels)
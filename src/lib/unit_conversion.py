@@ -1,3 +1,6 @@
+from functools import lru_cache
+
+import numpy as np
 from qgis.core import QgsUnitTypes
 
 distance_units ={
@@ -108,46 +111,97 @@ class RatioUnit(QgsUnitTypes):
         return super().toStringFromUnit(value, unit)
         
 
-def convert_units(value: float, from_unit: str, to_unit: str, invert: bool = False) -> float:
-    if value is None:
-        return None
-    
+def _unit_type(unit: str) -> int:
+    if unit in distance_units:
+        return distance_units[unit]
+    if unit in area_units:
+        return area_units[unit]
+    if unit in volume_units:
+        return volume_units[unit]
+    raise ValueError(f'Unknown unit type: {unit}')
+
+
+# --- Conversion factor tables ---
+# Factors are resolved from QgsUnitTypes once per unit pair and reused. Every conversion is a
+# multiplication by a factor, so a single value and a whole column of values convert the same way.
+
+@lru_cache(maxsize=None)
+def conversion_factor(from_unit: str, to_unit: str, invert: bool = False) -> float:
+    """Multiplier that converts values in from_unit to to_unit (the reciprocal when invert is True)."""
+
     if from_unit == to_unit:
-        return value
-    
+        return 1.0
+
     # check if they are ratios first
     if from_unit in ratio_units and to_unit in ratio_units:
         # Source * (SourceFactor / TargetFactor)
-        conversion_factor = ratio_units[from_unit] / ratio_units[to_unit]
-        if invert:
-            conversion_factor = 1 / conversion_factor
-        return value * conversion_factor
-
-    # get the base unit type from 
-    if from_unit in distance_units:
-        from_unit_type = distance_units[from_unit]
-    elif from_unit in area_units:
-        from_unit_type = area_units[from_unit]
-    elif from_unit in volume_units:
-        from_unit_type = volume_units[from_unit]
+        factor = ratio_units[from_unit] / ratio_units[to_unit]
     else:
-        raise ValueError(f'Unknown unit type: {from_unit}')
-    
-    if to_unit in distance_units:
-        to_unit_type = distance_units[to_unit]
-    elif to_unit in area_units:
-        to_unit_type = area_units[to_unit]
-    elif to_unit in volume_units:
-        to_unit_type = volume_units[to_unit]
-    else:
-        raise ValueError(f'Unknown unit type: {to_unit}')
+        factor = QgsUnitTypes.fromUnitToUnitFactor(_unit_type(from_unit), _unit_type(to_unit))
+
+    return 1 / factor if invert else factor
+
+
+@lru_cache(maxsize=None)
+def count_per_length_factor(from_length_unit: str, to_length_unit: str) -> float:
+    """Multiplier that converts count/from_length_unit to count/to_length_unit."""
+    if from_length_unit == to_length_unit:
+        return 1.0
+    # factor = how many from_length_unit in one to_length_unit
+    return 1 / QgsUnitTypes.fromUnitToUnitFactor(distance_units[from_length_unit], distance_units[to_length_unit])
+
+
+@lru_cache(maxsize=None)
+def count_per_area_factor(from_area_unit: str, to_area_unit: str) -> float:
+    """Multiplier that converts count/from_area_unit to count/to_area_unit."""
+    if from_area_unit == to_area_unit:
+        return 1.0
+    # factor = how many from_area_unit in one to_area_unit
+    return 1 / QgsUnitTypes.fromUnitToUnitFactor(area_units[from_area_unit], area_units[to_area_unit])
+
+
+def metric_unit_factor(base_unit: str, display_unit: str, normalization_unit_type: str = None, normalized: bool = False) -> float:
+    """Multiplier that converts a metric value from its base unit to display_unit.
+
+    Density metrics (normalization_unit_type 'distance' or 'area') convert the denominator,
+    other normalized metrics use the reciprocal of the unit conversion.
+    """
+    if display_unit is None:
+        return 1.0
+    if normalization_unit_type == 'distance':
+        return count_per_length_factor(base_unit, display_unit)
+    if normalization_unit_type == 'area':
+        return count_per_area_factor(base_unit, display_unit)
+    return conversion_factor(base_unit, display_unit, bool(normalized))
+
+
+def as_float_array(values) -> np.ndarray:
+    """Values as a float column with NaN for None and anything that is not a number."""
+    try:
+        return np.asarray(values, dtype=float)
+    except (TypeError, ValueError):
+        column = np.full(len(values), np.nan)
+        for i, value in enumerate(values):
+            try:
+                column[i] = float(value)
+            except (TypeError, ValueError):
+                continue
+        return column
+
+
+def convert_column(values, factors) -> np.ndarray:
+    """Convert a column of values with one factor, or with one factor per value. Missing values are NaN."""
+    return as_float_array(values) * np.asarray(factors, dtype=float)
+
+
+def convert_units(value: float, from_unit: str, to_unit: str, invert: bool = False) -> float:
+    if value is None:
+        return None
     
-    # get conversion factor
-    conversion_factor = QgsUnitTypes.fromUnitToUnitFactor(from_unit_type, to_unit_type)
-    if invert:
-        conversion_factor = 1 / conversion_factor
+    if from_unit == to_unit:
+        return value
 
-    return value * conversion_factor
+    return value * conversion_factor(from_unit, to_unit, invert)
 
 # --- Compound unit conversion helpers ---
 def convert_count_per_length(value, from_length_unit, to_length_unit):
@@ -157,11 +211,7 @@ def convert_count_per_length(value, from_length_unit, to_length_unit):
     """
     if value is None or from_length_unit == to_length_unit:
         return value
-    from_type = distance_units[from_length_unit]
-    to_type = distance_units[to_length_unit]
-    # factor = how many from_length_unit in one to_length_unit
-    factor = QgsUnitTypes.fromUnitToUnitFactor(from_type, to_type)
-    return value / factor
+    return value * count_per_length_factor(from_length_unit, to_length_unit)
 
 def convert_count_per_area(value, from_area_unit, to_area_unit):
     """
@@ -170,8 +220,4 @@ def convert_count_per_area(value, from_area_unit, to_area_unit):
     """
     if value is None or from_area_unit == to_area_unit:
         return value
-    from_type = area_units[from_area_unit]
-    to_type = area_units[to_area_unit]
-    # factor = how many from_area_unit in one to_area_unit
-    factor = QgsUnitTypes.fromUnitToUnitFactor(from_type, to_type)
-    return value / factor
\ No newline at end of file
+    return value * count_per_area_factor(from_area_unit, to_area_unit)
@@ -1,12 +1,12 @@
 import json
 import sqlite3
-import time
 from decimal import Decimal, InvalidOperation
 from typing import Dict, List, Tuple
 
 from .db_item_spatial import DBItemSpatial
 from .sample_frame import SampleFrame
 from .analysis_metric import AnalysisMetric, store_analysis_metrics
+from .connection_manager import request_checkpoint
 
 ANALYSIS_MACHINE_CODE = 'ANALYSIS'
 default_units = {'distance': 'meters', 'area': 'square meters', 'ratio': 'ratio', 'count': 'count'}
@@ -34,14 +34,6 @@ def _normalize_version(version):
         return version_str
 
 
-def checkpoint_wal(db_path: str) -> None:
-    with sqlite3.connect(db_path, isolation_level=None) as conn:
-        for _ in range(5):
-            busy, _log, _checkpointed = conn.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchone()
-            if busy == 0:
-                break
-            time.sleep(0.15)
-
 class Analysis(DBItemSpatial):
 
     def __init__(self, id: int, name: str, description: str, sample_frame: SampleFrame, metadata: dict = None):
@@ -70,7 +62,7 @@ class Analysis(DBItemSpatial):
                 self.description = description
                 self.analysis_metrics = analysis_metrics
                 self.set_metadata(metadata)
-                checkpoint_wal(db_path)
+                request_checkpoint(db_path)
 
             except Exception as ex:
                 conn.rollback()
@@ -181,8 +173,8 @@ class Analysis(DBItemSpatial):
                 self.metadata['system'] = self.system_metadata
             
 
-    def create_spatial_view(self, curs: sqlite3.Cursor) -> None:
-        """Create a spatial view of the Analysis features."""
+    def get_spatial_view_sql(self) -> str:
+        """Get the CREATE VIEW statement that pivots the analysis metric values onto the sample frame features."""
         
         # Filter by selected events if known
         event_filter = ""
@@ -198,22 +190,7 @@ class Analysis(DBItemSpatial):
         sql = f"""CREATE VIEW {self.view_name} AS SELECT * FROM sample_frame_features JOIN (SELECT sample_frame_feature_id, {sql_metric} FROM metric_values JOIN metrics ON metric_values.metric_id == metrics.id WHERE metric_values.analysis_id = {self.id}{event_filter} GROUP BY sample_frame_feature_id) AS x ON sample_frame_features.fid = x.sample_frame_feature_id"""  # nosec B608 - view_name is auto-generated (vw_<table>_<int_id>); all other values are integer DB IDs
         if sql_metric == '':
             sql = f"CREATE VIEW {self.view_name} AS SELECT * FROM sample_frame_features WHERE sample_frame_id == {self.sample_frame.id}"  # nosec B608 - view_name is auto-generated; sample_frame.id is an integer DB ID
-        # check if the view already exists, if so, delete it
-        if self.check_spatial_view_exists(curs):
-            curs.execute(f"DROP VIEW {self.view_name}")  # nosec B608 - view_name is auto-generated (vw_<table>_<int_id>)
-            curs.execute(f"DELETE FROM gpkg_contents WHERE table_name = '{self.view_name}'")  # nosec B608 - view_name is auto-generated
-            curs.execute(f"DELETE FROM gpkg_geometry_columns WHERE table_name = '{self.view_name}'")  # nosec B608 - view_name is auto-generated
-        curs.execute(sql)
-        # add view to geopackage
-        sql = "INSERT INTO gpkg_contents (table_name, data_type, identifier, description, srs_id) VALUES (?, ?, ?, ?, ?)"
-        curs.execute(sql, [self.view_name, "features", self.view_name, "", self.epsg])
-        sql = (
-            "INSERT INTO gpkg_geometry_columns "
-            "(table_name, column_name, geometry_type_name, srs_id, z, m) "
-            "VALUES (?, ?, ?, ?, ?, ?)"
-        )
-        curs.execute(sql, [self.view_name, 'geom', self.geom_type.upper(), self.epsg, 0, 0])
-
+        return sql
 
     def check_metric_feasibility(self, metric, project, event=None) -> Dict:
         return self._check_metric_feasibility(metric, project, event, set())
@@ -542,7 +519,7 @@ def insert_analysis(db_path: str, name: str, description: str, sample_frame: Sam
             analysis.analysis_metrics = analysis_metrics
             analysis.create_spatial_view(curs)
             conn.commit()
-            checkpoint_wal(db_path)
+            request_checkpoint(db_path)
         except Exception as ex:
             conn.rollback()
             raise Exception(f"Error inserting analysis {name}: {ex}") from ex
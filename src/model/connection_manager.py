@@ -0,0 +1,298 @@
+"""
+Project scoped SQLite connections.
+
+Opening a project registers a ConnectionManager for its GeoPackage. The manager keeps a
+small pool of read only connections and a single writer connection that is serialized
+with a lock, and applies tuned pragmas to every connection it opens:
+
+    cache_size      64 MB page cache per connection
+    mmap_size       256 MB memory mapped I/O
+    temp_store      temporary tables and indexes in memory
+    synchronous     NORMAL when the database is in WAL mode (durable at checkpoints, much
+                    cheaper commits). Rollback journal databases keep the SQLite default.
+    busy_timeout    wait for locks held by QGIS/OGR instead of failing immediately
+
+Code that only has a file path calls get_connection_manager(path). When no project has
+registered a manager for the path (tests, tools working on other GeoPackages) an
+unpooled manager is returned that opens and closes a connection for each use, with the
+same pragmas and counters.
+
+While any project is open, the cache, mmap and temp store pragmas are also set for
+GeoPackages opened through OGR (OGR_SQLITE_PRAGMA). The option is cleared when the last
+project closes.
+
+Pooled managers also keep one idle connection to read PRAGMA data_version, which changes
+whenever any connection (QGIS, OGR, another process) commits to the database. Caches of
+query results key on data_version() to see edits made outside QRiS.
+
+Pooled managers also own a WalCheckpointScheduler. Commits through write() notify it, and
+code that writes the GeoPackage some other way (OGR, direct sqlite3 connections in tasks)
+calls request_checkpoint(path) instead of running its own checkpoint.
+"""
+
+import os
+import time
+import queue
+import itertools
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+from .wal_checkpoint import WalCheckpointScheduler
+
+CACHE_SIZE_KIB = 65536
+MMAP_SIZE = 256 * 1024 * 1024
+BUSY_TIMEOUT_MS = 10000
+MAX_READERS = 4
+
+_managers = {}
+_managers_lock = threading.Lock()
+# Distinguishes the data_version connections, whose counters are only comparable within one connection
+_version_connection_ids = itertools.count(1)
+# True while OGR_SQLITE_PRAGMA holds the pragmas set by apply_gdal_pragmas
+_gdal_pragmas_applied = False
+
+
+def _normalize(db_path: str) -> str:
+    return os.path.normcase(os.path.abspath(db_path))
+
+
+class ConnectionManager:
+    """Reader pool and serialized writer for one SQLite database."""
+
+    def __init__(self, db_path: str, pooled: bool = True, max_readers: int = MAX_READERS):
+        self.db_path = db_path
+        self.pooled = pooled
+        self.max_readers = max_readers
+
+        self._readers = queue.LifoQueue()
+        self._writer = None
+        self._write_lock = threading.RLock()
+        self._version_conn = None
+        self._version_conn_id = None
+        self._version_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._closed = False
+        self._readers_in_use = 0
+        self.checkpoints = WalCheckpointScheduler(db_path) if pooled else None
+
+        self.counters = {
+            'opened': 0,
+            'closed': 0,
+            'reads': 0,
+            'reader_reuses': 0,
+            'writes': 0,
+            'write_wait_seconds': 0.0,
+            'max_readers_in_use': 0,
+        }
+
+    def _count(self, counter: str, value=1):
+        with self._stats_lock:
+            self.counters[counter] += value
+
+    def _connect(self, read_only: bool) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=BUSY_TIMEOUT_MS / 1000, check_same_thread=False)
+        conn.execute(f'PRAGMA cache_size = -{CACHE_SIZE_KIB}')
+        conn.execute(f'PRAGMA mmap_size = {MMAP_SIZE}')
+        conn.execute('PRAGMA temp_store = MEMORY')
+        conn.execute(f'PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}')
+        journal_mode = conn.execute('PRAGMA journal_mode').fetchone()[0]
+        if str(journal_mode).lower() == 'wal':
+            conn.execute('PRAGMA synchronous = NORMAL')
+        if read_only:
+            conn.execute('PRAGMA query_only = 1')
+        self._count('opened')
+        return conn
+
+    def _close(self, conn: sqlite3.Connection):
+        try:
+            conn.close()
+        finally:
+            self._count('closed')
+
+    @contextmanager
+    def read(self, row_factory=None):
+        """Check out a read only connection. Cursors must be exhausted before the block ends."""
+
+        conn = None
+        if self.pooled:
+            try:
+                conn = self._readers.get_nowait()
+                self._count('reader_reuses')
+            except queue.Empty:
+                conn = None
+        if conn is None:
+            conn = self._connect(read_only=True)
+
+        with self._stats_lock:
+            self.counters['reads'] += 1
+            self._readers_in_use += 1
+            self.counters['max_readers_in_use'] = max(self.counters['max_readers_in_use'], self._readers_in_use)
+
+        conn.row_factory = row_factory
+        try:
+            yield conn
+        finally:
+            with self._stats_lock:
+                self._readers_in_use -= 1
+            if conn.in_transaction:
+                conn.rollback()
+            conn.row_factory = None
+            if self.pooled and not self._closed and self._readers.qsize() < self.max_readers:
+                self._readers.put(conn)
+            else:
+                self._close(conn)
+
+    @contextmanager
+    def write(self, row_factory=None):
+        """Exclusive use of the writer connection. Commits when the block succeeds and rolls back if it raises."""
+
+        start = time.perf_counter()
+        with self._write_lock:
+            self._count('write_wait_seconds', time.perf_counter() - start)
+            self._count('writes')
+
+            conn = self._writer
+            if conn is None:
+                conn = self._connect(read_only=False)
+                if self.pooled:
+                    self._writer = conn
+
+            conn.row_factory = row_factory
+            try:
+                yield conn
+                conn.commit()
+                if self.checkpoints is not None:
+                    self.checkpoints.notify_write()
+            except Exception:
+                conn.rollback()
+                raise
+            finally:
+                conn.row_factory = None
+                if not self.pooled:
+                    self._close(conn)
+
+    def data_version(self):
+        """Token that changes whenever the database is committed to by any connection, or None for unpooled managers."""
+
+        if not self.pooled or self._closed:
+            return None
+        with self._version_lock:
+            if self._version_conn is None:
+                self._version_conn = self._connect(read_only=True)
+                self._version_conn_id = next(_version_connection_ids)
+            return (self._version_conn_id, self._version_conn.execute('PRAGMA data_version').fetchone()[0])
+
+    def release_idle(self):
+        """Close the pooled connections that are not in use. They are reopened on demand."""
+
+        while True:
+            try:
+                self._close(self._readers.get_nowait())
+            except queue.Empty:
+                break
+        with self._write_lock:
+            if self._writer is not None:
+                self._close(self._writer)
+                self._writer = None
+        with self._version_lock:
+            if self._version_conn is not None:
+                self._close(self._version_conn)
+                self._version_conn = None
+
+    def close(self):
+        self._closed = True
+        if self.checkpoints is not None:
+            self.checkpoints.stop()
+        self.release_idle()
+
+    def stats(self) -> dict:
+        """Copy of the connection counters with the number of idle pooled readers."""
+
+        with self._stats_lock:
+            stats = dict(self.counters)
+        stats['idle_readers'] = self._readers.qsize()
+        stats['pooled'] = self.pooled
+        return stats
+
+    def stats_text(self, stats: dict = None) -> str:
+        """Summary of the counters, or of counters previously returned by stats() or close_connection_manager()."""
+        stats = self.stats() if stats is None else stats
+        return (f'{stats["opened"]} connections opened, {stats["closed"]} closed, '
+                f'{stats["reads"]} reads ({stats["reader_reuses"]} from the pool), {stats["writes"]} writes '
+                f'({stats["write_wait_seconds"] * 1000:.0f} ms waiting for the writer), '
+                f'{stats["max_readers_in_use"]} concurrent readers at most')
+
+
+def open_connection_manager(db_path: str) -> ConnectionManager:
+    """Register (or return the already registered) pooled manager for a project database."""
+
+    key = _normalize(db_path)
+    with _managers_lock:
+        manager = _managers.get(key)
+        if manager is None:
+            manager = ConnectionManager(db_path, pooled=True)
+            _managers[key] = manager
+            manager.checkpoints.start()
+            apply_gdal_pragmas()
+    return manager
+
+
+def get_connection_manager(db_path: str) -> ConnectionManager:
+    """The registered manager for the database, or an unpooled manager when none is registered."""
+
+    with _managers_lock:
+        manager = _managers.get(_normalize(db_path))
+    return manager if manager is not None else ConnectionManager(db_path, pooled=False)
+
+
+def close_connection_manager(db_path: str) -> dict:
+    """Close and unregister the manager for the database. Returns its final counters, or None."""
+
+    with _managers_lock:
+        manager = _managers.pop(_normalize(db_path), None)
+        if len(_managers) == 0:
+            # Stop applying the project pragmas to GeoPackages opened by QGIS and other plugins
+            restore_gdal_pragmas()
+    if manager is None:
+        return None
+    manager.close()
+    return manager.stats()
+
+
+def request_checkpoint(db_path: str):
+    """Tell the project's checkpoint scheduler that the database was written outside the manager.
+
+    Databases without a registered manager are left to SQLite's automatic checkpoints.
+    """
+
+    with _managers_lock:
+        manager = _managers.get(_normalize(db_path))
+    if manager is not None and manager.checkpoints is not None:
+        manager.checkpoints.notify_write()
+
+
+def apply_gdal_pragmas():
+    """Apply the same cache, mmap and temp store pragmas to GeoPackages opened through OGR/GDAL.
+
+    OGR_SQLITE_PRAGMA is a process wide option, so it is only set while a project is open and is
+    cleared again by restore_gdal_pragmas. A value set by the user is left alone.
+    """
+
+    global _gdal_pragmas_applied
+    from osgeo import gdal
+    if _gdal_pragmas_applied or gdal.GetConfigOption('OGR_SQLITE_PRAGMA') is not None:
+        return
+    gdal.SetConfigOption('OGR_SQLITE_PRAGMA', f'cache_size=-{CACHE_SIZE_KIB},mmap_size={MMAP_SIZE},temp_store=MEMORY')
+    _gdal_pragmas_applied = True
+
+
+def restore_gdal_pragmas():
+    """Clear the OGR_SQLITE_PRAGMA value set by apply_gdal_pragmas."""
+
+    global _gdal_pragmas_applied
+    if not _gdal_pragmas_applied:
+        return
+    from osgeo import gdal
+    gdal.SetConfigOption('OGR_SQLITE_PRAGMA', None)
+    _gdal_pragmas_applied = False
@@ -1,3 +1,4 @@
+import hashlib
 import sqlite3
 
 from qgis.core import QgsDistanceArea, QgsGeometry, QgsProject, QgsUnitTypes, QgsVectorLayer
@@ -105,14 +106,23 @@ class DBItemSpatial(DBItem):
         curs.execute(f"SELECT name FROM sqlite_master WHERE type='view' AND name='{self.view_name}'")  # nosec B608 - view_name is auto-generated (vw_<table>_<int_id>)
         return curs.fetchone() is not None
 
+    def get_spatial_view_sql(self) -> str:
+        """Get the CREATE VIEW statement that defines the spatial view. Override for custom view definitions."""
+        return f"CREATE VIEW {self.view_name} AS SELECT * FROM {self.fc_name} WHERE {self.fc_id_column_name} == {self.id}"  # nosec B608 - all values are auto-generated internal names or integer IDs
+
+    def get_spatial_view_fingerprint(self) -> str:
+        """Get a hash of everything that defines the spatial view (SQL, geometry type and SRS)."""
+        definition = '|'.join([self.get_spatial_view_sql(), self.geom_type.upper(), str(self.epsg)])
+        return hashlib.sha256(definition.encode('utf-8')).hexdigest()
+
     def create_spatial_view(self, curs: sqlite3.Cursor) -> None:
         """Create a spatial view of the DB item features."""
-        sql = f"CREATE VIEW {self.view_name} AS SELECT * FROM {self.fc_name} WHERE {self.fc_id_column_name} == {self.id}"  # nosec B608 - all values are auto-generated internal names or integer IDs
-            # check if the view already exists, if so, delete it
+        sql = self.get_spatial_view_sql()
+        # check if the view already exists, if so, delete it
         if self.check_spatial_view_exists(curs):
             curs.execute(f"DROP VIEW {self.view_name}")  # nosec B608 - view_name is auto-generated (vw_<table>_<int_id>)
-            curs.execute(f"DELETE FROM gpkg_contents WHERE table_name = '{self.view_name}'")  # nosec B608 - view_name is auto-generated
-            curs.execute(f"DELETE FROM gpkg_geometry_columns WHERE table_name = '{self.view_name}'")  # nosec B608 - view_name is auto-generated
+        curs.execute("DELETE FROM gpkg_contents WHERE table_name = ?", (self.view_name,))
+        curs.execute("DELETE FROM gpkg_geometry_columns WHERE table_name = ?", (self.view_name,))
         curs.execute(sql)
         # add view to geopackage
         sql = "INSERT INTO gpkg_contents (table_name, data_type, identifier, description, srs_id) VALUES (?, ?, ?, ?, ?)"
@@ -123,9 +133,15 @@ class DBItemSpatial(DBItem):
             "VALUES (?, ?, ?, ?, ?, ?)"
         )
         curs.execute(sql, [self.view_name, 'geom', self.geom_type.upper(), self.epsg, 0, 0])
-    
+        # remember the definition so that unchanged views are not rebuilt on the next refresh
+        curs.execute(
+            "INSERT OR REPLACE INTO spatial_view_fingerprints (view_name, fingerprint, updated_on) VALUES (?, ?, CURRENT_TIMESTAMP)",
+            (self.view_name, self.get_spatial_view_fingerprint())
+        )
+
     def drop_spatial_view(self, curs: sqlite3.Cursor) -> None:
         """Drop the spatial view of the DB item features."""
         curs.execute(f"DROP VIEW IF EXISTS {self.view_name}")  # nosec B608 - view_name is auto-generated (vw_<table>_<int_id>)
         curs.execute(f"DELETE FROM gpkg_contents WHERE table_name = ?", (self.view_name,))  # nosec B608 - view_name is auto-generated
-        curs.execute(f"DELETE FROM gpkg_geometry_columns WHERE table_name = ?", (self.view_name,))  # nosec B608 - view_name is auto-generated
\ No newline at end of file
+        curs.execute(f"DELETE FROM gpkg_geometry_columns WHERE table_name = ?", (self.view_name,))  # nosec B608 - view_name is auto-generated
+        curs.execute("DELETE FROM spatial_view_fingerprints WHERE view_name = ?", (self.view_name,))
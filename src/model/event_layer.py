@@ -43,26 +43,13 @@ class EventLayer(DBItemSpatial):
             temp_layer = QgsVectorLayer(f'{db_path}|layername={self.fc_name}|subset=event_layer_id = {self.layer.id} AND event_id = {self.event_id}', 'temp', 'ogr')
             return temp_layer.featureCount()
 
-    def create_spatial_view(self, curs: sqlite3.Cursor) -> None:
-        """Create a spatial view of the Event Layer features."""
+    def get_spatial_view_sql(self) -> str:
+        """Get the CREATE VIEW statement for the Event Layer features, exposing each layer field as a column."""
         layer_fields: list = self.layer.metadata.get('fields', None)
         out_fields = '*'
         if layer_fields is not None and len(layer_fields) > 0:
             out_fields = ", ".join([f"json_extract(metadata, '$.attributes.{field['id']}') AS \"{field['label']}\"" for field in layer_fields])
-        sql = f"CREATE VIEW {self.view_name} AS SELECT fid, geom, event_id, event_layer_id, {out_fields}, metadata FROM {self.fc_name} WHERE event_id == {self.event_id} AND event_layer_id == {self.layer.id}"  # nosec B608 - view_name is auto-generated; fc_name is fixed schema; event_id and layer.id are integer DB IDs
-        # check if the view already exists, if so, delete it
-        if self.check_spatial_view_exists(curs):
-            curs.execute(f"DROP VIEW {self.view_name}")  # nosec B608 - view_name is auto-generated (vw_<table>_<int_id>)
-            curs.execute(f"DELETE FROM gpkg_contents WHERE table_name = '{self.view_name}'")  # nosec B608 - view_name is auto-generated
-            curs.execute(f"DELETE FROM gpkg_geometry_columns WHERE table_name = '{self.view_name}'")  # nosec B608 - view_name is auto-generated
-
-        curs.execute(sql)
-        # add view to geopackage
-        sql = "INSERT INTO gpkg_contents (table_name, data_type, identifier, description, srs_id) VALUES (?, ?, ?, ?, ?)"
-        curs.execute(sql, [self.view_name, "features", self.view_name, "", self.epsg])
-        sql = "INSERT INTO gpkg_geometry_columns (table_name, column_name, geometry_type_name, srs_id, z, m) VALUES (?, ?, ?, ?, ?, ?)"
-        curs.execute(sql, [self.view_name, 'geom', self.geom_type.upper(), self.epsg, 0, 0])
-        
+        return f"CREATE VIEW {self.view_name} AS SELECT fid, geom, event_id, event_layer_id, {out_fields}, metadata FROM {self.fc_name} WHERE event_id == {self.event_id} AND event_layer_id == {self.layer.id}"  # nosec B608 - view_name is auto-generated; fc_name is fixed schema; event_id and layer.id are integer DB IDs
 
     def delete_event_layer_features(self, db_path: str) -> None:
         """
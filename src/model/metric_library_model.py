@@ -0,0 +1,402 @@
+from typing import Callable, Dict, Iterable, List
+
+from qgis.PyQt import QtCore, QtGui
+
+from .metric import Metric
+
+COLUMN_NAME = 0
+COLUMN_VERSION = 1
+COLUMN_AVAILABILITY = 2
+COLUMN_USAGE = 3
+COLUMN_DESCRIPTION = 4
+COLUMN_PROTOCOL = 5
+COLUMN_GROUP = 6
+
+HEADERS = ['Metric', 'Version (Status)', 'Availability', 'Usage', 'Description', 'Protocol', 'Group']
+HEADER_TOOLTIPS = [
+    "Name of the metric or indicator.",
+    "Version number and active status.",
+    "Summary of the ability to calculatete metrics automatically based on the current layers and inputs for each DCE in the Project.",
+    "Select usage level: Metric or Indicator. These will be included in the analysis accordingly.",
+    "Description of the metric.",
+    "The protocol that defines this metric.",
+    "Hierarchical group/category.",
+]
+USAGE_LABELS = ['None', 'Metric', 'Indicator']
+
+METRIC_ROLE = QtCore.Qt.UserRole
+
+AVAILABILITY_ALL = None
+AVAILABILITY_FEASIBLE = 'feasible'
+AVAILABILITY_BLOCKED = 'blocked'
+AVAILABILITY_MANUAL = 'manual'
+
+
+def usage_label(level_id: int) -> str:
+    return USAGE_LABELS[level_id] if level_id is not None and 0 <= level_id <= 2 else 'None'
+
+
+class _Node:
+    """Protocol, group or metric row. Rows are fixed once the model is built, so each node knows its own row."""
+
+    __slots__ = ('name', 'parent', 'metric', 'children', 'row', 'flat_row', '_child_map')
+
+    def __init__(self, name: str, parent: '_Node' = None, metric: Metric = None):
+        self.name = name
+        self.parent = parent
+        self.metric = metric
+        self.children: List[_Node] = []
+        self.row = 0
+        self.flat_row = 0
+        self._child_map: Dict[str, _Node] = {}
+
+    def add_child(self, node: '_Node') -> '_Node':
+        node.parent = self
+        node.row = len(self.children)
+        self.children.append(node)
+        if node.metric is None:
+            self._child_map[node.name] = node
+        return node
+
+    def group(self, name: str) -> '_Node':
+        node = self._child_map.get(name)
+        return node if node is not None else self.add_child(_Node(name))
+
+
+class MetricLibraryModel(QtCore.QAbstractItemModel):
+    """The project metric catalog as a protocol > group > metric tree, or as a flat list of metrics.
+
+    Every metric row is reachable by metric id in constant time, so availability and usage
+    updates only touch the rows that changed. Updates are applied in batches and announced
+    with one dataChanged signal per run of adjacent rows.
+
+    levels is the {metric_id: level_id} usage state. The dictionary is shared with the
+    caller and updated in place by setData() and set_levels().
+    """
+
+    # metric_id, level_id. Emitted when the user changes the usage of a metric in a view.
+    usage_changed = QtCore.pyqtSignal(int, int)
+
+    def __init__(self, metrics: Dict[int, Metric], protocols: dict, levels: Dict[int, int], parent=None):
+        super().__init__(parent)
+        self.metrics = metrics
+        self.protocols = protocols
+        self.levels = levels
+        self.flat = False
+        self.availability: Dict[int, str] = {}
+
+        self._root = _Node(None)
+        self._flat: List[_Node] = []
+        self._metric_nodes: Dict[int, _Node] = {}
+        self._protocol_names: Dict[str, str] = {}
+        self._protocol_status: Dict[str, tuple] = {}
+        self.rebuild()
+
+    def rebuild(self):
+        """Rebuild the rows after the metric catalog changes."""
+
+        self.beginResetModel()
+        self._protocol_names = {}
+        self._protocol_status = {}
+        for protocol in self.protocols.values():
+            self._protocol_names[protocol.machine_code] = protocol.name
+            status = getattr(protocol, 'status', 'active')
+            experimental = 'experimental' in protocol.name.lower() or status == 'experimental'
+            self._protocol_status[protocol.machine_code] = (experimental, status == 'deprecated')
+
+        self._root = _Node(None)
+        self._flat = []
+        self._metric_nodes = {}
+        for metric in self.metrics.values():
+            parent = self._root.group(self.protocol_name(metric))
+            for group_name in getattr(metric, 'hierarchy', None) or []:
+                parent = parent.group(group_name)
+            node = parent.add_child(_Node(metric.name, metric=metric))
+            node.flat_row = len(self._flat)
+            self._flat.append(node)
+            self._metric_nodes[metric.id] = node
+        self.endResetModel()
+
+    def set_flat(self, flat: bool):
+        """Show metrics as a flat table (True) or as the protocol and group tree (False)."""
+        if flat != self.flat:
+            self.beginResetModel()
+            self.flat = flat
+            self.endResetModel()
+
+    # Metric properties used by the views and the filter
+
+    def protocol_name(self, metric: Metric) -> str:
+        return self._protocol_names.get(metric.protocol_machine_code, metric.protocol_machine_code)
+
+    def is_protocol_experimental(self, metric: Metric) -> bool:
+        return self._protocol_status.get(metric.protocol_machine_code, (False, False))[0]
+
+    def is_deprecated(self, metric: Metric) -> bool:
+        return getattr(metric, 'status', 'active') == 'deprecated' or self._protocol_status.get(metric.protocol_machine_code, (False, False))[1]
+
+    def metric_font(self, metric: Metric, level_id: int) -> QtGui.QFont:
+        font = QtGui.QFont()
+        if level_id > 0:
+            font.setBold(True)
+        if self.is_deprecated(metric):
+            font.setItalic(True)
+            if self._protocol_status.get(metric.protocol_machine_code, (False, False))[1]:
+                # Optional visual cue for protocol-level deprecation
+                font.setStrikeOut(True)
+        return font
+
+    def all_metrics(self) -> Iterable[Metric]:
+        return (node.metric for node in self._flat)
+
+    def metric(self, index: QtCore.QModelIndex) -> Metric:
+        """The metric for a source model index, or None for protocol and group rows."""
+        return index.internalPointer().metric if index.isValid() else None
+
+    def metric_index(self, metric_id: int, column: int = COLUMN_NAME) -> QtCore.QModelIndex:
+        node = self._metric_nodes.get(metric_id)
+        if node is None:
+            return QtCore.QModelIndex()
+        return self.createIndex(node.flat_row if self.flat else node.row, column, node)
+
+    # Batched updates
+
+    def set_availability(self, statuses: Dict[int, str]):
+        """Set the availability text of many metrics and emit one dataChanged per run of adjacent rows."""
+        self.availability.update(statuses)
+        self._emit_changed(statuses.keys(), COLUMN_AVAILABILITY, COLUMN_AVAILABILITY)
+
+    def clear_availability(self):
+        metric_ids = list(self.availability.keys())
+        self.availability = {}
+        self._emit_changed(metric_ids, COLUMN_AVAILABILITY, COLUMN_AVAILABILITY)
+
+    def set_levels(self, levels: Dict[int, int]):
+        """Set the usage level of many metrics. Does not emit usage_changed."""
+        self.levels.update(levels)
+        self._emit_changed(levels.keys(), COLUMN_NAME, COLUMN_USAGE)
+
+    def _emit_changed(self, metric_ids: Iterable[int], first_column: int, last_column: int):
+        rows_by_parent = {}
+        for metric_id in metric_ids:
+            node = self._metric_nodes.get(metric_id)
+            if node is None:
+                continue
+            parent = None if self.flat else node.parent
+            rows_by_parent.setdefault(id(parent), (parent, []))[1].append(node.flat_row if self.flat else node.row)
+
+        for parent, rows in rows_by_parent.values():
+            parent_index = QtCore.QModelIndex() if parent is None or parent is self._root else self.createIndex(parent.row, 0, parent)
+            rows.sort()
+            start = previous = rows[0]
+            for row in rows[1:] + [None]:
+                if row is not None and row == previous + 1:
+                    previous = row
+                    continue
+                self.dataChanged.emit(self.index(start, first_column, parent_index), self.index(previous, last_column, parent_index))
+                if row is not None:
+                    start = previous = row
+
+    # QAbstractItemModel
+
+    def _node(self, index: QtCore.QModelIndex) -> _Node:
+        return index.internalPointer() if index.isValid() else self._root
+
+    def index(self, row: int, column: int, parent: QtCore.QModelIndex = QtCore.QModelIndex()) -> QtCore.QModelIndex:
+        if column < 0 or column >= len(HEADERS) or row < 0:
+            return QtCore.QModelIndex()
+        if self.flat:
+            if parent.isValid() or row >= len(self._flat):
+                return QtCore.QModelIndex()
+            return self.createIndex(row, column, self._flat[row])
+
+        parent_node = self._node(parent)
+        if row >= len(parent_node.children):
+            return QtCore.QModelIndex()
+        return self.createIndex(row, column, parent_node.children[row])
+
+    def parent(self, index: QtCore.QModelIndex) -> QtCore.QModelIndex:
+        if not index.isValid() or self.flat:
+            return QtCore.QModelIndex()
+        parent_node = index.internalPointer().parent
+        if parent_node is None or parent_node is self._root:
+            return QtCore.QModelIndex()
+        return self.createIndex(parent_node.row, 0, parent_node)
+
+    def rowCount(self, parent: QtCore.QModelIndex = QtCore.QModelIndex()) -> int:
+        if parent.column() > 0:
+            return 0
+        if self.flat:
+            return 0 if parent.isValid() else len(self._flat)
+        return len(self._node(parent).children)
+
+    def columnCount(self, parent: QtCore.QModelIndex = QtCore.QModelIndex()) -> int:
+        return len(HEADERS)
+
+    def headerData(self, section: int, orientation, role=QtCore.Qt.DisplayRole):
+        if orientation == QtCore.Qt.Horizontal and 0 <= section < len(HEADERS):
+            if role == QtCore.Qt.DisplayRole:
+                return HEADERS[section]
+            if role == QtCore.Qt.ToolTipRole:
+                return HEADER_TOOLTIPS[section]
+        return None
+
+    def data(self, index: QtCore.QModelIndex, role=QtCore.Qt.DisplayRole):
+        if not index.isValid():
+            return None
+
+        node: _Node = index.internalPointer()
+        metric = node.metric
+        column = index.column()
+        if metric is None:
+            # Protocol and group rows only have a name
+            return node.name if column == COLUMN_NAME and role == QtCore.Qt.DisplayRole else None
+
+        if role == METRIC_ROLE:
+            return metric
+
+        level_id = self.levels.get(metric.id, 0)
+        if role == QtCore.Qt.DisplayRole:
+            if column == COLUMN_NAME:
+                return metric.name
+            if column == COLUMN_VERSION:
+                return f"{str(metric.version) if metric.version else ''} ({getattr(metric, 'status', 'active')})"
+            if column == COLUMN_AVAILABILITY:
+                # Availability is computed lazily to keep initial form loading responsive.
+                return self.availability.get(metric.id, '')
+            if column == COLUMN_USAGE:
+                return usage_label(level_id)
+            if column == COLUMN_DESCRIPTION:
+                return metric.description
+            if column == COLUMN_PROTOCOL:
+                return self.protocol_name(metric)
+            if column == COLUMN_GROUP:
+                hierarchy = getattr(metric, 'hierarchy', None)
+                return ' > '.join(hierarchy) if hierarchy else ''
+        elif role == QtCore.Qt.EditRole and column == COLUMN_USAGE:
+            return level_id
+        elif role == QtCore.Qt.FontRole and column in (COLUMN_NAME, COLUMN_VERSION):
+            return self.metric_font(metric, level_id)
+        elif role == QtCore.Qt.ToolTipRole and column == COLUMN_DESCRIPTION:
+            return metric.description
+        return None
+
+    def setData(self, index: QtCore.QModelIndex, value, role=QtCore.Qt.EditRole) -> bool:
+        metric = self.metric(index)
+        if metric is None or index.column() != COLUMN_USAGE or role != QtCore.Qt.EditRole:
+            return False
+
+        level_id = int(value)
+        if self.levels.get(metric.id, 0) == level_id:
+            return False
+        self.set_levels({metric.id: level_id})
+        self.usage_changed.emit(metric.id, level_id)
+        return True
+
+    def flags(self, index: QtCore.QModelIndex):
+        if not index.isValid():
+            return QtCore.Qt.NoItemFlags
+        flags = QtCore.Qt.ItemIsEnabled | QtCore.Qt.ItemIsSelectable
+        if index.column() == COLUMN_USAGE and index.internalPointer().metric is not None:
+            flags |= QtCore.Qt.ItemIsEditable
+        return flags
+
+
+class MetricLibraryFilterModel(QtCore.QSortFilterProxyModel):
+    """Filters the metric library by universe (experimental and deprecated), protocol, group, usage, availability and search text.
+
+    Group and protocol rows are shown when any metric below them is accepted. Set the
+    filters with set_filters(), which re-filters once for any number of changes.
+    """
+
+    def __init__(self, availability: Callable[[Metric], str], parent=None):
+        super().__init__(parent)
+        # Returns the availability text of a metric, computing it if necessary. Only called when an availability filter is active.
+        self.availability = availability
+        self.protocols = None
+        self.groups = None
+        self.search_text = ''
+        self.in_use_only = False
+        self.availability_filter = AVAILABILITY_ALL
+        self.intrinsic_mode = False
+        self.include_experimental = False
+        self.include_deprecated = False
+
+        self.setRecursiveFilteringEnabled(True)
+        self.setDynamicSortFilter(True)
+        self.setSortCaseSensitivity(QtCore.Qt.CaseInsensitive)
+
+    def set_filters(self, **filters):
+        """Update one or more filter attributes (protocols, groups, search_text, ...) and re-filter once."""
+        changed = False
+        for name, value in filters.items():
+            if not hasattr(self, name):
+                raise AttributeError(f'Unknown metric library filter {name}')
+            if getattr(self, name) != value:
+                setattr(self, name, value)
+                changed = True
+        if changed:
+            self.invalidateFilter()
+
+    def in_universe(self, metric: Metric) -> bool:
+        model: MetricLibraryModel = self.sourceModel()
+        if not self.include_experimental and model.is_protocol_experimental(metric):
+            return False
+        if not self.include_deprecated and model.is_deprecated(metric):
+            return False
+        return True
+
+    def accepts_metric(self, metric: Metric) -> bool:
+        model: MetricLibraryModel = self.sourceModel()
+
+        if self.search_text and self.search_text not in metric.name.lower():
+            return False
+
+        if self.in_use_only and model.levels.get(metric.id, 0) == 0:
+            return False
+
+        # Availability is expensive, so it is only looked up when an availability filter is active.
+        if self.availability_filter is not AVAILABILITY_ALL:
+            status_lower = self.availability(metric).lower()
+            is_manual = 'manual' in status_lower
+            if self.availability_filter == AVAILABILITY_FEASIBLE:
+                if self.intrinsic_mode:
+                    if status_lower.startswith('not feasible') or is_manual:
+                        return False
+                # Must contain "DCE" and NOT start with "No" to be considered "Ready" (e.g. "All 5 DCEs", "1 DCE")
+                elif 'dce' not in status_lower or status_lower.startswith('no'):
+                    return False
+            elif self.availability_filter == AVAILABILITY_BLOCKED:
+                if self.intrinsic_mode:
+                    if not status_lower.startswith('not feasible'):
+                        return False
+                # Must start with "No DCEs" (implies Missing Inputs or Selected or just empty) but must NOT be manual.
+                elif not status_lower.startswith('no dce'):
+                    return False
+            elif self.availability_filter == AVAILABILITY_MANUAL and not is_manual:
+                return False
+
+        if not self.in_universe(metric):
+            return False
+
+        if self.protocols is not None and metric.protocol_machine_code not in self.protocols:
+            return False
+
+        hierarchy = getattr(metric, 'hierarchy', None)
+        if self.groups is not None and hierarchy and not any(group in self.groups for group in hierarchy):
+            return False
+
+        return True
+
+    def filterAcceptsRow(self, source_row: int, source_parent: QtCore.QModelIndex) -> bool:
+        model: MetricLibraryModel = self.sourceModel()
+        metric = model.metric(model.index(source_row, 0, source_parent))
+        # Protocol and group rows are accepted through recursive filtering when a descendant metric is accepted
+        return metric is not None and self.accepts_metric(metric)
+
+    def metric(self, index: QtCore.QModelIndex) -> Metric:
+        """The metric for a proxy index, or None for protocol and group rows."""
+        return self.sourceModel().metric(self.mapToSource(index))
+
+    def accepted_metrics(self) -> List[Metric]:
+        return [metric for metric in self.sourceModel().all_metrics() if self.accepts_metric(metric)]
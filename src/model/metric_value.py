@@ -1,16 +1,36 @@
+import os
 import typing
-import sqlite3
 import json
+import threading
 
 from .metric import Metric
 from .analysis import Analysis, TEMPORAL_SCOPE_INTRINSIC
 from .event import Event
 from .db_item import dict_factory
-from ..lib.unit_conversion import convert_units, convert_count_per_length, convert_count_per_area
+from .connection_manager import get_connection_manager
+import numpy as np
+
+from ..lib.unit_conversion import metric_unit_factor, convert_column
 
 # Intrinsic metrics use event_id=0 so existing PK/UPSERT semantics work unchanged.
 INTRINSIC_EVENT_ID = 0
 
+# Incremented whenever this process writes metric values to a project, so that results derived from them can be cached
+_metric_values_versions = {}
+_metric_values_versions_lock = threading.Lock()
+
+
+def metric_values_changed(db_path: str):
+    """Call after writing to the metric_values table of a project."""
+    key = os.path.normcase(os.path.abspath(db_path))
+    with _metric_values_versions_lock:
+        _metric_values_versions[key] = _metric_values_versions.get(key, 0) + 1
+
+
+def metric_values_version(db_path: str) -> int:
+    return _metric_values_versions.get(os.path.normcase(os.path.abspath(db_path)), 0)
+
+
 class MetricValue():
 
     def __init__(self, metric: Metric, manual_value: float, automated_value: float, is_manual: bool, uncertainty: float, description: str, unit_id: int, metadata: dict):
@@ -24,27 +44,19 @@ class MetricValue():
         self.metadata = metadata
         self.description = description
             
+    def raw_value(self):
+        """The current value in the base unit of the metric."""
+        return self.manual_value if self.is_manual else self.automated_value
+
     def current_value(self, display_unit: str = None):
-        value = self.manual_value if self.is_manual else self.automated_value
-        if display_unit is not None:
-            if self.metric.normalization_unit_type is not None:
-                if self.metric.normalization_unit_type == 'distance':
-                    value = convert_count_per_length(value, self.metric.base_unit, display_unit)
-                elif self.metric.normalization_unit_type == 'area':
-                    value = convert_count_per_area(value, self.metric.base_unit, display_unit)
-                else:
-                    value = convert_units(value, self.metric.base_unit, display_unit, invert=self.metric.normalized)
-            else:
-                value = convert_units(value, self.metric.base_unit, display_unit, invert=self.metric.normalized)
-        return value
+        value = self.raw_value()
+        if value is None:
+            return None
+        factor = display_unit_factor(self.metric, display_unit)
+        return value if factor == 1 else value * factor
     
     def current_value_as_string(self, display_unit: str = None):
-        value = self.current_value(display_unit)
-        if value is None:
-            return ''
-        if isinstance(value, float) and self.metric.precision is not None:
-            return f'{value: .{self.metric.precision}f}'
-        return str(value)
+        return format_metric_value(self.metric, self.current_value(display_unit))
     
     def uncertainty_as_string(self):
         if self.uncertainty is None:
@@ -54,45 +66,79 @@ class MetricValue():
     def save(self, db_path: str, analysis: Analysis, event: Event, sample_frame_feature_id: int, unit_id: int = None):
         event_id = event.id if event is not None else INTRINSIC_EVENT_ID
 
-        with sqlite3.connect(db_path, timeout=10.0) as conn:
+        with get_connection_manager(db_path).write() as conn:
             curs = conn.cursor()
-            try:
-                curs.execute("""INSERT INTO metric_values (
-                        analysis_id
-                        , event_id
-                        , sample_frame_feature_id
-                        , metric_id
-                        , manual_value
-                        , automated_value
-                        , is_manual
-                        , uncertainty
-                        , unit_id
-                        , metadata
-                        , description
-                        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                    ON CONFLICT (analysis_id, event_id, sample_frame_feature_id, metric_id) DO UPDATE SET
-                        manual_value = excluded.manual_value
-                        , automated_value = excluded.automated_value
-                        , is_manual = excluded.is_manual
-                        , uncertainty = excluded.uncertainty
-                        , metadata = excluded.metadata
-                        , description = excluded.description""", [
-                    analysis.id,
-                    event_id,
-                    sample_frame_feature_id,
-                    self.metric.id,
-                    self.manual_value,
-                    self.automated_value,
-                    self.is_manual,
-                    json.dumps(self.uncertainty),
-                    unit_id,
-                    json.dumps(self.metadata) if self.metadata is not None and len(self.metadata) > 0 else None,
-                    self.description
-                ])
-                conn.commit()
-            except Exception as ex:
-                conn.rollback()
-                raise ex
+            curs.execute("""INSERT INTO metric_values (
+                    analysis_id
+                    , event_id
+                    , sample_frame_feature_id
+                    , metric_id
+                    , manual_value
+                    , automated_value
+                    , is_manual
+                    , uncertainty
+                    , unit_id
+                    , metadata
+                    , description
+                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (analysis_id, event_id, sample_frame_feature_id, metric_id) DO UPDATE SET
+                    manual_value = excluded.manual_value
+                    , automated_value = excluded.automated_value
+                    , is_manual = excluded.is_manual
+                    , uncertainty = excluded.uncertainty
+                    , metadata = excluded.metadata
+                    , description = excluded.description""", [
+                analysis.id,
+                event_id,
+                sample_frame_feature_id,
+                self.metric.id,
+                self.manual_value,
+                self.automated_value,
+                self.is_manual,
+                json.dumps(self.uncertainty),
+                unit_id,
+                json.dumps(self.metadata) if self.metadata is not None and len(self.metadata) > 0 else None,
+                self.description
+            ])
+        metric_values_changed(db_path)
+
+
+def display_unit_factor(metric: Metric, display_unit: str = None) -> float:
+    """Multiplier that converts values of the metric from its base unit to display_unit.
+    Every conversion is linear, so whole arrays of values can be converted with one multiplication."""
+    return metric_unit_factor(metric.base_unit, display_unit, metric.normalization_unit_type, metric.normalized)
+
+
+def format_metric_value(metric: Metric, value) -> str:
+    if value is None:
+        return ''
+    if isinstance(value, float) and metric.precision is not None:
+        return f'{value: .{metric.precision}f}'
+    return str(value)
+
+
+def current_values(metric_values: typing.List[MetricValue], display_units: typing.List[str]) -> np.ndarray:
+    """The current value of each metric value in the corresponding display unit, converted as one column. NaN where there is no value."""
+    factors = [display_unit_factor(metric_value.metric, display_unit) for metric_value, display_unit in zip(metric_values, display_units)]
+    return convert_column([metric_value.raw_value() for metric_value in metric_values], factors)
+
+
+def current_values_as_strings(metric_values: typing.List[MetricValue], display_units: typing.List[str]) -> typing.List[str]:
+    """current_value_as_string for a column of metric values, converting the whole column at once."""
+    factors = np.array([display_unit_factor(metric_value.metric, display_unit) for metric_value, display_unit in zip(metric_values, display_units)], dtype=float)
+    raw_values = [metric_value.raw_value() for metric_value in metric_values]
+    converted = convert_column(raw_values, factors)
+
+    strings = []
+    for metric_value, raw, factor, value in zip(metric_values, raw_values, factors, converted):
+        if raw is None:
+            strings.append('')
+        elif factor == 1 or not np.isfinite(value):
+            # Unconverted (or non numeric) values keep their type for formatting
+            strings.append(format_metric_value(metric_value.metric, raw))
+        else:
+            strings.append(format_metric_value(metric_value.metric, float(value)))
+    return strings
 
 
 def load_metric_values(db_path: str, analysis: Analysis, event: Event, sample_frame_feature_id: int, metrics: dict) -> typing.Dict[int, MetricValue]:
@@ -101,8 +147,7 @@ def load_metric_values(db_path: str, analysis: Analysis, event: Event, sample_fr
     """
 
     event_id = event.id if event is not None else INTRINSIC_EVENT_ID
-    with sqlite3.connect(db_path) as conn:
-        conn.row_factory = dict_factory
+    with get_connection_manager(db_path).read(dict_factory) as conn:
         curs = conn.cursor()
         curs.execute('SELECT * FROM metric_values WHERE (analysis_id = ?) AND (event_id = ?) AND (sample_frame_feature_id = ?)',
                      [analysis.id, event_id, sample_frame_feature_id])
@@ -0,0 +1,134 @@
+"""
+Reach-wide summaries of metric values over time.
+
+The values of a metric across every sample frame feature of an analysis are summarized
+per event by one grouped query over metric_values. SQLite window functions rank the
+values within each (metric, event) so that the quartiles are interpolated in SQL the
+same way as numpy.percentile, and the absolute uncertainty of each value is summed in
+quadrature for the uncertainty of the mean. Unit conversion is a multiplication of the
+summary arrays.
+
+Summaries are cached until metric values are written to the project by this process
+(see metric_value.metric_values_changed) or the database changes. For an open project the
+data_version of its connection manager changes with every commit, including inserts, updates
+and cascading deletes made through QGIS. Databases without a registered manager fall back to
+the row count and largest rowid of the analysis's metric values, which only see inserts and
+deletes.
+"""
+
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from .connection_manager import get_connection_manager
+from .metric_value import metric_values_version
+
+QUARTILES = (0.25, 0.5, 0.75)
+CACHE_SIZE = 64
+
+
+@dataclass(frozen=True)
+class MetricValueSummary:
+    """Summary statistics of one metric for a sequence of events. Each array has one element per event (NaN where an event has no values)."""
+
+    metric_id: int
+    event_ids: Tuple[int, ...]
+    count: np.ndarray
+    minimum: np.ndarray
+    maximum: np.ndarray
+    mean: np.ndarray
+    q1: np.ndarray
+    median: np.ndarray
+    q3: np.ndarray
+    # Absolute uncertainty of the mean, propagated from the Plus/Minus or Percent uncertainty of each value
+    mean_uncertainty: np.ndarray
+
+    def converted(self, factor: float) -> 'MetricValueSummary':
+        """The summary in another unit, where factor converts one base unit value to the display unit."""
+        if factor is None or factor == 1:
+            return self
+        return MetricValueSummary(self.metric_id, self.event_ids, self.count, self.minimum * factor, self.maximum * factor, self.mean * factor,
+                                  self.q1 * factor, self.median * factor, self.q3 * factor, self.mean_uncertainty * abs(factor))
+
+
+def _quantile_sql(p: float) -> str:
+    # Linear interpolation between the values ranked floor(p * (n - 1)) and the one above it, as numpy.percentile
+    position = f'({p} * last)'
+    rank = f'CAST({position} AS INTEGER)'
+    return f'TOTAL(CASE WHEN i = {rank} THEN value * (1 - ({position} - {rank})) WHEN i = {rank} + 1 THEN value * ({position} - {rank}) ELSE 0 END)'
+
+
+def _summary_sql(metric_count: int, event_count: int) -> str:
+    metric_params = ', '.join('?' * metric_count)
+    event_params = ', '.join('?' * event_count)
+    quartiles = ', '.join(_quantile_sql(p) for p in QUARTILES)
+    return f"""
+        WITH metric_value AS (
+            SELECT metric_id, event_id, CASE WHEN is_manual THEN manual_value ELSE automated_value END AS value, uncertainty
+            FROM metric_values
+            WHERE analysis_id = ? AND metric_id IN ({metric_params}) AND event_id IN ({event_params})
+        ), ranked AS (
+            SELECT metric_id, event_id, value,
+                CASE WHEN uncertainty IS NULL OR NOT json_valid(uncertainty) THEN 0.0
+                    WHEN json_extract(uncertainty, '$."Plus/Minus"') IS NOT NULL THEN ABS(json_extract(uncertainty, '$."Plus/Minus"'))
+                    WHEN json_extract(uncertainty, '$.Percent') IS NOT NULL THEN ABS(value * json_extract(uncertainty, '$.Percent') / 100.0)
+                    ELSE 0.0 END AS error,
+                ROW_NUMBER() OVER (PARTITION BY metric_id, event_id ORDER BY value) - 1 AS i,
+                COUNT(*) OVER (PARTITION BY metric_id, event_id) - 1 AS last
+            FROM metric_value
+            WHERE value IS NOT NULL
+        )
+        SELECT metric_id, event_id, COUNT(*), MIN(value), MAX(value), AVG(value), TOTAL(error * error), {quartiles}
+        FROM ranked
+        GROUP BY metric_id, event_id"""  # nosec B608
+
+
+def _metric_values_fingerprint(db_path: str, analysis_id: int) -> Tuple[int, int]:
+    """Row count and largest rowid of the analysis's metric values. Cheap, using the analysis_id index."""
+
+    with get_connection_manager(db_path).read() as conn:
+        return tuple(conn.execute('SELECT COUNT(*), MAX(rowid) FROM metric_values WHERE analysis_id = ?', [analysis_id]).fetchone())
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _load_summaries(db_path: str, version: tuple, analysis_id: int, metric_ids: Tuple[int, ...], event_ids: Tuple[int, ...]) -> Dict[int, MetricValueSummary]:
+
+    with get_connection_manager(db_path).read() as conn:
+        rows = conn.execute(_summary_sql(len(metric_ids), len(event_ids)), [analysis_id, *metric_ids, *event_ids]).fetchall()
+
+    # One column per statistic, one row per (metric, event) in the requested event order
+    event_index = {event_id: i for i, event_id in enumerate(event_ids)}
+    stats = {metric_id: np.full((8, len(event_ids)), np.nan) for metric_id in metric_ids}
+    for metric_id, event_id, count, minimum, maximum, mean, sum_squared_error, q1, median, q3 in rows:
+        stats[metric_id][:, event_index[event_id]] = (count, minimum, maximum, mean, sum_squared_error, q1, median, q3)
+
+    summaries = {}
+    for metric_id, values in stats.items():
+        values.flags.writeable = False
+        count, minimum, maximum, mean, sum_squared_error, q1, median, q3 = values
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean_uncertainty = np.sqrt(sum_squared_error) / count
+        mean_uncertainty.flags.writeable = False
+        summaries[metric_id] = MetricValueSummary(metric_id, event_ids, count, minimum, maximum, mean, q1, median, q3, mean_uncertainty)
+    return summaries
+
+
+def load_metric_value_summaries(db_path: str, analysis_id: int, metric_ids: List[int], event_ids: List[int]) -> Dict[int, MetricValueSummary]:
+    """Summarize the values of each metric across all sample frame features of the analysis, per event.
+
+    Returns metric_id keyed to a MetricValueSummary whose arrays follow the order of event_ids.
+    The summaries are shared between callers and must not be modified.
+    """
+
+    if len(metric_ids) == 0 or len(event_ids) == 0:
+        return {}
+    data_version = get_connection_manager(db_path).data_version()
+    fingerprint = _metric_values_fingerprint(db_path, analysis_id) if data_version is None else None
+    version = (metric_values_version(db_path), data_version, fingerprint)
+    return _load_summaries(db_path, version, analysis_id, tuple(metric_ids), tuple(event_ids))
+
+
+def clear_metric_value_summary_cache():
+    _load_summaries.cache_clear()
@@ -1,24 +1,15 @@
 import json
 import sqlite3
-import time
 from osgeo import ogr
-from typing import Dict
+from typing import Dict, List
 
 from .db_item_spatial import DBItemSpatial
+from .connection_manager import request_checkpoint
 
 POUR_POINTS_MACHINE_CODE = 'Pour Points'
 CATCHMENTS_MACHINE_CODE = 'CATCHMENTS'
 
 
-def checkpoint_wal(db_path: str) -> None:
-    with sqlite3.connect(db_path, isolation_level=None) as conn:
-        for _ in range(5):
-            busy, _log, _checkpointed = conn.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchone()
-            if busy == 0:
-                break
-            time.sleep(0.15)
-
-
 class PourPoint(DBItemSpatial):
     """Represents points on the map that  the usser has clicked on and delineated
     upstream catchments using stream statss"""
@@ -72,7 +63,7 @@ class PourPoint(DBItemSpatial):
         src_layer = None
         src_dataset = None
 
-        checkpoint_wal(db_path)
+        request_checkpoint(db_path)
 
     def update_stats(self, db_path: str, basin_chars: dict, flow_stats: dict, metadata: dict = None) -> None:
         """ Updates the basin characteristics, flow stats, and optionally metadata JSON fields. """
@@ -102,7 +93,7 @@ class PourPoint(DBItemSpatial):
         src_layer = None
         src_dataset = None
 
-        checkpoint_wal(db_path)
+        request_checkpoint(db_path)
 
     def drop_spatial_view(self, curs: sqlite3.Cursor) -> None:
         """Drop the spatial views for the pour point and its catchment."""
@@ -127,73 +118,134 @@ def load_pour_points(curs: sqlite3.Cursor) -> Dict[int, PourPoint]:
 
 def save_pour_point(project_file: str, latitude: float, longitude: float, catchment: dict, name: str, description: str, basin_chars: dict, flow_stats: dict, flow_scenarios: dict = None, metadata: dict = None) -> PourPoint:
 
+    failures = []
+    saved = save_pour_points(project_file, [{
+        'latitude': latitude,
+        'longitude': longitude,
+        'catchment': catchment,
+        'name': name,
+        'description': description,
+        'basin_chars': basin_chars,
+        'flow_stats': flow_stats,
+        'flow_scenarios': flow_scenarios,
+        'metadata': metadata,
+    }], failures)
+    if len(failures) > 0:
+        raise ValueError(failures[0][1])
+    return saved[0]
+
+
+def _catchment_polygon(catchment: dict) -> ogr.Geometry:
+    """The catchment polygon of a StreamStats delineation. Raises ValueError if the response is malformed."""
+
+    try:
+        geojson = catchment['featurecollection'][1]['feature']['features'][0]['geometry']
+    except (KeyError, IndexError, TypeError) as ex:
+        raise ValueError(f'The catchment does not contain a watershed polygon ({ex}).') from ex
+    polygon: ogr.Geometry = ogr.CreateGeometryFromJson(json.dumps(geojson))
+    if polygon is None or polygon.IsEmpty():
+        raise ValueError('The catchment watershed polygon is not a valid geometry.')
+    return polygon.MakeValid()
+
+
+def save_pour_points(project_file: str, pour_points: List[dict], failures: list = None) -> List[PourPoint]:
+    """Save pour points and their catchments in one transaction.
+
+    Each dictionary has the keyword arguments of save_pour_point(), except project_file.
+    Points that cannot be saved (such as a malformed catchment) are skipped and the rest are
+    committed. A (dictionary, error message) pair is appended to failures for each skipped point.
+    """
+
+    # Validate every point before writing so that one bad point does not roll back the batch
+    valid = []
+    for values in pour_points:
+        try:
+            point = ogr.Geometry(ogr.wkbPoint)
+            point.AddPoint(float(values['longitude']), float(values['latitude']))
+            valid.append((values, point, _catchment_polygon(values['catchment'])))
+        except Exception as ex:
+            if failures is not None:
+                failures.append((values, str(ex)))
+
     driver = ogr.GetDriverByName('GPKG')
     dataset = driver.Open(project_file, 1)
-    pour_point_id = None
-
-    # Save pour point
-    layer: ogr.Layer = dataset.GetLayerByName('pour_points')
-    featureDefn = layer.GetLayerDefn()
-    outFeature = ogr.Feature(featureDefn)
-    point = ogr.Geometry(ogr.wkbPoint)
-    point.AddPoint(longitude, latitude)
-    outFeature.SetGeometry(point)
-    outFeature.SetField('name', name)
-    outFeature.SetField('latitude', latitude)
-    outFeature.SetField('longitude', longitude)
-    if description is not None and len(description) > 0:
-        outFeature.SetField('description', description)
-
-    if basin_chars is not None:
-        outFeature.SetField('basin_characteristics', json.dumps(basin_chars))
-
-    if flow_stats is not None:
-        outFeature.SetField('flow_statistics', json.dumps(flow_stats))
-
-    # Store flow_scenarios and state_code in metadata under 'system' key
-    if metadata is None:
-        metadata = {}
-    system_meta = metadata.get('system', {})
-    if flow_scenarios is not None:
-        system_meta['flow_scenarios'] = flow_scenarios
-    if system_meta:
-        metadata['system'] = system_meta
-    outFeature.SetField('metadata', json.dumps(metadata))
-
-    out = layer.CreateFeature(outFeature)
-    pour_point_id = outFeature.GetFID()
-
-    # Save catchment polygon
-    layer: ogr.Layer = dataset.GetLayerByName('catchments')
-    geojson = catchment['featurecollection'][1]['feature']['features'][0]['geometry']
-    polygon: ogr.Geometry = ogr.CreateGeometryFromJson(json.dumps(geojson))
-    polygon = polygon.MakeValid()
-    featureDefn = layer.GetLayerDefn()
-    outFeature = ogr.Feature(featureDefn)
-    outFeature.SetGeometry(polygon)
-    outFeature.SetField('pour_point_id', pour_point_id)
-    layer.CreateFeature(outFeature)
-
-    # Release OGR handles before running a SQLite checkpoint.
-    layer = None
-    outFeature = None
-    polygon = None
-    point = None
-    dataset = None
-
-    pour_point = PourPoint(pour_point_id, name, latitude, longitude, description, json.dumps(basin_chars), json.dumps(flow_stats), json.dumps(metadata))
-    
+    point_layer: ogr.Layer = dataset.GetLayerByName('pour_points')
+    catchment_layer: ogr.Layer = dataset.GetLayerByName('catchments')
+
+    saved = []
+    dataset.StartTransaction()
+    try:
+        for values, point, polygon in valid:
+            latitude = values['latitude']
+            longitude = values['longitude']
+            description = values.get('description')
+            basin_chars = values.get('basin_chars')
+            flow_stats = values.get('flow_stats')
+            flow_scenarios = values.get('flow_scenarios')
+            metadata = values.get('metadata')
+
+            # Save pour point
+            featureDefn = point_layer.GetLayerDefn()
+            outFeature = ogr.Feature(featureDefn)
+            outFeature.SetGeometry(point)
+            outFeature.SetField('name', values['name'])
+            outFeature.SetField('latitude', latitude)
+            outFeature.SetField('longitude', longitude)
+            if description is not None and len(description) > 0:
+                outFeature.SetField('description', description)
+
+            if basin_chars is not None:
+                outFeature.SetField('basin_characteristics', json.dumps(basin_chars))
+
+            if flow_stats is not None:
+                outFeature.SetField('flow_statistics', json.dumps(flow_stats))
+
+            # Store flow_scenarios and state_code in metadata under 'system' key
+            if metadata is None:
+                metadata = {}
+            system_meta = metadata.get('system', {})
+            if flow_scenarios is not None:
+                system_meta['flow_scenarios'] = flow_scenarios
+            if system_meta:
+                metadata['system'] = system_meta
+            outFeature.SetField('metadata', json.dumps(metadata))
+
+            point_layer.CreateFeature(outFeature)
+            pour_point_id = outFeature.GetFID()
+
+            # Save catchment polygon
+            featureDefn = catchment_layer.GetLayerDefn()
+            outFeature = ogr.Feature(featureDefn)
+            outFeature.SetGeometry(polygon)
+            outFeature.SetField('pour_point_id', pour_point_id)
+            catchment_layer.CreateFeature(outFeature)
+
+            saved.append(PourPoint(pour_point_id, values['name'], latitude, longitude, description, json.dumps(basin_chars), json.dumps(flow_stats), json.dumps(metadata)))
+
+        dataset.CommitTransaction()
+    except Exception:
+        dataset.RollbackTransaction()
+        raise
+    finally:
+        # Release OGR handles before the checkpoint.
+        point_layer = None
+        catchment_layer = None
+        outFeature = None
+        dataset = None
+
     try:
         with sqlite3.connect(project_file) as conn:
             curs = conn.cursor()
-            pour_point.create_spatial_view(curs)
-            pour_point.catchment.create_spatial_view(curs)
+            for pour_point in saved:
+                pour_point.create_spatial_view(curs)
+                pour_point.catchment.create_spatial_view(curs)
             conn.commit()
-        checkpoint_wal(project_file)
+        request_checkpoint(project_file)
     except Exception as ex:
-        raise Exception(f"Error creating spatial views for pour point {pour_point_id}: {ex}") from ex
+        raise Exception(f"Error creating spatial views for pour points {', '.join(str(pour_point.id) for pour_point in saved)}: {ex}") from ex
+
+    return saved
 
-    return pour_point
 
 class Catchment(DBItemSpatial):
     def __init__(self, id: int):
@@ -1,9 +1,8 @@
 import os
 import json
 import sqlite3
-import time
 
-from qgis.PyQt.QtCore import QObject, pyqtSignal, QTimer
+from qgis.PyQt.QtCore import QObject, pyqtSignal
 from qgis.core import Qgis, QgsVectorLayer, QgsField, QgsVectorFileWriter, QgsCoordinateTransformContext, QgsMessageLog
 from qgis.utils import spatialite_connect
 
@@ -25,6 +24,8 @@ from .attachment import Attachment, load_attachments
 from .units import load_units
 from .db_item import DBItem, dict_factory, load_lookup_table
 from .db_item_spatial import DBItemSpatial
+from .connection_manager import open_connection_manager, close_connection_manager
+from .spatial_index import ensure_spatial_indexes
 
 from ..QRiS.path_utilities import parse_posix_path
 from ..QRiS.protocol_parser import load_protocol_definitions
@@ -134,12 +135,12 @@ class Project(DBItem, QObject):
     def __init__(self, project_file: str):
         DBItem.__init__(self, 'projects', 1, 'Placeholder')
         QObject.__init__(self)
-        self._flush_pending = False
+        self._spatial_views_verified = False
 
         self.project_file = parse_posix_path(project_file)
         self.project_xml_file = os.path.join(os.path.dirname(self.project_file), 'project.rs.xml')
-        with sqlite3.connect(self.project_file) as conn:
-            conn.row_factory = dict_factory
+        self.connections = open_connection_manager(self.project_file)
+        with self.connections.read(dict_factory) as conn:
             curs = conn.cursor()
 
             curs.execute('SELECT id, name, description, map_guid, metadata, created_on FROM projects LIMIT 1')
@@ -452,10 +453,8 @@ class Project(DBItem, QObject):
     def remove(self, db_item: DBItem) -> None:
         """Remove a DBItem from the project."""
         if isinstance(db_item, DBItemSpatial):
-            with sqlite3.connect(self.project_file) as conn:
-                curs = conn.cursor()
-                db_item.drop_spatial_view(curs)
-                conn.commit()
+            with self.connections.write() as conn:
+                db_item.drop_spatial_view(conn.cursor())
         if isinstance(db_item, SampleFrame):
             if db_item.sample_frame_type == SampleFrame.AOI_SAMPLE_FRAME_TYPE:
                 self.aois.pop(db_item.id)
@@ -494,7 +493,7 @@ class Project(DBItem, QObject):
         if metadata is not None:
             self.metadata.update(metadata)
 
-        with sqlite3.connect(self.project_file) as conn:
+        with self.connections.write() as conn:
             conn.execute('UPDATE projects SET metadata = ? WHERE id = ?', [json.dumps(self.metadata), self.id])
 
         self.project_changed.emit()
@@ -531,97 +530,109 @@ class Project(DBItem, QObject):
         # for dbitem in self.layers.values():
         #     yield dbitem
 
-    def refresh_spatial_views(self) -> None:
-        """Recreate all spatial views in the project and clean up orphaned views."""
+    def get_spatial_view_items(self) -> Generator[DBItemSpatial, None, None]:
+        """Yield every project item that is expected to have a spatial view."""
+
+        for dbitem in self.get_vector_dbitems():
+            if not isinstance(dbitem, DBItemSpatial):
+                continue
+            yield dbitem
+            if isinstance(dbitem, PourPoint):
+                yield dbitem.catchment
+
+        for analysis in self.analyses.values():
+            yield analysis
+
+        for event in self.events.values():
+            for event_layer in event.event_layers:
+                yield event_layer
+
+    def ensure_spatial_views(self) -> None:
+        """Refresh the spatial views the first time they are needed in this session."""
+        if self._spatial_views_verified:
+            return
+        self.refresh_spatial_views()
+
+    def refresh_spatial_views(self, force: bool = False) -> int:
+        """
+        Rebuild spatial views that are missing or whose definition has changed and clean up orphaned views.
+
+        Each view definition is fingerprinted and stored in spatial_view_fingerprints so that unchanged
+        views are left alone. Set force to rebuild every view regardless of its fingerprint.
+        Returns the number of views that were (re)created.
+        """
+        rebuilt = 0
         try:
-            with sqlite3.connect(self.project_file) as conn:
-                conn.row_factory = dict_factory
+            with self.connections.write(dict_factory) as conn:
                 curs = conn.cursor()
-                
+
+                curs.execute("SELECT name FROM sqlite_master WHERE type='view' AND name LIKE 'vw_%'")
+                existing_views = {row['name'] for row in curs.fetchall()}
+                curs.execute("SELECT table_name FROM gpkg_geometry_columns WHERE table_name LIKE 'vw_%'")
+                registered_views = {row['table_name'] for row in curs.fetchall()}
+                curs.execute("SELECT view_name, fingerprint FROM spatial_view_fingerprints")
+                fingerprints = {row['view_name']: row['fingerprint'] for row in curs.fetchall()}
+
                 # Keep track of expected views to clean up orphans later
                 expected_views = set()
 
-                for dbitem in self.get_vector_dbitems():
-                    if not isinstance(dbitem, DBItemSpatial):
+                for dbitem in self.get_spatial_view_items():
+                    expected_views.add(dbitem.view_name)
+                    if not force \
+                            and dbitem.view_name in existing_views \
+                            and dbitem.view_name in registered_views \
+                            and fingerprints.get(dbitem.view_name) == dbitem.get_spatial_view_fingerprint():
                         continue
                     dbitem.create_spatial_view(curs)
-                    expected_views.add(dbitem.view_name)
-                    if isinstance(dbitem, PourPoint):
-                        dbitem.catchment.create_spatial_view(curs)
-                        expected_views.add(dbitem.catchment.view_name)
-
-                for analysis in self.analyses.values():
-                    analysis.create_spatial_view(curs)
-                    expected_views.add(analysis.view_name)
-
-                for event in self.events.values():
-                    for event_layer in event.event_layers:
-                        event_layer.create_spatial_view(curs)
-                        expected_views.add(event_layer.view_name)
-                
-                # Find orphaned views (starting with vw_) that are not in expected_views
-                curs.execute("SELECT name FROM sqlite_master WHERE type='view' AND name LIKE 'vw_%'")
-                existing_views = {row['name'] for row in curs.fetchall()}
-                
-                orphaned_views = existing_views - expected_views
-                
-                for view_name in orphaned_views:
-                    curs.execute(f"DROP VIEW IF EXISTS {view_name}")
+                    rebuilt += 1
+
+                # Orphaned views (starting with vw_) and fingerprints that are not in expected_views
+                for view_name in existing_views - expected_views:
+                    curs.execute(f"DROP VIEW IF EXISTS {view_name}")  # nosec B608 - view_name is read from sqlite_master and matches the vw_ prefix
                     curs.execute("DELETE FROM gpkg_contents WHERE table_name = ?", (view_name,))
                     curs.execute("DELETE FROM gpkg_geometry_columns WHERE table_name = ?", (view_name,))
 
-                conn.commit()
+                for view_name in set(fingerprints) - expected_views:
+                    curs.execute("DELETE FROM spatial_view_fingerprints WHERE view_name = ?", (view_name,))
         except Exception as ex:
-            conn.rollback()
             raise Exception(f"Error refreshing spatial views: {ex}") from ex
 
+        self._spatial_views_verified = True
+        return rebuilt
+
     def flush(self, vacuum: bool = False) -> None:
         """
-        Flushes the project database to disk.
+        Flushes the project database to disk before it is uploaded, exported or closed.
         WAL changes are merged to the main file and the WAL file is truncated.
         If vacuum is True, the database is compacted before flushing.
+        Routine edits only need request_flush().
         """
         try:
-            # Use isolation_level=None to allow VACUUM/Journal Mode changes
-            with sqlite3.connect(self.project_file, isolation_level=None) as conn:
-                if vacuum:
-                    conn.execute("VACUUM")
-                # Checkpoint Mode: TRUNCATE - writes transactions to DB and attempts to shrink WAL to 0 bytes.
-                # TRUNCATE can return busy when other handles are still active, so retry a few times.
-                busy = 0
-                for _ in range(5):
-                    busy, _log, _checkpointed = conn.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchone()
-                    if busy == 0:
-                        break
-                    time.sleep(0.15)
-
-                if busy != 0:
-                    QgsMessageLog.logMessage(
-                        'Project flush checkpoint remained busy after retries; WAL may stay non-zero until handles are released.',
-                        'QRiS',
-                        Qgis.Warning
-                    )
-            
-            # QgsMessageLog.logMessage(f"Project flushed successfully (Vacuum={vacuum}).", 'QRiS', Qgis.Info)
+            # Pooled connections are closed so that they do not hold the WAL open during the checkpoint
+            self.connections.release_idle()
+            result = self.connections.checkpoints.truncate(vacuum=vacuum)
+            if result.busy:
+                QgsMessageLog.logMessage(
+                    f'Project flush checkpoint remained busy after {result.seconds:.1f} s; WAL is {result.wal_bytes_after / 1024:.0f} KB and may stay non-zero until handles are released.',
+                    'QRiS',
+                    Qgis.Warning
+                )
+            else:
+                QgsMessageLog.logMessage(f'Project flushed in {result.seconds * 1000:.0f} ms ({result.wal_bytes_before / 1024:.0f} KB WAL, Vacuum={vacuum}).', 'QRiS', Qgis.Info)
         except Exception as e:
             QgsMessageLog.logMessage(f"Failed to flush changes to QRiS project: {str(e)}", 'QRiS', Qgis.Warning)
 
-    def request_flush(self) -> None:
-        """Request a two-pass flush to improve WAL truncation when short-lived write handles are still active."""
-        if self._flush_pending:
-            return
+    def close(self) -> None:
+        """Close the project's pooled database connections and log how they and the WAL checkpoints were used."""
 
-        self._flush_pending = True
-        self.flush()
+        stats = close_connection_manager(self.project_file)
+        if stats is not None:
+            QgsMessageLog.logMessage(f'QRiS project database connections: {self.connections.stats_text(stats)}', 'QRiS', Qgis.Info)
+            QgsMessageLog.logMessage(f'QRiS project WAL checkpoints: {self.connections.checkpoints.stats_text()}', 'QRiS', Qgis.Info)
 
-        def _delayed_flush():
-            try:
-                self.flush()
-            finally:
-                self._flush_pending = False
-
-        # A short delay helps when providers/OGR release locks just after create/update operations return.
-        QTimer.singleShot(800, _delayed_flush)
+    def request_flush(self) -> None:
+        """Schedule a background PASSIVE checkpoint so the .gpkg main file catches up with the WAL once the project is idle."""
+        self.connections.checkpoints.notify_write()
 
 def create_geopackage_table(geometry_type: str, table_name: str, geopackage_path: str, full_path: str, field_tuple_list: list = None):
     """
@@ -710,6 +721,11 @@ def apply_db_migrations(db_path: str):
             conn.rollback()
             raise ex
 
+    # Spatial filters on feature tables without an R-tree silently become full table scans.
+    # Only the schema is checked here; row counts are for spatial_index_stats() diagnostics.
+    for msg in ensure_spatial_indexes(db_path, count_rows=False):
+        yield f'Applying QRiS Database Migrations: {msg}'
+
 def test_project(db_path: str) -> bool:
     """ Tests if the given database path is a valid QRiS project database """
 
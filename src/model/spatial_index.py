@@ -0,0 +1,201 @@
+"""
+GeoPackage R-tree spatial index management for project feature tables.
+
+OGR only uses a spatial index for SetSpatialFilter when the rtree_<table>_<geom> virtual
+table exists and is registered in gpkg_extensions. Without it every spatial filter is a
+full table scan. An index is healthy when it is registered, its maintenance triggers
+exist and it holds one entry per non empty geometry.
+
+Indexes are checked and repaired when migrations are applied, after bulk imports and
+after export pruning. The check on project open only looks at the schema. Comparing the
+R-tree and feature row counts reads every table, so it is left to explicit rebuilds and
+spatial_index_stats(). warn_if_unindexed() is called before spatial filters and logs a
+warning, once per table per session, when the filter will scan an unindexed table.
+"""
+
+import os
+import re
+import sqlite3
+import threading
+from dataclasses import dataclass
+from typing import Generator, List
+
+from osgeo import ogr
+from qgis.core import QgsMessageLog, Qgis
+
+MESSAGE_CATEGORY = 'QRiS'
+RTREE_EXTENSION = 'gpkg_rtree_index'
+
+# {(normalized db path, table name): True if the table (or the table behind a view) is indexed}
+_indexed_tables = {}
+# Spatial filters check the cache from metric worker threads
+_indexed_tables_lock = threading.Lock()
+
+
+@dataclass
+class SpatialIndexStatus:
+    table_name: str
+    column_name: str
+    exists: bool
+    registered: bool
+    triggers: int
+    indexed_rows: int = None
+    feature_rows: int = None
+
+    @property
+    def rtree_name(self) -> str:
+        return rtree_name(self.table_name, self.column_name)
+
+    @property
+    def healthy(self) -> bool:
+        # insert, delete and at least one update trigger
+        in_sync = self.indexed_rows is None or self.indexed_rows == self.feature_rows
+        return self.exists and self.registered and self.triggers >= 3 and in_sync
+
+
+def rtree_name(table_name: str, column_name: str) -> str:
+    return f'rtree_{table_name}_{column_name}'
+
+
+def _key(db_path: str, table_name: str) -> tuple:
+    return (os.path.normcase(os.path.abspath(db_path)), table_name)
+
+
+def spatial_tables(curs: sqlite3.Cursor) -> dict:
+    """{table name: geometry column} for the feature tables (not views) in the GeoPackage."""
+
+    curs.execute("""SELECT g.table_name, g.column_name FROM gpkg_geometry_columns g
+        INNER JOIN sqlite_master m ON m.name = g.table_name AND m.type = 'table'
+        ORDER BY g.table_name""")
+    return {table_name: column_name for table_name, column_name in curs.fetchall()}
+
+
+def view_base_table(curs: sqlite3.Cursor, view_name: str) -> str:
+    """The table that a spatial view selects its features from, or None if it is not a view."""
+
+    curs.execute("SELECT sql FROM sqlite_master WHERE type = 'view' AND name = ?", [view_name])
+    row = curs.fetchone()
+    if row is None or row[0] is None:
+        return None
+    match = re.search(r'\bFROM\s+["\[`]?(\w+)', row[0], re.IGNORECASE)
+    return match.group(1) if match is not None else None
+
+
+def spatial_index_status(curs: sqlite3.Cursor, table_name: str, column_name: str, count_rows: bool = True) -> SpatialIndexStatus:
+    """Check the R-tree for one feature table. Counting rows reads every geometry header, so it can be skipped."""
+
+    name = rtree_name(table_name, column_name)
+    curs.execute("SELECT COUNT(*) FROM sqlite_master WHERE type = 'table' AND name = ?", [name])
+    exists = curs.fetchone()[0] > 0
+    registered = False
+    curs.execute("SELECT COUNT(*) FROM sqlite_master WHERE type = 'table' AND name = 'gpkg_extensions'")
+    if curs.fetchone()[0] > 0:
+        curs.execute('SELECT COUNT(*) FROM gpkg_extensions WHERE table_name = ? AND column_name = ? AND extension_name = ?', [table_name, column_name, RTREE_EXTENSION])
+        registered = curs.fetchone()[0] > 0
+    curs.execute("SELECT COUNT(*) FROM sqlite_master WHERE type = 'trigger' AND tbl_name = ? AND name LIKE ?", [table_name, f'{name}_%'])
+    triggers = curs.fetchone()[0]
+
+    status = SpatialIndexStatus(table_name, column_name, exists, registered, triggers)
+    if count_rows and exists:
+        curs.execute(f'SELECT COUNT(*) FROM "{name}"')  # nosec B608 - rtree name is built from gpkg_geometry_columns
+        status.indexed_rows = curs.fetchone()[0]
+        curs.execute(f'SELECT COUNT(*) FROM "{table_name}" WHERE "{column_name}" IS NOT NULL')  # nosec B608 - table and column names are read from gpkg_geometry_columns
+        status.feature_rows = curs.fetchone()[0]
+        if status.feature_rows != status.indexed_rows:
+            # Empty geometries are not indexed. The empty flag is bit 4 of the GeoPackage header flags byte.
+            curs.execute(f"""SELECT COUNT(*) FROM "{table_name}" WHERE "{column_name}" IS NOT NULL
+                AND (instr('0123456789ABCDEF', substr(hex(substr("{column_name}", 4, 1)), 1, 1)) - 1) % 2 = 0""")  # nosec B608 - table and column names are read from gpkg_geometry_columns
+            status.feature_rows = curs.fetchone()[0]
+    return status
+
+
+def check_spatial_indexes(db_path: str, table_names: List[str] = None, count_rows: bool = True) -> List[SpatialIndexStatus]:
+    """Status of the R-tree for each feature table in the GeoPackage (or only the specified tables)."""
+
+    with sqlite3.connect(db_path) as conn:
+        curs = conn.cursor()
+        tables = spatial_tables(curs)
+        statuses = [spatial_index_status(curs, table_name, column_name, count_rows)
+                    for table_name, column_name in tables.items()
+                    if table_names is None or table_name in table_names]
+
+    # Recheck the tables and views (and warn again if still unindexed) on the next spatial filter
+    database = _key(db_path, None)[0]
+    with _indexed_tables_lock:
+        for key in [key for key in _indexed_tables if key[0] == database]:
+            del _indexed_tables[key]
+    return statuses
+
+
+def ensure_spatial_indexes(db_path: str, table_names: List[str] = None, rebuild: bool = False, count_rows: bool = True) -> Generator[str, None, None]:
+    """Create missing R-tree indexes and rebuild unhealthy ones (or all of them if rebuild is True).
+
+    Without count_rows only missing, unregistered or untriggered indexes are repaired, which avoids
+    counting the rows of every feature table and R-tree.
+
+    Yields a message for each index that was created or rebuilt.
+    """
+
+    statuses = [status for status in check_spatial_indexes(db_path, table_names, count_rows=count_rows and not rebuild) if rebuild or not status.healthy]
+    if len(statuses) == 0:
+        return
+
+    ds: ogr.DataSource = ogr.Open(db_path, 1)
+    if ds is None:
+        raise Exception(f'Unable to open {db_path} to create spatial indexes')
+    try:
+        for status in statuses:
+            if status.exists or status.registered:
+                ds.ReleaseResultSet(ds.ExecuteSQL(f"SELECT DisableSpatialIndex('{status.table_name}', '{status.column_name}')"))
+            ds.ReleaseResultSet(ds.ExecuteSQL(f"SELECT CreateSpatialIndex('{status.table_name}', '{status.column_name}')"))
+            with _indexed_tables_lock:
+                _indexed_tables[_key(db_path, status.table_name)] = True
+            yield f'{"Rebuilt" if status.exists else "Created"} spatial index for {status.table_name}'
+    finally:
+        ds = None
+
+
+def spatial_index_stats(db_path: str) -> dict:
+    """{table name: {'indexed_rows', 'feature_rows', 'healthy'}} for every feature table."""
+
+    return {status.table_name: {
+        'indexed_rows': status.indexed_rows,
+        'feature_rows': status.feature_rows,
+        'healthy': status.healthy,
+    } for status in check_spatial_indexes(db_path)}
+
+
+def warn_if_unindexed(db_path: str, table_name: str) -> bool:
+    """Log a slow query warning, once per table, if a spatial filter on the table or view will be a full scan.
+
+    Returns True if the table is indexed.
+    """
+
+    key = _key(db_path, table_name)
+    with _indexed_tables_lock:
+        indexed = _indexed_tables.get(key)
+    if indexed is not None:
+        return indexed
+
+    with sqlite3.connect(db_path) as conn:
+        curs = conn.cursor()
+        tables = spatial_tables(curs)
+        base_table = table_name if table_name in tables else view_base_table(curs, table_name)
+        if base_table not in tables:
+            # Not a GeoPackage feature table (or the view could not be parsed). Nothing to check.
+            indexed = True
+        else:
+            status = spatial_index_status(curs, base_table, tables[base_table], count_rows=False)
+            indexed = status.exists and status.registered
+
+        with _indexed_tables_lock:
+            # Another thread may have checked the same table meanwhile. Only the first one warns.
+            first = key not in _indexed_tables
+            _indexed_tables.setdefault(key, indexed)
+        if first and not indexed:
+            curs.execute(f'SELECT COUNT(*) FROM "{base_table}"')  # nosec B608 - base_table is read from gpkg_geometry_columns
+            QgsMessageLog.logMessage(
+                f'Slow query: spatial filter on {table_name} scans all {curs.fetchone()[0]} features of {base_table} because it has no spatial index. Reopen the project to rebuild it.',
+                MESSAGE_CATEGORY, Qgis.Warning)
+
+    return indexed
@@ -0,0 +1,134 @@
+from qgis.PyQt import QtCore
+
+from .connection_manager import get_connection_manager
+
+DEFAULT_PAGE_SIZE = 500
+
+
+class SqlTableModel(QtCore.QAbstractTableModel):
+    """Read only table model that pages rows out of a SQLite query as the view scrolls.
+
+    Only the rows that the view has asked for (via canFetchMore/fetchMore) are held in
+    memory. Sorting and filtering are applied to the SQL so the full result is never
+    materialised on the GUI thread, and export_rows() streams the same query.
+
+    columns is a list of (SQL expression, header text) tuples. from_sql is everything
+    between FROM and WHERE (a table name or joins) and must only contain trusted SQL.
+    """
+
+    def __init__(self, db_path: str, from_sql: str, columns: list, where_sql: str = None, params: list = None, order_column: int = 0, order: int = QtCore.Qt.AscendingOrder, page_size: int = DEFAULT_PAGE_SIZE, parent=None):
+        super().__init__(parent)
+
+        self.db_path = db_path
+        self.from_sql = from_sql
+        self.columns = columns
+        self.where_sql = where_sql
+        self.params = list(params) if params is not None else []
+        self.order_column = order_column
+        self.order = order
+        self.page_size = page_size
+
+        self._rows = []
+        self._total_rows = None
+
+    def _where_clause(self) -> str:
+        return f' WHERE {self.where_sql}' if self.where_sql else ''
+
+    def _select_sql(self) -> str:
+        expressions = ', '.join(expression for expression, _header in self.columns)
+        direction = 'DESC' if self.order == QtCore.Qt.DescendingOrder else 'ASC'
+        # Order by column position. The remaining columns break ties so that LIMIT/OFFSET pages are stable.
+        order_by = [f'{self.order_column + 1} {direction}'] + [str(column + 1) for column in range(len(self.columns)) if column != self.order_column]
+        return f'SELECT {expressions} FROM {self.from_sql}{self._where_clause()} ORDER BY {", ".join(order_by)}'  # nosec B608 - expressions, from_sql and where_sql are supplied by the calling code, values are bound parameters
+
+    @property
+    def total_rows(self) -> int:
+        """Number of rows that match the filter, whether or not they have been fetched."""
+
+        if self._total_rows is None:
+            with get_connection_manager(self.db_path).read() as conn:
+                curs = conn.cursor()
+                curs.execute(f'SELECT COUNT(*) FROM {self.from_sql}{self._where_clause()}', self.params)  # nosec B608 - from_sql and where_sql are supplied by the calling code
+                self._total_rows = curs.fetchone()[0]
+        return self._total_rows
+
+    def rowCount(self, parent=QtCore.QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self._rows)
+
+    def columnCount(self, parent=QtCore.QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self.columns)
+
+    def data(self, index, role=QtCore.Qt.DisplayRole):
+        if not index.isValid() or role not in (QtCore.Qt.DisplayRole, QtCore.Qt.EditRole):
+            return None
+        value = self._rows[index.row()][index.column()]
+        if role == QtCore.Qt.DisplayRole:
+            return '' if value is None else str(value)
+        return value
+
+    def headerData(self, section, orientation, role=QtCore.Qt.DisplayRole):
+        if orientation == QtCore.Qt.Horizontal and role == QtCore.Qt.DisplayRole:
+            return self.columns[section][1]
+        return super().headerData(section, orientation, role)
+
+    def canFetchMore(self, parent=QtCore.QModelIndex()):
+        if parent.isValid():
+            return False
+        return len(self._rows) < self.total_rows
+
+    def fetchMore(self, parent=QtCore.QModelIndex()):
+        if parent.isValid():
+            return
+
+        with get_connection_manager(self.db_path).read() as conn:
+            curs = conn.cursor()
+            curs.execute(f'{self._select_sql()} LIMIT ? OFFSET ?', self.params + [self.page_size, len(self._rows)])
+            rows = curs.fetchall()
+
+        if len(rows) == 0:
+            # The table changed underneath the model. Stop asking for more.
+            self._total_rows = len(self._rows)
+            return
+
+        self.beginInsertRows(QtCore.QModelIndex(), len(self._rows), len(self._rows) + len(rows) - 1)
+        self._rows.extend(rows)
+        self.endInsertRows()
+
+    def sort(self, column: int, order=QtCore.Qt.AscendingOrder):
+        self.order_column = column
+        self.order = order
+        self.refresh()
+
+    def set_filter(self, where_sql: str, params: list = None):
+        """Replace the WHERE clause (without the WHERE keyword) and its bound parameters."""
+
+        self.where_sql = where_sql
+        self.params = list(params) if params is not None else []
+        self.refresh()
+
+    def refresh(self):
+        """Discard the fetched rows and start paging again from the first row."""
+
+        self.beginResetModel()
+        self._rows = []
+        self._total_rows = None
+        self.endResetModel()
+
+    def iter_rows(self):
+        """Stream every row that matches the filter in the current sort order."""
+
+        with get_connection_manager(self.db_path).read() as conn:
+            curs = conn.cursor()
+            curs.execute(self._select_sql(), self.params)
+            for row in curs:
+                yield row
+
+    def export_rows(self, keys: list = None) -> list:
+        """All the rows as dictionaries for the table export dialog. Keys default to the column headers."""
+
+        keys = keys if keys is not None else [header for _expression, header in self.columns]
+        return [dict(zip(keys, row)) for row in self.iter_rows()]
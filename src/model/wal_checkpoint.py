@@ -0,0 +1,214 @@
+"""
+Background WAL checkpoints for the project GeoPackage.
+
+Writes only notify the scheduler. A daemon thread runs a PASSIVE checkpoint once the
+database has been idle for IDLE_SECONDS or the WAL file grows past WAL_SIZE_THRESHOLD.
+PASSIVE checkpoints never wait for, or block, the QGIS/OGR handles that have the
+project open, so they are safe to run at any time.
+
+A background checkpoint that cannot finish, because a reader still holds a snapshot of
+the older frames, is retried with an exponential backoff (from IDLE_SECONDS up to
+MAX_RETRY_SECONDS) instead of on every poll.
+
+A TRUNCATE checkpoint, which waits (using the SQLite busy handler rather than sleeping
+on the calling thread) for readers to finish so that the WAL can be emptied, is only run
+on request before the GeoPackage is uploaded, exported or closed.
+"""
+
+import os
+import time
+import sqlite3
+import threading
+from dataclasses import dataclass
+
+CHECKPOINT_PASSIVE = 'PASSIVE'
+CHECKPOINT_TRUNCATE = 'TRUNCATE'
+
+WAL_SIZE_THRESHOLD = 4 * 1024 * 1024
+IDLE_SECONDS = 2.0
+POLL_SECONDS = 0.5
+MAX_RETRY_SECONDS = 60.0
+TRUNCATE_TIMEOUT_MS = 2000
+
+
+@dataclass
+class CheckpointResult:
+    mode: str
+    busy: bool
+    log_frames: int
+    checkpointed_frames: int
+    wal_bytes_before: int
+    wal_bytes_after: int
+    seconds: float
+
+    @property
+    def complete(self) -> bool:
+        """True when every frame in the WAL was copied to the database file."""
+        return not self.busy and self.checkpointed_frames >= self.log_frames
+
+
+class WalCheckpointScheduler:
+    """Runs PASSIVE checkpoints in the background after writes, and TRUNCATE checkpoints on request."""
+
+    def __init__(self, db_path: str, wal_size_threshold: int = WAL_SIZE_THRESHOLD, idle_seconds: float = IDLE_SECONDS, poll_seconds: float = POLL_SECONDS):
+        self.db_path = db_path
+        self.wal_size_threshold = wal_size_threshold
+        self.idle_seconds = idle_seconds
+        self.poll_seconds = poll_seconds
+
+        self._generation = 0
+        self._checkpointed_generation = 0
+        self._last_write = 0.0
+        # Background retries after incomplete checkpoints
+        self._retry_at = 0.0
+        self._retry_seconds = 0.0
+        self._state_lock = threading.Lock()
+        # Only one checkpoint at a time, whether background or requested
+        self._checkpoint_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+        self.last_result = None
+        self.counters = {
+            'passive': 0,
+            'truncate': 0,
+            'busy': 0,
+            'errors': 0,
+            'max_wal_bytes': 0,
+            'total_seconds': 0.0,
+            'max_seconds': 0.0,
+        }
+
+    @property
+    def wal_path(self) -> str:
+        return f'{self.db_path}-wal'
+
+    def wal_size(self) -> int:
+        """Size of the WAL file in bytes. Zero when the database is not in WAL mode or the WAL is truncated."""
+        try:
+            return os.path.getsize(self.wal_path)
+        except OSError:
+            return 0
+
+    @property
+    def pending(self) -> bool:
+        """True if there have been writes since the last complete checkpoint."""
+        with self._state_lock:
+            return self._generation != self._checkpointed_generation
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='QRiS WAL checkpoint', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        """Stop the background thread. Pending writes are left for the next TRUNCATE or for SQLite on close."""
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def notify_write(self):
+        """Record that the database was written. Cheap enough to call after every commit."""
+        with self._state_lock:
+            self._generation += 1
+            self._last_write = time.monotonic()
+        self._wake.set()
+
+    def due(self, now: float = None) -> bool:
+        """True if there are pending writes and either the WAL is over the threshold or the database is idle.
+
+        After an incomplete background checkpoint nothing is due until its retry time.
+        """
+        if not self.pending:
+            return False
+        now = time.monotonic() if now is None else now
+        if now < self._retry_at:
+            return False
+        return now - self._last_write >= self.idle_seconds or self.wal_size() >= self.wal_size_threshold
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.poll_seconds)
+            self._wake.clear()
+            if self._stop.is_set():
+                break
+            if self.due():
+                try:
+                    complete = self.checkpoint(CHECKPOINT_PASSIVE).complete
+                except sqlite3.Error:
+                    # Counted in checkpoint()
+                    complete = False
+                self._schedule_retry(complete)
+
+    def _schedule_retry(self, complete: bool, now: float = None):
+        """Back off exponentially while background checkpoints stay incomplete, and reset once one completes."""
+        if complete:
+            self._retry_seconds = 0.0
+            self._retry_at = 0.0
+            return
+        now = time.monotonic() if now is None else now
+        self._retry_seconds = min(max(self._retry_seconds * 2, self.idle_seconds, self.poll_seconds), MAX_RETRY_SECONDS)
+        self._retry_at = now + self._retry_seconds
+
+    def checkpoint(self, mode: str = CHECKPOINT_PASSIVE, vacuum: bool = False) -> CheckpointResult:
+        """Run a checkpoint now on a dedicated connection and record its WAL size and latency."""
+
+        with self._checkpoint_lock:
+            with self._state_lock:
+                generation = self._generation
+
+            wal_before = self.wal_size()
+            start = time.perf_counter()
+            try:
+                conn = sqlite3.connect(self.db_path, isolation_level=None, check_same_thread=False)
+                try:
+                    # TRUNCATE waits for readers through the busy handler. PASSIVE never invokes it.
+                    conn.execute(f'PRAGMA busy_timeout = {TRUNCATE_TIMEOUT_MS if mode == CHECKPOINT_TRUNCATE else 0}')
+                    if vacuum:
+                        conn.execute('VACUUM')
+                    busy, log_frames, checkpointed_frames = conn.execute(f'PRAGMA wal_checkpoint({mode})').fetchone()
+                finally:
+                    conn.close()
+            except sqlite3.Error:
+                self.counters['errors'] += 1
+                raise
+
+            result = CheckpointResult(mode, busy != 0, max(log_frames, 0), max(checkpointed_frames, 0), wal_before, self.wal_size(), time.perf_counter() - start)
+            self._record(result)
+
+            if result.complete:
+                with self._state_lock:
+                    self._checkpointed_generation = generation
+            return result
+
+    def truncate(self, vacuum: bool = False) -> CheckpointResult:
+        """Copy the whole WAL into the database file and truncate it, for uploads, exports and close."""
+        return self.checkpoint(CHECKPOINT_TRUNCATE, vacuum)
+
+    def _record(self, result: CheckpointResult):
+        self.last_result = result
+        self.counters['passive' if result.mode == CHECKPOINT_PASSIVE else 'truncate'] += 1
+        if result.busy:
+            self.counters['busy'] += 1
+        self.counters['max_wal_bytes'] = max(self.counters['max_wal_bytes'], result.wal_bytes_before)
+        self.counters['total_seconds'] += result.seconds
+        self.counters['max_seconds'] = max(self.counters['max_seconds'], result.seconds)
+
+    def stats(self) -> dict:
+        stats = dict(self.counters)
+        stats['wal_bytes'] = self.wal_size()
+        stats['pending'] = self.pending
+        return stats
+
+    def stats_text(self) -> str:
+        stats = self.stats()
+        count = stats['passive'] + stats['truncate']
+        average_ms = stats['total_seconds'] / count * 1000 if count > 0 else 0.0
+        return (f'{stats["passive"]} passive and {stats["truncate"]} truncate checkpoints ({stats["busy"]} busy), '
+                f'{average_ms:.0f} ms average, {stats["max_seconds"] * 1000:.0f} ms longest, '
+                f'largest WAL {stats["max_wal_bytes"] / 1024:.0f} KB, current WAL {stats["wal_bytes"] / 1024:.0f} KB')
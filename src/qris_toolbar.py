@@ -30,23 +30,26 @@ from qgis.gui import QgsMapToolEmitPoint, QgisInterface
 
 from .QRiS.settings import Settings
 from .QRiS.settings import CONSTANTS
+from .QRiS.lazy_loader import LazyRegistry, startup_diagnostics, STARTUP_DIAGNOSTICS_KEY
 
-# Initialize Qt resources from file resources.py
-from . import resources
-
-# Import the code for the DockWidget
-from .view.frm_dockwidget import QRiSDockWidget
-from .view.frm_new_project import FrmNewProject
-from .view.frm_about import FrmAboutDialog
-from .view.frm_settings import FrmSettings, DOCK_WIDGET_LOCATION, default_dock_widget_location, TELEMETRY_ENABLED_KEY
 from .view.metadata_field_editor_widget import initialize_metadata_widget
 
 from .QRiS.qrave_integration import QRaveIntegration
 from .QRiS.path_utilities import safe_make_abspath, safe_make_relpath
-from .gp.load_project_task import LoadProjectTask
 from .lib.data_exchange import browse_data_exchange as open_data_exchange
-from .gp.watershed_attributes import WatershedAttributes
-from .gp.update_metadata import update_metadata, check_metadata
+
+# The dock widget, forms, tasks and the compiled Qt resource bundle are imported on first
+# use so that enabling QRiS does not slow down QGIS startup.
+lazy = LazyRegistry(__package__)
+resources = lazy.register('.resources')
+QRiSDockWidget = lazy.register('.view.frm_dockwidget', 'QRiSDockWidget')
+FrmNewProject = lazy.register('.view.frm_new_project', 'FrmNewProject')
+FrmAboutDialog = lazy.register('.view.frm_about', 'FrmAboutDialog')
+frm_settings = lazy.register('.view.frm_settings')
+LoadProjectTask = lazy.register('.gp.load_project_task', 'LoadProjectTask')
+WatershedAttributes = lazy.register('.gp.watershed_attributes', 'WatershedAttributes')
+update_metadata = lazy.register('.gp.update_metadata', 'update_metadata')
+check_metadata = lazy.register('.gp.update_metadata', 'check_metadata')
 
 ORGANIZATION = 'Riverscapes'
 APPNAME = 'QRiS'
@@ -106,6 +109,9 @@ class QRiSToolbar:
         self.pluginIsActive = False
         self.dockwidget = None
 
+        # (action or button, icon name) pairs that receive their icon once the resources are loaded
+        self.deferred_icons = []
+
     # noinspection PyMethodMayBeStatic
 
     def tr(self, message):
@@ -129,10 +135,12 @@ class QRiSToolbar:
         self.qris_menu = QtWidgets.QMenu()
 
         # Populate Project menu
-        self.project_menu = self.qris_menu.addMenu(QtGui.QIcon(':/plugins/qris_toolbar/folder'), 'Project')
+        self.project_menu = self.qris_menu.addMenu('Project')
+        self.deferred_icons.append((self.project_menu, 'folder'))
         self.add_menu_action(self.project_menu, 'new', 'New QRiS Project', self.create_new_project_dialog, True, 'Create a New QRiS Project')
         self.add_menu_action(self.project_menu, 'folder', 'Open QRiS Project', self.open_existing_project, True, 'Open Existing QRiS Project')
-        self.mru_menu = self.project_menu.addMenu(QtGui.QIcon(':/plugins/qris_toolbar/folder'), 'Recent QRiS Projects')
+        self.mru_menu = self.project_menu.addMenu('Recent QRiS Projects')
+        self.deferred_icons.append((self.mru_menu, 'folder'))
         self.add_menu_action(self.project_menu, 'close', 'Close Project', self.close_project, True, 'Close the Current QRiS Project')
         self.load_mru_projects()
 
@@ -141,7 +149,8 @@ class QRiSToolbar:
         self.add_menu_action(self.qris_menu, 'data_exchange', 'Browse Data Exchange Projects', lambda: open_data_exchange(self.iface.mapCanvas()), True, 'Browse Riverscapes Data Exchange for Projects near the current map view')
 
         # Populate Help menu
-        self.help_menu = self.qris_menu.addMenu(QtGui.QIcon(':/plugins/qris_toolbar/help'), 'Help')
+        self.help_menu = self.qris_menu.addMenu('Help')
+        self.deferred_icons.append((self.help_menu, 'help'))
         self.add_menu_action(self.help_menu, 'help', 'QRiS Online Help', lambda: QtGui.QDesktopServices.openUrl(QtCore.QUrl('https://qris.riverscapes.net')), True, 'Launch QRiS Online Help in default browser')
         self.add_menu_action(self.help_menu, 'settings', 'Settings', self.show_settings, True, 'QRiS Settings')
         self.add_menu_action(self.help_menu, 'qris_icon', 'About QRiS', self.about_load, True, 'Show Information About QRiS')
@@ -149,7 +158,7 @@ class QRiSToolbar:
         # Create the toolbar button with icon and text
         self.qris_button = QtWidgets.QToolButton(self.toolbar)
         self.qris_button.setText('  QRiS')
-        self.qris_button.setIcon(QtGui.QIcon(':/plugins/qris_toolbar/qris_icon'))
+        self.deferred_icons.append((self.qris_button, 'qris_icon'))
         self.qris_button.setToolButtonStyle(QtCore.Qt.ToolButtonTextBesideIcon)
         self.qris_button.setMenu(self.qris_menu)
         self.qris_button.setPopupMode(QtWidgets.QToolButton.InstantPopup)  # Clicking anywhere opens the menu
@@ -163,9 +172,31 @@ class QRiSToolbar:
         self.watershed_json_tool = QgsMapToolEmitPoint(canvas)
         self.watershed_json_tool.canvasClicked.connect(self.json_watershed_metrics)
 
+        # The Qt resources are registered once QGIS has finished loading plugins so the toolbar button
+        # gets its icon without holding up startup. Forms and tools also load them on first use.
+        QtCore.QTimer.singleShot(0, self.load_resources)
+        self.qris_menu.aboutToShow.connect(self.load_resources)
+
+        if Settings().getValue(STARTUP_DIAGNOSTICS_KEY):
+            for line in startup_diagnostics():
+                QgsMessageLog.logMessage(line, 'QRiS', Qgis.Info)
+
+    def load_resources(self):
+        """Register the compiled Qt resources and apply any icons that were waiting on them.
+        Safe to call repeatedly; everything that needs ':/plugins/qris_toolbar' paths calls this first."""
+
+        resources.resolve()
+        for widget, icon_name in self.deferred_icons:
+            widget.setIcon(QtGui.QIcon(f':/plugins/qris_toolbar/{icon_name}'))
+        self.deferred_icons = []
+
     def add_menu_action(self, menu: QtWidgets.QMenu, icon_name: str, label: str, callback, enabled: bool, status_tip: str):
 
-        action = QtWidgets.QAction(QtGui.QIcon(f':/plugins/qris_toolbar/{icon_name}'), label, self.iface.mainWindow())
+        if resources.loaded:
+            action = QtWidgets.QAction(QtGui.QIcon(f':/plugins/qris_toolbar/{icon_name}'), label, self.iface.mainWindow())
+        else:
+            action = QtWidgets.QAction(label, self.iface.mainWindow())
+            self.deferred_icons.append((action, icon_name))
         action.triggered.connect(callback)
         action.setEnabled(enabled)
 
@@ -226,6 +257,8 @@ class QRiSToolbar:
             self.iface.removeToolBarIcon(action)
 
         self.dockwidget = None
+        # Nothing left to apply icons to if the plugin is unloaded before the resources are registered
+        self.deferred_icons = []
 
         # remove the toolbar
         del self.toolbar
@@ -258,6 +291,9 @@ class QRiSToolbar:
         if not self.pluginIsActive:
             self.pluginIsActive = True
 
+        # The dock widget and its forms use icons from the Qt resources
+        self.load_resources()
+
         # Load a version of the QRave code we can use for cross-plugin integration
         if self.toolbar is not None and isinstance(self.toolbar, QtWidgets.QToolBar):
             try:
@@ -279,7 +315,7 @@ class QRiSToolbar:
 
         # Get the dockwidget location from the settings
         settings = QtCore.QSettings(ORGANIZATION, APPNAME)
-        dock_location = settings.value(DOCK_WIDGET_LOCATION, default_dock_widget_location)
+        dock_location = settings.value(frm_settings.DOCK_WIDGET_LOCATION, frm_settings.default_dock_widget_location)
         dock_area = dock_widget_locations[dock_location]
 
         # Create the dockwidget (after translation) and keep reference
@@ -423,7 +459,7 @@ class QRiSToolbar:
             settings.setValue(LAST_PROJECT_FOLDER, os.path.dirname(db_path))
             settings.sync()
             try:
-                self.qrave.telemetry.send("Load_Project", Settings().getValue(TELEMETRY_ENABLED_KEY))
+                self.qrave.telemetry.send("Load_Project", Settings().getValue(frm_settings.TELEMETRY_ENABLED_KEY))
             except Exception as ex:
                 Settings().log(f"Error sending telemetry event for Load_Project: {str(ex)}", Qgis.Warning)
         
@@ -497,6 +533,7 @@ class QRiSToolbar:
         settings = QtCore.QSettings(ORGANIZATION, APPNAME)
         last_parent_folder = os.path.dirname(settings.value(LAST_PROJECT_FOLDER)) if settings.value(LAST_PROJECT_FOLDER) is not None else None
 
+        self.load_resources()
         self.frm_new_project = FrmNewProject(self.iface.mainWindow(), last_parent_folder)
         self.frm_new_project.newProjectComplete.connect(self.on_new_project_complete)
         result = self.frm_new_project.exec_()
@@ -567,6 +604,8 @@ class QRiSToolbar:
 
     def configure_watershed_attribute_menu(self):
 
+        self.load_resources()
+
         self.wat_button = QtWidgets.QToolButton()
         self.wat_button.setToolButtonStyle(QtCore.Qt.ToolButtonIconOnly)
         self.wat_button.setIcon(QtGui.QIcon(':/plugins/qris_toolbar/watershed'))
@@ -592,6 +631,7 @@ class QRiSToolbar:
 
     def about_load(self):
 
+        self.load_resources()
         self.frm_about = FrmAboutDialog(self.iface.mainWindow())
         self.frm_about.exec_()
         self.frm_about = None
@@ -603,7 +643,8 @@ class QRiSToolbar:
         if self.dockwidget is not None:
             qris_project = self.dockwidget.qris_project
 
-        self.settings_dialog = FrmSettings(settings, qris_project)
+        self.load_resources()
+        self.settings_dialog = frm_settings.FrmSettings(settings, qris_project)
         self.settings_dialog.exec_()
         self.settings_dialog = None
 
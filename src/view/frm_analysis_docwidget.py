@@ -32,9 +32,11 @@ from ..model.event import AS_BUILT_EVENT_TYPE_ID, DCE_EVENT_TYPE_ID, DESIGN_EVEN
 from ..model.sample_frame import get_sample_frame_ids
 
 from ..gp.analysis_metrics_task import AnalysisMetricsTask
+from ..QRiS.settings import Settings
 
 from .utilities import add_help_button
 from .frm_metric_value import FrmMetricValue
+from .frm_settings import METRIC_PROFILING_ENABLED
 from .frm_metric_calculate_all import FrmCalculateAllMetrics
 from .frm_export_metrics import FrmExportMetrics
 from .frm_analysis_properties import FrmAnalysisProperties
@@ -115,7 +117,7 @@ class FrmAnalysisDocWidget(QtWidgets.QDockWidget):
 
     def cmdCalculate_clicked(self):
 
-        frm = FrmCalculateAllMetrics(self)
+        frm = FrmCalculateAllMetrics(self, self.qris_project.project_file)
         result = frm.exec_()
 
         if result == QtWidgets.QDialog.Accepted:
@@ -141,6 +143,8 @@ class FrmAnalysisDocWidget(QtWidgets.QDockWidget):
                 metric_ids,
                 overwrite_existing=frm.chkOverwrite.isChecked(),
                 force_active=frm.chkForceActive.isChecked(),
+                profile=Settings().getValue(METRIC_PROFILING_ENABLED),
+                use_cache=frm.chkUseCache.isChecked(),
             )
             self.metrics_task_context = {'mode': 'bulk'}
             self.metrics_task.on_complete.connect(self.on_metrics_task_complete)
@@ -191,8 +195,10 @@ class FrmAnalysisDocWidget(QtWidgets.QDockWidget):
 
         has_missing = summary.get('missing_data', 0) > 0
         has_errors = summary.get('errors', 0) > 0
+        cache_hits = summary.get('cache_hits', 0)
         if not has_missing and not has_errors:
-            self.iface.messageBar().pushMessage('Metrics', 'All metrics successfully calculated.', level=Qgis.Success)
+            cache_text = f' {cache_hits} values were reused from the metric result cache.' if cache_hits > 0 else ''
+            self.iface.messageBar().pushMessage('Metrics', f'All metrics successfully calculated.{cache_text}', level=Qgis.Success)
         else:
             if has_missing:
                 self.iface.messageBar().pushMessage('Metrics', 'One or more metrics were not calculated due to missing data requirements. See log for details.', level=Qgis.Success)
@@ -256,6 +262,7 @@ class FrmAnalysisDocWidget(QtWidgets.QDockWidget):
             [metric.id],
             overwrite_existing=True,
             force_active=True,
+            profile=Settings().getValue(METRIC_PROFILING_ENABLED),
         )
         self.metrics_task_context = {'mode': 'single', 'metric_id': metric.id}
         self.metrics_task.on_complete.connect(self.on_metrics_task_complete)
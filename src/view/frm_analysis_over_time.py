@@ -13,7 +13,8 @@ from matplotlib.ticker import MaxNLocator
 from ..model.project import Project
 from ..model.analysis import Analysis
 from ..model.sample_frame import SampleFrame, get_sample_frame_sequence
-from ..model.metric_value import load_metric_values
+from ..model.metric_value import load_metric_values, display_unit_factor, current_values
+from ..model.metric_value_summary import load_metric_value_summaries
 from ..lib.unit_conversion import short_unit_name, distance_units, area_units, ratio_units
 from ..lib.font_tools import apply_qfont_to_mpl_text, apply_qfont_to_mpl_texts, select_chart_font
 from ..model.event import DCE_EVENT_TYPE_ID, DESIGN_EVENT_TYPE_ID, AS_BUILT_EVENT_TYPE_ID
@@ -23,6 +24,16 @@ from .widgets.export_chart_widget import ChartExportWidget
 from .frm_metric_value import FrmMetricValue
 from .frm_settings import get_default_chart_font
 
+# What each point on the chart represents. The reach-wide summaries use the values of every mask polygon in the analysis.
+SUMMARY_FEATURE = 'feature'
+SUMMARY_MEDIAN = 'median'
+SUMMARY_MEAN = 'mean'
+SUMMARY_TYPES = [
+    (SUMMARY_FEATURE, 'Selected Mask Polygon'),
+    (SUMMARY_MEDIAN, 'All Mask Polygons: Median (IQR)'),
+    (SUMMARY_MEAN, 'All Mask Polygons: Mean'),
+]
+
 class FrmAnalysisOverTime(QtWidgets.QDockWidget):
     """
     Dockable widget for performing analysis over time. Allows users to select a sample frame and pour point, and then runs the analysis.
@@ -54,8 +65,7 @@ class FrmAnalysisOverTime(QtWidgets.QDockWidget):
         self.metric_combo.currentIndexChanged.connect(self.redraw_chart)
         self.sample_frame_combo.currentIndexChanged.connect(self.redraw_chart)
         self.event_library.event_checked.connect(self.redraw_chart)
-        self.sample_frame_combo.currentIndexChanged.connect(self.redraw_chart)
-        self.event_library.event_checked.connect(self.redraw_chart)
+        self.summary_combo.currentIndexChanged.connect(self.on_summary_changed)
         # Trigger redraw when events are reordered
         if hasattr(self.event_library, 'table') and hasattr(self.event_library.table, 'orderChanged'):
             self.event_library.table.orderChanged.connect(self.redraw_chart)
@@ -235,8 +245,17 @@ class FrmAnalysisOverTime(QtWidgets.QDockWidget):
         self.sample_frame_combo = QtWidgets.QComboBox()
         grid_layout.addWidget(self.sample_frame_combo, 2, 1)
 
+        # Summary Selection
+        lbl_summary = QtWidgets.QLabel("Summarize:")
+        grid_layout.addWidget(lbl_summary, 3, 0)
+        self.summary_combo = QtWidgets.QComboBox()
+        for summary_type, label in SUMMARY_TYPES:
+            self.summary_combo.addItem(label, summary_type)
+        self.summary_combo.setToolTip("Chart the selected mask polygon, or summarize the metric across every mask polygon in the analysis for each event.")
+        grid_layout.addWidget(self.summary_combo, 3, 1)
+
         self.chk_interactive_map = QtWidgets.QCheckBox("Interactive Map")
-        grid_layout.addWidget(self.chk_interactive_map, 3, 0, 1, 2)
+        grid_layout.addWidget(self.chk_interactive_map, 4, 0, 1, 2)
         
         # Push the grid to the top
         basic_layout.addLayout(grid_layout)
@@ -292,12 +311,11 @@ class FrmAnalysisOverTime(QtWidgets.QDockWidget):
         self.splitter.setStretchFactor(0, 0)
         self.splitter.setStretchFactor(1, 1)
 
-    def redraw_chart(self, *args):
-        metric_id = self.metric_combo.currentData()
-        scope_feature_id = self.sample_frame_combo.currentData()
-        if not metric_id or not scope_feature_id or not self.analysis or not self.project:
-            return
+    def on_summary_changed(self):
+        self.sample_frame_combo.setEnabled(self.summary_combo.currentData() == SUMMARY_FEATURE)
+        self.redraw_chart()
 
+    def get_selected_events(self) -> list:
         # Fetch visually reordered events from the list
         selected_events = []
         table = self.event_library.table
@@ -306,16 +324,63 @@ class FrmAnalysisOverTime(QtWidgets.QDockWidget):
                 event = table.item(row, 1).data(QtCore.Qt.UserRole)
                 if event is not None:
                     selected_events.append(event)
+        return selected_events
+
+    def get_display_unit(self, metric) -> str:
+        if metric is None or not hasattr(self.analysis, 'units'):
+            return None
+
+        display_unit = None
+        if metric.normalized:
+            if hasattr(metric, 'normalization_unit_type') and metric.normalization_unit_type == 'area':
+                display_unit = self.analysis.units.get('area', None)
+            elif hasattr(metric, 'normalization_unit_type') and metric.normalization_unit_type == 'distance':
+                display_unit = self.analysis.units.get('distance', None)
+            elif metric.unit_type != 'ratio':
+                display_unit = self.analysis.units.get('distance', None)
+        else:
+            display_unit = self.analysis.units.get(metric.unit_type, None)
+
+        if display_unit in ['count', 'ratio']:
+            display_unit = None
+        return display_unit
+
+    def get_axis_label(self, metric) -> str:
+        ylabel = metric.name if metric else "Value"
+        if metric and hasattr(self.analysis, 'units'):
+            du = short_unit_name(self.analysis.units.get(metric.unit_type, None))
+            if metric.normalized:
+                if du != 'ratio':
+                    norm_key = 'distance'
+                    if hasattr(metric, 'normalization_unit_type') and metric.normalization_unit_type == 'area':
+                        norm_key = 'area'
+
+                    norm_u = short_unit_name(self.analysis.units.get(norm_key, None))
+                    du = f'{du}/{norm_u}'
+            if du and du not in ['count', 'ratio']:
+                ylabel += f" ({du})"
+        return ylabel
 
+    def redraw_chart(self, *args):
+        metric_id = self.metric_combo.currentData()
+        summary_type = self.summary_combo.currentData()
+        scope_feature_id = self.sample_frame_combo.currentData()
+        if not metric_id or not self.analysis or not self.project:
+            return
+        if summary_type == SUMMARY_FEATURE and not scope_feature_id:
+            return
+
+        selected_events = self.get_selected_events()
         if not selected_events:
             self.chart.render_plot([], [], None, "No events selected", self.chart.cbo_value_type.currentText())
             return
             
         metric = self.project.metrics.get(metric_id)
+        if summary_type != SUMMARY_FEATURE:
+            self.redraw_summary_chart(metric, summary_type, selected_events)
+            return
         
         x_labels = []
-        y_values = []
-        y_err = []
         metric_details = []
         
         for event in selected_events:
@@ -324,61 +389,87 @@ class FrmAnalysisOverTime(QtWidgets.QDockWidget):
             try:
                 values_dict = load_metric_values(self.project.project_file, self.analysis, event, scope_feature_id, self.project.metrics)
                 if metric_id in values_dict:
-                    mv = values_dict[metric_id]
-                    metric_details.append((mv, event, scope_feature_id))
-                    
-                    display_unit = None
-                    if metric and hasattr(self.analysis, 'units'):
-                        if metric.normalized:
-                            if hasattr(metric, 'normalization_unit_type') and metric.normalization_unit_type == 'area':
-                                display_unit = self.analysis.units.get('area', None)
-                            elif hasattr(metric, 'normalization_unit_type') and metric.normalization_unit_type == 'distance':
-                                display_unit = self.analysis.units.get('distance', None)
-                            elif metric.unit_type != 'ratio':
-                                display_unit = self.analysis.units.get('distance', None)
-                        else:
-                            display_unit = self.analysis.units.get(metric.unit_type, None)
-
-                        if display_unit in ['count', 'ratio']:
-                            display_unit = None
-                            
-                    val = mv.current_value(display_unit)
-                    y_values.append(val)
-                    
-                    err_val = 0.0
-                    if mv.uncertainty and 'Plus/Minus' in mv.uncertainty:
-                        err_val = mv.uncertainty['Plus/Minus']
-                    elif mv.uncertainty and 'Percent' in mv.uncertainty and val is not None:
-                        err_val = abs(val * (mv.uncertainty['Percent'] / 100.0))
-                    
-                    y_err.append(err_val)
+                    metric_details.append((values_dict[metric_id], event, scope_feature_id))
                 else:
-                    y_values.append(None)
-                    y_err.append(0.0)
                     metric_details.append(None)
             except Exception as e:
+                metric_details.append(None)
+
+        # Convert the values of every event at once
+        found = [details[0] for details in metric_details if details is not None]
+        try:
+            converted = iter(current_values(found, [self.get_display_unit(metric)] * len(found)))
+        except Exception as e:
+            QgsMessageLog.logMessage(f"Error converting metric values for {metric.name if metric else metric_id}: {e}", 'QRiS', Qgis.Warning)
+            converted = iter([np.nan] * len(found))
+
+        y_values = []
+        y_err = []
+        for details in metric_details:
+            if details is None:
                 y_values.append(None)
                 y_err.append(0.0)
-                metric_details.append(None)
+                continue
+
+            val = next(converted)
+            uncertainty = details[0].uncertainty
+            val = float(val) if np.isfinite(val) else None
+            y_values.append(val)
+
+            err_val = 0.0
+            if uncertainty and 'Plus/Minus' in uncertainty:
+                err_val = uncertainty['Plus/Minus']
+            elif uncertainty and 'Percent' in uncertainty and val is not None:
+                err_val = abs(val * (uncertainty['Percent'] / 100.0))
+            y_err.append(err_val)
 
         val_type = self.chart.cbo_value_type.currentText()
         show_err = self.chart.action_chk_uncertainty.isChecked()
-        
-        ylabel = metric.name if metric else "Value"
-        if metric and hasattr(self.analysis, 'units'):
-            du = short_unit_name(self.analysis.units.get(metric.unit_type, None))
-            if metric.normalized:
-                if du != 'ratio':
-                    norm_key = 'distance'
-                    if hasattr(metric, 'normalization_unit_type') and metric.normalization_unit_type == 'area':
-                        norm_key = 'area'
-                    
-                    norm_u = short_unit_name(self.analysis.units.get(norm_key, None))
-                    du = f'{du}/{norm_u}'
-            if du and du not in ['count', 'ratio']:
-                ylabel += f" ({du})"
+        ylabel = self.get_axis_label(metric)
                 
         self.chart.render_plot(x_labels, y_values, y_err if show_err else None, ylabel, val_type, metric.name if metric else None, metric_details)
+
+    def redraw_summary_chart(self, metric, summary_type: str, selected_events: list):
+        """Chart the median (with the interquartile range) or the mean (with its propagated uncertainty) of the metric across every mask polygon, per event."""
+
+        x_labels = [event.name for event in selected_events]
+        val_type = self.chart.cbo_value_type.currentText()
+        ylabel = self.get_axis_label(metric)
+        if metric is None:
+            self.chart.render_plot(x_labels, [None] * len(x_labels), None, ylabel, val_type)
+            return
+
+        try:
+            summaries = load_metric_value_summaries(self.project.project_file, self.analysis.id, [metric.id], [event.id for event in selected_events])
+            summary = summaries[metric.id].converted(display_unit_factor(metric, self.get_display_unit(metric)))
+        except Exception as e:
+            QgsMessageLog.logMessage(f"Error summarizing metric values for {metric.name}: {e}", 'QRiS', Qgis.Warning)
+            self.chart.render_plot(x_labels, [None] * len(x_labels), None, ylabel, val_type, metric.name)
+            return
+
+        def to_list(values: np.ndarray) -> list:
+            return [float(v) if np.isfinite(v) else None for v in values]
+
+        export_columns = {
+            'Mask Polygons': [int(n) if np.isfinite(n) else 0 for n in summary.count],
+            'Minimum': to_list(summary.minimum),
+            'Q1': to_list(summary.q1),
+            'Median': to_list(summary.median),
+            'Q3': to_list(summary.q3),
+            'Maximum': to_list(summary.maximum),
+            'Mean': to_list(summary.mean),
+            'Mean Uncertainty': to_list(summary.mean_uncertainty),
+        }
+
+        if summary_type == SUMMARY_MEDIAN:
+            # The whiskers are the interquartile range
+            self.chart.render_plot(x_labels, to_list(summary.median), to_list(summary.median - summary.q1), ylabel, val_type,
+                                   f'{metric.name} (Median and IQR)', y_err_high=to_list(summary.q3 - summary.median), export_columns=export_columns)
+        else:
+            show_err = self.chart.action_chk_uncertainty.isChecked()
+            self.chart.render_plot(x_labels, to_list(summary.mean), to_list(summary.mean_uncertainty) if show_err else None, ylabel, val_type,
+                                   f'{metric.name} (Mean)', export_columns=export_columns)
+
     def edit_metric_value(self, details_tuple):
         if not details_tuple:
             return
@@ -494,23 +585,33 @@ class AnalysisOverTimeChart(QtWidgets.QWidget):
         x_labels = self.last_plot_data['x']
         y_values = self.last_plot_data['y']
         y_err = self.last_plot_data['err']
+        y_err_high = self.last_plot_data.get('err_high')
         ylabel = self.last_plot_data['ylabel']
+        export_columns = self.last_plot_data.get('columns') or {}
         
         export_list = []
         for i, label in enumerate(x_labels):
             val = y_values[i]
-            if val is None: continue
+            if val is None or np.isnan(val): continue
             
             err = 0.0
             if y_err and i < len(y_err) and y_err[i] is not None:
                 err = y_err[i]
             
-            export_list.append({
+            row = {
                 "Event": label,
                 "Value": float(val),
                 "Unit": ylabel,
-                "Uncertainty": float(err)
-            })
+            }
+            if y_err_high is not None:
+                # Asymmetric whiskers (e.g. interquartile range) below and above the value
+                row["Lower Error"] = float(err)
+                row["Upper Error"] = float(y_err_high[i]) if y_err_high[i] is not None else 0.0
+            else:
+                row["Uncertainty"] = float(err)
+            for column, values in export_columns.items():
+                row[column] = values[i]
+            export_list.append(row)
         return export_list
 
     def set_chart_font(self):
@@ -585,7 +686,9 @@ class AnalysisOverTimeChart(QtWidgets.QWidget):
             self.analysis.units[unit_type] = unit_name
             self.chart_needs_update.emit()
             
-    def render_plot(self, x_labels, y_values, y_err, ylabel, val_type, metric_name=None, metric_values=None):
+    def render_plot(self, x_labels, y_values, y_err, ylabel, val_type, metric_name=None, metric_values=None, y_err_high=None, export_columns=None):
+        """y_err is the error below and above each value, or only below it when y_err_high is provided.
+        export_columns are additional per event columns for the exported data."""
         self.ax.clear()
 
         # Set font properties
@@ -651,6 +754,7 @@ class AnalysisOverTimeChart(QtWidgets.QWidget):
 
         # Handle errors
         y_err_plot = [e if e is not None else 0.0 for e in y_err] if y_err else [0.0]*len(y_plot)
+        y_err_high_plot = [e if e is not None else 0.0 for e in y_err_high] if y_err and y_err_high is not None else y_err_plot
 
         x_indices = range(len(x_labels))
         
@@ -659,7 +763,9 @@ class AnalysisOverTimeChart(QtWidgets.QWidget):
             'x': x_labels,
             'y': y_plot,
             'err': y_err,
-            'ylabel': ylabel
+            'err_high': y_err_high if y_err else None,
+            'ylabel': ylabel,
+            'columns': export_columns,
         }
         
         # Store for picking
@@ -677,16 +783,17 @@ class AnalysisOverTimeChart(QtWidgets.QWidget):
         mask = np.isfinite(y_plot)
         if np.any(mask):
             self.ax.errorbar(np.array(x_indices)[mask], np.array(y_plot)[mask], 
-                            yerr=np.array(y_err_plot)[mask] if y_err else None, 
+                            yerr=np.vstack([np.array(y_err_plot)[mask], np.array(y_err_high_plot)[mask]]) if y_err else None, 
                             fmt='o', capsize=5, ecolor='red')
 
         finite_values = np.array(y_plot)[np.isfinite(y_plot)]
         if finite_values.size > 0:
             finite_indices = np.where(np.isfinite(y_plot))[0]
             finite_errors = np.array([y_err_plot[i] for i in finite_indices], dtype=float)
+            finite_errors_high = np.array([y_err_high_plot[i] for i in finite_indices], dtype=float)
 
             y_low = float(np.min(finite_values - finite_errors))
-            y_high = float(np.max(finite_values + finite_errors))
+            y_high = float(np.max(finite_values + finite_errors_high))
             center = (y_low + y_high) / 2.0
             span = y_high - y_low
 
@@ -14,6 +14,7 @@ from ..model.scratch_vector import ScratchVector
 from ..gp.feature_class_functions import layer_path_parser
 from ..gp.import_feature_class import ImportFeatureClass, ImportFieldMap
 from ..gp.import_temp_layer import ImportMapLayer
+from ..gp.sample_frame_geometry import update_sample_frame_geometries
 
 from .widgets.metadata import MetadataWidget
 from .widgets.stats_widget import StatsWidget
@@ -241,6 +242,10 @@ class FrmAOIValleyBottom(QtWidgets.QDialog):
 
     def on_import_complete(self, result: bool):
         if result is True:
+            try:
+                update_sample_frame_geometries(self.qris_project.project_file, self.sample_frame.id)
+            except Exception as ex:
+                QgsApplication.messageLog().logMessage(f'Error storing {self.type_name} geometries: {str(ex)}', 'QRIS', level=Qgis.Warning)
             self.iface.messageBar().pushMessage(f'{self.type_name} Imported', f'{self.type_name} "{self.txtName.text()}" has been imported successfully.', level=Qgis.Success, duration=5)
             self.finalize_accept()
         else:
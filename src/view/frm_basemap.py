@@ -13,6 +13,7 @@ from ..model.project import Project
 
 from ..gp.copy_raster import CopyRaster
 from ..gp.create_hillshade import Hillshade
+from ..gp.raster_output import RESAMPLING_METHODS, PREDICTORS
 from .widgets.metadata import MetadataWidget
 from .utilities import validate_name_unique, validate_name, add_standard_form_buttons
 from ..QRiS.path_utilities import parse_posix_path
@@ -116,6 +117,7 @@ class FrmRaster(QtWidgets.QDialog):
             self.cboMask.setVisible(False)
             self.chkHillshade.setChecked(False)
             self.chkHillshade.setVisible(False)
+            self.tabs.removeTab(self.tabs.indexOf(self.tabOutput))
 
             self.txtProjectPath.setText(qris_project.get_absolute_path(raster.path))
 
@@ -177,14 +179,18 @@ class FrmRaster(QtWidgets.QDialog):
                 if not os.path.isdir(os.path.dirname(project_path)):
                     os.makedirs(os.path.dirname(project_path))
 
-                copy_raster = CopyRaster(self.txtSourcePath.text(), mask_tuple, project_path)
+                resampling = self.cboResampling.currentData(QtCore.Qt.UserRole)
+                predictor = self.cboPredictor.currentData(QtCore.Qt.UserRole)
+                cog = self.chkCog.isChecked()
+                copy_raster = CopyRaster(self.txtSourcePath.text(), mask_tuple, project_path, resampling, predictor, cog)
 
                 self.buttonBox.setEnabled(False)
 
                 if self.chkHillshade.isChecked() is True:
                     self.hillshade_raster_name = f'{self.txtName.text()} hillshade'
                     hillshade_path = self.qris_project.get_absolute_path(self.hillshade_project_path)
-                    hillshade_task = Hillshade(project_path, hillshade_path)
+                    # The hillshade is generated from the copied (and clipped) DEM, not the source
+                    hillshade_task = Hillshade(project_path, hillshade_path, cog)
                     hillshade_task.addSubTask(copy_raster, [], QgsTask.ParentDependsOnSubTask)
                     hillshade_task.hillshade_complete.connect(self.on_raster_copy_complete)
                     QgsApplication.taskManager().addTask(hillshade_task)
@@ -367,6 +373,37 @@ class FrmRaster(QtWidgets.QDialog):
 
         self.grid.addItem(QtWidgets.QSpacerItem(20, 40, QtWidgets.QSizePolicy.Minimum, QtWidgets.QSizePolicy.Expanding), 10, 0, 1, 2)
 
+        # Output Options Tab
+        self.gridOutput = QtWidgets.QGridLayout()
+        self.tabOutput = QtWidgets.QWidget()
+        self.tabs.addTab(self.tabOutput, 'Output Options')
+        self.tabOutput.setLayout(self.gridOutput)
+
+        self.lblResampling = QtWidgets.QLabel('Resampling')
+        self.gridOutput.addWidget(self.lblResampling, 0, 0, 1, 1)
+
+        self.cboResampling = QtWidgets.QComboBox()
+        self.cboResampling.setToolTip('Resampling method used when the raster is reprojected or clipped')
+        for name, method in RESAMPLING_METHODS.items():
+            self.cboResampling.addItem(name, method)
+        self.gridOutput.addWidget(self.cboResampling, 0, 1, 1, 1)
+
+        self.lblPredictor = QtWidgets.QLabel('Compression Predictor')
+        self.gridOutput.addWidget(self.lblPredictor, 1, 0, 1, 1)
+
+        self.cboPredictor = QtWidgets.QComboBox()
+        self.cboPredictor.setToolTip('Predictor used with DEFLATE compression. Automatic uses floating point prediction for floating point rasters.')
+        for name, predictor in PREDICTORS.items():
+            self.cboPredictor.addItem(name, predictor)
+        self.gridOutput.addWidget(self.cboPredictor, 1, 1, 1, 1)
+
+        self.chkCog = QtWidgets.QCheckBox('Cloud-Optimized GeoTIFF with overviews')
+        self.chkCog.setToolTip('Write a tiled GeoTIFF with internal overviews so the raster draws and samples quickly')
+        self.chkCog.setChecked(True)
+        self.gridOutput.addWidget(self.chkCog, 2, 1, 1, 1)
+
+        self.gridOutput.addItem(QtWidgets.QSpacerItem(20, 40, QtWidgets.QSizePolicy.Minimum, QtWidgets.QSizePolicy.Expanding), 3, 0, 1, 2)
+
         # Description Tab
         self.tabDescription = QtWidgets.QWidget()
         self.tabs.addTab(self.tabDescription, 'Description')
@@ -0,0 +1,115 @@
+from qgis.PyQt import QtWidgets
+from qgis.core import QgsMapLayerProxyModel, QgsFieldProxyModel
+from qgis.gui import QgsMapLayerComboBox, QgsFieldComboBox
+
+from ..model.project import Project
+from ..gp.stream_stats_batch import read_point_layer
+from .utilities import add_standard_form_buttons
+from .widgets.metadata import MetadataWidget
+
+
+class FrmBatchPourPoints(QtWidgets.QDialog):
+    """Pick a point layer in the map and the Stream Stats options to run for each of its points."""
+
+    def __init__(self, parent, project: Project):
+        super().__init__(parent)
+        self.qris_project = project
+        self.points = []
+
+        self.setupUi()
+        self.setWindowTitle('Run USGS StreamStats for Point Layer')
+
+        self.cboLayer.layerChanged.connect(self.on_layer_changed)
+        self.on_layer_changed(self.cboLayer.currentLayer())
+
+    def on_layer_changed(self, layer):
+        self.cboNameField.setLayer(layer)
+        self.chkSelectedOnly.setEnabled(layer is not None and layer.selectedFeatureCount() > 0)
+        self.chkSelectedOnly.setChecked(self.chkSelectedOnly.isEnabled())
+
+    def accept(self):
+
+        layer = self.cboLayer.currentLayer()
+        if layer is None:
+            QtWidgets.QMessageBox.warning(self, 'Missing Point Layer', 'Select a point layer in the map that contains the pour points.')
+            return
+
+        try:
+            self.points = read_point_layer(layer, self.cboNameField.currentField(), self.chkSelectedOnly.isChecked())
+        except Exception as ex:
+            QtWidgets.QMessageBox.warning(self, 'Error Reading Point Layer', str(ex))
+            return
+
+        if len(self.points) == 0:
+            QtWidgets.QMessageBox.warning(self, 'No Pour Points', f'The layer {layer.name()} does not contain any points.')
+            return
+
+        super().accept()
+
+    def setupUi(self):
+
+        self.resize(500, 300)
+
+        # Top level layout must include parent. Widgets added to this layout do not need parent.
+        self.vert = QtWidgets.QVBoxLayout(self)
+        self.setLayout(self.vert)
+
+        self.grid = QtWidgets.QGridLayout()
+        self.vert.addLayout(self.grid)
+
+        self.lblLayer = QtWidgets.QLabel()
+        self.lblLayer.setText('Point Layer')
+        self.grid.addWidget(self.lblLayer, 0, 0, 1, 1)
+
+        self.cboLayer = QgsMapLayerComboBox()
+        self.cboLayer.setFilters(QgsMapLayerProxyModel.PointLayer)
+        self.cboLayer.setToolTip('The map layer containing one point per pour point')
+        self.grid.addWidget(self.cboLayer, 0, 1, 1, 1)
+
+        self.lblNameField = QtWidgets.QLabel()
+        self.lblNameField.setText('Name Field')
+        self.grid.addWidget(self.lblNameField, 1, 0, 1, 1)
+
+        self.cboNameField = QgsFieldComboBox()
+        self.cboNameField.setFilters(QgsFieldProxyModel.String | QgsFieldProxyModel.Numeric)
+        self.cboNameField.setAllowEmptyFieldName(True)
+        self.cboNameField.setToolTip('The field used to name each catchment. Leave empty to use the layer name and feature ID.')
+        self.grid.addWidget(self.cboNameField, 1, 1, 1, 1)
+
+        self.chkSelectedOnly = QtWidgets.QCheckBox()
+        self.chkSelectedOnly.setText('Selected features only')
+        self.grid.addWidget(self.chkSelectedOnly, 2, 1, 1, 1)
+
+        # Create GroupBox for Analysis Options
+        self.groupAnalysis = QtWidgets.QGroupBox('Download Options')
+        self.layoutAnalysis = QtWidgets.QVBoxLayout()
+        self.groupAnalysis.setLayout(self.layoutAnalysis)
+        self.vert.addWidget(self.groupAnalysis)
+
+        self.grpOptions = QtWidgets.QButtonGroup(self)
+
+        self.radDelineate = QtWidgets.QRadioButton()
+        self.radDelineate.setText('Delineate Catchments Only')
+        self.radDelineate.setChecked(True)
+        self.layoutAnalysis.addWidget(self.radDelineate)
+        self.grpOptions.addButton(self.radDelineate)
+
+        self.radBasin = QtWidgets.QRadioButton()
+        self.radBasin.setText('Catchments with Basin Characteristics')
+        self.layoutAnalysis.addWidget(self.radBasin)
+        self.grpOptions.addButton(self.radBasin)
+
+        self.radFlowStats = QtWidgets.QRadioButton()
+        self.radFlowStats.setText('Catchments with Basin Characteristics and Flow Statistics')
+        self.layoutAnalysis.addWidget(self.radFlowStats)
+        self.grpOptions.addButton(self.radFlowStats)
+
+        self.metadata_widget = MetadataWidget(self)
+        self.vert.addWidget(self.metadata_widget)
+
+        self.chkAddToMap = QtWidgets.QCheckBox()
+        self.chkAddToMap.setText('Add to Map')
+        self.chkAddToMap.setChecked(True)
+        self.vert.addWidget(self.chkAddToMap)
+
+        self.vert.addLayout(add_standard_form_buttons(self, 'context/watershed-catchments'))
@@ -3,8 +3,6 @@ import sqlite3
 from datetime import datetime
 
 import matplotlib.dates as mdates
-from matplotlib.figure import Figure
-from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
 
 from qgis.PyQt import QtWidgets
 from qgis.PyQt.QtGui import QStandardItemModel, QStandardItem, QIcon, QCursor
@@ -16,15 +14,26 @@ from .widgets.sample_frames import SampleFrameWidget
 from .widgets.date_range import DateRangeWidget
 from .widgets.event_library import EventLibraryWidget
 from .widgets.export_chart_widget import ChartExportWidget
+from .widgets.time_series_chart import TimeSeriesChart
 
 from ..model.project import Project
 from ..model.db_item import dict_factory
 from ..model.sample_frame import SampleFrame
 from ..model.basin_characteristics_table_view import BasinCharsTableModel
+from ..model.sql_table_model import SqlTableModel
 
 from ..lib.climate_engine import get_datasets, open_climate_engine_website
+from ..lib.decimation import series_from_rows
 from ..QRiS.qris_map_manager import QRisMapManager
 
+TIME_SERIES_VALUES_FROM = 'sample_frame_time_series sfts LEFT JOIN sample_frame_features sff ON sfts.sample_frame_fid = sff.fid'
+TIME_SERIES_VALUES_COLUMNS = [
+    ('sfts.time_value', 'Date'),
+    ("COALESCE(NULLIF(sff.display_label, ''), 'Feature ' || sfts.sample_frame_fid)", 'Sample Frame Feature'),
+    ('sfts.value', 'Value'),
+]
+
+
 class FrmClimateEngineExplorer(QtWidgets.QDockWidget):
 
     def __init__(self, parent: QtWidgets.QWidget, qris_project: Project, qris_map_manager: QRisMapManager):
@@ -109,12 +118,29 @@ class FrmClimateEngineExplorer(QtWidgets.QDockWidget):
         self.lst_climate_engine.selectionModel().selectionChanged.connect(self.load_metadata)
         self.lst_climate_engine.update()
 
+    def load_time_series_values(self, curs: sqlite3.Cursor, time_series_id: int, sample_frame_feature_ids: list, start_date, end_date) -> list:
+        """Values of a time series for all the sample frame features in a single query.
+
+        Returns (sample_frame_fid, display_label, time_value, value) rows ordered by feature then date."""
+
+        if len(sample_frame_feature_ids) == 0:
+            return []
+
+        placeholders = ', '.join('?' for _ in sample_frame_feature_ids)
+        curs.execute(f"""SELECT sfts.sample_frame_fid, sff.display_label, sfts.time_value, sfts.value
+            FROM sample_frame_time_series sfts
+                LEFT JOIN sample_frame_features sff ON sfts.sample_frame_fid = sff.fid
+            WHERE sfts.time_series_id = ? AND sfts.sample_frame_fid IN ({placeholders}) AND sfts.time_value BETWEEN ? AND ?
+            ORDER BY sfts.sample_frame_fid, sfts.time_value""",  # nosec B608 - placeholders are generated as '?,?,...' from list length, not user input
+                     [time_series_id, *sample_frame_feature_ids, start_date, end_date])
+        return curs.fetchall()
+
     def create_plot(self):
 
         if self.lst_climate_engine.model() is None:
             return
 
-        self._static_ax.clear()
+        self.chart.clear()
 
         # get the selected time series ids
         time_series_ids = self.lst_climate_engine.selectedIndexes()
@@ -172,18 +198,19 @@ class FrmClimateEngineExplorer(QtWidgets.QDockWidget):
             dataset_name = time_series_metadata.get('dataset', None)
             variable_id = time_series_metadata.get('variable', None)
             units = time_series_metadata.get('units', None)
-            for sample_frame_feature_id in sample_frame_feature_ids:
-                curs.execute('SELECT time_value, value FROM sample_frame_time_series WHERE time_series_id = ? AND sample_frame_fid = ? AND time_value BETWEEN ? AND ?',
-                             (time_series_id, sample_frame_feature_id, start_date, end_date))
-                values = [(datetime.strptime(row[0], '%Y-%m-%d'), row[1]) for row in curs.fetchall()]
-                curs.execute('SELECT display_label FROM sample_frame_features WHERE fid = ?', (sample_frame_feature_id,))
-                display_label = curs.fetchone()[0]
-                if display_label is None or display_label == '':
-                    display_label = f'Feature {sample_frame_feature_id}'
-                data[display_label] = values
+            rows = self.load_time_series_values(curs, time_series_id, sample_frame_feature_ids, start_date, end_date)
+
+        self.load_values_table(time_series_id, sample_frame_feature_ids, start_date, end_date)
+
+        display_labels = {row[0]: row[1] for row in rows}
+        for sample_frame_feature_id, values in series_from_rows(rows, key_index=0, date_index=2, value_index=3).items():
+            display_label = display_labels[sample_frame_feature_id]
+            if display_label is None or display_label == '':
+                display_label = f'Feature {sample_frame_feature_id}'
+            data[display_label] = values
 
         # check the data if there is only one plot point per sample frame
-        if all(len(values) <= 1 for values in data.values()):
+        if all(len(dates) <= 1 for dates, _values in data.values()):
             marker = 'o'
             markersize = 10
         else:
@@ -196,12 +223,12 @@ class FrmClimateEngineExplorer(QtWidgets.QDockWidget):
         y_label = f'{description} ({units})' if units is not None else description
         self._static_ax.set_title(f'{dataset_name} ({description})')
         if self.rdo_space.isChecked():
-            for sample_frame_feature_id, values in data.items():
-                self._static_ax.plot([value[0] for value in values], [value[1] for value in values], label=sample_frame_feature_id)
+            for sample_frame_feature_id, (dates, values) in data.items():
+                self.chart.add_series(dates, values, label=sample_frame_feature_id)
             self._static_ax.legend(title='Sample Frame Feature')
         elif self.rdo_time.isChecked():
-            for sample_frame_feature_id, values in data.items():
-                self._static_ax.plot([value[0] for value in values], [value[1] for value in values], label=sample_frame_feature_id)
+            for sample_frame_feature_id, (dates, values) in data.items():
+                self.chart.add_series(dates, values, label=sample_frame_feature_id)
             self._static_ax.legend(title='Sample Frame Feature', frameon=False)
         self._static_ax.set_ylabel(y_label)
 
@@ -222,7 +249,26 @@ class FrmClimateEngineExplorer(QtWidgets.QDockWidget):
         self.chart_canvas.figure.autofmt_xdate()
         # Use a more precise date string for the x axis locations in the toolbar.
         self._static_ax.fmt_xdata = mdates.DateFormatter('%Y-%m-%d')
-        self.chart_canvas.draw()
+        self.chart.draw()
+
+    def load_values_table(self, time_series_id: int, sample_frame_feature_ids: list, start_date, end_date):
+
+        if len(sample_frame_feature_ids) == 0:
+            self.values_table_model = None
+            self.table_values.setModel(None)
+            return
+
+        placeholders = ', '.join('?' for _ in sample_frame_feature_ids)
+        where_sql = f'sfts.time_series_id = ? AND sfts.sample_frame_fid IN ({placeholders}) AND sfts.time_value BETWEEN ? AND ?'
+        params = [time_series_id, *sample_frame_feature_ids, start_date, end_date]
+
+        # Rows are paged from the database as the table scrolls. Sorting is done in SQL.
+        if self.values_table_model is None:
+            self.values_table_model = SqlTableModel(self.qris_project.project_file, TIME_SERIES_VALUES_FROM, TIME_SERIES_VALUES_COLUMNS, where_sql, params, parent=self)
+            self.table_values.setModel(self.values_table_model)
+            self.table_values.horizontalHeader().setStretchLastSection(True)
+        else:
+            self.values_table_model.set_filter(where_sql, params)
 
     def load_metadata(self):
 
@@ -297,16 +343,10 @@ class FrmClimateEngineExplorer(QtWidgets.QDockWidget):
             variable_id = metadata.get('variable', 'unknown_variable')
             dataset_name = self.datasets[dataset_id]['datasetName'] if dataset_id in self.datasets else dataset_id
             y_label = metadata['units'] if 'units' in metadata else 'Value'
-            for sample_frame_feature_id in sample_frame_feature_ids:
-                curs.execute('SELECT time_value, value FROM sample_frame_time_series WHERE time_series_id = ? AND sample_frame_fid = ? AND time_value BETWEEN ? AND ?',
-                             (time_series_id, sample_frame_feature_id, start_date, end_date))
-                data[sample_frame_feature_id] = [(datetime.strptime(row[0], '%Y-%m-%d'), row[1]) for row in curs.fetchall()]
-                curs.execute('SELECT display_label FROM sample_frame_features WHERE fid = ?', (sample_frame_feature_id,))
-                label_row = curs.fetchone()
-                if label_row is not None and label_row[0] not in [None, '']:
-                    feature_labels[sample_frame_feature_id] = label_row[0]
-                else:
-                    feature_labels[sample_frame_feature_id] = str(sample_frame_feature_id)
+            for sample_frame_feature_id, display_label, time_value, value in self.load_time_series_values(curs, time_series_id, sample_frame_feature_ids, start_date, end_date):
+                data.setdefault(sample_frame_feature_id, []).append((datetime.strptime(time_value, '%Y-%m-%d'), value))
+                if display_label not in [None, '']:
+                    feature_labels[sample_frame_feature_id] = display_label
 
         rows = []
         for sample_frame_feature_id in sample_frame_feature_ids:
@@ -512,20 +552,28 @@ class FrmClimateEngineExplorer(QtWidgets.QDockWidget):
         self.vert_right.addWidget(self.lbl_initial_text)
         self.lbl_initial_text.setAlignment(Qt.AlignCenter)
 
-        self.chart_canvas = FigureCanvas(Figure())
-        self._static_ax = self.chart_canvas.figure.subplots()
+        self.chart = TimeSeriesChart(self)
+        self.chart_canvas = self.chart.canvas
+        self._static_ax = self.chart.ax
 
         self.table_metadata = QtWidgets.QTableView(self)
         self.table_metadata.verticalHeader().hide()
 
+        self.values_table_model = None
+        self.table_values = QtWidgets.QTableView(self)
+        self.table_values.verticalHeader().hide()
+        self.table_values.setSortingEnabled(True)
+        self.table_values.sortByColumn(0, Qt.AscendingOrder)
+
         self.tab_widget_right = QtWidgets.QTabWidget(self)
         self.vert_right.addWidget(self.tab_widget_right)
         
         chart_widget = QtWidgets.QWidget(self)
         chart_widget.setLayout(QtWidgets.QVBoxLayout())
         chart_widget.layout().addLayout(self.horiz_chart_controls)
-        chart_widget.layout().addWidget(self.chart_canvas)
+        chart_widget.layout().addWidget(self.chart)
         self.tab_widget_right.addTab(chart_widget, 'Graphical')
+        self.tab_widget_right.addTab(self.table_values, 'Data')
         self.tab_widget_right.addTab(self.table_metadata, 'Metadata')
         self.tab_widget_right.setVisible(False)
 
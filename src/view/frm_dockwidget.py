@@ -33,7 +33,7 @@ from qgis.gui import QgsMapToolEmitPoint, QgsLayerTreeView, QgisInterface
 from ..model.scratch_vector import ScratchVector, scratch_gpkg_path
 from ..model.layer import Layer
 from ..model.project import Project
-from ..model.event import Event, EVENT_MACHINE_CODE, DESIGN_EVENT_TYPE_ID, AS_BUILT_EVENT_TYPE_ID
+from ..model.event import Event, EVENT_MACHINE_CODE, DESIGN_EVENT_TYPE_ID, AS_BUILT_EVENT_TYPE_ID, DCE_EVENT_TYPE_ID as DATA_CAPTURE_EVENT_TYPE_ID
 from ..model.planning_container import PlanningContainer
 from ..model.raster import BASEMAP_MACHINE_CODE, PROTOCOL_BASEMAP_MACHINE_CODE, SURFACE_MACHINE_CODE, Raster
 from ..model.analysis import ANALYSIS_MACHINE_CODE, Analysis
@@ -48,66 +48,76 @@ from ..model.profile import Profile
 from ..model.cross_sections import CrossSections
 from ..model.attachment import Attachment, ATTACHMENT_MACHINE_CODE, attachments_path
 
-from .widgets.export_map_widget import MapExportWidget
-from .frm_design import FrmDesign
-from .frm_event import DATA_CAPTURE_EVENT_TYPE_ID, FrmEvent
-from .frm_planning_container import FrmPlanningContainer
-from .frm_asbuilt import FrmAsBuilt
-from .frm_basemap import FrmRaster
-from .frm_aoi_valley_bottom import FrmAOIValleyBottom
-from .frm_attachment import FrmAttachment
-from .frm_sample_frame import FrmSampleFrame
-from .frm_analysis_properties import FrmAnalysisProperties
-from .frm_analysis_explorer import FrmAnalysisExplorer
-from .frm_new_project import FrmNewProject
-from .frm_pour_point import FrmPourPoint
-from .frm_analysis_docwidget import FrmAnalysisDocWidget
-from .frm_analysis_over_time import FrmAnalysisOverTime
-from .frm_analysis_distribution import FrmDistributionAnalysis
-from .frm_analysis_distribution_dockwidget import FrmDistributionAnalysisDockWidget
-from .frm_slider import FrmSlider
-from .frm_scratch_vector import FrmScratchVector
-from .frm_geospatial_metrics import FrmGeospatialMetrics
-from .frm_stream_gage_docwidget import FrmStreamGageDocWidget
-from .frm_centerline_docwidget import FrmCenterlineDocWidget
-from .frm_cross_sections_docwidget import FrmCrossSectionsDocWidget
-from .frm_profile import FrmProfile
-from .frm_cross_sections import FrmCrossSections
-from .frm_import_dce_layer import FrmImportDceLayer
-from .frm_import_project_layer import FrmImportProjectLayer
-from .frm_layer_picker import FrmLayerPicker
-from .frm_layer_metric_details import FrmLayerMetricDetails
-from .frm_toc_layer_picker import FrmTOCLayerPicker
-from .frm_export_metrics import FrmExportMetrics
-from .frm_export_layer import FrmExportLayer
-from .frm_query_builder import FrmQueryBuilder
-from .frm_event_picker import FrmEventPicker
-from .frm_export_project import FrmExportProject
-from .frm_import_photos import FrmImportPhotos
-from .frm_settings import FrmSettings
-from .frm_climate_engine_explorer import FrmClimateEngineExplorer
-from .frm_climate_engine_map_layer import FrmClimateEngineMapLayer
-from .frm_batch_attribute_editor import FrmBatchAttributeEditor
-from .frm_order_by_centerline import FrmOrderByCenterline
-from .frm_layer_type import FrmLayerTypeDialog
-from .frm_settings import REMOVE_LAYERS_ON_CLOSE
-
 from ..lib.climate_engine import CLIMATE_ENGINE_MACHINE_CODE, require_api_key
-from ..lib.data_exchange import browse_data_exchange
-from ..lib.rs_project import RSProject
 
 from ..QRiS.settings import Settings
+from ..QRiS.lazy_loader import LazyRegistry
 from ..QRiS.qrave_integration import QRaveIntegration
 from ..QRiS.qris_map_manager import QRisMapManager
 from ..QRiS.riverscapes_map_manager import RiverscapesMapManager
 
-from ..gp.order_by_line_task import OrderByLineTask
-
-from ..gp.feature_class_functions import browse_raster, browse_vector, flip_line_geometry, import_existing
-from ..gp.stream_stats import transform_geometry, get_state_from_coordinates
-from ..gp.stream_stats import StreamStats
-from ..gp.zonal_statistics_task import ZonalMetricsTask
-from ..gp.vicinity_map import VicinityMapExportTask
+# Forms, dock widgets, chart widgets, tasks and libraries are imported the first time they are used.
+# See QRiS.lazy_loader for how import times are recorded.
+lazy_modules = LazyRegistry(__package__)
+MapExportWidget = lazy_modules.register('.widgets.export_map_widget', 'MapExportWidget')
+FrmDesign = lazy_modules.register('.frm_design', 'FrmDesign')
+FrmEvent = lazy_modules.register('.frm_event', 'FrmEvent')
+FrmPlanningContainer = lazy_modules.register('.frm_planning_container', 'FrmPlanningContainer')
+FrmAsBuilt = lazy_modules.register('.frm_asbuilt', 'FrmAsBuilt')
+FrmRaster = lazy_modules.register('.frm_basemap', 'FrmRaster')
+FrmAOIValleyBottom = lazy_modules.register('.frm_aoi_valley_bottom', 'FrmAOIValleyBottom')
+FrmAttachment = lazy_modules.register('.frm_attachment', 'FrmAttachment')
+FrmSampleFrame = lazy_modules.register('.frm_sample_frame', 'FrmSampleFrame')
+FrmAnalysisProperties = lazy_modules.register('.frm_analysis_properties', 'FrmAnalysisProperties')
+FrmAnalysisExplorer = lazy_modules.register('.frm_analysis_explorer', 'FrmAnalysisExplorer')
+FrmNewProject = lazy_modules.register('.frm_new_project', 'FrmNewProject')
+FrmPourPoint = lazy_modules.register('.frm_pour_point', 'FrmPourPoint')
+FrmAnalysisDocWidget = lazy_modules.register('.frm_analysis_docwidget', 'FrmAnalysisDocWidget')
+FrmAnalysisOverTime = lazy_modules.register('.frm_analysis_over_time', 'FrmAnalysisOverTime')
+FrmDistributionAnalysis = lazy_modules.register('.frm_analysis_distribution', 'FrmDistributionAnalysis')
+FrmDistributionAnalysisDockWidget = lazy_modules.register('.frm_analysis_distribution_dockwidget', 'FrmDistributionAnalysisDockWidget')
+FrmSlider = lazy_modules.register('.frm_slider', 'FrmSlider')
+FrmScratchVector = lazy_modules.register('.frm_scratch_vector', 'FrmScratchVector')
+FrmGeospatialMetrics = lazy_modules.register('.frm_geospatial_metrics', 'FrmGeospatialMetrics')
+FrmStreamGageDocWidget = lazy_modules.register('.frm_stream_gage_docwidget', 'FrmStreamGageDocWidget')
+FrmCenterlineDocWidget = lazy_modules.register('.frm_centerline_docwidget', 'FrmCenterlineDocWidget')
+FrmCrossSectionsDocWidget = lazy_modules.register('.frm_cross_sections_docwidget', 'FrmCrossSectionsDocWidget')
+FrmProfile = lazy_modules.register('.frm_profile', 'FrmProfile')
+FrmCrossSections = lazy_modules.register('.frm_cross_sections', 'FrmCrossSections')
+FrmImportDceLayer = lazy_modules.register('.frm_import_dce_layer', 'FrmImportDceLayer')
+FrmImportProjectLayer = lazy_modules.register('.frm_import_project_layer', 'FrmImportProjectLayer')
+FrmLayerPicker = lazy_modules.register('.frm_layer_picker', 'FrmLayerPicker')
+FrmLayerMetricDetails = lazy_modules.register('.frm_layer_metric_details', 'FrmLayerMetricDetails')
+FrmTOCLayerPicker = lazy_modules.register('.frm_toc_layer_picker', 'FrmTOCLayerPicker')
+FrmExportMetrics = lazy_modules.register('.frm_export_metrics', 'FrmExportMetrics')
+FrmExportLayer = lazy_modules.register('.frm_export_layer', 'FrmExportLayer')
+FrmQueryBuilder = lazy_modules.register('.frm_query_builder', 'FrmQueryBuilder')
+FrmEventPicker = lazy_modules.register('.frm_event_picker', 'FrmEventPicker')
+FrmExportProject = lazy_modules.register('.frm_export_project', 'FrmExportProject')
+FrmImportPhotos = lazy_modules.register('.frm_import_photos', 'FrmImportPhotos')
+FrmClimateEngineExplorer = lazy_modules.register('.frm_climate_engine_explorer', 'FrmClimateEngineExplorer')
+FrmClimateEngineMapLayer = lazy_modules.register('.frm_climate_engine_map_layer', 'FrmClimateEngineMapLayer')
+FrmBatchAttributeEditor = lazy_modules.register('.frm_batch_attribute_editor', 'FrmBatchAttributeEditor')
+FrmOrderByCenterline = lazy_modules.register('.frm_order_by_centerline', 'FrmOrderByCenterline')
+FrmLayerTypeDialog = lazy_modules.register('.frm_layer_type', 'FrmLayerTypeDialog')
+FrmBatchPourPoints = lazy_modules.register('.frm_batch_pour_points', 'FrmBatchPourPoints')
+frm_settings = lazy_modules.register('.frm_settings')
+
+browse_data_exchange = lazy_modules.register('..lib.data_exchange', 'browse_data_exchange')
+RSProject = lazy_modules.register('..lib.rs_project', 'RSProject')
+
+# Processing tasks and geoprocessing helpers
+OrderByLineTask = lazy_modules.register('..gp.order_by_line_task', 'OrderByLineTask')
+browse_raster = lazy_modules.register('..gp.feature_class_functions', 'browse_raster')
+browse_vector = lazy_modules.register('..gp.feature_class_functions', 'browse_vector')
+flip_line_geometry = lazy_modules.register('..gp.feature_class_functions', 'flip_line_geometry')
+import_existing = lazy_modules.register('..gp.feature_class_functions', 'import_existing')
+transform_geometry = lazy_modules.register('..gp.stream_stats', 'transform_geometry')
+get_state_from_coordinates = lazy_modules.register('..gp.stream_stats', 'get_state_from_coordinates')
+StreamStats = lazy_modules.register('..gp.stream_stats', 'StreamStats')
+StreamStatsBatchTask = lazy_modules.register('..gp.stream_stats_batch', 'StreamStatsBatchTask')
+ZonalMetricsTask = lazy_modules.register('..gp.zonal_statistics_task', 'ZonalMetricsTask')
+VicinityMapExportTask = lazy_modules.register('..gp.vicinity_map', 'VicinityMapExportTask')
 
 ORGANIZATION = 'Riverscapes'
 APPNAME = 'QRiS'
@@ -380,13 +390,14 @@ class QRiSDockWidget(QtWidgets.QDockWidget):
 
     def destroy_docwidget(self):
         settings = QtCore.QSettings(ORGANIZATION, APPNAME)
-        remove_layers = settings.value(REMOVE_LAYERS_ON_CLOSE, True, type=bool)
+        remove_layers = settings.value(frm_settings.REMOVE_LAYERS_ON_CLOSE, True, type=bool)
         if remove_layers is True:
             if self.map_manager is not None and self.qris_project is not None:
                 self.map_manager.remove_all_layers(self.qris_project.map_guid)                
         # If layers are removed, attempt a VACUUM and Flush to ensure the WAL is cleared.
         if self.qris_project and self.qris_project.project_file:
             self.qris_project.flush(vacuum=True)
+            self.qris_project.close()
 
         self.destroy_analysis_doc_widget()
         self.destroy_analysis_over_time_dock_widget()
@@ -613,6 +624,7 @@ class QRiSDockWidget(QtWidgets.QDockWidget):
                     self.add_context_menu_item(import_menu, 'Layer in Map', 'new', lambda: self.add_context_vector(model_item, DB_MODE_IMPORT_LAYER))
                 elif model_data == CATCHMENTS_MACHINE_CODE:
                     self.add_context_menu_item(self.menu, 'Run USGS StreamStats (US Only)', 'new', lambda: self.add_pour_point(model_item))
+                    self.add_context_menu_item(self.menu, 'Run USGS StreamStats for Point Layer (US Only)', 'new', self.add_batch_pour_points)
                 elif model_data == Profile.PROFILE_MACHINE_CODE:
                     import_menu = self.menu.addMenu('Import Profile From ...  ')
                     self.add_context_menu_item(import_menu, 'Existing Feature Class', 'new', lambda: self.add_profile(model_item, DB_MODE_IMPORT))
@@ -950,15 +962,13 @@ class QRiSDockWidget(QtWidgets.QDockWidget):
                     if 'hillshade_raster_id' in db_item.metadata['system']:
                         self.map_manager.build_raster_layer(self.qris_project.rasters[db_item.metadata['system']['hillshade_raster_id']])
         elif isinstance(db_item, Event):
-            [self.map_manager.build_event_single_layer(db_item, layer) for layer in db_item.event_layers]
+            self.map_manager.build_event_layers(db_item)
             [self.map_manager.build_raster_layer(raster) for raster in db_item.rasters]
         elif isinstance(db_item, Protocol):
             # determine parent node
             event_node = tree_node.parent()
             event: Event = event_node.data(QtCore.Qt.UserRole)
-            for event_layer in event.event_layers:
-                if event_layer.layer in db_item.layers:
-                    self.map_manager.build_event_single_layer(event, event_layer)
+            self.map_manager.build_event_layers(event, [event_layer for event_layer in event.event_layers if event_layer.layer in db_item.layers])
             [self.map_manager.build_raster_layer(raster) for raster in event.rasters]
         elif isinstance(db_item, EventLayer):
             # determine parent node
@@ -979,7 +989,7 @@ class QRiSDockWidget(QtWidgets.QDockWidget):
             [self.map_manager.build_raster_layer(raster) for raster in self.qris_project.surface_rasters().values()]
             [self.map_manager.build_raster_layer(raster) for raster in self.qris_project.scratch_rasters().values()]
             [self.map_manager.build_pour_point_map_layer(pour_point) for pour_point in self.qris_project.pour_points.values()]
-            [[self.map_manager.build_event_single_layer(event, event_layer) for event_layer in event.event_layers] for event in self.qris_project.events.values()]
+            [self.map_manager.build_event_layers(event) for event in self.qris_project.events.values()]
         elif isinstance(db_item, PourPoint):
             self.map_manager.build_pour_point_map_layer(db_item)
         elif isinstance(db_item, ScratchVector):
@@ -1283,7 +1293,7 @@ class QRiSDockWidget(QtWidgets.QDockWidget):
     def _open_settings_climate_engine_tab(self):
 
         settings = QtCore.QSettings(ORGANIZATION, APPNAME)
-        frm = FrmSettings(settings, self.qris_project)
+        frm = frm_settings.FrmSettings(settings, self.qris_project)
         frm.tabs.setCurrentWidget(frm.tabClimateEngine)
         result = frm.exec_()
         if result == QtWidgets.QDialog.Accepted and self.map_manager is not None:
@@ -2281,6 +2291,42 @@ class QRiSDockWidget(QtWidgets.QDockWidget):
             # Call the addTask() method to run the process asynchronously. Deploy with this method uncommented.
             QgsApplication.taskManager().addTask(stream_stats)
 
+    def add_batch_pour_points(self):
+
+        frm = FrmBatchPourPoints(self, self.qris_project)
+        result = frm.exec_()
+        if result != 0:
+
+            get_basin = frm.radBasin.isChecked() or frm.radFlowStats.isChecked()
+            get_flow = frm.radFlowStats.isChecked()
+
+            batch = StreamStatsBatchTask(self.qris_project.project_file,
+                                         frm.points,
+                                         get_basin,
+                                         get_flow,
+                                         frm.chkAddToMap.isChecked(),
+                                         metadata=frm.metadata_widget.get_data())
+            batch.batch_complete.connect(self.stream_stats_batch_complete)
+            QgsApplication.taskManager().addTask(batch)
+
+    @ pyqtSlot(list, bool)
+    def stream_stats_batch_complete(self, pour_points: list, add_to_map: bool):
+
+        if len(pour_points) == 0:
+            self.iface.messageBar().pushMessage('Stream Stats Error', 'No catchments were delineated. Check the QGIS Log for details.', level=Qgis.Warning, duration=5)
+            return
+
+        rootNode = self.model.invisibleRootItem()
+        project_node = self.add_child_to_project_tree(rootNode, self.qris_project)
+        inputs_node = self.add_child_to_project_tree(project_node, INPUTS_NODE_TAG)
+        context_node = self.add_child_to_project_tree(inputs_node, CONTEXT_NODE_TAG)
+        catchments_node = self.add_child_to_project_tree(context_node, CATCHMENTS_MACHINE_CODE)
+        for pour_point in pour_points:
+            self.qris_project.add_db_item(pour_point)
+            self.add_child_to_project_tree(catchments_node, pour_point, add_to_map)
+
+        self.iface.messageBar().pushMessage('Stream Stats Complete', f'Catchment delineation successful for {len(pour_points)} pour points. Check the QGIS Log for any points that failed.', level=Qgis.Info, duration=5)
+
     @ pyqtSlot(PourPoint or None, bool)
     def stream_stats_complete(self, pour_point: PourPoint, add_to_map: bool):
 
@@ -2395,6 +2441,10 @@ class QRiSDockWidget(QtWidgets.QDockWidget):
     def geospatial_summary(self, model_item, model_data: SampleFrame):
 
         zonal_metrics_task = ZonalMetricsTask(self.qris_project, model_data)
+        # Results are shown layer by layer as the task summarizes them
+        self.frm_geospatial_metrics = FrmGeospatialMetrics(self, self.qris_project, model_data, {}, {}, zonal_metrics_task)
+        self.frm_geospatial_metrics.setModal(False)
+        self.frm_geospatial_metrics.show()
         # -- DEBUG --
         # zonal_statistics_task.run()
         # -- PRODUCTION --
@@ -2685,10 +2735,7 @@ class QRiSDockWidget(QtWidgets.QDockWidget):
     @ pyqtSlot(bool, SampleFrame, dict or None, dict or None)
     def geospatial_summary_complete(self, result, model_data, polygons, data):
 
-        if result is True:
-            frm = FrmGeospatialMetrics(self, self.qris_project, model_data, polygons, data)
-            frm.exec_()
-        else:
+        if result is not True:
             self.iface.messageBar().pushMessage('Zonal Statistics Error', 'Check the QGIS Log for details.', level=Qgis.Warning, duration=5)
 
     def delete_item(self, model_item: QtGui.QStandardItem, db_item: DBItem):
@@ -1,11 +1,12 @@
 import os
+from typing import List
 
 from qgis.PyQt import QtWidgets
 from qgis.utils import Qgis
 from qgis.gui import QgisInterface
 
 from ..model.sample_frame import get_sample_frame_ids
-from ..model.metric_value import MetricValue, load_metric_values
+from ..model.metric_value import MetricValue, load_metric_values, current_values_as_strings
 from ..model.analysis import Analysis
 from ..model.project import Project
 from ..model.metric import Metric
@@ -112,6 +113,36 @@ class FrmExportMetrics(QtWidgets.QDialog):
         if is_intrinsic:
             data_capture_events = [None]
         for analysis, sample_frame_ids in self.analyses.items():
+            # Column headers and display units are the same for every row of the analysis
+            columns = []
+            for analysis_metric in analysis.analysis_metrics.values():
+                metric: Metric = analysis_metric.metric
+
+                # --- Consistent display unit logic ---
+                display_unit = analysis.units.get(metric.unit_type, None)
+                if metric.normalized and display_unit not in [None, 'ratio', 'count']:
+                    display_unit = analysis.units['distance']
+                display_unit_for_value = None if display_unit in ['count', 'ratio'] else display_unit
+
+                # --- Header logic: always use metric.unit_type for numerator ---
+                # Get the actual unit string for numerator
+                unit_str_raw = analysis.units.get(metric.unit_type, None)
+                numerator = short_unit_name(unit_str_raw) if unit_str_raw not in [None, 'count', 'ratio', 'percent'] else (
+                    '#' if unit_str_raw == 'count' else
+                    '%' if unit_str_raw == 'percent' else
+                    '')
+
+                # For normalized metrics, use the actual normalization unit string
+                if metric.normalized and unit_str_raw not in [None, 'ratio']:
+                    normalization_unit_raw = analysis.units.get('distance', 'm')
+                    denominator = short_unit_name(normalization_unit_raw)
+                    unit_str = f'{numerator}/{denominator}' if numerator else f'/{denominator}'
+                else:
+                    unit_str = numerator
+
+                metric_name = f'{metric.name} ({unit_str})' if unit_str else metric.name
+                columns.append((metric, metric_name, display_unit_for_value))
+
             sample_frame_features = list(sample_frame_ids.values()) if self.rdoAllSF.isChecked() else [self.current_sf]
             for sample_frame_feature in sample_frame_features:
                 for data_capture_event in data_capture_events:
@@ -129,40 +160,16 @@ class FrmExportMetrics(QtWidgets.QDialog):
                         'sample_frame_feature_name': sample_frame_feature.name,
                         'data_capture_event_name': data_capture_event.name if data_capture_event else 'Intrinsic'
                     }
-                    for analysis_metric in analysis.analysis_metrics.values():
-                        metric: Metric = analysis_metric.metric
-
-                        # --- Consistent display unit logic ---
-                        display_unit = analysis.units.get(metric.unit_type, None)
-                        if metric.normalized and display_unit not in [None, 'ratio', 'count']:
-                            display_unit = analysis.units['distance']
-                        display_unit_for_value = None if display_unit in ['count', 'ratio'] else display_unit
-
-                        # --- Header logic: always use metric.unit_type for numerator ---
-                        # Get the actual unit string for numerator
-                        unit_str_raw = analysis.units.get(metric.unit_type, None)
-                        numerator = short_unit_name(unit_str_raw) if unit_str_raw not in [None, 'count', 'ratio', 'percent'] else (
-                            '#' if unit_str_raw == 'count' else
-                            '%' if unit_str_raw == 'percent' else
-                            '')
-
-                        # For normalized metrics, use the actual normalization unit string
-                        if metric.normalized and unit_str_raw not in [None, 'ratio']:
-                            normalization_unit_raw = analysis.units.get('distance', 'm')
-                            denominator = short_unit_name(normalization_unit_raw)
-                            unit_str = f'{numerator}/{denominator}' if numerator else f'/{denominator}'
-                        else:
-                            unit_str = numerator
-
-                        metric_name = f'{metric.name} ({unit_str})' if unit_str else metric.name
-
-                        metric_value: MetricValue = metric_values.get(
-                            metric.id,
-                            MetricValue(metric, None, None, False, None, None, metric.default_unit_id, None)
-                        )
-
-                        # --- Use current_value_as_string for formatting and conversion ---
-                        value = metric_value.manual_value if metric_value.is_manual == 1 else metric_value.current_value_as_string(display_unit_for_value)
+
+                    row_values: List[MetricValue] = [
+                        metric_values.get(metric.id, MetricValue(metric, None, None, False, None, None, metric.default_unit_id, None))
+                        for metric, _metric_name, _display_unit in columns
+                    ]
+                    # --- Convert and format the whole row at once ---
+                    value_texts = current_values_as_strings(row_values, [display_unit for _metric, _metric_name, display_unit in columns])
+
+                    for (metric, metric_name, _display_unit), metric_value, value_text in zip(columns, row_values, value_texts):
+                        value = metric_value.manual_value if metric_value.is_manual == 1 else value_text
                         value = value if value is not None else ''
                         values.update({metric_name: value})
                         
@@ -22,6 +22,7 @@ from ..model.scratch_vector import ScratchVector, scratch_gpkg_path
 from ..model.sample_frame import SampleFrame
 from ..model.attachment import Attachment
 from ..lib.rs_project import RSProject
+from ..gp.export_project import prune_export_geopackage
 
 from .utilities import add_standard_form_buttons, message_box
 
@@ -599,46 +600,18 @@ class FrmExportProject(QtWidgets.QDialog):
                     keep_layers['attachments'] = {'id_field': 'attachment_id', 'id_values': []}
                 keep_layers['attachments']['id_values'].append(str(attachment.id))
 
-        # open the geopackage using ogr
-        ds_gpkg: ogr.DataSource = ogr.Open(out_geopackage, 1)
-        for layer in ['analyses', 'catchments', 'cross_sections', 'cross_section_features', 'dce_lines', 'dce_points', 'dce_polygons', 'events', 'event_layers', 'pour_points', 'profile_centerlines', 'profile_features', 'profiles', 'rasters', 'scratch_vectors', 'sample_frame_features', 'sample_frames', 'attachments', 'planning_containers']:
-            # get the layer
-            lyr: ogr.Layer = ds_gpkg.GetLayerByName(layer)
-            # remove all features that are not in the keep list
-            if layer in keep_layers:
-                keep_layer = keep_layers[layer]
-                lyr.SetAttributeFilter(f"{keep_layer['id_field']} NOT IN ({', '.join(keep_layer['id_values'])})")
-            if lyr.GetFeatureCount() != 0:
-                for feat in lyr:
-                    lyr.DeleteFeature(feat.GetFID())
-            lyr.SetAttributeFilter(None)
-            lyr = None
-        ds_gpkg = None
-
-        # use sqlite3 to vacuum the geopackage
-        with sqlite3.connect(out_geopackage) as conn:
-
-            # Delete orphaned records
-            curs = conn.cursor()
-            curs.execute("DELETE FROM event_rasters WHERE event_id NOT IN (SELECT id FROM events)")
-            curs.execute("DELETE FROM planning_container_events WHERE planning_container_id NOT IN (SELECT id FROM planning_containers)")
-            curs.execute("DELETE FROM metric_values WHERE analysis_id NOT IN (SELECT id FROM analyses)")
-            curs.execute("DELETE FROM analysis_metrics WHERE analysis_id NOT IN (SELECT id FROM analyses)")
-            conn.commit()  # Commit the transaction before executing VACUUM
-
-            # Write project name and description
-            project_name = self.txt_rs_name.text()
-            project_description = self.txt_description.toPlainText()
-            conn.execute("UPDATE projects SET name = ?, description = ? WHERE id = 1", (project_name, project_description))
-            conn.commit()
-            conn.execute("VACUUM")
+        prune_export_geopackage(out_geopackage, keep_layers, self.txt_rs_name.text(), self.txt_description.toPlainText())
 
         try:
             # Load the new project from the exported geopackage
             exported_project = QRiSProject(out_geopackage)
-            # Create the RSProject and write the project.rs.xml
-            rs_project = RSProject(exported_project)
-            rs_project.write()
+            try:
+                # Create the RSProject and write the project.rs.xml
+                rs_project = RSProject(exported_project)
+                rs_project.write()
+            finally:
+                # Release the pooled connections and checkpoint thread registered for the exported geopackage
+                exported_project.close()
         except Exception as e:
             # We don't want to fail the export if the xml generation fails
             # But we should probably log it
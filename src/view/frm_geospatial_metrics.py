@@ -5,19 +5,23 @@ from .frm_geospatial_metrics_export import FrmGeospatialMetricsExport
 
 from ..model.project import Project
 from ..model.sample_frame import SampleFrame
+from ..gp.zonal_statistics_task import ZonalMetricsTask
 
 from .utilities import add_standard_form_buttons
 
 
 class FrmGeospatialMetrics(QtWidgets.QDialog):
 
-    def __init__(self, parent, project: Project, mask: SampleFrame, polygons: dict, metrics: dict):
+    def __init__(self, parent, project: Project, mask: SampleFrame, polygons: dict, metrics: dict, task: ZonalMetricsTask = None):
         super().__init__(parent)
 
         self.qris_project = project
         self.qris_mask = mask
         self.metrics = metrics
         self.polygons = polygons
+        self.task = task
+        # {layer name: layer tree item}
+        self.layer_items = {}
 
         self.setupUi()
 
@@ -27,6 +31,18 @@ class FrmGeospatialMetrics(QtWidgets.QDialog):
 
         self.load_tree()
 
+        if self.task is not None:
+            # Results arrive layer by layer while the task runs
+            self.cmdExport.setEnabled(False)
+            self.lblStatus.setText('Loading sample frame polygons...')
+            self.task.polygons_loaded.connect(self.on_polygons_loaded)
+            self.task.layer_status.connect(self.on_layer_status)
+            self.task.layer_complete.connect(self.on_layer_complete)
+            self.task.on_complete.connect(self.on_task_complete)
+        else:
+            self.lblStatus.setVisible(False)
+            self.cmdCancelLayer.setVisible(False)
+
     def load_tree(self):
 
         # The data are organized layer then polygon. Need to invert if necessary
@@ -39,32 +55,103 @@ class FrmGeospatialMetrics(QtWidgets.QDialog):
         self.treeModel = QtGui.QStandardItemModel()
         self.treeModel.setColumnCount(2)
         self.treeModel.setHorizontalHeaderLabels(['Layer / Polygon / Metric', 'Value'])
+        self.layer_items = {}
 
         for layer_name, values in display_data.items():
-            layer_item = QtGui.QStandardItem(layer_name)
-            for polygon_id, poly_values in values.items():
-                polygon_label = self.polygons[polygon_id]['display_label']
-                poly_item = QtGui.QStandardItem(polygon_label)
-                layer_item.appendRow(poly_item)
-
-                for metric_name, metric_value in poly_values.items():
-                    metric_item = QtGui.QStandardItem(metric_name)
-                    if metric_value is None:
-                        metric_value_str = ''
-                    elif isinstance(metric_value, float):
-                        metric_value_str = '{:,.2f}'.format(metric_value)
-                    else:
-                        metric_value_str = '{:,}'.format(metric_value)
-                    metric_value_item = QtGui.QStandardItem(str(metric_value_str))
-                    poly_item.appendRow([metric_item, metric_value_item])
-
-                    # metric_item.appendColumn([metric_value_item])
-
-            self.treeModel.appendRow(layer_item)
+            self.add_layer_values(layer_name, values)
 
         self.tree.setModel(self.treeModel)
+        self.tree.selectionModel().currentChanged.connect(self.on_current_changed)
         self.tree.expandAll()
 
+    def add_layer_item(self, layer_name: str, status: str = None):
+
+        layer_item = QtGui.QStandardItem(layer_name)
+        status_item = QtGui.QStandardItem(status or '')
+        self.treeModel.appendRow([layer_item, status_item])
+        self.layer_items[layer_name] = layer_item
+        return layer_item
+
+    def add_layer_values(self, layer_name: str, values: dict):
+
+        layer_item = self.layer_items.get(layer_name, None)
+        if layer_item is None:
+            layer_item = self.add_layer_item(layer_name)
+
+        for polygon_id, poly_values in values.items():
+            polygon_label = self.polygons[polygon_id]['display_label']
+            poly_item = QtGui.QStandardItem(polygon_label)
+            layer_item.appendRow(poly_item)
+
+            for metric_name, metric_value in poly_values.items():
+                metric_item = QtGui.QStandardItem(metric_name)
+                if metric_value is None:
+                    metric_value_str = ''
+                elif isinstance(metric_value, float):
+                    metric_value_str = '{:,.2f}'.format(metric_value)
+                else:
+                    metric_value_str = '{:,}'.format(metric_value)
+                metric_value_item = QtGui.QStandardItem(str(metric_value_str))
+                poly_item.appendRow([metric_item, metric_value_item])
+
+                # metric_item.appendColumn([metric_value_item])
+
+    def set_layer_status(self, layer_name: str, status: str):
+
+        layer_item = self.layer_items.get(layer_name, None)
+        if layer_item is None:
+            return
+        self.treeModel.item(layer_item.row(), 1).setText(status)
+        self.on_current_changed(self.tree.currentIndex(), None)
+
+    def on_polygons_loaded(self, polygons: dict, layer_names: list):
+
+        self.polygons = polygons
+        for layer_name in layer_names:
+            if layer_name not in self.layer_items:
+                self.add_layer_item(layer_name, ZonalMetricsTask.LAYER_QUEUED)
+        self.lblStatus.setText(f'Summarizing {len(layer_names)} layers for {len(polygons)} polygons...')
+
+    def on_layer_status(self, layer_name: str, status: str):
+
+        if status == ZonalMetricsTask.LAYER_COMPLETE:
+            status = ''
+        self.set_layer_status(layer_name, status)
+
+    def on_layer_complete(self, layer_name: str, values: dict):
+
+        self.metrics[layer_name] = values
+        self.add_layer_values(layer_name, values)
+        self.tree.expand(self.layer_items[layer_name].index())
+        self.lblStatus.setText(f'{len(self.metrics)} of {len(self.layer_items)} layers summarized...')
+
+    def on_task_complete(self, result: bool, mask, polygons, data):
+
+        self.cmdExport.setEnabled(len(self.metrics) > 0)
+        self.cmdCancelLayer.setEnabled(False)
+        if result is True:
+            self.lblStatus.setText(f'{len(self.metrics)} of {len(self.layer_items)} layers summarized.')
+        else:
+            self.lblStatus.setText('Zonal statistics did not complete. Check the QGIS Log for details.')
+        self.task = None
+
+    def on_current_changed(self, current, previous):
+
+        running = self.task is not None
+        layer_item = self.treeModel.itemFromIndex(current.siblingAtColumn(0)) if current.isValid() else None
+        status = self.treeModel.item(layer_item.row(), 1).text() if layer_item is not None and layer_item.parent() is None else None
+        self.cmdCancelLayer.setEnabled(running and status in (ZonalMetricsTask.LAYER_QUEUED, ZonalMetricsTask.LAYER_PROCESSING))
+
+    def on_cancel_layer(self):
+
+        current = self.tree.currentIndex()
+        if self.task is None or not current.isValid():
+            return
+        layer_item = self.treeModel.itemFromIndex(current.siblingAtColumn(0))
+        if layer_item is not None and layer_item.parent() is None:
+            self.task.cancel_layer(layer_item.text())
+            self.cmdCancelLayer.setEnabled(False)
+
     def on_export(self):
         frm = FrmGeospatialMetricsExport(self, self.qris_project, self.qris_mask, self.polygons, self.metrics)
         frm.exec_()
@@ -78,6 +165,13 @@ class FrmGeospatialMetrics(QtWidgets.QDialog):
 
         super().accept()
 
+    def done(self, result):
+
+        # Closing the form stops the layers that are still being summarized
+        if self.task is not None:
+            self.task.cancel()
+        super().done(result)
+
     def setupUi(self):
 
         self.resize(500, 300)
@@ -112,7 +206,15 @@ class FrmGeospatialMetrics(QtWidgets.QDialog):
         # self.cmdSettings.clicked.connect(self.on_settings)
         # self.horizCommands.addWidget(self.cmdSettings)
 
+        self.cmdCancelLayer = QtWidgets.QPushButton('Cancel Layer')
+        self.cmdCancelLayer.setEnabled(False)
+        self.cmdCancelLayer.clicked.connect(self.on_cancel_layer)
+        self.horizCommands.addWidget(self.cmdCancelLayer)
+
         self.tree = QtWidgets.QTreeView()
         self.vert.addWidget(self.tree)
 
+        self.lblStatus = QtWidgets.QLabel()
+        self.vert.addWidget(self.lblStatus)
+
         self.vert.addLayout(add_standard_form_buttons(self, 'zonal-statistics'))
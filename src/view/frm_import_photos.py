@@ -1,16 +1,14 @@
 import os
-import json
-import shutil
 
 from qgis.PyQt import QtWidgets
 from qgis.PyQt.QtGui import QPixmap
-from qgis.PyQt.QtCore import Qt, QDateTime
+from qgis.PyQt.QtCore import Qt, pyqtSlot
 
-from qgis import processing
-from qgis.core import QgsProcessingContext, QgsMessageLog, Qgis, QgsVectorLayer, QgsVectorLayerUtils
+from qgis.core import QgsApplication
 
 from ..model.event_layer import EventLayer
 from ..model.project import Project
+from ..gp.import_photos_task import ImportPhotosTask, is_photo, list_photos
 
 from .utilities import add_standard_form_buttons
 
@@ -21,6 +19,7 @@ class FrmImportPhotos(QtWidgets.QDialog):
 
         self.qris_project = qris_project
         self.event_layer = event_layer
+        self.import_task = None
 
         self.setWindowTitle("Import Photos")
         self.setModal(True)
@@ -46,7 +45,7 @@ class FrmImportPhotos(QtWidgets.QDialog):
         # Show first photo in folder as preview
         files = os.listdir(folder_path)
         for file in files:
-            if file.endswith(".jpg") or file.endswith(".jpeg") or file.endswith(".png"):
+            if is_photo(file):
                 file_path = os.path.join(folder_path, file)
                 pixmap = QPixmap(file_path)
                 self.lbl_preview.setPixmap(pixmap.scaled(300, 300, Qt.KeepAspectRatio))
@@ -62,86 +61,32 @@ class FrmImportPhotos(QtWidgets.QDialog):
         if not os.path.isdir(folder_path):
             return
 
-        # Create dce photo folder
-        dce_photo_folder = os.path.join(os.path.dirname(self.qris_project.project_file), "photos", f'dce_{str(self.event_layer.event_id).zfill(3)}')
-        if not os.path.isdir(dce_photo_folder):
-            os.makedirs(dce_photo_folder)
+        if len(list_photos(folder_path)) == 0:
+            QtWidgets.QMessageBox.warning(self, "No Photos", "The selected folder does not contain any jpg, jpeg or png photos.")
+            return
 
-        # get a list of existing photos in the dce_photo_folder (could be 0)
-        self.existing_photos = []
-        for file in os.listdir(dce_photo_folder):
-            if file.endswith(".jpg") or file.endswith(".jpeg") or file.endswith(".png"):
-                self.existing_photos.append(file)
+        # Copying, EXIF extraction and thumbnails run in the background
+        self.import_task = ImportPhotosTask(self.qris_project.project_file, folder_path, self.event_layer.event_id, self.event_layer.layer.id)
+        self.import_task.import_complete.connect(self.on_import_complete)
+        self.setEnabled(False)
+        QgsApplication.taskManager().addTask(self.import_task)
 
-        # Copy photos to dce photo folder using naming convention YYYY_MM_DD_photo_number (e.g. 2021_01_01_0001)
-        files = os.listdir(folder_path)
-        photo_number = 1
-        for file in files:
-            if file.endswith(".jpg") or file.endswith(".jpeg") or file.endswith(".png"):
-                file_path = os.path.join(folder_path, file)
-                # just use the existing file name for now
-                file_name = os.path.basename(file_path)
-                new_file_path = os.path.join(dce_photo_folder, file_name)
-                shutil.copy(file_path, new_file_path)
-                photo_number += 1
-
-        # use the processing algorithm to create the photo layer
-        context = QgsProcessingContext()
-        params = {
-            'FOLDER': dce_photo_folder,
-            'RECURSIVE': False,
-            # 'OUTPUT': """ogr:dbname=\'D:/NAR_Data/QRIS/photo_experiment/photos.gpkg\' table="Photos" (geom)"""
-            'OUTPUT': 'memory:Photos'
-        }
-
-        result = processing.run("native:importphotos", params)
-        self.task_finished(context, True, result)
-
-        # return super().accept()
-
-    def task_finished(self, context: QgsProcessingContext, successful, results):
-        if not successful:
-            QgsMessageLog.logMessage('Task finished unsucessfully',
-                                     "Import Photos Qgis Processing",
-                                     Qgis.Warning)
-        output_layer = results['OUTPUT']
-
-        if output_layer.isValid():
-            working_layer: QgsVectorLayer = output_layer  # context.takeResultLayer(output_layer.id())
-
-            # we need to copy the features from the working layer to the event layer
-            # we need to set the event_id field to the event_id of the event layer
-            # we need to add the attributes as a metadata json field
-            out_layer = QgsVectorLayer(f"{self.qris_project.project_file}|layername=dce_points", "dce_points", "ogr")
-            new_features = []
-            for feature in working_layer.getFeatures():
-                # check if the photo already exists in the event layer
-                if os.path.basename(feature['photo']) in self.existing_photos:
-                    continue
-                # take all the attributes from the working layer and turn them into a json string
-                metadata = {}
-                for field in working_layer.fields():
-                    data = feature[field.name()]
-                    if data is not None:
-                        name = field.name()
-                        if isinstance(data, QDateTime):
-                            data = data.toString(Qt.ISODate)
-                        if name == 'photo':
-                            metadata['Photo Path'] = os.path.basename(data)
-                            # data = data.replace('\\', '/')
-                            # name = "Photo Path"
-                    metadata[name] = data
-                metadata['Observation Type'] = "Photo Observation"
-                metadata_json = json.dumps(metadata)
-                # create a new feature in the event layer
-                new_feature = QgsVectorLayerUtils.createFeature(out_layer)
-                new_feature.setGeometry(feature.geometry())
-                new_feature.setAttribute('event_id', self.event_layer.event_id)
-                new_feature.setAttribute('event_layer_id', self.event_layer.layer.id)
-                new_feature.setAttribute('metadata', metadata_json)
-                new_features.append(new_feature)
-            out_layer.dataProvider().addFeatures(new_features)
-            out_layer.updateExtents()
+    @pyqtSlot(bool, int, int, int)
+    def on_import_complete(self, result: bool, imported: int, duplicates: int, invalid: int):
+
+        self.setEnabled(True)
+        self.import_task = None
+        if result is not True:
+            QtWidgets.QMessageBox.warning(self, "Import Photos", "The photos could not be imported. Check the QGIS log for details.")
+            return
+
+        if duplicates > 0 or invalid > 0:
+            message = f"{imported} photo(s) imported."
+            if duplicates > 0:
+                message += f" {duplicates} photo(s) were skipped because they are already part of this data capture event."
+            if invalid > 0:
+                message += f" {invalid} photo(s) were not added to the layer because they do not have a GPS location."
+            QtWidgets.QMessageBox.information(self, "Import Photos", message)
 
         return super().accept()
 
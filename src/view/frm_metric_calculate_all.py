@@ -1,14 +1,37 @@
 from qgis.PyQt import QtWidgets
 
 from .utilities import add_standard_form_buttons
+from ..gp.metric_cache import metric_cache_stats, purge_metric_cache
 
 
 class FrmCalculateAllMetrics(QtWidgets.QDialog):
 
-    def __init__(self, parent):
+    def __init__(self, parent, project_file: str = None):
         super(FrmCalculateAllMetrics, self).__init__(parent)
+        self.project_file = project_file
         self.setWindowTitle('Calculate All Metrics')
         self.setupUi()
+        self.load_cache_stats()
+
+    def load_cache_stats(self):
+
+        if self.project_file is None:
+            self.grpCache.setVisible(False)
+            return
+
+        stats = metric_cache_stats(self.project_file)
+        self.lblCacheStats.setText(f'{stats["entries"]:,} cached values for {stats["metrics"]} metrics, reused {stats["hits"]:,} times ({stats["size"] / 1024:,.0f} KB)')
+        self.cmdPurgeCache.setEnabled(stats['entries'] > 0)
+
+    def cmdPurgeCache_clicked(self):
+
+        result = QtWidgets.QMessageBox.question(self, 'Purge Metric Cache', 'Delete all cached metric values for this project? Values already stored in analyses are not affected.', QtWidgets.QMessageBox.Yes | QtWidgets.QMessageBox.No, QtWidgets.QMessageBox.No)
+        if result != QtWidgets.QMessageBox.Yes:
+            return
+
+        deleted = purge_metric_cache(self.project_file)
+        QtWidgets.QMessageBox.information(self, 'Purge Metric Cache', f'{deleted:,} cached metric values deleted.')
+        self.load_cache_stats()
 
     def accept(self):
 
@@ -57,6 +80,22 @@ class FrmCalculateAllMetrics(QtWidgets.QDialog):
         self.grpMetricValues.layout().addWidget(self.chkForceActive)
         self.vert.addWidget(self.grpMetricValues)
 
+        self.grpCache = QtWidgets.QGroupBox('Metric Result Cache')
+        self.grpCache.setLayout(QtWidgets.QVBoxLayout())
+        self.chkUseCache = QtWidgets.QCheckBox('Reuse values already calculated from identical inputs')
+        self.chkUseCache.setToolTip('Values calculated by any analysis in this project for the same metric, sample frame feature, data capture event and inputs are reused instead of being recalculated')
+        self.chkUseCache.setChecked(True)
+        self.grpCache.layout().addWidget(self.chkUseCache)
+        self.horizCache = QtWidgets.QHBoxLayout()
+        self.lblCacheStats = QtWidgets.QLabel()
+        self.horizCache.addWidget(self.lblCacheStats, 1)
+        self.cmdPurgeCache = QtWidgets.QPushButton('Purge Cache')
+        self.cmdPurgeCache.setToolTip('Delete all cached metric values for this project')
+        self.cmdPurgeCache.clicked.connect(self.cmdPurgeCache_clicked)
+        self.horizCache.addWidget(self.cmdPurgeCache)
+        self.grpCache.layout().addLayout(self.horizCache)
+        self.vert.addWidget(self.grpCache)
+
         self.vert.addSpacerItem(QtWidgets.QSpacerItem(0, 0, QtWidgets.QSizePolicy.Minimum, QtWidgets.QSizePolicy.Expanding))
 
         self.vert.addLayout(add_standard_form_buttons(self, 'analyses'))
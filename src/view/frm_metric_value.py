@@ -13,6 +13,8 @@ from .frm_layer_metric_details import FrmLayerMetricDetails
 from .widgets.metadata import MetadataWidget
 from ..lib.unit_conversion import convert_units, convert_count_per_length, convert_count_per_area, unit_types
 from ..gp.analysis_metrics_task import AnalysisMetricsTask
+from ..QRiS.settings import Settings
+from .frm_settings import METRIC_PROFILING_ENABLED
 
 UNCERTAINTY_NONE = 'None'
 UNCERTAINTY_PLUS_MINUS = 'Plus/Minus'
@@ -395,6 +397,7 @@ class FrmMetricValue(QtWidgets.QDialog):
             [self.metric_value.metric.id],
             overwrite_existing=True,
             force_active=True,
+            profile=Settings().getValue(METRIC_PROFILING_ENABLED),
         )
         self.metrics_task.on_complete.connect(self.on_metrics_task_complete)
         self.metrics_task.progressChanged.connect(self.on_metrics_task_progress)
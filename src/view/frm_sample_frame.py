@@ -22,6 +22,7 @@ from ..gp.feature_class_functions import layer_path_parser
 from ..gp.import_feature_class import ImportFeatureClass, ImportFieldMap
 from ..gp.import_temp_layer import ImportMapLayer
 from ..gp.sample_frame_task import SampleFrameTask
+from ..gp.sample_frame_geometry import update_sample_frame_geometries
 from ..gp.order_by_line_task import OrderByLineTask
 
 from .widgets.metadata import MetadataWidget
@@ -289,6 +290,10 @@ class FrmSampleFrame(QDialog):
             if self.tab_inputs is not None and isinstance(self.tab_inputs, SampleFrameInputs):
                 if self.tab_inputs.cboTopologyField.currentIndex() > 0:
                     self._resolve_topology()
+            try:
+                update_sample_frame_geometries(self.qris_project.project_file, self.sample_frame.id)
+            except Exception as ex:
+                QgsApplication.messageLog().logMessage(f'Error storing sample frame geometries: {str(ex)}', 'QRIS', level=Qgis.Warning)
             self.iface.messageBar().pushMessage(f'Sample Frame Imported', f'Sample Frame "{self.txtName.text()}" has been created successfully.', level=Qgis.Success, duration=5)
             self.complete.emit(True)
             super(FrmSampleFrame, self).accept()
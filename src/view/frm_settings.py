@@ -6,6 +6,7 @@ from ..model.project import Project
 from ..lib.climate_engine import clear_api_key, get_api_key, open_climate_engine_website
 from ..QRiS.protocol_parser import LOCAL_PROTOCOL_FOLDER, SHOW_EXPERIMENTAL_PROTOCOLS
 from ..QRiS.settings import Settings
+from ..QRiS.lazy_loader import STARTUP_DIAGNOSTICS_KEY
 from ..lib.font_tools import select_chart_font, sanitize_chart_font
 
 from .frm_api_key import FrmApiKey
@@ -18,6 +19,7 @@ REMOVE_LAYERS_ON_CLOSE = 'remove_layers_on_close'
 TELEMETRY_ENABLED_KEY = 'telemetryEnabled'
 DEFAULT_CHART_FONT = 'default_chart_font'
 SELECTION_COLOR_OVERRIDE_ENABLED = 'selectionColorOverrideEnabled'
+METRIC_PROFILING_ENABLED = 'metricProfilingEnabled'
 
 default_dock_widget_location = 'right'
 
@@ -74,6 +76,8 @@ class FrmSettings(QDialog):
 
         self.chk_telemetry.setChecked(Settings().getValue(TELEMETRY_ENABLED_KEY))
         self.chk_selection_color_override.setChecked(Settings().getValue(SELECTION_COLOR_OVERRIDE_ENABLED))
+        self.chk_metric_profiling.setChecked(Settings().getValue(METRIC_PROFILING_ENABLED))
+        self.chk_startup_diagnostics.setChecked(Settings().getValue(STARTUP_DIAGNOSTICS_KEY))
 
         self.default_chart_font = get_default_chart_font(self.settings)
         self.update_chart_font_button_text()
@@ -107,6 +111,8 @@ class FrmSettings(QDialog):
 
         Settings().setValue(TELEMETRY_ENABLED_KEY, self.chk_telemetry.isChecked())
         Settings().setValue(SELECTION_COLOR_OVERRIDE_ENABLED, self.chk_selection_color_override.isChecked())
+        Settings().setValue(METRIC_PROFILING_ENABLED, self.chk_metric_profiling.isChecked())
+        Settings().setValue(STARTUP_DIAGNOSTICS_KEY, self.chk_startup_diagnostics.isChecked())
 
         super().accept()
 
@@ -207,6 +213,14 @@ class FrmSettings(QDialog):
         self.chk_selection_color_override = QCheckBox("Override feature selection color for QRiS layers")
         self.chk_selection_color_override.setToolTip("Uses white (#ffffff) with 30% transparency so selected features remain visible while editing.")
         self.vertGeneral.addWidget(self.chk_selection_color_override)
+
+        self.chk_metric_profiling = QCheckBox("Profile analysis metric calculations")
+        self.chk_metric_profiling.setToolTip("Records the time spent in each metric calculation, feature read, raster read and database write. The profile is written to the QRiS message log and to a JSON file in the project profiling folder.")
+        self.vertGeneral.addWidget(self.chk_metric_profiling)
+
+        self.chk_startup_diagnostics = QCheckBox("Log plugin startup import times")
+        self.chk_startup_diagnostics.setToolTip("Writes the time taken to import each QRiS module during QGIS startup to the QRiS message log. Takes effect the next time QGIS starts.")
+        self.vertGeneral.addWidget(self.chk_startup_diagnostics)
         
         self.grid = QGridLayout()
 
@@ -1,7 +1,9 @@
+import os
+
 from qgis.PyQt import QtCore, QtWidgets
-from qgis.PyQt.QtCore import pyqtSignal
+from qgis.PyQt.QtCore import pyqtSignal, pyqtSlot
 
-from qgis.core import QgsRasterBandStats
+from qgis.core import QgsApplication, QgsRasterBandStats
 
 from ..model.scratch_vector import ScratchVector
 from ..model.raster import Raster, RASTER_SLIDER_MACHINE_CODE
@@ -12,6 +14,11 @@ from .frm_slider_scratch_vector import FrmSliderScratchVector
 from .widgets.double_slider import DoubleSlider
 from .utilities import add_help_button
 from ..QRiS.qris_map_manager import QRisMapManager
+from ..gp.hypsometry import Hypsometry, HypsometryTask, load_hypsometry, threshold_preview
+
+RASTER_SLIDER_PREVIEW_MACHINE_CODE = 'RASTER_SLIDER_PREVIEW'
+# Pixels sampled for the initial min/max while the hypsometry cache is being built
+STATISTICS_SAMPLE_SIZE = 250000
 
 
 class FrmSlider(QtWidgets.QDockWidget):
@@ -29,36 +36,123 @@ class FrmSlider(QtWidgets.QDockWidget):
         self.raster_layer = None
         self.scratch_vector = None
         self.max = None
+        self.hypsometry: Hypsometry = None
+        self.hypsometry_task = None
+        self.preview_path = None
 
         self.optAbove.toggled.connect(self.invert_values)
 
     def configure_raster(self, raster: Raster):
 
+        self.cancel_hypsometry()
         self.raster = raster
         self.txtSurface.setText(raster.name)
+        self.remove_preview()
         self.raster_layer = self.map_manager.build_raster_slider_layer(raster)
-        min = self.raster_layer.dataProvider().bandStatistics(1, QgsRasterBandStats.Min, self.raster_layer.extent(), 0).minimumValue
-        max = self.raster_layer.dataProvider().bandStatistics(1, QgsRasterBandStats.Max, self.raster_layer.extent(), 0).maximumValue
-        self.max = max
-        self.valElevation.setMinimum(min)
-        self.valElevation.setMaximum(max)
+
+        raster_path = self.project.get_absolute_path(raster.path)
+        self.hypsometry = load_hypsometry(raster_path)
+        if self.hypsometry is not None:
+            min, max = self.hypsometry.minimum, self.hypsometry.maximum
+        else:
+            # Sampled statistics keep the form responsive while the full histogram is built
+            stats = self.raster_layer.dataProvider().bandStatistics(1, QgsRasterBandStats.Min | QgsRasterBandStats.Max, self.raster_layer.extent(), STATISTICS_SAMPLE_SIZE)
+            min, max = stats.minimumValue, stats.maximumValue
+            self.lblArea.setText('Calculating area...')
+            self.hypsometry_task = HypsometryTask(raster_path)
+            self.hypsometry_task.hypsometry_complete.connect(self.on_hypsometry_complete)
+            QgsApplication.taskManager().addTask(self.hypsometry_task)
+
+        self.set_range(min, max)
         self.valElevation.setValue(min)
         self.sliderElevationChange(self.valElevation.value())
 
+    def set_range(self, min: float, max: float):
+        self.max = max
+        self.valElevation.setMinimum(min)
+        self.valElevation.setMaximum(max)
         self.slider.setMinimum(min)
         self.slider.setMaximum(max)
 
+    def cancel_hypsometry(self):
+
+        if self.hypsometry_task is not None:
+            self.hypsometry_task.hypsometry_complete.disconnect(self.on_hypsometry_complete)
+            self.hypsometry_task.cancel()
+            self.hypsometry_task = None
+
+    @pyqtSlot(str, object)
+    def on_hypsometry_complete(self, raster_path: str, hypsometry: Hypsometry):
+
+        # Ignore late results for a raster that is no longer selected
+        if self.raster is None or raster_path != self.project.get_absolute_path(self.raster.path):
+            return
+
+        self.hypsometry_task = None
+        if hypsometry is None:
+            self.lblArea.setText('Area unavailable. Check the QGIS log for details.')
+            return
+
+        self.hypsometry = hypsometry
+        value = self.valElevation.value()
+        self.set_range(hypsometry.minimum, hypsometry.maximum)
+        self.valElevation.setValue(min(max(value, hypsometry.minimum), hypsometry.maximum))
+        self.update_area()
+
+    def update_area(self):
+
+        if self.hypsometry is None:
+            return
+        value = self.valElevation.value()
+        above = self.optAbove.isChecked()
+        area = self.hypsometry.area(value, above)
+        percent = self.hypsometry.percent(value, above)
+        self.lblArea.setText(f'{area:,.0f} {self.hypsometry.area_units} ({percent:.1f}% of surface)')
+
     def sliderElevationChange(self, value: float):
         self.map_manager.apply_raster_single_value(self.raster_layer, value, self.max, self.optAbove.isChecked())
         self.valElevation.setValue(value)
+        self.update_area()
 
     def spinBoxElevationChange(self, value: float):
         self.map_manager.apply_raster_single_value(self.raster_layer, value, self.max, self.optAbove.isChecked())
         self.slider.setValue(value)
+        self.update_area()
 
     def invert_values(self):
         value = self.valElevation.value()
         self.map_manager.apply_raster_single_value(self.raster_layer, value, self.max, self.optAbove.isChecked())
+        self.update_area()
+
+    def cmdPreview_click(self):
+
+        if self.raster is None:
+            return
+
+        self.remove_preview()
+        raster_path = self.project.get_absolute_path(self.raster.path)
+        QtWidgets.QApplication.setOverrideCursor(QtCore.Qt.WaitCursor)
+        try:
+            self.preview_path = threshold_preview(raster_path, self.valElevation.value(), self.optAbove.isChecked())
+            self.map_manager.create_temporary_feature_layer(self.project.map_guid, f'{self.preview_path}|layername=preview', RASTER_SLIDER_PREVIEW_MACHINE_CODE, 'Raster Slider Preview')
+        except Exception as ex:
+            QtWidgets.QMessageBox.warning(self, 'Preview Polygon', f'Unable to generate the preview polygon.\n{ex}')
+        finally:
+            QtWidgets.QApplication.restoreOverrideCursor()
+
+    def remove_preview(self):
+        self.map_manager.remove_machine_code_layer(self.project.map_guid, RASTER_SLIDER_PREVIEW_MACHINE_CODE)
+
+        # Delete the temporary GeoPackage once its layer has been removed from the map
+        if self.preview_path is not None:
+            for path in [self.preview_path, f'{self.preview_path}-wal', f'{self.preview_path}-shm']:
+                try:
+                    if os.path.exists(path):
+                        os.remove(path)
+                except OSError:
+                    # Still locked. Left in the temp folder for the operating system to clean up.
+                    pass
+            self.preview_path = None
 
     def increment_change(self):
         self.increment = self.valIncrement.value()
@@ -88,7 +182,9 @@ class FrmSlider(QtWidgets.QDockWidget):
         self.export_complete.emit(self.scratch_vector, self.add_to_map)
 
     def closeEvent(self, event):
+        self.cancel_hypsometry()
         self.map_manager.remove_machine_code_layer(self.project.map_guid, RASTER_SLIDER_MACHINE_CODE)
+        self.remove_preview()
         QtWidgets.QDockWidget.closeEvent(self, event)
 
     def setupUi(self):
@@ -157,6 +253,13 @@ class FrmSlider(QtWidgets.QDockWidget):
         self.valIncrement.valueChanged.connect(self.increment_change)
         self.grid.addWidget(self.valIncrement, 4, 1, 1, 1)
 
+        self.lblAreaTitle = QtWidgets.QLabel('Area')
+        self.lblAreaTitle.setToolTip('Area of the surface above or below the threshold value')
+        self.grid.addWidget(self.lblAreaTitle, 5, 0, 1, 1)
+
+        self.lblArea = QtWidgets.QLabel()
+        self.grid.addWidget(self.lblArea, 5, 1, 1, 1)
+
         self.gridButtons = QtWidgets.QGridLayout()
         self.vert.addLayout(self.gridButtons)
 
@@ -164,9 +267,14 @@ class FrmSlider(QtWidgets.QDockWidget):
 
         self.gridButtons.addItem(QtWidgets.QSpacerItem(20, 40, QtWidgets.QSizePolicy.Expanding, QtWidgets.QSizePolicy.Minimum), 0, 1, 1, 1)
 
+        self.cmdPreview = QtWidgets.QPushButton('Preview Polygon')
+        self.cmdPreview.setToolTip('Show a quick, reduced resolution polygon of the highlighted area')
+        self.cmdPreview.clicked.connect(self.cmdPreview_click)
+        self.gridButtons.addWidget(self.cmdPreview, 0, 2, 1, 1)
+
         self.cmdExport = QtWidgets.QPushButton('Export Polygon')
         self.cmdExport.setToolTip('Export the highlighted area as a polygon')
         self.cmdExport.clicked.connect(self.cmdExport_click)
-        self.gridButtons.addWidget(self.cmdExport, 0, 2, 1, 1)
+        self.gridButtons.addWidget(self.cmdExport, 0, 3, 1, 1)
 
         self.setWidget(self.dockWidgetContents)
@@ -1,5 +1,5 @@
 import sqlite3
-from datetime import date, datetime
+from datetime import date
 
 import matplotlib
 
@@ -12,11 +12,14 @@ from ..QRiS.qris_map_manager import QRisMapManager
 
 from .utilities import add_help_button
 from .widgets.export_chart_widget import ChartExportWidget
+from .widgets.time_series_chart import TimeSeriesChart
 
 from ..model.project import Project
 from ..model.stream_gage import STREAM_GAGE_MACHINE_CODE
 from ..model.db_item import dict_factory
 from ..model.basin_characteristics_table_view import BasinCharsTableModel
+from ..model.sql_table_model import SqlTableModel
+from ..lib.decimation import series_from_rows
 
 from ..gp.stream_gage_task import StreamGageTask
 from ..gp.stream_gage_discharge_task import StreamGageDischargeTask
@@ -24,14 +27,12 @@ from ..gp.stream_gage_discharge_task import StreamGageDischargeTask
 # https://stackoverflow.com/questions/31406193/matplotlib-is-not-worked-with-qgis
 # https://matplotlib.org/3.1.1/gallery/user_interfaces/embedding_in_qt_sgskip.html
 try:
-    from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
-    from matplotlib.figure import Figure
-    import matplotlib.pyplot as plt
     import matplotlib.dates as mdates
-    import matplotlib.ticker as ticker
 except ImportError:
     QgsMessageLog.logMessage(f"Matplotlib is not at a sufficient version: {matplotlib.__version__}", CONSTANTS['logCategory'], level=Qgis.Critical)
 
+DISCHARGE_TABLE_COLUMNS = [('measurement_date', 'Measurement Date'), ('discharge', 'Discharge (CFS)')]
+
 # Help on selection changed event
 # https://stackoverflow.com/questions/10156842/howto-get-the-selectionchanged-signal
 
@@ -80,7 +81,7 @@ class FrmStreamGageDocWidget(QtWidgets.QDockWidget):
 
         data = self.load_discharge_data()
         self.load_discharge_plot(data)
-        self.load_discharge_table(data)
+        self.load_discharge_table()
         self.load_metadata()
 
         map_layer_tree = self.map_manager.get_machine_code_layer(self.project.map_guid, STREAM_GAGE_MACHINE_CODE, None)
@@ -130,19 +131,26 @@ class FrmStreamGageDocWidget(QtWidgets.QDockWidget):
         self.metadata_model = BasinCharsTableModel(metadata_values, ['Name', 'Value'])
         self.tableMeta.setModel(self.metadata_model)
 
-    def load_discharge_data(self):
+    def discharge_filter(self):
+        """SQL filter and parameters for the discharges of the selected gage within the date range."""
+
         lst_item = self.stream_gage_model.itemFromIndex(self.lst_gages.currentIndex())
         if lst_item is None:
-            return
+            return None, None
 
         site_id, site_code = lst_item.data(QtCore.Qt.UserRole)
         start = date(self.dtStart.date().year(), self.dtStart.date().month(), self.dtStart.date().day())
         end = date(self.dtEnd.date().year(), self.dtEnd.date().month(), self.dtEnd.date().day())
+        return '(stream_gage_id = ?) AND (measurement_date >= ?) AND (measurement_date < ?)', [site_id, start.strftime('%Y-%m-%d'), end.strftime('%Y-%m-%d')]
+
+    def load_discharge_data(self):
+        where_sql, params = self.discharge_filter()
+        if where_sql is None:
+            return
 
         with sqlite3.connect(self.project.project_file) as conn:
             curs = conn.cursor()
-            curs.execute('SELECT measurement_date, discharge FROM stream_gage_discharges WHERE (stream_gage_id = ?) AND (measurement_date >= ?) AND (measurement_date < ?) ORDER BY measurement_date',
-                        [site_id, start.strftime('%Y-%m-%d'), end.strftime('%Y-%m-%d')])
+            curs.execute(f'SELECT measurement_date, discharge FROM stream_gage_discharges WHERE {where_sql} ORDER BY measurement_date', params)  # nosec B608 - where_sql is a hardcoded filter, values are bound parameters
 
             data = [(row[0], row[1]) for row in curs.fetchall()]
         return data
@@ -155,7 +163,7 @@ class FrmStreamGageDocWidget(QtWidgets.QDockWidget):
         if data is None:
             return
 
-        self._static_ax.cla()
+        self.chart.clear()
 
         lst_item = self.stream_gage_model.itemFromIndex(self.lst_gages.currentIndex())
         station_name = None
@@ -166,13 +174,11 @@ class FrmStreamGageDocWidget(QtWidgets.QDockWidget):
             if station_data and len(station_data) > 1:
                 station_code = station_data[1]
 
-        dates = [datetime.strptime(item[0], '%Y-%m-%d') for item in data]
-        disch = [item[1] for item in data]
-        # remove empty string values
-        disch = [item if item != '' else None for item in disch]
-        # Remove non float values
-        disch = [item if item is None or isinstance(item, (int, float)) else None for item in disch]
-        self._static_ax.plot(dates, disch, ".")
+        # Empty strings and other non numeric discharge values become NaN and are not drawn
+        series = series_from_rows(data)
+        if None in series:
+            dates, disch = series[None]
+            self.chart.add_series(dates, disch, '.')
         self._static_ax.set_ylabel('Discharge (CFS)')
         self._static_ax.set_xlabel('Date')
         if station_name and station_code:
@@ -180,8 +186,9 @@ class FrmStreamGageDocWidget(QtWidgets.QDockWidget):
         elif station_name:
             self._static_ax.set_title(station_name)
 
+        # A fixed 30 day tick interval creates hundreds of ticks for long records
+        self._static_ax.xaxis.set_major_locator(mdates.AutoDateLocator())
         self._static_ax.xaxis.set_major_formatter(mdates.DateFormatter('%Y-%b'))
-        self._static_ax.xaxis.set_major_locator(ticker.MultipleLocator(30))
         self._static_ax.tick_params(axis='x', rotation=45)
 
         # Match climate engine chart grid styling (major + minor grids).
@@ -195,24 +202,24 @@ class FrmStreamGageDocWidget(QtWidgets.QDockWidget):
         self.static_canvas.figure.subplots_adjust(bottom=0.25)
         self.static_canvas.figure.tight_layout(pad=1.2)
         
-        self.static_canvas.draw()
+        self.chart.draw()
 
-    def load_discharge_table(self, data=None):
-        if data is None:
-            data = self.load_discharge_data()
+    def load_discharge_table(self):
 
-        model = QtGui.QStandardItemModel(self)
-        model.setHorizontalHeaderLabels(['Measurement Date', 'Discharge (CFS)'])
-
-        if data:
-            for measurement_date, discharge in data:
-                date_item = QtGui.QStandardItem(str(measurement_date))
-                discharge_item = QtGui.QStandardItem('' if discharge is None else str(discharge))
-                model.appendRow([date_item, discharge_item])
+        where_sql, params = self.discharge_filter()
+        if where_sql is None:
+            self.discharge_table_model = None
+            self.tableDischarge.setModel(None)
+            return
 
-        self.tableDischarge.setModel(model)
-        self.tableDischarge.horizontalHeader().setStretchLastSection(True)
-        self.tableDischarge.resizeColumnsToContents()
+        # Rows are paged from the database as the table scrolls. Sorting is done in SQL.
+        if self.discharge_table_model is None:
+            self.discharge_table_model = SqlTableModel(self.project.project_file, 'stream_gage_discharges', DISCHARGE_TABLE_COLUMNS, where_sql, params, parent=self)
+            self.tableDischarge.setModel(self.discharge_table_model)
+            self.tableDischarge.horizontalHeader().setStretchLastSection(True)
+            self.tableDischarge.resizeColumnsToContents()
+        else:
+            self.discharge_table_model.set_filter(where_sql, params)
 
     def download_discharges(self):
 
@@ -242,7 +249,7 @@ class FrmStreamGageDocWidget(QtWidgets.QDockWidget):
 
         data = self.load_discharge_data()
         self.load_discharge_plot(data)
-        self.load_discharge_table(data)
+        self.load_discharge_table()
 
     def download_stream_gages(self):
 
@@ -274,10 +281,9 @@ class FrmStreamGageDocWidget(QtWidgets.QDockWidget):
         self.load_stream_gages()
 
     def get_discharge_export_data(self):
-        data = self.load_discharge_data()
-        if data is None:
+        if self.discharge_table_model is None:
             return []
-        return [{'measurement_date': row[0], 'discharge (cfs)': row[1]} for row in data]
+        return self.discharge_table_model.export_rows(['measurement_date', 'discharge (cfs)'])
 
     def delete_gage(self):
         
@@ -317,10 +323,11 @@ class FrmStreamGageDocWidget(QtWidgets.QDockWidget):
         
         self.load_stream_gages()
         # clear the plot and metadata
-        self._static_ax.cla()
-        self.static_canvas.draw()
+        self.chart.clear()
+        self.chart.draw()
         self.tableMeta.setModel(None)
         self.tableDischarge.setModel(None)
+        self.discharge_table_model = None
         
         self.load_discharge_plot()
         self.load_discharge_table()
@@ -407,14 +414,18 @@ class FrmStreamGageDocWidget(QtWidgets.QDockWidget):
         self.cmdHelp = add_help_button(self, 'context/stream-gage-explorer')
         self.button_horiz.addWidget(self.cmdHelp)
 
-        self.static_canvas = FigureCanvas(Figure(figsize=(5, 3)))
-        self._static_ax = self.static_canvas.figure.subplots()
+        self.chart = TimeSeriesChart(self, figsize=(5, 3))
+        self.static_canvas = self.chart.canvas
+        self._static_ax = self.chart.ax
 
         self.tableMeta = QtWidgets.QTableView(self)
         self.tableMeta.verticalHeader().hide()
 
+        self.discharge_table_model = None
         self.tableDischarge = QtWidgets.QTableView(self)
         self.tableDischarge.verticalHeader().hide()
+        self.tableDischarge.setSortingEnabled(True)
+        self.tableDischarge.sortByColumn(0, QtCore.Qt.AscendingOrder)
 
         self.discharge_tab = QtWidgets.QWidget(self)
         self.discharge_tab_layout = QtWidgets.QVBoxLayout(self.discharge_tab)
@@ -428,7 +439,7 @@ class FrmStreamGageDocWidget(QtWidgets.QDockWidget):
 
         self.tabWidget = QtWidgets.QTabWidget()
         self.right_vert.addWidget(self.tabWidget)
-        self.tabWidget.addTab(self.static_canvas, 'Graphical')
+        self.tabWidget.addTab(self.chart, 'Graphical')
         self.tabWidget.addTab(self.discharge_tab, 'Discharge Data')
         self.tabWidget.addTab(self.metadata_tab, 'Metadata')
 
@@ -2,7 +2,7 @@ from qgis.PyQt import QtCore, QtGui, QtWidgets
 
 from ...model.metric import Metric
 from ...model.analysis import format_feasibility_text
-from ...model.metric_value import MetricValue, load_metric_values
+from ...model.metric_value import MetricValue, load_metric_values, current_values_as_strings
 from ...model.analysis_metric import AnalysisMetric
 from ...lib.unit_conversion import short_unit_name, distance_units, area_units, ratio_units
 
@@ -515,6 +515,13 @@ class AnalysisTable(QtWidgets.QWidget):
         label_uncertainty = QtWidgets.QTableWidgetItem()
         self.table.setItem(row, self.column['uncertainty'], label_uncertainty)
 
+    def display_unit(self, metric: Metric) -> str:
+        display_unit = self.analysis.units.get(metric.unit_type, None)
+        if metric.normalized:
+            if display_unit != 'ratio':
+                display_unit = self.analysis.units['distance']
+        return None if display_unit in ['count', 'ratio'] else display_unit
+
     def load_values(self, event, mask_feature_id):
         self.current_dce = event
         self.mask_feature_id = mask_feature_id
@@ -529,10 +536,15 @@ class AnalysisTable(QtWidgets.QWidget):
             # Load latest metric values from DB
             metric_values = load_metric_values(self.qris_project.project_file, self.analysis, event, mask_feature_id, self.qris_project.metrics)
 
+            # Convert the values of every row as one column before filling the grid
+            rows = [(row, self.table.item(row, self.column['metric']).data(QtCore.Qt.UserRole)) for row in range(self.table.rowCount())]
+            loaded = [(row, metric_values[analysis_metric.metric.id]) for row, analysis_metric in rows if analysis_metric.metric.id in metric_values]
+            texts = current_values_as_strings([metric_value for _row, metric_value in loaded], [self.display_unit(metric_value.metric) for _row, metric_value in loaded])
+            value_text = {row: text for (row, _metric_value), text in zip(loaded, texts)}
+
             # Loop over active metrics and load values into grid
             self.table.setSortingEnabled(False)
-            for row in range(self.table.rowCount()):
-                analysis_metric: AnalysisMetric = self.table.item(row, self.column['metric']).data(QtCore.Qt.UserRole)
+            for row, analysis_metric in rows:
                 metric: Metric = analysis_metric.metric
                 
                 # Update Status Widget (Source)
@@ -547,12 +559,7 @@ class AnalysisTable(QtWidgets.QWidget):
                 
                 if metric.id in metric_values:
                     metric_value = metric_values[metric.id]
-                    display_unit = self.analysis.units.get(metric.unit_type, None)
-                    if metric.normalized:
-                        if display_unit != 'ratio':
-                            display_unit = self.analysis.units['distance']
-                    display_unit = None if display_unit in ['count', 'ratio'] else display_unit
-                    metric_value_text = metric_value.current_value_as_string(display_unit)
+                    metric_value_text = value_text[row]
                     uncertainty_text = metric_value.uncertainty_as_string()
                     
                     is_manual = metric_value.is_manual
@@ -3,9 +3,11 @@ from typing import Dict
 from qgis.PyQt import QtCore, QtGui, QtWidgets
 
 from ...model.project import Project
-from ...model.metric import Metric
 from ...model.analysis_metric import AnalysisMetric
 from ...model.analysis import Analysis
+from ...model.metric_library_model import (MetricLibraryModel, MetricLibraryFilterModel, USAGE_LABELS,
+                                           COLUMN_NAME, COLUMN_VERSION, COLUMN_AVAILABILITY, COLUMN_USAGE, COLUMN_DESCRIPTION, COLUMN_PROTOCOL, COLUMN_GROUP,
+                                           AVAILABILITY_ALL, AVAILABILITY_FEASIBLE, AVAILABILITY_BLOCKED, AVAILABILITY_MANUAL)
 
 from ..frm_layer_metric_details import FrmLayerMetricDetails
 from ..frm_metric_availability_matrix import FrmMetricAvailabilityMatrix
@@ -14,6 +16,23 @@ from ..frm_custom_metric_library import FrmCustomMetricLibrary
 from .checkable_combo_box import CheckableComboBox
 
 
+class UsageDelegate(QtWidgets.QStyledItemDelegate):
+    """Edits the usage level of a metric with a combo box that is only created while the cell is being edited."""
+
+    def createEditor(self, parent, option, index):
+        editor = QtWidgets.QComboBox(parent)
+        for level_id, label in enumerate(USAGE_LABELS):
+            editor.addItem(label, level_id)
+        editor.activated.connect(lambda _index, e=editor: self.commitData.emit(e))
+        return editor
+
+    def setEditorData(self, editor, index):
+        editor.setCurrentIndex(index.data(QtCore.Qt.EditRole) or 0)
+
+    def setModelData(self, editor, model, index):
+        model.setData(index, editor.currentData(), QtCore.Qt.EditRole)
+
+
 class MetricLibrary(QtWidgets.QWidget):
 
     def __init__(self, parent, project: Project, analysis: Analysis = None):
@@ -33,9 +52,13 @@ class MetricLibrary(QtWidgets.QWidget):
         self._availability_timer.setSingleShot(True)
         self._availability_timer.timeout.connect(self._process_availability_batch)
         
-        # Initialize state
+        # Initialize state. The model shares the state dictionary and updates it when usage is edited.
         self.current_metrics_state: Dict[int, int] = {}
         self.init_state()
+        self.model = MetricLibraryModel(self.qris_project.metrics, self.qris_project.protocols, self.current_metrics_state, self)
+        self.model.usage_changed.connect(self.on_metric_status_changed)
+        self.proxy = MetricLibraryFilterModel(self.get_metric_availability, self)
+        self.proxy.setSourceModel(self.model)
 
         self.setupUi()
         self.load_filters()
@@ -52,8 +75,8 @@ class MetricLibrary(QtWidgets.QWidget):
     def should_compute_availability(self) -> bool:
         # Compute availability when the UI is showing the Availability column,
         # or when availability-based filters are active.
-        tree_visible = not self.metricsTree.isColumnHidden(2)
-        table_visible = not self.metricsTable.isColumnHidden(4)
+        tree_visible = not self.metricsTree.isColumnHidden(COLUMN_AVAILABILITY)
+        table_visible = not self.metricsTable.isColumnHidden(COLUMN_AVAILABILITY)
         return (
             tree_visible or
             table_visible or
@@ -154,72 +177,12 @@ class MetricLibrary(QtWidgets.QWidget):
         if enable_experimental:
             self.act_include_experimental.setChecked(True)
 
-    def get_metric_font(self, metric, level_id):
-        font = QtGui.QFont()
-        status = getattr(metric, 'status', 'active')
-        
-        # Check if Protocol is Deprecated
-        # lookup protocol by machine code
-        protocol_status = 'active'
-        if hasattr(self.qris_project, 'protocols'): # Safety check
-            for p in self.qris_project.protocols.values():
-                if p.machine_code == metric.protocol_machine_code:
-                    if getattr(p, 'status', 'active') == 'deprecated':
-                        protocol_status = 'deprecated'
-                    break
-
-        if level_id > 0:
-            font.setBold(True)
-            
-        if status == 'deprecated' or protocol_status == 'deprecated':
-            font.setItalic(True)
-            if protocol_status == 'deprecated':
-                 font.setStrikeOut(True) # Optional visual cue for protocol-level deprecation
-            
-        return font
-
     def on_metric_status_changed(self, metric_id: int, index: int):
+        # The model has already updated current_metrics_state and repainted the row
         self.current_metrics_state[metric_id] = index
         self.invalidate_availability_cache()
-        
-        # Get Font
-        # We need the metric object to determine deprecated status, which we can get from the item traversal below 
-        # provided we find it.
-        
-        # Update text for sorting in Tree
-        iterator = QtWidgets.QTreeWidgetItemIterator(self.metricsTree)
-        usage_display = ['None', 'Metric', 'Indicator'][index] if 0 <= index <= 2 else 'None'
-        while iterator.value():
-            item = iterator.value()
-            metric = item.data(0, QtCore.Qt.UserRole)
-            if metric and metric.id == metric_id:
-                 item.setText(3, usage_display)
-                 
-                 # Update Font
-                 font = self.get_metric_font(metric, index)
-                 item.setFont(0, font)
-                 item.setFont(1, font)
-                 break
-            iterator += 1
-        
-        # Update text for sorting in Table
-        for row in range(self.metricsTable.rowCount()):
-             item = self.metricsTable.item(row, 0)
-             if not item: continue
-             metric = item.data(QtCore.Qt.UserRole)
-             if metric and metric.id == metric_id:
-                 usage_item = self.metricsTable.item(row, 5)
-                 if usage_item:
-                     usage_item.setText(usage_display)
-                 
-                 # Update Font (Name and Version)
-                 font = self.get_metric_font(metric, index)
-                 if self.metricsTable.item(row, 2): self.metricsTable.item(row, 2).setFont(font)
-                 if self.metricsTable.item(row, 3): self.metricsTable.item(row, 3).setFont(font)
-                 break
-        
         self.update_usage_count_label()
-                 
+
     def init_state(self):
         metrics = list(self.qris_project.metrics.values())
         for metric in metrics:
@@ -234,7 +197,7 @@ class MetricLibrary(QtWidgets.QWidget):
             self.current_metrics_state[metric.id] = level_id
 
     def setupUi(self):
-        
+
         self.vert_metrics = QtWidgets.QVBoxLayout(self)
         self.vert_metrics.setContentsMargins(0, 0, 0, 0)
         self.setLayout(self.vert_metrics)
@@ -252,7 +215,7 @@ class MetricLibrary(QtWidgets.QWidget):
         self.cbo_filter_protocol.setEmptyText("No Protocols Available")
         self.cbo_filter_protocol.popupClosed.connect(self.on_protocol_filter_changed)
         self.horiz_filters.addWidget(self.cbo_filter_protocol)
-        
+
         self.cbo_filter_group = CheckableComboBox()
         self.cbo_filter_group.setPlaceholderText("All Groups")
         self.cbo_filter_group.setNoneCheckedText("No Groups Selected")
@@ -260,7 +223,7 @@ class MetricLibrary(QtWidgets.QWidget):
         self.cbo_filter_group.popupClosed.connect(self.update_visibility)
         self.cbo_filter_group.setMinimumWidth(150)
         self.horiz_filters.addWidget(self.cbo_filter_group)
-        
+
         self.txt_filter_search = QtWidgets.QLineEdit()
         self.txt_filter_search.setPlaceholderText("Search Metrics...")
         self.txt_filter_search.textChanged.connect(self.update_visibility)
@@ -282,13 +245,13 @@ class MetricLibrary(QtWidgets.QWidget):
         self.btn_advanced.setText("Advanced Filters")
         self.btn_advanced.setPopupMode(QtWidgets.QToolButton.InstantPopup)
         self.btn_advanced.setToolButtonStyle(QtCore.Qt.ToolButtonTextBesideIcon)
-        
+
         self.menu_advanced = QtWidgets.QMenu(self.btn_advanced)
-        
+
         self.act_limit_metrics = self.menu_advanced.addAction("Limit to Currently In Use Metrics")
         self.act_limit_metrics.setCheckable(True)
         self.act_limit_metrics.toggled.connect(self.update_visibility)
-        
+
         self.menu_advanced.addSeparator()
 
         # Type Filters Group
@@ -317,17 +280,17 @@ class MetricLibrary(QtWidgets.QWidget):
         self.act_limit_manual.setCheckable(True)
         self.act_limit_manual.toggled.connect(self.on_availability_filter_toggled)
         self.type_filter_group.addAction(self.act_limit_manual)
-        
+
         self.menu_advanced.addSeparator()
-        
+
         self.act_include_experimental = self.menu_advanced.addAction("Include Experimental Protocols")
         self.act_include_experimental.setCheckable(True)
         self.act_include_experimental.toggled.connect(self.on_universe_changed)
-        
+
         self.act_include_deprecated = self.menu_advanced.addAction("Include Deprecated Metrics")
         self.act_include_deprecated.setCheckable(True)
         self.act_include_deprecated.toggled.connect(self.on_universe_changed)
-        
+
         self.btn_advanced.setMenu(self.menu_advanced)
 
         self.horiz_filters.addWidget(self.btn_advanced)
@@ -336,36 +299,28 @@ class MetricLibrary(QtWidgets.QWidget):
         self.stackedWidget = QtWidgets.QStackedWidget()
         self.vert_metrics.addWidget(self.stackedWidget)
 
+        # Both views show the same filtered model. The model switches between tree and flat rows with the view.
+        self.usage_delegate = UsageDelegate(self)
+        edit_triggers = QtWidgets.QAbstractItemView.CurrentChanged | QtWidgets.QAbstractItemView.SelectedClicked | QtWidgets.QAbstractItemView.DoubleClicked
+
         # --- Page 0: Tree View ---
         self.pageTree = QtWidgets.QWidget()
         self.vboxTree = QtWidgets.QVBoxLayout(self.pageTree)
         self.vboxTree.setContentsMargins(0, 0, 0, 0)
-        
-        self.metricsTree = QtWidgets.QTreeWidget()
-        self.metricsTree.setHeaderLabels(['Metric', 'Version (Status)', 'Availability', 'Usage', 'Description'])
-        
-        # Header Tooltips
-        headerItem = self.metricsTree.headerItem()
-        headerItem.setToolTip(0, "Name of the metric or indicator.")
-        headerItem.setToolTip(1, "Version number and active status.")
-        headerItem.setToolTip(2, "Summary of the ability to calculatete metrics automatically based on the current layers and inputs for each DCE in the Project.")
-        headerItem.setToolTip(3, "Select usage level: Metric or Indicator. These will be included in the analysis accordingly.")
-        headerItem.setToolTip(4, "Description of the metric.")
 
-        header = self.metricsTree.header()
-        header.setSectionResizeMode(0, QtWidgets.QHeaderView.Stretch)
-        header.setSectionResizeMode(1, QtWidgets.QHeaderView.ResizeToContents)
-        header.setSectionResizeMode(2, QtWidgets.QHeaderView.ResizeToContents)
-        header.setSectionResizeMode(3, QtWidgets.QHeaderView.ResizeToContents)
-        header.setSectionResizeMode(4, QtWidgets.QHeaderView.Interactive)
+        self.metricsTree = QtWidgets.QTreeView()
+        self.metricsTree.setModel(self.proxy)
+        self.metricsTree.setItemDelegateForColumn(COLUMN_USAGE, self.usage_delegate)
+        self.metricsTree.setEditTriggers(edit_triggers)
+        self.metricsTree.setUniformRowHeights(True)
         self.metricsTree.setSelectionBehavior(QtWidgets.QAbstractItemView.SelectRows)
         self.metricsTree.setSelectionMode(QtWidgets.QAbstractItemView.SingleSelection)
         self.metricsTree.setContextMenuPolicy(QtCore.Qt.CustomContextMenu)
         self.metricsTree.customContextMenuRequested.connect(self.open_tree_context_menu)
         self.metricsTree.setSortingEnabled(True)
-        self.metricsTree.setColumnHidden(2, False)
+        self.metricsTree.sortByColumn(COLUMN_NAME, QtCore.Qt.AscendingOrder)
         self.vboxTree.addWidget(self.metricsTree)
-        
+
         self.stackedWidget.addWidget(self.pageTree)
 
         # --- Page 1: Table View ---
@@ -373,39 +328,17 @@ class MetricLibrary(QtWidgets.QWidget):
         self.vboxTable = QtWidgets.QVBoxLayout(self.pageTable)
         self.vboxTable.setContentsMargins(0, 0, 0, 0)
 
-        self.metricsTable = QtWidgets.QTableWidget(0, 7)
+        self.metricsTable = QtWidgets.QTableView()
+        self.metricsTable.setModel(self.proxy)
+        self.metricsTable.setItemDelegateForColumn(COLUMN_USAGE, self.usage_delegate)
+        self.metricsTable.setEditTriggers(edit_triggers)
         self.metricsTable.setSizeAdjustPolicy(QtWidgets.QAbstractScrollArea.AdjustToContents)
-        self.metricsTable.setHorizontalHeaderLabels(['Protocol', 'Group', 'Metric', 'Version (Status)', 'Availability', 'Usage', 'Description'])
-        
-        # Header Tooltips
-        table_tooltips = [
-            "The protocol that defines this metric.",
-            "Hierarchical group/category.",
-            "Name of the metric or indicator.",
-            "Version number and active status.",
-            "Automation availability status based on current inputs.",
-            "Select usage level: Metric or Indicator.",
-            "Description of the metric."
-        ]
-        for i, tip in enumerate(table_tooltips):
-            if self.metricsTable.horizontalHeaderItem(i):
-                self.metricsTable.horizontalHeaderItem(i).setToolTip(tip)
-
-        header = self.metricsTable.horizontalHeader()
-        header.setSectionResizeMode(0, QtWidgets.QHeaderView.ResizeToContents)
-        header.setSectionResizeMode(1, QtWidgets.QHeaderView.ResizeToContents)
-        header.setSectionResizeMode(2, QtWidgets.QHeaderView.Stretch)
-        header.setSectionResizeMode(3, QtWidgets.QHeaderView.ResizeToContents)
-        header.setSectionResizeMode(4, QtWidgets.QHeaderView.ResizeToContents)
-        header.setSectionResizeMode(5, QtWidgets.QHeaderView.ResizeToContents)
-        header.setSectionResizeMode(6, QtWidgets.QHeaderView.Interactive)
         self.metricsTable.verticalHeader().setVisible(False)
         self.metricsTable.setSelectionBehavior(QtWidgets.QAbstractItemView.SelectRows)
         self.metricsTable.setSelectionMode(QtWidgets.QAbstractItemView.SingleSelection)
         self.metricsTable.setContextMenuPolicy(QtCore.Qt.CustomContextMenu)
         self.metricsTable.customContextMenuRequested.connect(self.open_table_context_menu)
         self.metricsTable.setSortingEnabled(True)
-        self.metricsTable.setColumnHidden(4, False)
         self.vboxTable.addWidget(self.metricsTable)
 
         self.stackedWidget.addWidget(self.pageTable)
@@ -449,14 +382,12 @@ class MetricLibrary(QtWidgets.QWidget):
         self.cmd_set_defaults.clicked.connect(lambda: self.toggle_all_metrics('Default'))
         self.horiz_metric_buttons.addWidget(self.cmd_set_defaults)
 
-        # Build views once
-        self.build_metrics_tree()
-        self.build_metrics_table()
-        
+        self.arrange_columns()
+
         # Apply Logic from User Settings (Must be after views are built because toggling triggers update_visibility)
         settings = QtCore.QSettings('Riverscapes', 'QRiS')
         show_experimental = settings.value('show_experimental_protocols', False, bool)
-        
+
         if show_experimental:
             self.act_include_experimental.setChecked(True)
 
@@ -464,9 +395,40 @@ class MetricLibrary(QtWidgets.QWidget):
         if self.analysis is not None:
              self.apply_smart_filtering_for_existing_analysis()
 
+        # Protocols and groups start expanded when editing an existing analysis
+        if self.analysis is not None:
+            self.metricsTree.expandAll()
+
         # Initial Stack View
         self.stackedWidget.setCurrentIndex(0 if self.is_tree_view else 1)
 
+    def arrange_columns(self):
+        """Column visibility, order and sizing for both views. Must be reapplied after the model switches between tree and flat rows."""
+
+        header = self.metricsTree.header()
+        header.setSectionResizeMode(COLUMN_NAME, QtWidgets.QHeaderView.Stretch)
+        header.setSectionResizeMode(COLUMN_VERSION, QtWidgets.QHeaderView.ResizeToContents)
+        header.setSectionResizeMode(COLUMN_AVAILABILITY, QtWidgets.QHeaderView.ResizeToContents)
+        header.setSectionResizeMode(COLUMN_USAGE, QtWidgets.QHeaderView.ResizeToContents)
+        header.setSectionResizeMode(COLUMN_DESCRIPTION, QtWidgets.QHeaderView.Interactive)
+        # The tree shows protocols and groups as parent rows
+        self.metricsTree.setColumnHidden(COLUMN_PROTOCOL, True)
+        self.metricsTree.setColumnHidden(COLUMN_GROUP, True)
+
+        # The table shows Protocol, Group, Metric, Version (Status), Availability, Usage, Description
+        header = self.metricsTable.horizontalHeader()
+        for visual_index, column in enumerate([COLUMN_PROTOCOL, COLUMN_GROUP, COLUMN_NAME, COLUMN_VERSION, COLUMN_AVAILABILITY, COLUMN_USAGE, COLUMN_DESCRIPTION]):
+            if header.visualIndex(column) != visual_index:
+                header.moveSection(header.visualIndex(column), visual_index)
+        header.setSectionResizeMode(COLUMN_PROTOCOL, QtWidgets.QHeaderView.ResizeToContents)
+        header.setSectionResizeMode(COLUMN_GROUP, QtWidgets.QHeaderView.ResizeToContents)
+        header.setSectionResizeMode(COLUMN_NAME, QtWidgets.QHeaderView.Stretch)
+        header.setSectionResizeMode(COLUMN_VERSION, QtWidgets.QHeaderView.ResizeToContents)
+        header.setSectionResizeMode(COLUMN_AVAILABILITY, QtWidgets.QHeaderView.ResizeToContents)
+        header.setSectionResizeMode(COLUMN_USAGE, QtWidgets.QHeaderView.Interactive)
+        header.setSectionResizeMode(COLUMN_DESCRIPTION, QtWidgets.QHeaderView.Interactive)
+        self.metricsTable.setColumnWidth(COLUMN_USAGE, 120) # Ensure Usage column is wide enough for ComboBox
+
     def set_filter_tools_visible(self, visible: bool):
         self.filter_tools_widget.setVisible(visible)
 
@@ -476,11 +438,13 @@ class MetricLibrary(QtWidgets.QWidget):
     def toggle_view(self):
         # Toggle Mode
         self.is_tree_view = not self.is_tree_view
-        
+
         # Update UI
         self.cmdToggleView.setText(self.get_toggle_text())
+        self.model.set_flat(not self.is_tree_view)
+        self.arrange_columns()
         self.stackedWidget.setCurrentIndex(0 if self.is_tree_view else 1)
-        
+
         # Load new view
         self.load_current_view()
 
@@ -507,29 +471,7 @@ class MetricLibrary(QtWidgets.QWidget):
         self.update_visibility()
 
     def refresh_availability(self):
-        # Update Tree
-        it = QtWidgets.QTreeWidgetItemIterator(self.metricsTree)
-        while it.value():
-            item = it.value()
-            metric = item.data(0, QtCore.Qt.UserRole)
-            if metric:
-                 status = self.get_metric_availability(metric)
-                 item.setText(2, status)
-            it += 1
-        
-        # Update Table
-        self.metricsTable.setSortingEnabled(False)
-        for row in range(self.metricsTable.rowCount()):
-             metric_item = self.metricsTable.item(row, 0)
-             if metric_item:
-                 metric = metric_item.data(QtCore.Qt.UserRole)
-                 if metric:
-                     status = self.get_metric_availability(metric)
-                     # Column 4 is Availability
-                     avail_item = self.metricsTable.item(row, 4)
-                     if avail_item:
-                         avail_item.setText(status)
-        self.metricsTable.setSortingEnabled(True)
+        self.model.set_availability({metric.id: self.get_metric_availability(metric) for metric in self.model.all_metrics()})
 
     def _build_selected_analysis_metrics(self):
         if self._selected_analysis_metrics_cache is not None:
@@ -610,6 +552,8 @@ class MetricLibrary(QtWidgets.QWidget):
         self.update_visibility()
 
     def on_universe_changed(self):
+        self.proxy.set_filters(include_experimental=self.act_include_experimental.isChecked(),
+                               include_deprecated=self.act_include_deprecated.isChecked())
         self.load_filters()
         self.update_visibility()
 
@@ -620,27 +564,7 @@ class MetricLibrary(QtWidgets.QWidget):
         self.update_visibility()
 
     def set_metric_availability_text(self, metric_id: int, status_text: str):
-        # Tree update
-        iterator = QtWidgets.QTreeWidgetItemIterator(self.metricsTree)
-        while iterator.value():
-            item = iterator.value()
-            metric = item.data(0, QtCore.Qt.UserRole)
-            if metric and metric.id == metric_id:
-                item.setText(2, status_text)
-                break
-            iterator += 1
-
-        # Table update
-        for row in range(self.metricsTable.rowCount()):
-            metric_item = self.metricsTable.item(row, 0)
-            if not metric_item:
-                continue
-            metric = metric_item.data(QtCore.Qt.UserRole)
-            if metric and metric.id == metric_id:
-                avail_item = self.metricsTable.item(row, 4)
-                if avail_item:
-                    avail_item.setText(status_text)
-                break
+        self.model.set_availability({metric_id: status_text})
 
     def start_background_availability_refresh(self):
         if not self.should_compute_availability():
@@ -657,9 +581,8 @@ class MetricLibrary(QtWidgets.QWidget):
         if len(metric_ids) == 0:
             return
 
-        # Show immediate feedback in both views; hidden columns can still be updated.
-        for metric_id in metric_ids:
-            self.set_metric_availability_text(metric_id, 'Calculating...')
+        # Show immediate feedback in both views with a single model update.
+        self.model.set_availability({metric_id: 'Calculating...' for metric_id in metric_ids})
 
         self._availability_compute_queue = metric_ids
         self._availability_timer.start(0)
@@ -668,11 +591,10 @@ class MetricLibrary(QtWidgets.QWidget):
         if len(self._availability_compute_queue) == 0:
             return
 
-        selected_analysis_metrics = self._build_selected_analysis_metrics()
-        batch = []
-        for _ in range(min(self._availability_batch_size, len(self._availability_compute_queue))):
-            batch.append(self._availability_compute_queue.pop(0))
+        batch = self._availability_compute_queue[:self._availability_batch_size]
+        del self._availability_compute_queue[:self._availability_batch_size]
 
+        statuses = {}
         for metric_id in batch:
             metric = self.qris_project.metrics.get(metric_id)
             if metric is None:
@@ -684,7 +606,9 @@ class MetricLibrary(QtWidgets.QWidget):
                 status = 'Error'
 
             self._availability_cache[metric_id] = status
-            self.set_metric_availability_text(metric_id, status)
+            statuses[metric_id] = status
+
+        self.model.set_availability(statuses)
 
         if len(self._availability_compute_queue) > 0:
             self._availability_timer.start(0)
@@ -777,103 +701,38 @@ class MetricLibrary(QtWidgets.QWidget):
         # Force text update in case we unchecked items manually without signal
         self.cbo_filter_group.updateText()
 
-    def should_show_metric(self, metric):
-        sel_protocols = self.cbo_filter_protocol.get_checked_data()
-        sel_groups = self.cbo_filter_group.get_checked_data()
-        search_text = self.txt_filter_search.text().lower().strip()
-
-        prot_count = self.cbo_filter_protocol.count()
-        group_count = self.cbo_filter_group.count()
-        
-        # 1. Search Text Check
-        if search_text:
-            # Check name, protocol, hierarchy
-            name_match = search_text in metric.name.lower()
-            if not name_match:
-                # Optionally check other fields if desired
-                return False
-
-        # 2. Advanced Filters
-        if self.act_limit_metrics.isChecked():
-            if self.current_metrics_state.get(metric.id, 0) == 0:
-                return False
-        
-        # Availability Status Check (expensive): only compute when availability-based filters are active.
-        if (self.act_limit_feasible.isChecked() or
-            self.act_limit_blocked.isChecked() or
-            self.act_limit_manual.isChecked()):
-            status = self.get_metric_availability(metric)
-            status_lower = status.lower()
-            is_manual = "manual" in status_lower
-
-            if self.act_limit_feasible.isChecked():
-                if self._intrinsic_mode:
-                    if status_lower.startswith("not feasible") or is_manual:
-                        return False
-                else:
-                    # Must contain "DCE" and NOT start with "No" to be considered "Ready"
-                    # (e.g. "All 5 DCEs", "1 DCE")
-                    if "dce" not in status_lower or status_lower.startswith("no"):
-                        return False
-
-            if self.act_limit_blocked.isChecked():
-                if self._intrinsic_mode:
-                    if not status_lower.startswith("not feasible"):
-                        return False
-                else:
-                    # Must start with "No DCEs" (implies Missing Inputs or Selected or just empty)
-                    # But must NOT be manual.
-                    if not status_lower.startswith("no dce"):
-                        return False
-
-            if self.act_limit_manual.isChecked():
-                if not is_manual:
-                    return False
-
-        # Note: Experimental and Deprecated checks are Universe checks. 
-        # If the metric is hidden by these flags, it should not be shown even if it matches search.
-        if not self.is_metric_in_universe(metric):
-            return False
-
-        if prot_count == 0 and group_count == 0:
-            return True
-
-        if prot_count > 0:
-            if metric.protocol_machine_code not in sel_protocols:
-                return False
-        
-        if group_count > 0:
-            m_groups = getattr(metric, 'hierarchy', [])
-            if m_groups:
-                if not any(g in sel_groups for g in m_groups):
-                    return False
-        
-        return True
+    def sync_filters(self):
+        """Push the state of the filter widgets to the proxy model. The proxy only re-filters if something changed."""
 
-    def is_metric_in_universe(self, metric):
-        
-        # Check Protocol Status first
-        protocol_status = 'active'
-        protocol_experimental = False
-        for p in self.qris_project.protocols.values():
-            if p.machine_code == metric.protocol_machine_code:
-                if "experimental" in p.name.lower() or getattr(p, 'status', 'active') == 'experimental':
-                    protocol_experimental = True
-                
-                if getattr(p, 'status', 'active') == 'deprecated':
-                    protocol_status = 'deprecated'
-                break
+        if self.act_limit_feasible.isChecked():
+            availability_filter = AVAILABILITY_FEASIBLE
+        elif self.act_limit_blocked.isChecked():
+            availability_filter = AVAILABILITY_BLOCKED
+        elif self.act_limit_manual.isChecked():
+            availability_filter = AVAILABILITY_MANUAL
+        else:
+            availability_filter = AVAILABILITY_ALL
+
+        self.proxy.set_filters(
+            # An empty combo (e.g. no metrics in the universe) does not filter
+            protocols=set(self.cbo_filter_protocol.get_checked_data()) if self.cbo_filter_protocol.count() > 0 else None,
+            groups=set(self.cbo_filter_group.get_checked_data()) if self.cbo_filter_group.count() > 0 else None,
+            search_text=self.txt_filter_search.text().lower().strip(),
+            in_use_only=self.act_limit_metrics.isChecked(),
+            availability_filter=availability_filter,
+            intrinsic_mode=self._intrinsic_mode,
+            include_experimental=self.act_include_experimental.isChecked(),
+            include_deprecated=self.act_include_deprecated.isChecked(),
+        )
 
-        if not self.act_include_experimental.isChecked():
-             if protocol_experimental:
-                 return False
+    def should_show_metric(self, metric):
+        self.sync_filters()
+        return self.proxy.accepts_metric(metric)
 
-        if not self.act_include_deprecated.isChecked():
-            status = getattr(metric, 'status', 'active')
-            if status == 'deprecated' or protocol_status == 'deprecated':
-                return False
-        
-        return True
+    def is_metric_in_universe(self, metric):
+        self.proxy.set_filters(include_experimental=self.act_include_experimental.isChecked(),
+                               include_deprecated=self.act_include_deprecated.isChecked())
+        return self.proxy.in_universe(metric)
 
     def clear_filters(self):
         self.txt_filter_search.clear()
@@ -888,67 +747,12 @@ class MetricLibrary(QtWidgets.QWidget):
         self.update_visibility()
 
     def update_visibility(self):
-        # Calculate Universe Count (Y)
-        all_metrics = self.qris_project.metrics.values()
-        universe_count = sum(1 for m in all_metrics if self.is_metric_in_universe(m))
-
-        visible_count = 0
-        if self.is_tree_view:
-            # Update tree only when tree view is active.
-            root = self.metricsTree.invisibleRootItem()
-            for i in range(root.childCount()):
-                prot_item = root.child(i)
-                prot_visible = False
-
-                for j in range(prot_item.childCount()):
-                    group_or_metric = prot_item.child(j)
-                    self.update_tree_item_visibility(group_or_metric)
-                    if not group_or_metric.isHidden():
-                        prot_visible = True
-
-                prot_item.setHidden(not prot_visible)
-
-            iterator = QtWidgets.QTreeWidgetItemIterator(self.metricsTree)
-            while iterator.value():
-                item = iterator.value()
-                metric = item.data(0, QtCore.Qt.UserRole)
-                if metric and not item.isHidden():
-                    visible_count += 1
-                iterator += 1
-        else:
-            # Update table only when table view is active.
-            for row in range(self.metricsTable.rowCount()):
-                item = self.metricsTable.item(row, 0)
-                if not item:
-                    continue
-                metric = item.data(QtCore.Qt.UserRole)
-                if metric:
-                    show = self.should_show_metric(metric)
-                    self.metricsTable.setRowHidden(row, not show)
-                    if show:
-                        visible_count += 1
-        
-        self.lbl_filter_count.setText(f"Viewing {visible_count} of {universe_count} Metrics")
+        self.sync_filters()
 
-    def update_tree_item_visibility(self, item):
-        # Leaf node check
-        metric = item.data(0, QtCore.Qt.UserRole)
-        if metric:
-            # It's a metric leaf
-            visible = self.should_show_metric(metric)
-            item.setHidden(not visible)
-            return visible
-        
-        # It's a group node
-        any_child_visible = False
-        for i in range(item.childCount()):
-            child = item.child(i)
-            child_visible = self.update_tree_item_visibility(child) # Recursion
-            if child_visible:
-                any_child_visible = True
-        
-        item.setHidden(not any_child_visible)
-        return any_child_visible
+        universe_count = sum(1 for m in self.qris_project.metrics.values() if self.proxy.in_universe(m))
+        visible_count = len(self.proxy.accepted_metrics())
+
+        self.lbl_filter_count.setText(f"Viewing {visible_count} of {universe_count} Metrics")
 
     def load_current_view(self):
         self.update_visibility()
@@ -966,217 +770,26 @@ class MetricLibrary(QtWidgets.QWidget):
         for metric_id in (new_metric_ids or []):
             self.current_metrics_state[metric_id] = 1  # Metric
         self.invalidate_availability_cache()
-        self.build_metrics_tree()
-        self.build_metrics_table()
+        self.model.rebuild()
+        self.arrange_columns()
+        if self.analysis is not None:
+            self.metricsTree.expandAll()
         self.load_filters()
         self.load_current_view()
 
-    def build_metrics_tree(self):
-        self.metricsTree.setSortingEnabled(False)
-        metrics = list(self.qris_project.metrics.values())
-        protocol_map = {p.machine_code: p.name for p in self.qris_project.protocols.values()}
-        
-        self.metricsTree.clear()
-        
-        def find_or_create_item(parent, text):
-            for i in range(parent.childCount()):
-                child = parent.child(i)
-                if child.text(0) == text:
-                    return child
-            item = QtWidgets.QTreeWidgetItem(parent)
-            item.setText(0, text)
-            item.setExpanded(self.analysis is not None)
-            return item
-
-        for metric in metrics:
-            level_id = self.current_metrics_state.get(metric.id, 0)
-
-            # 1. Protocol Node
-            prot_display = protocol_map.get(metric.protocol_machine_code, metric.protocol_machine_code)
-            prot_item = find_or_create_item(self.metricsTree.invisibleRootItem(), prot_display)
-
-            # 2. Group Nodes
-            current_parent = prot_item
-            hierarchy = getattr(metric, 'hierarchy', [])
-            if hierarchy:
-                for group_name in hierarchy:
-                    current_parent = find_or_create_item(current_parent, group_name)
-
-            # 3. Metric Leaf
-            metric_item = QtWidgets.QTreeWidgetItem(current_parent)
-            metric_item.setText(0, metric.name)
-            metric_item.setData(0, QtCore.Qt.UserRole, metric)
-            
-            font = self.get_metric_font(metric, level_id)
-            metric_item.setFont(0, font)
-            
-            # Version (Status)
-            status = getattr(metric, 'status', 'active')
-            ver_text = str(metric.version) if metric.version else ""
-            metric_item.setText(1, f"{ver_text} ({status})")
-            metric_item.setFont(1, font)
-
-            # Availability is computed lazily to keep initial form loading responsive.
-            calc_status = ""
-            metric_item.setText(2, calc_status)
-
-            # Usage
-            usage_display = ['None', 'Metric', 'Indicator'][level_id] if 0 <= level_id <= 2 else 'None'
-            
-            # Use a specialized item for sorting if feasible, or just text
-            # Setting text on column 4 allows sorting even if widget covers it?
-            # QTreeWidget uses the item text for sorting.
-            metric_item.setText(3, usage_display)
-
-            cboStatus = QtWidgets.QComboBox()
-            cboStatus.addItem('None', 0)
-            cboStatus.addItem('Metric', 1)
-            cboStatus.addItem('Indicator', 2)
-            cboStatus.setCurrentIndex(level_id)
-            cboStatus.setProperty("metric_item", metric_item) 
-            cboStatus.currentIndexChanged.connect(lambda idx, m_id=metric.id: self.on_metric_status_changed(m_id, idx))
-            self.metricsTree.setItemWidget(metric_item, 3, cboStatus)
-
-            # Description
-            metric_item.setText(4, metric.description)
-            metric_item.setToolTip(4, metric.description)
-        
-        self.metricsTree.setSortingEnabled(True)
-
-    def collapse_tree_children(self, item: QtWidgets.QTreeWidgetItem):
-        item.setExpanded(False)
-        for i in range(item.childCount()):
-             self.collapse_tree_children(item.child(i))
-
-    def expand_tree_children(self, item: QtWidgets.QTreeWidgetItem):
-        item.setExpanded(True)
-        for i in range(item.childCount()):
-             self.expand_tree_children(item.child(i))
-
-    def open_tree_context_menu(self, position):
-        item = self.metricsTree.itemAt(position)
-        if not item: return
-
-        metric = item.data(0, QtCore.Qt.UserRole)
-        menu = QtWidgets.QMenu()
-        if metric:
-            menu.addAction(QtGui.QIcon(':/plugins/qris_toolbar/details'), "Metric Details", lambda: FrmLayerMetricDetails(self, self.qris_project, metric=metric).exec_())
-            if metric.metric_params:
-                menu.addSeparator()
-                menu.addAction(
-                    QtGui.QIcon(':/plugins/qris_toolbar/fact_check'),
-                    "Metric Availability",
-                    lambda: FrmMetricAvailabilityMatrix(
-                        self,
-                        self.qris_project,
-                        metric,
-                        self.analysis_metadata,
-                        limit_dces=self.limit_dces,
-                        analysis=self.analysis,
-                        selected_analysis_metrics=self._build_selected_analysis_metrics(),
-                    ).exec_(),
-                )
-        elif item.childCount() > 0:
-            menu.addAction(QtGui.QIcon(':/plugins/qris_toolbar/expand'), "Expand All Children", lambda: self.expand_tree_children(item))
-            menu.addAction(QtGui.QIcon(':/plugins/qris_toolbar/collapse'), "Collapse All Children", lambda: self.collapse_tree_children(item))
-        if not menu.isEmpty():
-            menu.exec_(self.metricsTree.viewport().mapToGlobal(position))
-
-    def build_metrics_table(self):
-        self.metricsTable.setSortingEnabled(False)
-        metrics = list(self.qris_project.metrics.values())
-        protocol_map = {p.machine_code: p.name for p in self.qris_project.protocols.values()}
-
-        self.metricsTable.setRowCount(len(metrics))
-
-        for row in range(len(metrics)):
-            metric: Metric = metrics[row]
-            level_id = self.current_metrics_state.get(metric.id, 0)
-
-            # Protocol
-            prot_display = protocol_map.get(metric.protocol_machine_code, metric.protocol_machine_code)
-            prot_item = QtWidgets.QTableWidgetItem()
-            prot_item.setText(prot_display)
-            prot_item.setData(QtCore.Qt.UserRole, metric) # Storing metric here for retrieval
-            prot_item.setFlags(QtCore.Qt.ItemIsEnabled)
-            self.metricsTable.setItem(row, 0, prot_item)
-
-            # Group
-            group_item = QtWidgets.QTableWidgetItem()
-            hierarchy = getattr(metric, 'hierarchy', [])
-            group_item.setText(" > ".join(hierarchy) if hierarchy else "")
-            group_item.setFlags(QtCore.Qt.ItemIsEnabled)
-            self.metricsTable.setItem(row, 1, group_item)
-
-            # Metric
-            label_item = QtWidgets.QTableWidgetItem()
-            label_item.setText(metric.name)
-            font = self.get_metric_font(metric, level_id)
-            label_item.setFont(font)
-            self.metricsTable.setItem(row, 2, label_item)
-            label_item.setFlags(QtCore.Qt.ItemIsEnabled)
-
-            # Version (Status)
-            status = getattr(metric, 'status', 'active')
-            ver_text = str(metric.version) if metric.version else ""
-            ver_item = QtWidgets.QTableWidgetItem()
-            ver_item.setText(f"{ver_text} ({status})")
-            ver_item.setFont(font)
-            ver_item.setFlags(QtCore.Qt.ItemIsEnabled)
-            self.metricsTable.setItem(row, 3, ver_item)
-
-            # Availability is computed lazily to keep initial form loading responsive.
-            calc_status = ""
-            calc_item = QtWidgets.QTableWidgetItem()
-            calc_item.setText(calc_status)
-            calc_item.setFlags(QtCore.Qt.ItemIsEnabled)
-            self.metricsTable.setItem(row, 4, calc_item)
-
-            # Usage
-            usage_display = ['None', 'Metric', 'Indicator'][level_id] if 0 <= level_id <= 2 else 'None'
-            
-            # Create an item for sorting purposes
-            usage_item = QtWidgets.QTableWidgetItem(usage_display)
-            self.metricsTable.setItem(row, 5, usage_item)
-
-            cboStatus = QtWidgets.QComboBox()
-            cboStatus.addItem('None', 0)
-            cboStatus.addItem('Metric', 1)
-            cboStatus.addItem('Indicator', 2)
-            cboStatus.setCurrentIndex(level_id)
-            cboStatus.currentIndexChanged.connect(lambda idx, m_id=metric.id: self.on_metric_status_changed(m_id, idx))
-            self.metricsTable.setCellWidget(row, 5, cboStatus)
-
-            # Description
-            desc_item = QtWidgets.QTableWidgetItem(metric.description)
-            desc_item.setFlags(QtCore.Qt.ItemIsEnabled)
-            desc_item.setToolTip(metric.description)
-            self.metricsTable.setItem(row, 6, desc_item)
-
-        self.metricsTable.resizeColumnsToContents()
-        self.metricsTable.setColumnWidth(5, 120) # Ensure Usage column is wide enough for ComboBox
-        self.metricsTable.setSortingEnabled(True)
-
-    def open_table_context_menu(self, position):
-        item = self.metricsTable.itemAt(position)
-        if not item: return
-        
-        row = item.row()
-        metric_item = self.metricsTable.item(row, 0) # Metric stored in first column data
-        if not metric_item: return
-
-        metric = metric_item.data(QtCore.Qt.UserRole)
-        if not metric: return
+    def set_tree_children_expanded(self, index: QtCore.QModelIndex, expanded: bool):
+        self.metricsTree.setExpanded(index, expanded)
+        for row in range(self.proxy.rowCount(index)):
+            self.set_tree_children_expanded(self.proxy.index(row, 0, index), expanded)
 
+    def metric_context_menu(self, metric) -> QtWidgets.QMenu:
         menu = QtWidgets.QMenu()
-        action_details = menu.addAction("Metric Details...")
-        action_details.triggered.connect(lambda: FrmLayerMetricDetails(self, self.qris_project, metric=metric).exec_())
-
+        menu.addAction(QtGui.QIcon(':/plugins/qris_toolbar/details'), "Metric Details", lambda: FrmLayerMetricDetails(self, self.qris_project, metric=metric).exec_())
         if metric.metric_params:
             menu.addSeparator()
-
-            action_matrix = menu.addAction("Automation Availability Matrix...")
-            action_matrix.triggered.connect(
+            menu.addAction(
+                QtGui.QIcon(':/plugins/qris_toolbar/fact_check'),
+                "Metric Availability",
                 lambda: FrmMetricAvailabilityMatrix(
                     self,
                     self.qris_project,
@@ -1185,135 +798,55 @@ class MetricLibrary(QtWidgets.QWidget):
                     limit_dces=self.limit_dces,
                     analysis=self.analysis,
                     selected_analysis_metrics=self._build_selected_analysis_metrics(),
-                ).exec_()
+                ).exec_(),
             )
-        
+        return menu
+
+    def open_tree_context_menu(self, position):
+        index = self.metricsTree.indexAt(position)
+        if not index.isValid():
+            return
+
+        index = index.siblingAtColumn(COLUMN_NAME)
+        metric = self.proxy.metric(index)
+        if metric:
+            menu = self.metric_context_menu(metric)
+        elif self.proxy.rowCount(index) > 0:
+            menu = QtWidgets.QMenu()
+            menu.addAction(QtGui.QIcon(':/plugins/qris_toolbar/expand'), "Expand All Children", lambda: self.set_tree_children_expanded(index, True))
+            menu.addAction(QtGui.QIcon(':/plugins/qris_toolbar/collapse'), "Collapse All Children", lambda: self.set_tree_children_expanded(index, False))
+        else:
+            return
+        menu.exec_(self.metricsTree.viewport().mapToGlobal(position))
+
+    def open_table_context_menu(self, position):
+        index = self.metricsTable.indexAt(position)
+        if not index.isValid():
+            return
+
+        metric = self.proxy.metric(index)
+        if not metric:
+            return
+
+        menu = self.metric_context_menu(metric)
         menu.exec_(self.metricsTable.viewport().mapToGlobal(position))
 
     def toggle_all_metrics(self, level_id_text: str):
-        metrics_update_map = {} # metric_id -> new_level_idx
-        
         # Determine target logic
         use_default = (level_id_text == 'Default')
         fixed_target_idx = 0
         if level_id_text == 'Metric': fixed_target_idx = 1
         elif level_id_text == 'Indicator': fixed_target_idx = 2
-        
-        usage_labels = ['None', 'Metric', 'Indicator']
 
-        # 1. Calculate updates
-        for metric in self.qris_project.metrics.values():
-             if self.should_show_metric(metric):
-                 new_state = metric.default_level_id if use_default else fixed_target_idx
-                 metrics_update_map[metric.id] = new_state
-                 self.current_metrics_state[metric.id] = new_state
-
-        self.invalidate_availability_cache()
-
-        # 2. Update Tree Widgets
-        iterator = QtWidgets.QTreeWidgetItemIterator(self.metricsTree)
-        while iterator.value():
-            item = iterator.value()
-            metric = item.data(0, QtCore.Qt.UserRole)
-            if metric and metric.id in metrics_update_map:
-                 new_idx = metrics_update_map[metric.id]
-                 item.setText(3, usage_labels[new_idx] if 0 <= new_idx <= 2 else 'None') # Update sorting text
-                 
-                 # Apply Font
-                 font = self.get_metric_font(metric, new_idx)
-                 item.setFont(0, font)
-                 item.setFont(1, font)
-
-                 w = self.metricsTree.itemWidget(item, 3)
-                 if isinstance(w, QtWidgets.QComboBox):
-                     w.blockSignals(True)
-                     w.setCurrentIndex(new_idx)
-                     w.blockSignals(False)
-            iterator += 1
-
-        # 3. Update Table Widgets
-        for row in range(self.metricsTable.rowCount()):
-             item = self.metricsTable.item(row, 0) # Protocol column holds valid items? No, row 0 col 0. Checks valid row.
-             if not item: continue # Should not happen
-             
-             # Metric is stored in Column 0 (Protocol) UserRole? YES.
-             metric = item.data(QtCore.Qt.UserRole) 
-             
-             if metric and metric.id in metrics_update_map:
-                 new_idx = metrics_update_map[metric.id]
-                 usage_display = usage_labels[new_idx] if 0 <= new_idx <= 2 else 'None'
-
-                 # Update sorting text
-                 usage_item = self.metricsTable.item(row, 5)
-                 if usage_item:
-                     usage_item.setText(usage_display)
-                 
-                 # Apply Font
-                 font = self.get_metric_font(metric, new_idx)
-                 if self.metricsTable.item(row, 2): self.metricsTable.item(row, 2).setFont(font)
-                 if self.metricsTable.item(row, 3): self.metricsTable.item(row, 3).setFont(font)
-                     
-                 w = self.metricsTable.cellWidget(row, 5)
-                 if isinstance(w, QtWidgets.QComboBox):
-                     w.blockSignals(True)
-                     w.setCurrentIndex(new_idx)
-                     w.blockSignals(False)
-                     
-        self.update_usage_count_label()
+        self.sync_filters()
+        states = {metric.id: metric.default_level_id if use_default else fixed_target_idx for metric in self.proxy.accepted_metrics()}
+        self.apply_metric_states(states)
 
     def apply_metric_states(self, states: dict):
-        """Bulk-apply a pre-computed {metric_id: level_id} dict in a single tree/table pass.
+        """Bulk-apply a pre-computed {metric_id: level_id} dict with one model update per run of changed rows.
         More efficient than calling on_metric_status_changed() per metric."""
-        usage_labels = ['None', 'Metric', 'Indicator']
-
-        # Update internal state
-        for metric_id, level_id in states.items():
-            self.current_metrics_state[metric_id] = level_id
-
+        self.model.set_levels(states)
         self.invalidate_availability_cache()
-
-        # Single pass over tree
-        iterator = QtWidgets.QTreeWidgetItemIterator(self.metricsTree)
-        while iterator.value():
-            item = iterator.value()
-            metric = item.data(0, QtCore.Qt.UserRole)
-            if metric and metric.id in states:
-                new_idx = states[metric.id]
-                usage_display = usage_labels[new_idx] if 0 <= new_idx <= 2 else 'None'
-                item.setText(3, usage_display)
-                font = self.get_metric_font(metric, new_idx)
-                item.setFont(0, font)
-                item.setFont(1, font)
-                w = self.metricsTree.itemWidget(item, 3)
-                if isinstance(w, QtWidgets.QComboBox):
-                    w.blockSignals(True)
-                    w.setCurrentIndex(new_idx)
-                    w.blockSignals(False)
-            iterator += 1
-
-        # Single pass over table
-        for row in range(self.metricsTable.rowCount()):
-            item = self.metricsTable.item(row, 0)
-            if not item:
-                continue
-            metric = item.data(QtCore.Qt.UserRole)
-            if metric and metric.id in states:
-                new_idx = states[metric.id]
-                usage_display = usage_labels[new_idx] if 0 <= new_idx <= 2 else 'None'
-                usage_item = self.metricsTable.item(row, 5)
-                if usage_item:
-                    usage_item.setText(usage_display)
-                font = self.get_metric_font(metric, new_idx)
-                if self.metricsTable.item(row, 2):
-                    self.metricsTable.item(row, 2).setFont(font)
-                if self.metricsTable.item(row, 3):
-                    self.metricsTable.item(row, 3).setFont(font)
-                w = self.metricsTable.cellWidget(row, 5)
-                if isinstance(w, QtWidgets.QComboBox):
-                    w.blockSignals(True)
-                    w.setCurrentIndex(new_idx)
-                    w.blockSignals(False)
-
         self.update_usage_count_label()
 
     def get_selected_metrics(self):
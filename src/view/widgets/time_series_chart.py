@@ -0,0 +1,102 @@
+import numpy as np
+
+import matplotlib.dates as mdates
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
+from matplotlib.backends.backend_qt5agg import NavigationToolbar2QT as NavigationToolbar
+
+from qgis.PyQt import QtWidgets
+
+from ...lib.decimation import DECIMATION_MINMAX, decimate
+
+
+class TimeSeriesChart(QtWidgets.QWidget):
+    """Matplotlib time series chart that only draws the points visible at screen resolution.
+
+    Series are stored as NumPy arrays and decimated to the canvas width whenever the
+    x axis limits change (zoom, pan or a new date range) or the canvas is resized.
+    """
+
+    def __init__(self, parent=None, figsize=None, method: str = DECIMATION_MINMAX, toolbar: bool = True):
+        super().__init__(parent)
+
+        self.method = method
+        # {line: (x as matplotlib date numbers, y)}
+        self.series = {}
+        self._updating = False
+
+        self.canvas = FigureCanvas(Figure(figsize=figsize))
+        self.figure = self.canvas.figure
+        self.ax = self.canvas.figure.subplots()
+        self.ax.callbacks.connect('xlim_changed', self.on_xlim_changed)
+        self.canvas.mpl_connect('resize_event', self.on_resize)
+
+        layout = QtWidgets.QVBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+        if toolbar:
+            self.toolbar = NavigationToolbar(self.canvas, self)
+            layout.addWidget(self.toolbar)
+        layout.addWidget(self.canvas)
+
+    def clear(self):
+        """Clear the axes and all series."""
+
+        self.series = {}
+        self.ax.cla()
+        # cla() removes the callbacks registered on the axes
+        self.ax.callbacks.connect('xlim_changed', self.on_xlim_changed)
+
+    def add_series(self, dates: np.ndarray, values: np.ndarray, fmt: str = None, **kwargs):
+        """Plot a series of datetime64 dates and float values. fmt and keyword arguments are passed to Axes.plot."""
+
+        x = mdates.date2num(dates) if len(dates) > 0 else np.zeros(0, dtype=np.float64)
+        y = np.asarray(values, dtype=np.float64)
+        if np.any(np.diff(x) < 0):
+            order = np.argsort(x, kind='stable')
+            x, y = x[order], y[order]
+
+        plot_x, plot_y = decimate(x, y, pixels=self.pixel_width(), method=self.method)
+        args = (plot_x, plot_y) if fmt is None else (plot_x, plot_y, fmt)
+        line, = self.ax.plot(*args, **kwargs)
+        self.series[line] = (x, y)
+
+        # Autoscale to the full series, not just the decimated points
+        if len(x) > 0:
+            finite = np.isfinite(y)
+            if finite.any():
+                self.ax.update_datalim(np.column_stack((x[finite][[0, -1]], [np.nanmin(y), np.nanmax(y)])))
+                self.ax.autoscale_view()
+        self.ax.xaxis_date()
+        return line
+
+    def pixel_width(self) -> int:
+        """Width of the axes in device pixels."""
+
+        width = int(self.ax.get_window_extent().width) if self.canvas.width() > 0 else 0
+        return max(width, 100)
+
+    def redecimate(self):
+
+        if self._updating or len(self.series) == 0:
+            return
+
+        self._updating = True
+        try:
+            x_min, x_max = self.ax.get_xlim()
+            pixels = self.pixel_width()
+            for line, (x, y) in self.series.items():
+                plot_x, plot_y = decimate(x, y, x_min, x_max, pixels, self.method)
+                line.set_data(plot_x, plot_y)
+        finally:
+            self._updating = False
+
+    def on_xlim_changed(self, ax):
+        self.redecimate()
+        self.canvas.draw_idle()
+
+    def on_resize(self, event):
+        self.redecimate()
+
+    def draw(self):
+        self.redecimate()
+        self.canvas.draw()
@@ -0,0 +1,383 @@
+# coding=utf-8
+"""Throughput benchmarks for QRiS on a synthetic project.
+
+Run from the plugin root inside a QGIS Python environment:
+
+    python -m test.benchmarks.run_benchmarks --sample-frames 5000 --output bench.json
+    python -m test.benchmarks.run_benchmarks --output new.json --baseline bench.json
+
+Each benchmark is repeated and the individual timings, median and throughput are
+written to a JSON file. When a baseline results file is supplied, any benchmark
+whose median is slower than the baseline by more than the tolerance is reported
+as a regression (and the exit code is non-zero with --fail-on-regression).
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import statistics
+from datetime import datetime
+
+try:
+    from utilities import get_qgis_app
+except ImportError:
+    from ..utilities import get_qgis_app
+
+get_qgis_app()
+
+from osgeo import gdal, ogr, osr
+from qgis.core import Qgis, QgsGeometry
+
+try:
+    from src.gp.analysis_metrics_task import AnalysisMetricsTask
+    from src.gp.zonal_statistics import zonal_statistics
+    from src.gp.import_feature_class import ImportFeatureClass
+    from src.gp.order_by_line_task import OrderByLineTask
+    from src.gp.export_project import prune_export_geopackage
+    from src.model.project import Project
+    from src.lib.rs_project import RSProject
+except ImportError:
+    from qris_dev.src.gp.analysis_metrics_task import AnalysisMetricsTask
+    from qris_dev.src.gp.zonal_statistics import zonal_statistics
+    from qris_dev.src.gp.import_feature_class import ImportFeatureClass
+    from qris_dev.src.gp.order_by_line_task import OrderByLineTask
+    from qris_dev.src.gp.export_project import prune_export_geopackage
+    from qris_dev.src.model.project import Project
+    from qris_dev.src.lib.rs_project import RSProject
+
+try:
+    from synthetic_project import SyntheticProject, SyntheticProjectConfig, BENCHMARK_METRICS, create_synthetic_project
+except ImportError:
+    from .synthetic_project import SyntheticProject, SyntheticProjectConfig, BENCHMARK_METRICS, create_synthetic_project
+
+RESULTS_FORMAT_VERSION = 1
+DEFAULT_TOLERANCE = 0.10
+ZONAL_STATISTICS_MAX_FRAMES = 500
+
+
+def _plugin_version() -> str:
+    version_path = os.path.join(os.path.dirname(__file__), '..', '..', '__version__.py')
+    version = {}
+    with open(version_path, 'r') as f:
+        exec(f.read(), version)  # nosec B102 - reads the plugin's own version file
+    return version.get('__version__', 'unknown')
+
+
+def time_benchmark(name: str, group: str, func, repeat: int, items: int, setup=None) -> dict:
+    """Time func() repeat times and summarise.
+
+    Args:
+        name (str): unique benchmark name, used as the key for regression comparison
+        group (str): benchmark group (metrics, zonal_statistics, import, load, export, order_by_line)
+        func (callable): the operation to time. Receives the value returned by setup when setup is supplied.
+        repeat (int): number of timed repetitions
+        items (int): units of work in one repetition, used for the throughput figure
+        setup (callable): optional untimed preparation run before each repetition
+
+    Returns:
+        dict: benchmark result record
+    """
+
+    seconds = []
+    details = None
+    for _i in range(repeat):
+        args = setup() if setup is not None else None
+        start = time.perf_counter()
+        details = func(args) if setup is not None else func()
+        seconds.append(time.perf_counter() - start)
+
+    median = statistics.median(seconds)
+    result = {
+        'name': name,
+        'group': group,
+        'repeat': repeat,
+        'items': items,
+        'seconds': seconds,
+        'min': min(seconds),
+        'median': median,
+        'mean': statistics.mean(seconds),
+        'items_per_second': items / median if median > 0 else None,
+    }
+    if isinstance(details, dict):
+        result['details'] = details
+    print(f'{name:<40} median {median:10.4f}s  ({result["items_per_second"] or 0:12.1f} items/s)')
+    return result
+
+
+def benchmark_project_load(project: SyntheticProject, repeat: int) -> list:
+
+    def load():
+        qris_project = Project(project.project_file)
+        return {'sample_frames': len(qris_project.sample_frames), 'events': len(qris_project.events)}
+
+    return [time_benchmark('project_load', 'load', load, repeat, 1)]
+
+
+def benchmark_metrics(project: SyntheticProject, repeat: int) -> list:
+
+    qris_project = Project(project.project_file)
+    analysis = qris_project.analyses[project.analysis_id]
+    results = []
+
+    # Metrics run in definition order so dependency metrics (proportion) already have values
+    for machine_name, metric_function, _metric_params in BENCHMARK_METRICS:
+        metric_id = project.metric_ids[machine_name]
+
+        def run_task(metric_id=metric_id):
+            task = AnalysisMetricsTask(
+                qris_project,
+                analysis,
+                sample_frame_ids=project.sample_frame_feature_ids,
+                event_ids=project.event_ids,
+                metric_ids=[metric_id],
+                overwrite_existing=True,
+                force_active=True,
+            )
+            if not task.run():
+                raise Exception(f'Analysis metrics task failed for {machine_name}: {task.exception}')
+            summary = dict(task.summary)
+            summary['messages'] = len(summary['messages'])
+            return summary
+
+        items = len(project.sample_frame_feature_ids) * len(project.event_ids)
+        result = time_benchmark(f'metrics.{machine_name}', 'metrics', run_task, repeat, items)
+        result['metric_function'] = metric_function
+        results.append(result)
+
+    return results
+
+
+def benchmark_zonal_statistics(project: SyntheticProject, repeat: int) -> list:
+
+    qris_project = Project(project.project_file)
+    dem_path = os.path.join(os.path.dirname(project.project_file), qris_project.rasters[project.raster_id].path)
+
+    srs = osr.SpatialReference()
+    srs.ImportFromEPSG(4326)
+    srs.SetAxisMappingStrategy(osr.OAMS_TRADITIONAL_GIS_ORDER)
+
+    geoms = []
+    ds: ogr.DataSource = ogr.Open(project.project_file)
+    layer: ogr.Layer = ds.GetLayerByName('sample_frame_features')
+    layer.SetAttributeFilter(f'sample_frame_id = {project.sample_frame_id}')
+    for feature in layer:
+        geom: ogr.Geometry = feature.GetGeometryRef().Clone()
+        geom.AssignSpatialReference(srs)
+        geoms.append(geom)
+        if len(geoms) >= ZONAL_STATISTICS_MAX_FRAMES:
+            break
+    layer = None
+    ds = None
+
+    def run_zonal_statistics():
+        for geom in geoms:
+            zonal_statistics(dem_path, geom)
+
+    return [time_benchmark('zonal_statistics', 'zonal_statistics', run_zonal_statistics, repeat, len(geoms))]
+
+
+def benchmark_import(project: SyntheticProject, repeat: int, work_dir: str) -> list:
+
+    def setup():
+        # Import into a fresh copy each time so repetitions (and later benchmarks) see the same data
+        copy_path = os.path.join(work_dir, 'import_target.gpkg')
+        shutil.copy(project.project_file, copy_path)
+        return copy_path
+
+    def run_import(copy_path):
+        attributes = {'event_id': project.event_ids[0], 'event_layer_id': project.layer_ids['bench_polygons']}
+        task = ImportFeatureClass(project.import_source, f'{copy_path}|layername=dce_polygons', attributes)
+        if not task.run():
+            raise Exception(f'Import feature class failed: {task.exception}')
+        return {'in_feats': task.in_feats, 'out_feats': task.out_feats, 'skipped_feats': task.skipped_feats}
+
+    return [time_benchmark('import_feature_class', 'import', run_import, repeat, project.config.import_features, setup=setup)]
+
+
+def benchmark_order_by_line(project: SyntheticProject, repeat: int) -> list:
+
+    centerline = QgsGeometry.fromWkt(project.centerline_wkt)
+
+    def run_order_by_line():
+        task = OrderByLineTask(f'{project.project_file}|layername=sample_frame_features', centerline,
+                               filter_expression=f'sample_frame_id = {project.sample_frame_id}')
+        if not task.run():
+            raise Exception(f'Order by line task failed: {task.exception}')
+
+    return [time_benchmark('order_by_line', 'order_by_line', run_order_by_line, repeat, len(project.sample_frame_feature_ids))]
+
+
+def benchmark_export(project: SyntheticProject, repeat: int, work_dir: str) -> list:
+
+    qris_project = Project(project.project_file)
+
+    # Keep everything, which is the most expensive export
+    keep_layers = {
+        'sample_frame_features': {'id_field': 'sample_frame_id', 'id_values': [str(project.sample_frame_id)]},
+        'sample_frames': {'id_field': 'id', 'id_values': [str(project.sample_frame_id)]},
+        'profile_centerlines': {'id_field': 'profile_id', 'id_values': [str(project.profile_id)]},
+        'profiles': {'id_field': 'id', 'id_values': [str(project.profile_id)]},
+        'rasters': {'id_field': 'id', 'id_values': [str(project.raster_id)]},
+        'events': {'id_field': 'id', 'id_values': [str(event_id) for event_id in project.event_ids]},
+        'event_layers': {'id_field': 'event_id', 'id_values': [str(event_id) for event_id in project.event_ids]},
+        'analyses': {'id_field': 'id', 'id_values': [str(project.analysis_id)]},
+    }
+    for fc_name in ['dce_points', 'dce_lines', 'dce_polygons']:
+        keep_layers[fc_name] = {'id_field': 'event_layer_id', 'id_values': [str(layer_id) for layer_id in project.layer_ids.values()]}
+
+    raster = qris_project.rasters[project.raster_id]
+
+    def setup():
+        out_dir = os.path.join(work_dir, 'export')
+        if os.path.exists(out_dir):
+            shutil.rmtree(out_dir)
+        os.makedirs(out_dir)
+        return out_dir
+
+    def run_export(out_dir):
+        out_geopackage = os.path.join(out_dir, 'qris.gpkg')
+        shutil.copy(project.project_file, out_geopackage)
+        out_raster_path = os.path.join(out_dir, raster.path)
+        os.makedirs(os.path.dirname(out_raster_path), exist_ok=True)
+        shutil.copy(os.path.join(os.path.dirname(project.project_file), raster.path), out_raster_path)
+
+        prune_export_geopackage(out_geopackage, keep_layers, 'QRiS Benchmark Export', 'Benchmark export')
+
+        exported_project = Project(out_geopackage)
+        RSProject(exported_project).write()
+        return {'geopackage_bytes': os.path.getsize(out_geopackage)}
+
+    return [time_benchmark('export_project', 'export', run_export, repeat, 1, setup=setup)]
+
+
+def compare_results(results: dict, baseline: dict, tolerance: float) -> list:
+    """Compare the medians of two results documents.
+
+    Returns:
+        list: one record for every benchmark present in both documents, with a 'regression' flag
+    """
+
+    baseline_by_name = {b['name']: b for b in baseline.get('benchmarks', [])}
+    comparisons = []
+    for current in results.get('benchmarks', []):
+        previous = baseline_by_name.get(current['name'], None)
+        if previous is None or not previous.get('median'):
+            continue
+        ratio = current['median'] / previous['median']
+        comparisons.append({
+            'name': current['name'],
+            'baseline_median': previous['median'],
+            'median': current['median'],
+            'ratio': ratio,
+            'regression': ratio > 1.0 + tolerance,
+        })
+    return comparisons
+
+
+def run(args) -> int:
+
+    config = SyntheticProjectConfig(
+        sample_frames=args.sample_frames,
+        events=args.events,
+        features_per_layer=args.features_per_layer,
+        vertex_density=args.vertex_density,
+        dem_size=args.dem_size,
+        import_features=args.import_features,
+        seed=args.seed,
+    )
+
+    work_dir = args.work_dir if args.work_dir else tempfile.mkdtemp(prefix='qris_benchmark_')
+    os.makedirs(work_dir, exist_ok=True)
+    project_file = os.path.join(work_dir, 'qris.gpkg')
+
+    try:
+        start = time.perf_counter()
+        project = create_synthetic_project(project_file, config)
+        generation_seconds = time.perf_counter() - start
+        print(f'Synthetic project created in {generation_seconds:.1f}s: {project_file}')
+
+        groups = args.only.split(',') if args.only else ['load', 'metrics', 'zonal_statistics', 'import', 'order_by_line', 'export']
+        benchmarks = []
+        if 'load' in groups:
+            benchmarks.extend(benchmark_project_load(project, args.repeat))
+        if 'metrics' in groups:
+            benchmarks.extend(benchmark_metrics(project, args.repeat))
+        if 'zonal_statistics' in groups:
+            benchmarks.extend(benchmark_zonal_statistics(project, args.repeat))
+        if 'import' in groups:
+            benchmarks.extend(benchmark_import(project, args.repeat, work_dir))
+        if 'order_by_line' in groups:
+            benchmarks.extend(benchmark_order_by_line(project, args.repeat))
+        if 'export' in groups:
+            benchmarks.extend(benchmark_export(project, args.repeat, work_dir))
+
+        results = {
+            'format_version': RESULTS_FORMAT_VERSION,
+            'qris_version': _plugin_version(),
+            'created_on': datetime.now().isoformat(timespec='seconds'),
+            'environment': {
+                'python': platform.python_version(),
+                'platform': platform.platform(),
+                'qgis': Qgis.QGIS_VERSION,
+                'gdal': gdal.__version__,
+                'cpu_count': os.cpu_count(),
+            },
+            'config': config.to_dict(),
+            'generation_seconds': generation_seconds,
+            'benchmarks': benchmarks,
+        }
+
+        regressions = []
+        if args.baseline:
+            with open(args.baseline, 'r') as f:
+                baseline = json.load(f)
+            comparisons = compare_results(results, baseline, args.tolerance)
+            results['comparison'] = {'baseline': os.path.abspath(args.baseline), 'tolerance': args.tolerance, 'benchmarks': comparisons}
+            regressions = [c for c in comparisons if c['regression']]
+            for comparison in comparisons:
+                flag = 'REGRESSION' if comparison['regression'] else ''
+                print(f'{comparison["name"]:<40} {comparison["ratio"]:6.2f}x baseline {flag}')
+
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f'Benchmark results written to {args.output}')
+
+        if regressions and args.fail_on_regression:
+            return 1
+        return 0
+
+    finally:
+        if not args.keep and not args.work_dir:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description='QRiS synthetic project benchmarks')
+    parser.add_argument('--sample-frames', type=int, default=100, help='Number of sample frame features')
+    parser.add_argument('--events', type=int, default=2, help='Number of data capture events')
+    parser.add_argument('--features-per-layer', type=int, default=200, help='Features per DCE layer per event')
+    parser.add_argument('--vertex-density', type=int, default=16, help='Vertices per line and polygon ring')
+    parser.add_argument('--dem-size', type=int, default=1024, help='DEM width and height in cells')
+    parser.add_argument('--import-features', type=int, default=1000, help='Features in the import source')
+    parser.add_argument('--seed', type=int, default=42, help='Random seed for the synthetic project')
+    parser.add_argument('--repeat', type=int, default=3, help='Timed repetitions per benchmark')
+    parser.add_argument('--only', type=str, default=None, help='Comma separated groups: load,metrics,zonal_statistics,import,order_by_line,export')
+    parser.add_argument('--output', type=str, default='qris_benchmarks.json', help='Path of the JSON results file')
+    parser.add_argument('--baseline', type=str, default=None, help='Previous results file to compare against')
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE, help='Allowed slowdown before a benchmark is a regression (0.1 = 10%%)')
+    parser.add_argument('--fail-on-regression', action='store_true', help='Exit with code 1 when a regression is found')
+    parser.add_argument('--work-dir', type=str, default=None, help='Folder for the synthetic project. A temporary folder is used by default')
+    parser.add_argument('--keep', action='store_true', help='Keep the temporary synthetic project')
+    args = parser.parse_args()
+
+    sys.exit(run(args))
+
+
+if __name__ == '__main__':
+    main()
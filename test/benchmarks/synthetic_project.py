@@ -0,0 +1,419 @@
+# coding=utf-8
+"""Synthetic QRiS project generator used by the benchmark suite.
+
+The project is built through the same path as a real project (feature classes,
+schema.sql and the migrations) and is then populated with a configurable number
+of sample frames, data capture events, DCE features, a centerline profile and a
+DEM so that metric, import, export and load timings can be compared between
+releases on identical data.
+"""
+
+import os
+import math
+import json
+import random
+import sqlite3
+import uuid
+
+import numpy as np
+from osgeo import gdal, ogr, osr
+
+try:
+    from src.model.project import project_layers, create_geopackage_table, apply_db_migrations
+    from src.model.profile import Profile, insert_profile
+    from src.model.raster import insert_raster
+    from src.model.sample_frame import insert_sample_frame
+    from src.model.metric import insert_metric
+except ImportError:
+    from qris_dev.src.model.project import project_layers, create_geopackage_table, apply_db_migrations
+    from qris_dev.src.model.profile import Profile, insert_profile
+    from qris_dev.src.model.raster import insert_raster
+    from qris_dev.src.model.sample_frame import insert_sample_frame
+    from qris_dev.src.model.metric import insert_metric
+
+BENCHMARK_PROTOCOL = 'QRIS_BENCHMARK'
+DEM_RASTER_TYPE_ID = 4
+
+# Synthetic DCE layers: fc_name, display name, geometry type
+BENCHMARK_LAYERS = [
+    ('bench_points', 'Benchmark Points', 'Point'),
+    ('bench_lines', 'Benchmark Lines', 'Linestring'),
+    ('bench_polygons', 'Benchmark Polygons', 'Polygon'),
+]
+
+# One metric per analysis metric function: machine name, metric function, metric params
+BENCHMARK_METRICS = [
+    ('bench_count', 'count', {'dce_layers': [{'layer_id_ref': 'bench_points'}]}),
+    ('bench_count_filtered', 'count', {'dce_layers': [{'layer_id_ref': 'bench_points', 'attribute_filter': {'field_id_ref': 'bench_type', 'values': ['A']}}]}),
+    ('bench_length', 'length', {'dce_layers': [{'layer_id_ref': 'bench_lines'}]}),
+    ('bench_area', 'area', {'dce_layers': [{'layer_id_ref': 'bench_polygons'}]}),
+    ('bench_sinuosity', 'sinuosity', {'dce_layers': [{'layer_id_ref': 'bench_lines'}]}),
+    ('bench_gradient', 'gradient', {'inputs': [{'input_ref': 'dem', 'usage': 'surface'}], 'dce_layers': [{'layer_id_ref': 'bench_lines'}]}),
+    ('bench_area_proportion', 'area_proportion', {'dce_layers': [{'layer_id_ref': 'bench_polygons', 'usage': 'numerator'}]}),
+    ('bench_proportion', 'proportion', {'metric_dependencies': [
+        {'metric_id_ref': 'bench_length', 'protocol_machine_code_ref': BENCHMARK_PROTOCOL, 'version': '1.0', 'usage': 'numerator'},
+        {'metric_id_ref': 'bench_area', 'protocol_machine_code_ref': BENCHMARK_PROTOCOL, 'version': '1.0', 'usage': 'denominator'},
+    ]}),
+    ('bench_elevation', 'elevation', {'inputs': [{'input_ref': 'dem', 'usage': 'surface'}, {'input_ref': 'centerline', 'usage': 'sample_frame_difference'}]}),
+]
+
+
+class SyntheticProjectConfig:
+    """Size parameters for a synthetic project."""
+
+    def __init__(self,
+                 sample_frames: int = 100,
+                 events: int = 2,
+                 features_per_layer: int = 200,
+                 vertex_density: int = 16,
+                 dem_size: int = 1024,
+                 import_features: int = 1000,
+                 seed: int = 42):
+        """
+        sample_frames (int): number of sample frame features (grid cells)
+        events (int): number of data capture events, each with every benchmark layer
+        features_per_layer (int): features per benchmark layer per event
+        vertex_density (int): vertices per line and per polygon ring
+        dem_size (int): DEM width and height in cells
+        import_features (int): polygon features in the source GeoPackage used by the import benchmark
+        seed (int): random seed so that projects are reproducible
+        """
+        self.sample_frames = sample_frames
+        self.events = events
+        self.features_per_layer = features_per_layer
+        self.vertex_density = max(vertex_density, 4)
+        self.dem_size = dem_size
+        self.import_features = import_features
+        self.seed = seed
+
+    def to_dict(self) -> dict:
+        return dict(self.__dict__)
+
+
+class SyntheticProject:
+    """Identifiers of the items created in a synthetic project."""
+
+    # Geographic origin and sample frame cell size (degrees)
+    ORIGIN_X = -111.85
+    ORIGIN_Y = 41.70
+    CELL_SIZE = 0.002
+
+    def __init__(self, project_file: str, config: SyntheticProjectConfig):
+        self.project_file = project_file
+        self.config = config
+        self.sample_frame_id = None
+        self.sample_frame_feature_ids = []
+        self.event_ids = []
+        self.layer_ids = {}
+        self.metric_ids = {}
+        self.analysis_id = None
+        self.profile_id = None
+        self.raster_id = None
+        self.centerline_wkt = None
+        self.import_source = None
+
+    @property
+    def columns(self) -> int:
+        return int(math.ceil(math.sqrt(self.config.sample_frames)))
+
+    @property
+    def rows(self) -> int:
+        return int(math.ceil(self.config.sample_frames / self.columns))
+
+    def extent(self, margin: float = 0.0) -> tuple:
+        """(min_x, min_y, max_x, max_y) of the sample frame grid."""
+        return (self.ORIGIN_X - margin,
+                self.ORIGIN_Y - margin,
+                self.ORIGIN_X + self.columns * self.CELL_SIZE + margin,
+                self.ORIGIN_Y + self.rows * self.CELL_SIZE + margin)
+
+
+def _wgs84() -> osr.SpatialReference:
+    srs = osr.SpatialReference()
+    srs.ImportFromEPSG(4326)
+    srs.SetAxisMappingStrategy(osr.OAMS_TRADITIONAL_GIS_ORDER)
+    return srs
+
+
+def _ring(cx: float, cy: float, radius: float, vertices: int, rnd: random.Random) -> ogr.Geometry:
+    ring = ogr.Geometry(ogr.wkbLinearRing)
+    for i in range(vertices):
+        angle = 2.0 * math.pi * i / vertices
+        r = radius * (0.75 + 0.25 * rnd.random())
+        ring.AddPoint_2D(cx + r * math.cos(angle), cy + r * math.sin(angle))
+    ring.CloseRings()
+    return ring
+
+
+def _line(x: float, y: float, length: float, vertices: int, rnd: random.Random) -> ogr.Geometry:
+    line = ogr.Geometry(ogr.wkbLineString)
+    heading = rnd.uniform(0, 2.0 * math.pi)
+    step = length / (vertices - 1)
+    for _i in range(vertices):
+        line.AddPoint_2D(x, y)
+        heading += rnd.uniform(-0.5, 0.5)
+        x += step * math.cos(heading)
+        y += step * math.sin(heading)
+    return line
+
+
+def create_empty_project(project_file: str, name: str = 'QRiS Benchmark Project') -> None:
+    """Create a new, empty QRiS project exactly as the New Project task does and bring it up to date."""
+
+    for fc_name, layer_name, geometry_type in project_layers:
+        features_path = '{}|layername={}'.format(project_file, layer_name)
+        create_geopackage_table(geometry_type, fc_name, project_file, features_path, None)
+
+    schema_path = os.path.join(os.path.dirname(__file__), '..', '..', 'src', 'db', 'schema.sql')
+    with open(schema_path, 'r') as schema_file:
+        sql_commands = schema_file.read()
+
+    with sqlite3.connect(project_file) as conn:
+        conn.execute('PRAGMA foreign_keys = ON;')
+        curs = conn.cursor()
+        curs.executescript(sql_commands)
+        curs.execute('INSERT INTO projects (name, description, map_guid, metadata) VALUES (?, ?, ?, ?)', [name, None, str(uuid.uuid4()), None])
+        conn.commit()
+
+    for _message in apply_db_migrations(project_file):
+        pass
+
+
+def _insert_protocol_and_layers(project: SyntheticProject) -> None:
+
+    with sqlite3.connect(project.project_file) as conn:
+        curs = conn.cursor()
+        curs.execute('INSERT INTO protocols (name, machine_code, has_custom_ui, description, version, metadata) VALUES (?, ?, ?, ?, ?, ?)', [
+            'QRiS Benchmark', BENCHMARK_PROTOCOL, 0, 'Synthetic protocol used by the benchmark suite', '1.0',
+            json.dumps({'system': {'status': 'experimental'}})])
+        protocol_id = curs.lastrowid
+
+        for fc_name, display_name, geom_type in BENCHMARK_LAYERS:
+            metadata = {'hierarchy': ['Benchmark'], 'fields': [{'id': 'bench_type', 'type': 'list', 'label': 'Type', 'values': ['A', 'B']}]}
+            curs.execute('INSERT INTO layers (fc_name, display_name, qml, is_lookup, geom_type, description, metadata, version) VALUES (?, ?, ?, ?, ?, ?, ?, ?)', [
+                fc_name, display_name, None, 0, geom_type, None, json.dumps(metadata), '1.0'])
+            project.layer_ids[fc_name] = curs.lastrowid
+            curs.execute('INSERT INTO protocol_layers (protocol_id, layer_id) VALUES (?, ?)', [protocol_id, curs.lastrowid])
+
+        conn.commit()
+
+
+def _insert_sample_frames(project: SyntheticProject) -> None:
+
+    sample_frame = insert_sample_frame(project.project_file, 'Benchmark Sample Frame', '')
+    project.sample_frame_id = sample_frame.id
+
+    ds: ogr.DataSource = ogr.Open(project.project_file, 1)
+    layer: ogr.Layer = ds.GetLayerByName('sample_frame_features')
+    layer.StartTransaction()
+    size = SyntheticProject.CELL_SIZE
+    for index in range(project.config.sample_frames):
+        row, col = divmod(index, project.columns)
+        # Boustrophedon ordering so that consecutive frames are adjacent along the centerline
+        if row % 2 == 1:
+            col = project.columns - 1 - col
+        min_x = SyntheticProject.ORIGIN_X + col * size
+        min_y = SyntheticProject.ORIGIN_Y + row * size
+        ring = ogr.Geometry(ogr.wkbLinearRing)
+        for x, y in [(min_x, min_y), (min_x + size, min_y), (min_x + size, min_y + size), (min_x, min_y + size), (min_x, min_y)]:
+            ring.AddPoint_2D(x, y)
+        polygon = ogr.Geometry(ogr.wkbPolygon)
+        polygon.AddGeometry(ring)
+
+        feature = ogr.Feature(layer.GetLayerDefn())
+        feature.SetGeometry(polygon)
+        feature.SetField('sample_frame_id', sample_frame.id)
+        feature.SetField('display_label', str(index + 1))
+        layer.CreateFeature(feature)
+        project.sample_frame_feature_ids.append(feature.GetFID())
+        feature = None
+    layer.CommitTransaction()
+    layer = None
+    ds = None
+
+
+def _insert_centerline(project: SyntheticProject) -> None:
+
+    profile = insert_profile(project.project_file, 'Benchmark Centerline', Profile.ProfileTypes.CENTERLINE_PROFILE_TYPE, '')
+    project.profile_id = profile.id
+
+    # Snake through the centre of each row of sample frames
+    size = SyntheticProject.CELL_SIZE
+    line = ogr.Geometry(ogr.wkbLineString)
+    for row in range(project.rows):
+        y = SyntheticProject.ORIGIN_Y + (row + 0.5) * size
+        xs = [SyntheticProject.ORIGIN_X, SyntheticProject.ORIGIN_X + project.columns * size]
+        if row % 2 == 1:
+            xs.reverse()
+        steps = max(project.config.vertex_density, 2)
+        for i in range(steps):
+            x = xs[0] + (xs[1] - xs[0]) * i / (steps - 1)
+            line.AddPoint_2D(x, y + 0.1 * size * math.sin(i))
+    project.centerline_wkt = line.ExportToWkt()
+
+    ds: ogr.DataSource = ogr.Open(project.project_file, 1)
+    layer: ogr.Layer = ds.GetLayerByName('profile_centerlines')
+    feature = ogr.Feature(layer.GetLayerDefn())
+    feature.SetGeometry(line)
+    feature.SetField('profile_id', profile.id)
+    feature.SetField('display_label', 'Benchmark Centerline')
+    layer.CreateFeature(feature)
+    feature = None
+    layer = None
+    ds = None
+
+
+def _create_dem(project: SyntheticProject) -> None:
+
+    relative_path = os.path.join('context', 'benchmark_dem.tif')
+    dem_path = os.path.join(os.path.dirname(project.project_file), relative_path)
+    os.makedirs(os.path.dirname(dem_path), exist_ok=True)
+
+    min_x, min_y, max_x, max_y = project.extent(margin=SyntheticProject.CELL_SIZE)
+    size = project.config.dem_size
+    cell_x = (max_x - min_x) / size
+    cell_y = (max_y - min_y) / size
+
+    # Tilted plane (valley gradient) with some relief
+    cols, rows = np.meshgrid(np.arange(size), np.arange(size))
+    values = 1500.0 - 0.05 * cols - 0.02 * rows + 2.0 * np.sin(cols / 25.0) * np.cos(rows / 25.0)
+
+    driver: gdal.Driver = gdal.GetDriverByName('GTiff')
+    dem_ds: gdal.Dataset = driver.Create(dem_path, size, size, 1, gdal.GDT_Float32, options=['COMPRESS=DEFLATE', 'TILED=YES'])
+    dem_ds.SetGeoTransform((min_x, cell_x, 0.0, max_y, 0.0, -cell_y))
+    dem_ds.SetProjection(_wgs84().ExportToWkt())
+    band: gdal.Band = dem_ds.GetRasterBand(1)
+    band.SetNoDataValue(-9999.0)
+    band.WriteArray(values.astype(np.float32))
+    band.FlushCache()
+    band = None
+    dem_ds = None
+
+    raster = insert_raster(project.project_file, 'Benchmark DEM', relative_path.replace('\\', '/'), DEM_RASTER_TYPE_ID, 'Synthetic DEM', False)
+    project.raster_id = raster.id
+
+
+def _insert_events(project: SyntheticProject) -> None:
+
+    with sqlite3.connect(project.project_file) as conn:
+        curs = conn.cursor()
+        for index in range(project.config.events):
+            curs.execute('INSERT INTO events (name, description, event_type_id, platform_id, representation_id, metadata, start_year) VALUES (?, ?, ?, ?, ?, ?, ?)', [
+                f'Benchmark Event {index + 1}', None, 1, 1, 1, None, 2000 + index])
+            event_id = curs.lastrowid
+            project.event_ids.append(event_id)
+            curs.executemany('INSERT INTO event_layers (event_id, layer_id) VALUES (?, ?)', [(event_id, layer_id) for layer_id in project.layer_ids.values()])
+        conn.commit()
+
+
+def _insert_dce_features(project: SyntheticProject, rnd: random.Random) -> None:
+
+    min_x, min_y, max_x, max_y = project.extent()
+    size = SyntheticProject.CELL_SIZE
+    vertices = project.config.vertex_density
+
+    ds: ogr.DataSource = ogr.Open(project.project_file, 1)
+    for fc_name, _display_name, geom_type in BENCHMARK_LAYERS:
+        layer: ogr.Layer = ds.GetLayerByName({'Point': 'dce_points', 'Linestring': 'dce_lines', 'Polygon': 'dce_polygons'}[geom_type])
+        layer.StartTransaction()
+        for event_id in project.event_ids:
+            for _i in range(project.config.features_per_layer):
+                x = rnd.uniform(min_x, max_x)
+                y = rnd.uniform(min_y, max_y)
+                if geom_type == 'Point':
+                    geom = ogr.Geometry(ogr.wkbPoint)
+                    geom.AddPoint_2D(x, y)
+                elif geom_type == 'Linestring':
+                    geom = _line(x, y, size, vertices, rnd)
+                else:
+                    geom = ogr.Geometry(ogr.wkbPolygon)
+                    geom.AddGeometry(_ring(x, y, size * 0.3, vertices, rnd))
+
+                feature = ogr.Feature(layer.GetLayerDefn())
+                feature.SetGeometry(geom)
+                feature.SetField('event_id', event_id)
+                feature.SetField('event_layer_id', project.layer_ids[fc_name])
+                feature.SetField('metadata', json.dumps({'attributes': {'bench_type': rnd.choice(['A', 'B'])}}))
+                layer.CreateFeature(feature)
+                feature = None
+        layer.CommitTransaction()
+        layer = None
+    ds = None
+
+
+def _insert_metrics_and_analysis(project: SyntheticProject) -> None:
+
+    for machine_name, metric_function, metric_params in BENCHMARK_METRICS:
+        metric_id, _metric = insert_metric(project.project_file, machine_name.replace('_', ' ').title(), machine_name, BENCHMARK_PROTOCOL,
+                                           f'Benchmark {metric_function} metric', 'Metric', metric_function, metric_params, None, None, version='1.0')
+        project.metric_ids[machine_name] = metric_id
+
+    # Insert the analysis directly so the spatial view is left to the lazy refresh on load
+    metadata = {'dem': project.raster_id, 'centerline': project.profile_id}
+    with sqlite3.connect(project.project_file) as conn:
+        curs = conn.cursor()
+        curs.execute('INSERT INTO analyses (name, description, sample_frame_id, metadata) VALUES (?, ?, ?, ?)', [
+            'Benchmark Analysis', None, project.sample_frame_id, json.dumps(metadata)])
+        project.analysis_id = curs.lastrowid
+        curs.executemany('INSERT INTO analysis_metrics (analysis_id, metric_id, level_id) VALUES (?, ?, ?)', [
+            (project.analysis_id, metric_id, 1) for metric_id in project.metric_ids.values()])
+        conn.commit()
+
+
+def _create_import_source(project: SyntheticProject, rnd: random.Random) -> None:
+    """Polygon GeoPackage outside the project used as the source for the import benchmark."""
+
+    source_gpkg = os.path.join(os.path.dirname(project.project_file), 'benchmark_import_source.gpkg')
+    driver: ogr.Driver = ogr.GetDriverByName('GPKG')
+    if os.path.exists(source_gpkg):
+        driver.DeleteDataSource(source_gpkg)
+    ds: ogr.DataSource = driver.CreateDataSource(source_gpkg)
+    layer: ogr.Layer = ds.CreateLayer('import_polygons', _wgs84(), ogr.wkbPolygon)
+    layer.CreateField(ogr.FieldDefn('name', ogr.OFTString))
+
+    min_x, min_y, max_x, max_y = project.extent()
+    layer.StartTransaction()
+    for index in range(project.config.import_features):
+        polygon = ogr.Geometry(ogr.wkbPolygon)
+        polygon.AddGeometry(_ring(rnd.uniform(min_x, max_x), rnd.uniform(min_y, max_y), SyntheticProject.CELL_SIZE * 0.3, project.config.vertex_density, rnd))
+        feature = ogr.Feature(layer.GetLayerDefn())
+        feature.SetGeometry(polygon)
+        feature.SetField('name', f'Import {index + 1}')
+        layer.CreateFeature(feature)
+        feature = None
+    layer.CommitTransaction()
+    layer = None
+    ds = None
+
+    project.import_source = f'{source_gpkg}|layername=import_polygons'
+
+
+def create_synthetic_project(project_file: str, config: SyntheticProjectConfig = None) -> SyntheticProject:
+    """Create a populated QRiS project at project_file.
+
+    Args:
+        project_file (str): path of the project GeoPackage to create. Must not exist.
+        config (SyntheticProjectConfig): size parameters. Defaults are used when omitted.
+
+    Returns:
+        SyntheticProject: identifiers of the items that were created
+    """
+
+    if os.path.exists(project_file):
+        raise FileExistsError(f'Synthetic project already exists: {project_file}')
+
+    config = config if config is not None else SyntheticProjectConfig()
+    rnd = random.Random(config.seed)
+    project = SyntheticProject(project_file, config)
+
+    create_empty_project(project_file)
+    _insert_protocol_and_layers(project)
+    _insert_sample_frames(project)
+    _insert_centerline(project)
+    _create_dem(project)
+    _insert_events(project)
+    _insert_dce_features(project, rnd)
+    _insert_metrics_and_analysis(project)
+    _create_import_source(project, rnd)
+
+    return project
@@ -27,7 +27,7 @@ parent_root = os.path.dirname(plugin_root)
 if parent_root not in sys.path:
     sys.path.insert(0, parent_root)
 
-from qris_dev.src.gp.analysis_metrics import get_metric_layer_features, MetricCalculationError
+from qris_dev.src.gp.analysis_metrics import get_metric_layer_features, get_metric_layer_geometries, MetricCalculationError, _attribute_filter_sql, _open_metric_layer
 
 class TestMetricFiltering(unittest.TestCase):
 
@@ -46,6 +46,7 @@ class TestMetricFiltering(unittest.TestCase):
         layer.CreateField(ogr.FieldDefn('metadata', ogr.OFTString))
         layer.CreateField(ogr.FieldDefn('event_id', ogr.OFTInteger))
         layer.CreateField(ogr.FieldDefn('event_layer_id', ogr.OFTInteger))
+        layer.CreateField(ogr.FieldDefn('notes', ogr.OFTString))
         
         self.ds = ds
         self.layer = layer
@@ -128,5 +129,117 @@ class TestMetricFiltering(unittest.TestCase):
             next(gen)
         self.assertIn("has a NULL value", str(cm.exception))
 
+    def add_point(self, x, metadata, event_id=100):
+        feat = ogr.Feature(self.layer.GetLayerDefn())
+        geom = ogr.Geometry(ogr.wkbPoint)
+        geom.AddPoint(x, 4500000)
+        feat.SetGeometry(geom)
+        feat.SetField('event_id', event_id)
+        feat.SetField('event_layer_id', 1)
+        feat.SetField('notes', 'not needed by metrics')
+        feat.SetField('metadata', json.dumps(metadata))
+        self.layer.CreateFeature(feat)
+        return feat.GetFID()
+
+    def test_filter_and_column_projection(self):
+        """Only matching features are returned, with the unrequested columns left unread."""
+        dam = self.add_point(500000, {'attributes': {'type': 'dam'}})
+        self.add_point(500100, {'attributes': {'type': 'lodge'}})
+        self.add_point(500200, {'attributes': {'type': 'dam'}}, event_id=200)
+        self.ds.FlushCache()
+
+        features = list(get_metric_layer_features(self.gpkg_path, self.metric_layer_def, 100, self.sf_geom, {}))
+        self.assertEqual([feature.GetFID() for feature in features], [dam])
+        self.assertIsNone(features[0].GetField('notes'))
+        self.assertIsNotNone(features[0].GetGeometryRef())
+
+        features = list(get_metric_layer_features(self.gpkg_path, self.metric_layer_def, 100, self.sf_geom, {}, ['notes']))
+        self.assertEqual(features[0].GetField('notes'), 'not needed by metrics')
+
+    def test_geometries_as_wkb(self):
+        """The geometry reader returns WKB for the filtered features and the layer spatial reference."""
+        self.add_point(500000, {'attributes': {'type': 'dam'}})
+        self.add_point(500100, {'attributes': {'type': 'lodge'}})
+        self.ds.FlushCache()
+
+        geometries, srs = get_metric_layer_geometries(self.gpkg_path, self.metric_layer_def, 100, self.sf_geom, {})
+        self.assertEqual(len(geometries), 1)
+        self.assertEqual(ogr.CreateGeometryFromWkb(geometries[0]).GetX(), 500000)
+        self.assertEqual(srs.GetAuthorityCode(None), '26912')
+
+    def test_filter_is_pushed_down(self):
+        """Features known not to match are dropped by SQLite; missing and NULL values are still read so they can be reported."""
+        dam = self.add_point(500000, {'attributes': {'type': 'dam'}})
+        self.add_point(500100, {'attributes': {'type': 'lodge'}})
+        missing = self.add_point(500200, {'attributes': {'other': 'val'}})
+        null = self.add_point(500300, {'attributes': {'type': None}})
+        self.ds.FlushCache()
+
+        ds, layer = _open_metric_layer(self.gpkg_path, self.metric_layer_def, 100, self.sf_geom, {}, ())
+        self.assertEqual(sorted(feature.GetFID() for feature in layer), sorted([dam, missing, null]))
+        layer = None
+        ds = None
+
+    def test_missing_attribute_error_with_pushdown(self):
+        """A missing attribute is reported even when the other features are filtered out by SQLite."""
+        self.add_point(500100, {'attributes': {'type': 'lodge'}})
+        self.add_point(500200, {'attributes': {'other': 'val'}})
+        self.ds.FlushCache()
+
+        with self.assertRaises(MetricCalculationError) as cm:
+            list(get_metric_layer_features(self.gpkg_path, self.metric_layer_def, 100, self.sf_geom, {}))
+        self.assertIn("missing required attribute", str(cm.exception))
+
+    def test_null_attribute_error_with_pushdown(self):
+        """A NULL attribute is reported even when the other features are filtered out by SQLite."""
+        self.add_point(500100, {'attributes': {'type': 'lodge'}})
+        self.add_point(500200, {'attributes': {'type': 'NULL'}})
+        self.ds.FlushCache()
+
+        with self.assertRaises(MetricCalculationError) as cm:
+            get_metric_layer_geometries(self.gpkg_path, self.metric_layer_def, 100, self.sf_geom, {})
+        self.assertIn("has a NULL value", str(cm.exception))
+
+
+class TestAttributeFilterSql(unittest.TestCase):
+
+    def matching_rows(self, attribute_filter: dict, values: list) -> list:
+        """Evaluate the SQL prefilter against metadata rows holding each of the values."""
+        where = _attribute_filter_sql(attribute_filter)
+        self.assertIsNotNone(where)
+        conn = sqlite3.connect(':memory:')
+        conn.execute("CREATE TABLE features (id INTEGER PRIMARY KEY, metadata TEXT)")
+        for index, value in enumerate(values):
+            conn.execute("INSERT INTO features (id, metadata) VALUES (?, ?)", (index, json.dumps({'attributes': {attribute_filter['field_id_ref']: value}})))
+        rows = [row[0] for row in conn.execute(f"SELECT id FROM features WHERE {where} ORDER BY id")]  # nosec B608
+        conn.close()
+        return rows
+
+    def test_quoted_strings(self):
+        rows = self.matching_rows({'field_id_ref': 'type', 'values': ["beaver's dam", 'dam']}, ["beaver's dam", 'dam', 'lodge', "beaver''s dam"])
+        self.assertEqual(rows, [0, 1])
+
+    def test_bools(self):
+        rows = self.matching_rows({'field_id_ref': 'active', 'values': [True]}, [True, False])
+        self.assertEqual(rows, [0])
+
+    def test_floats(self):
+        rows = self.matching_rows({'field_id_ref': 'depth', 'values': [1.5, 2]}, [1.5, 2, 2.5])
+        self.assertEqual(rows, [0, 1])
+
+    def test_missing_and_null_values_are_kept(self):
+        rows = self.matching_rows({'field_id_ref': 'type', 'values': ['dam']}, [None, '', 'NULL', 'lodge'])
+        self.assertEqual(rows, [0, 1, 2])
+
+    def test_unsafe_field_id_ref(self):
+        self.assertIsNone(_attribute_filter_sql({'field_id_ref': "type') OR 1=1 --", 'values': ['dam']}))
+        self.assertIsNone(_attribute_filter_sql({'field_id_ref': 'type"', 'values': ['dam']}))
+
+    def test_unsupported_values(self):
+        self.assertIsNone(_attribute_filter_sql({'field_id_ref': 'type', 'values': []}))
+        self.assertIsNone(_attribute_filter_sql({'field_id_ref': 'type', 'values': [['dam']]}))
+        self.assertIsNone(_attribute_filter_sql({'field_id_ref': 'depth', 'values': [float('nan')]}))
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,188 @@
+"""Tests for the analysis_metrics length and area calculations."""
+import unittest
+import os
+import shutil
+import tempfile
+import json
+import sqlite3
+import sys
+from types import SimpleNamespace
+
+# Use standard test utility to start QGIS
+try:
+    from utilities import get_qgis_app
+except ImportError:
+    from .utilities import get_qgis_app
+
+get_qgis_app()
+
+from osgeo import ogr, osr, gdal
+gdal.UseExceptions()
+
+# Add src to path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+plugin_root = os.path.dirname(current_dir)
+parent_root = os.path.dirname(plugin_root)
+
+if parent_root not in sys.path:
+    sys.path.insert(0, parent_root)
+
+from qris_dev.src.gp.analysis_metrics import length, area, get_metric_layer_features, get_sample_frame_geom
+from qris_dev.src.gp.sample_frame_geometry import get_utm_zone_epsg
+
+EVENT_ID = 100
+LINE_LAYER_ID = 1
+POLYGON_LAYER_ID = 2
+
+# The sample frame straddles the UTM zone 11/12 boundary at -114 degrees
+SAMPLE_FRAME = 'POLYGON ((-115 40, -113 40, -113 41, -115 41, -115 40))'
+
+LINES = [
+    'LINESTRING (-114.8 40.2, -114.4 40.6)',  # zone 11, inside
+    'LINESTRING (-113.8 40.2, -113.2 40.8)',  # zone 12, inside
+    'LINESTRING (-113.5 40.5, -112.5 40.5)',  # zone 12, half outside
+    'MULTILINESTRING ((-114.9 40.1, -114.7 40.1), (-113.6 40.9, -113.4 40.9))',  # parts in both zones
+    'LINESTRING (-110 40.5, -109 40.5)',  # outside
+]
+
+POLYGONS = [
+    'POLYGON ((-114.8 40.2, -114.6 40.2, -114.6 40.4, -114.8 40.4, -114.8 40.2))',  # zone 11, inside
+    'POLYGON ((-113.8 40.6, -113.6 40.6, -113.6 40.8, -113.8 40.8, -113.8 40.6))',  # zone 12, inside
+    'POLYGON ((-113.1 40.1, -112.9 40.1, -112.9 40.3, -113.1 40.3, -113.1 40.1))',  # zone 12, half outside
+    'POLYGON ((-114.4 40.4, -114.2 40.6, -114.2 40.4, -114.4 40.6, -114.4 40.4))',  # invalid bowtie, zone 11
+]
+
+CENTERLINE = 'LINESTRING (-114.5 40.5, -112.5 40.5)'  # input layer, half outside the sample frame
+
+
+def old_total(project_file: str, metric_layer: dict, analysis_params: dict, make_valid: bool, measure) -> float:
+    """The per-feature OGR computation that length() and area() used before they were vectorized."""
+
+    sample_frame_geom = get_sample_frame_geom(project_file, 1)
+    total = 0.0
+    for feature in get_metric_layer_features(project_file, metric_layer, EVENT_ID, sample_frame_geom, analysis_params):
+        geom: ogr.Geometry = feature.GetGeometryRef().Clone()
+        if make_valid and not geom.IsValid():
+            geom = geom.MakeValid()
+        epsg = get_utm_zone_epsg(geom.Centroid().GetX())
+        utm_srs = osr.SpatialReference()
+        utm_srs.ImportFromEPSG(epsg)
+        usage = str(metric_layer.get('usage', '')).lower()
+        if metric_layer.get('input_ref') is not None and not usage.startswith('sample_frame'):
+            geom.TransformTo(utm_srs)
+            total += measure(geom)
+        elif geom.Intersects(sample_frame_geom):
+            clipped_geom: ogr.Geometry = geom.Intersection(sample_frame_geom)
+            clipped_geom.TransformTo(utm_srs)
+            total += measure(clipped_geom)
+    return total
+
+
+class TestMetricLengthArea(unittest.TestCase):
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.gpkg_path = os.path.join(self.test_dir, 'test_project.gpkg')
+
+        driver = ogr.GetDriverByName('GPKG')
+        ds = driver.CreateDataSource(self.gpkg_path)
+
+        srs = osr.SpatialReference()
+        srs.ImportFromEPSG(4326)
+
+        sf_layer = ds.CreateLayer('sample_frame_features', srs=srs, geom_type=ogr.wkbPolygon)
+        self.add_feature(sf_layer, SAMPLE_FRAME)
+
+        line_layer = ds.CreateLayer('dce_lines', srs=srs, geom_type=ogr.wkbMultiLineString)
+        polygon_layer = ds.CreateLayer('dce_polygons', srs=srs, geom_type=ogr.wkbMultiPolygon)
+        for layer in (line_layer, polygon_layer):
+            layer.CreateField(ogr.FieldDefn('event_id', ogr.OFTInteger))
+            layer.CreateField(ogr.FieldDefn('event_layer_id', ogr.OFTInteger))
+            layer.CreateField(ogr.FieldDefn('metadata', ogr.OFTString))
+        for wkt in LINES:
+            self.add_feature(line_layer, wkt, {'event_id': EVENT_ID, 'event_layer_id': LINE_LAYER_ID, 'metadata': json.dumps({})})
+        for wkt in POLYGONS:
+            self.add_feature(polygon_layer, wkt, {'event_id': EVENT_ID, 'event_layer_id': POLYGON_LAYER_ID, 'metadata': json.dumps({})})
+
+        centerline_layer = ds.CreateLayer('profile_centerlines', srs=srs, geom_type=ogr.wkbMultiLineString)
+        centerline_layer.CreateField(ogr.FieldDefn('profile_id', ogr.OFTInteger))
+        self.add_feature(centerline_layer, CENTERLINE, {'profile_id': 1})
+        self.add_feature(centerline_layer, 'LINESTRING (-114.9 40.9, -114.1 40.9)', {'profile_id': 2})
+
+        ds = None
+
+        conn = sqlite3.connect(self.gpkg_path)
+        c = conn.cursor()
+        c.execute("CREATE TABLE layers (id INTEGER PRIMARY KEY, fc_name TEXT, geom_type TEXT)")
+        c.execute("INSERT INTO layers (id, fc_name, geom_type) VALUES (?, 'CHANNEL_LINES', 'Linestring')", (LINE_LAYER_ID,))
+        c.execute("INSERT INTO layers (id, fc_name, geom_type) VALUES (?, 'WETTED_AREAS', 'Polygon')", (POLYGON_LAYER_ID,))
+        conn.commit()
+        conn.close()
+
+        self.analysis_params = {'centerline': SimpleNamespace(fc_name='profile_centerlines', fc_id_column_name='profile_id', id=1)}
+
+    def tearDown(self):
+        try:
+            shutil.rmtree(self.test_dir)
+        except Exception:
+            pass
+
+    @staticmethod
+    def add_feature(layer: ogr.Layer, wkt: str, fields: dict = None):
+        feature = ogr.Feature(layer.GetLayerDefn())
+        feature.SetGeometry(ogr.CreateGeometryFromWkt(wkt))
+        for name, value in (fields or {}).items():
+            feature.SetField(name, value)
+        layer.CreateFeature(feature)
+
+    def assert_matches_old(self, value: float, expected: float):
+        self.assertGreater(expected, 0.0)
+        self.assertAlmostEqual(value, expected, delta=expected * 1e-9)
+
+    def test_length_matches_per_feature_computation(self):
+        """DCE lines are clipped to the sample frame and measured in the UTM zone of each feature."""
+        metric_layer = {'layer_id_ref': 'CHANNEL_LINES'}
+        expected = old_total(self.gpkg_path, metric_layer, {}, False, ogr.Geometry.Length)
+        value = length(self.gpkg_path, 1, EVENT_ID, {'dce_layers': [metric_layer]}, {})
+        self.assert_matches_old(value, expected)
+
+    def test_length_of_input_layers(self):
+        """Input layers are measured in full unless the usage asks for them to be clipped to the sample frame."""
+        for usage in ('metric_layer', 'sample_frame_clip'):
+            metric_layer = {'input_ref': 'centerline', 'usage': usage}
+            expected = old_total(self.gpkg_path, metric_layer, self.analysis_params, False, ogr.Geometry.Length)
+            value = length(self.gpkg_path, 1, EVENT_ID, {'inputs': [metric_layer]}, self.analysis_params)
+            self.assert_matches_old(value, expected)
+
+        full = length(self.gpkg_path, 1, EVENT_ID, {'inputs': [{'input_ref': 'centerline', 'usage': 'metric_layer'}]}, self.analysis_params)
+        clipped = length(self.gpkg_path, 1, EVENT_ID, {'inputs': [{'input_ref': 'centerline', 'usage': 'sample_frame_clip'}]}, self.analysis_params)
+        self.assertGreater(full, clipped)
+
+    def test_area_matches_per_feature_computation(self):
+        """DCE polygons, including an invalid one, are repaired, clipped and measured in the UTM zone of each feature."""
+        metric_layer = {'layer_id_ref': 'WETTED_AREAS'}
+        expected = old_total(self.gpkg_path, metric_layer, {}, True, ogr.Geometry.GetArea)
+        value = area(self.gpkg_path, 1, EVENT_ID, {'dce_layers': [metric_layer]}, {})
+        self.assert_matches_old(value, expected)
+
+    def test_area_of_invalid_polygon(self):
+        """A self-intersecting polygon is measured as the two triangles that make it up."""
+        ds = ogr.Open(self.gpkg_path, 1)
+        layer = ds.GetLayerByName('dce_polygons')
+        layer.SetAttributeFilter(f"fid <> {len(POLYGONS)}")
+        for feature in list(layer):
+            layer.DeleteFeature(feature.GetFID())
+        ds = None
+
+        metric_layer = {'layer_id_ref': 'WETTED_AREAS'}
+        expected = old_total(self.gpkg_path, metric_layer, {}, True, ogr.Geometry.GetArea)
+        value = area(self.gpkg_path, 1, EVENT_ID, {'dce_layers': [metric_layer]}, {})
+        self.assert_matches_old(value, expected)
+
+    def test_no_features(self):
+        value = area(self.gpkg_path, 1, EVENT_ID + 1, {'dce_layers': [{'layer_id_ref': 'WETTED_AREAS'}]}, {})
+        self.assertEqual(value, 0.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -59,6 +59,25 @@ class TestAnalysisMetricsTaskDag(unittest.TestCase):
 
         self.assertEqual(ordered_ids, [1, 2])
 
+    def test_plans_dependency_edges_between_planned_metrics(self):
+        m1 = build_metric(1, 'base_length')
+        m2 = build_metric(2, 'base_area')
+        m3 = build_metric(3, 'derived_ratio', dependencies=[{'metric_id_ref': 'base_length'}, {'metric_id_ref': 'base_area'}])
+        m4 = build_metric(4, 'unrelated')
+
+        analysis_metrics = {
+            1: build_analysis_metric(m1),
+            2: build_analysis_metric(m2),
+            3: build_analysis_metric(m3),
+            4: build_analysis_metric(m4),
+        }
+
+        planned = AnalysisMetricsTask.plan_metric_execution(analysis_metrics, [3])
+        dependencies = AnalysisMetricsTask.plan_metric_dependencies(analysis_metrics, planned)
+
+        self.assertEqual(dependencies, {1: [], 2: [], 3: [1, 2]})
+        self.assertEqual(list(dependencies), [am.metric.id for am in planned])
+
     def test_raises_for_missing_dependency(self):
         m2 = build_metric(2, 'derived_ratio', dependencies=[{'metric_id_ref': 'missing_metric'}])
 
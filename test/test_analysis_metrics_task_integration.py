@@ -158,6 +158,52 @@ class TestAnalysisMetricsTaskIntegration(unittest.TestCase):
         self.assertEqual(rows[1][0], 2)
         self.assertAlmostEqual(rows[1][1], 5.0, places=6)
 
+    def test_task_profile_records_metric_and_write_timings(self):
+        profile_path = os.path.join(self.temp_dir, 'profiling', 'metrics_profile.json')
+        task = AnalysisMetricsTask(
+            self.qris_project,
+            self.analysis,
+            sample_frame_ids=[1, 2],
+            event_ids=[100],
+            metric_ids=[2],
+            overwrite_existing=True,
+            force_active=True,
+            profile=True,
+            profile_path=profile_path,
+        )
+
+        with patch('qris_dev.src.gp.analysis_metrics.count', return_value=10.0), patch(
+            'qris_dev.src.gp.analysis_metrics.proportion', return_value=5.0
+        ):
+            success = task.run()
+
+        self.assertTrue(success)
+        profile = task.summary['profile']
+        self.assertIsNotNone(profile)
+        categories = profile['categories']
+        self.assertEqual(categories['metric_function']['count']['calls'], 2)
+        self.assertEqual(categories['metric_function']['proportion']['calls'], 2)
+        self.assertEqual(set(categories['sample_frame'].keys()), {'1', '2'})
+        self.assertIn('_flush_pending_rows', categories['db_write'])
+        self.assertTrue(os.path.exists(profile_path))
+
+    def test_task_without_profile_has_no_profile(self):
+        task = AnalysisMetricsTask(
+            self.qris_project,
+            self.analysis,
+            sample_frame_ids=[1],
+            event_ids=[100],
+            metric_ids=[1],
+            overwrite_existing=True,
+            force_active=True,
+        )
+
+        with patch('qris_dev.src.gp.analysis_metrics.count', return_value=10.0):
+            self.assertTrue(task.run())
+
+        self.assertIsNone(task.summary['profile'])
+        self.assertFalse(os.path.exists(os.path.join(self.temp_dir, 'profiling')))
+
     def test_task_with_parsed_system_protocol_metrics(self):
         protocol_path = os.path.join(
             plugin_root,
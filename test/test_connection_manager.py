@@ -0,0 +1,135 @@
+# coding=utf-8
+"""Tests for the project SQLite connection manager."""
+
+import os
+import sys
+import shutil
+import sqlite3
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from qris_dev.src.model.connection_manager import ConnectionManager, CACHE_SIZE_KIB, close_connection_manager, get_connection_manager
+
+
+class TestConnectionManager(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.db_path = os.path.join(self.temp_dir, 'project.gpkg')
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute('PRAGMA journal_mode = WAL')
+            conn.execute('CREATE TABLE values_table (fid INTEGER PRIMARY KEY, value REAL)')
+            conn.executemany('INSERT INTO values_table (value) VALUES (?)', [(1.0,), (2.0,)])
+        self.manager = ConnectionManager(self.db_path)
+
+    def tearDown(self):
+        self.manager.close()
+        shutil.rmtree(self.temp_dir)
+
+    def test_readers_are_reused(self):
+        for _ in range(5):
+            with self.manager.read() as conn:
+                self.assertEqual(conn.execute('SELECT COUNT(*) FROM values_table').fetchone()[0], 2)
+
+        stats = self.manager.stats()
+        self.assertEqual(stats['opened'], 1)
+        self.assertEqual(stats['reads'], 5)
+        self.assertEqual(stats['reader_reuses'], 4)
+        self.assertEqual(stats['idle_readers'], 1)
+
+    def test_concurrent_readers_open_separate_connections(self):
+        with self.manager.read() as first, self.manager.read() as second:
+            self.assertIsNot(first, second)
+
+        stats = self.manager.stats()
+        self.assertEqual(stats['opened'], 2)
+        self.assertEqual(stats['max_readers_in_use'], 2)
+
+    def test_readers_are_query_only(self):
+        with self.manager.read() as conn:
+            with self.assertRaises(sqlite3.OperationalError):
+                conn.execute('DELETE FROM values_table')
+
+    def test_pragmas(self):
+        with self.manager.read() as conn:
+            self.assertEqual(conn.execute('PRAGMA cache_size').fetchone()[0], -CACHE_SIZE_KIB)
+            self.assertEqual(conn.execute('PRAGMA temp_store').fetchone()[0], 2)
+        with self.manager.write() as conn:
+            # NORMAL in WAL mode
+            self.assertEqual(conn.execute('PRAGMA synchronous').fetchone()[0], 1)
+            self.assertEqual(conn.execute('PRAGMA query_only').fetchone()[0], 0)
+
+    def test_write_commits(self):
+        with self.manager.write() as conn:
+            conn.execute('INSERT INTO values_table (value) VALUES (3.0)')
+
+        with sqlite3.connect(self.db_path) as conn:
+            self.assertEqual(conn.execute('SELECT COUNT(*) FROM values_table').fetchone()[0], 3)
+
+    def test_write_rolls_back_on_exception(self):
+        with self.assertRaises(ValueError):
+            with self.manager.write() as conn:
+                conn.execute('DELETE FROM values_table')
+                raise ValueError('abort')
+
+        with self.manager.read() as conn:
+            self.assertEqual(conn.execute('SELECT COUNT(*) FROM values_table').fetchone()[0], 2)
+
+    def test_writer_is_reused(self):
+        for value in range(3):
+            with self.manager.write() as conn:
+                conn.execute('INSERT INTO values_table (value) VALUES (?)', [value])
+
+        stats = self.manager.stats()
+        self.assertEqual(stats['writes'], 3)
+        self.assertEqual(stats['opened'], 1)
+
+    def test_release_idle_closes_pooled_connections(self):
+        with self.manager.read() as conn:
+            self.assertEqual(conn.execute('SELECT 1').fetchone()[0], 1)
+        with self.manager.write() as conn:
+            self.assertEqual(conn.execute('SELECT 1').fetchone()[0], 1)
+        self.manager.release_idle()
+
+        stats = self.manager.stats()
+        self.assertEqual(stats['opened'], 2)
+        self.assertEqual(stats['closed'], 2)
+        self.assertEqual(stats['idle_readers'], 0)
+
+    def test_data_version_changes_with_commits_from_other_connections(self):
+        first = self.manager.data_version()
+        self.assertEqual(self.manager.data_version(), first)
+
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute('UPDATE values_table SET value = 5.0 WHERE fid = 1')
+        second = self.manager.data_version()
+        self.assertNotEqual(second, first)
+
+        with self.manager.write() as conn:
+            conn.execute('UPDATE values_table SET value = 6.0 WHERE fid = 1')
+        self.assertNotEqual(self.manager.data_version(), second)
+
+        # A new connection after release_idle never repeats an earlier token
+        self.manager.release_idle()
+        self.assertNotIn(self.manager.data_version(), (first, second))
+
+    def test_unregistered_path_is_unpooled(self):
+        manager = get_connection_manager(self.db_path)
+        self.assertFalse(manager.pooled)
+        self.assertIsNone(manager.data_version())
+
+        with manager.read() as conn:
+            conn.execute('SELECT 1')
+        with manager.write() as conn:
+            conn.execute('INSERT INTO values_table (value) VALUES (4.0)')
+
+        stats = manager.stats()
+        self.assertEqual(stats['opened'], 2)
+        self.assertEqual(stats['closed'], 2)
+        self.assertIsNone(close_connection_manager(self.db_path))
+
+
+if __name__ == '__main__':
+    unittest.main()
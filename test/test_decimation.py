@@ -0,0 +1,75 @@
+# coding=utf-8
+"""Tests for screen resolution time series decimation."""
+
+import os
+import sys
+import unittest
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from qris_dev.src.lib.decimation import DECIMATION_LTTB, decimate, lttb_decimate, minmax_decimate, series_from_rows, to_float_array
+
+
+class TestDecimation(unittest.TestCase):
+
+    def setUp(self):
+        # Fifty years of daily values with a single spike
+        self.x = np.arange(50 * 365, dtype=np.float64)
+        self.y = np.sin(self.x / 30.0)
+        self.y[10000] = 100.0
+
+    def test_minmax_preserves_envelope(self):
+        x, y = minmax_decimate(self.x, self.y, 500)
+
+        self.assertLessEqual(len(x), 2 * 500 + 2)
+        self.assertEqual(y.max(), 100.0)
+        self.assertEqual(y.min(), self.y.min())
+        self.assertEqual(x[0], self.x[0])
+        self.assertEqual(x[-1], self.x[-1])
+        self.assertTrue(np.all(np.diff(x) > 0))
+
+    def test_lttb_keeps_end_points_and_spike(self):
+        x, y = lttb_decimate(self.x, self.y, 1000)
+
+        self.assertEqual(len(x), 1000)
+        self.assertEqual(x[0], self.x[0])
+        self.assertEqual(x[-1], self.x[-1])
+        self.assertIn(100.0, y)
+
+    def test_short_series_is_not_decimated(self):
+        x, y = decimate(self.x[:100], self.y[:100], pixels=500)
+        self.assertEqual(len(x), 100)
+
+    def test_zoomed_window_is_decimated_at_full_detail(self):
+        x, y = decimate(self.x, self.y, 1000.0, 1400.0, pixels=500, method=DECIMATION_LTTB)
+
+        # Every point inside the window plus one either side
+        self.assertEqual(len(x), 403)
+        self.assertEqual(x[0], 999.0)
+        self.assertEqual(x[-1], 1401.0)
+
+    def test_series_from_rows(self):
+        rows = [
+            (1, '2020-01-01', 1.5),
+            (1, '2020-01-02', ''),
+            (2, '2020-01-01', 3),
+        ]
+        series = series_from_rows(rows, key_index=0, date_index=1, value_index=2)
+
+        self.assertEqual(sorted(series.keys()), [1, 2])
+        dates, values = series[1]
+        self.assertEqual(dates.dtype, np.dtype('datetime64[D]'))
+        self.assertEqual(values[0], 1.5)
+        self.assertTrue(np.isnan(values[1]))
+        self.assertEqual(series[2][1][0], 3.0)
+
+    def test_non_numeric_values_are_nan(self):
+        values = to_float_array([1, None, 'text', 2.5])
+        self.assertTrue(np.isnan(values[1]) and np.isnan(values[2]))
+        self.assertEqual(values[3], 2.5)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,75 @@
+# coding=utf-8
+"""Tests for the raster slider hypsometry cache."""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+from osgeo import gdal, osr
+
+try:
+    from utilities import get_qgis_app
+except ImportError:
+    from .utilities import get_qgis_app
+
+get_qgis_app()
+
+try:
+    from src.gp.hypsometry import build_hypsometry, load_hypsometry, hypsometry_path
+except ImportError:
+    from qris_dev.src.gp.hypsometry import build_hypsometry, load_hypsometry, hypsometry_path
+
+
+class TestHypsometry(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.raster_path = os.path.join(self.temp_dir, 'dem.tif')
+        # 10 x 10 cells of 2 m, elevations 0-99 with one nodata cell
+        values = np.arange(100, dtype=np.float32).reshape(10, 10)
+        values[0, 0] = -9999
+        self._write_raster(values)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def _write_raster(self, values: np.ndarray):
+        srs = osr.SpatialReference()
+        srs.ImportFromEPSG(32612)
+        ds = gdal.GetDriverByName('GTiff').Create(self.raster_path, values.shape[1], values.shape[0], 1, gdal.GDT_Float32)
+        ds.SetGeoTransform((500000, 2, 0, 4000000, 0, -2))
+        ds.SetProjection(srs.ExportToWkt())
+        band = ds.GetRasterBand(1)
+        band.SetNoDataValue(-9999)
+        band.WriteArray(values)
+        ds = None
+
+    def test_area_below_and_above_threshold(self):
+        hypsometry = build_hypsometry(self.raster_path)
+
+        self.assertEqual(hypsometry.minimum, 1.0)
+        self.assertEqual(hypsometry.maximum, 99.0)
+        self.assertEqual(hypsometry.area_units, 'm2')
+        self.assertAlmostEqual(hypsometry.total_area, 99 * 4)
+        self.assertAlmostEqual(hypsometry.area(hypsometry.maximum), 99 * 4)
+        self.assertAlmostEqual(hypsometry.area(hypsometry.minimum, above=True), 99 * 4)
+        # Roughly half of the cells are below 50
+        self.assertAlmostEqual(hypsometry.percent(50.0), 50.0, delta=1.5)
+        self.assertAlmostEqual(hypsometry.percent(50.0) + hypsometry.percent(50.0, above=True), 100.0)
+
+    def test_cache_is_reused_until_raster_changes(self):
+        self.assertIsNone(load_hypsometry(self.raster_path))
+        build_hypsometry(self.raster_path)
+        self.assertTrue(os.path.isfile(hypsometry_path(self.raster_path)))
+        self.assertIsNotNone(load_hypsometry(self.raster_path))
+
+        # Rewriting the raster invalidates the cache
+        self._write_raster(np.ones((20, 20), dtype=np.float32))
+        os.utime(self.raster_path, (0, 0))
+        self.assertIsNone(load_hypsometry(self.raster_path))
+
+
+if __name__ == '__main__':
+    unittest.main()
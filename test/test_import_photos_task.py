@@ -0,0 +1,74 @@
+# coding=utf-8
+"""Tests for the photo import helpers (content hashing, dedup and naming)."""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+try:
+    from utilities import get_qgis_app
+except ImportError:
+    from .utilities import get_qgis_app
+
+get_qgis_app()
+
+try:
+    from src.gp.import_photos_task import load_hash_index, save_hash_index, unique_file_name, list_photos, file_content_hash
+except ImportError:
+    from qris_dev.src.gp.import_photos_task import load_hash_index, save_hash_index, unique_file_name, list_photos, file_content_hash
+
+
+class TestImportPhotosHelpers(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.photo_folder = os.path.join(self.temp_dir, 'photos', 'dce_001')
+        self.cache_folder = os.path.join(self.temp_dir, 'photos', '.cache', 'dce_001')
+        os.makedirs(self.photo_folder)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def _write(self, name: str, content: bytes):
+        with open(os.path.join(self.photo_folder, name), 'wb') as f:
+            f.write(content)
+
+    def test_unique_file_name(self):
+        self.assertEqual(unique_file_name('IMG_0001.JPG', {'IMG_0002.JPG'}), 'IMG_0001.JPG')
+        self.assertEqual(unique_file_name('IMG_0001.JPG', {'img_0001.jpg'}), 'IMG_0001_1.JPG')
+        self.assertEqual(unique_file_name('IMG_0001.JPG', {'IMG_0001.JPG', 'IMG_0001_1.JPG'}), 'IMG_0001_2.JPG')
+
+    def test_list_photos_is_case_insensitive(self):
+        self._write('a.JPG', b'a')
+        self._write('b.png', b'b')
+        self._write('notes.txt', b'c')
+        self.assertEqual(list_photos(self.photo_folder), ['a.JPG', 'b.png'])
+
+    def test_hash_index_only_rehashes_changed_files(self):
+        self._write('a.jpg', b'first')
+        self._write('b.jpg', b'second')
+
+        index = load_hash_index(self.cache_folder, self.photo_folder)
+        self.assertEqual(index['a.jpg']['hash'], file_content_hash(os.path.join(self.photo_folder, 'a.jpg')))
+        save_hash_index(self.cache_folder, index)
+
+        # A stale cached hash is reused while size and modification time are unchanged
+        index['b.jpg']['hash'] = 'cached'
+        save_hash_index(self.cache_folder, index)
+        self.assertEqual(load_hash_index(self.cache_folder, self.photo_folder)['b.jpg']['hash'], 'cached')
+
+        # Changing the file invalidates the cached entry
+        self._write('b.jpg', b'changed content')
+        reloaded = load_hash_index(self.cache_folder, self.photo_folder)
+        self.assertEqual(reloaded['b.jpg']['hash'], file_content_hash(os.path.join(self.photo_folder, 'b.jpg')))
+
+    def test_identical_content_has_identical_hash(self):
+        self._write('a.jpg', b'same')
+        self._write('copy_of_a.jpg', b'same')
+        index = load_hash_index(self.cache_folder, self.photo_folder)
+        self.assertEqual(index['a.jpg']['hash'], index['copy_of_a.jpg']['hash'])
+
+
+if __name__ == '__main__':
+    unittest.main()
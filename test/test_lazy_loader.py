@@ -0,0 +1,56 @@
+# coding=utf-8
+"""Tests for the deferred import registry used during plugin startup."""
+
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from qris_dev.src.QRiS.lazy_loader import LazyRegistry, import_timings, record_imports, startup_diagnostics
+
+
+class TestLazyLoader(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.package = 'qris_lazy_test_pkg'
+        package_dir = os.path.join(self.temp_dir, self.package)
+        os.makedirs(package_dir)
+        with open(os.path.join(package_dir, '__init__.py'), 'w') as f:
+            f.write('')
+        with open(os.path.join(package_dir, 'heavy_form.py'), 'w') as f:
+            f.write('class HeavyForm:\n    LABEL = "heavy"\n\n    def __init__(self, value):\n        self.value = value\n')
+        sys.path.insert(0, self.temp_dir)
+
+    def tearDown(self):
+        sys.path.remove(self.temp_dir)
+        for name in [name for name in sys.modules if name.startswith(self.package)]:
+            del sys.modules[name]
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def test_module_is_imported_on_first_use(self):
+        registry = LazyRegistry(self.package)
+        HeavyForm = registry.register('.heavy_form', 'HeavyForm')
+
+        self.assertNotIn(f'{self.package}.heavy_form', sys.modules)
+        self.assertFalse(HeavyForm.loaded)
+
+        form = HeavyForm(5)
+        self.assertEqual(form.value, 5)
+        self.assertEqual(HeavyForm.LABEL, 'heavy')
+        self.assertIn(f'{self.package}.heavy_form', sys.modules)
+        self.assertEqual(registry.loaded(), ['HeavyForm'])
+
+    def test_import_times_are_recorded(self):
+        with record_imports(self.package):
+            __import__(f'{self.package}.heavy_form')
+
+        self.assertIn(f'{self.package}.heavy_form', import_timings())
+        self.assertTrue(any(self.package in line for line in startup_diagnostics()))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,103 @@
+# coding=utf-8
+"""Tests for the content addressed metric result cache."""
+
+import os
+import sys
+import shutil
+import sqlite3
+import tempfile
+import unittest
+from types import SimpleNamespace
+
+try:
+    from utilities import get_qgis_app
+except ImportError:
+    from .utilities import get_qgis_app
+
+get_qgis_app()
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+plugin_root = os.path.dirname(current_dir)
+parent_root = os.path.dirname(plugin_root)
+
+if parent_root not in sys.path:
+    sys.path.insert(0, parent_root)
+
+from qris_dev.src.gp.metric_cache import MetricFingerprinter, MetricResultCache, metric_cache_available, metric_cache_stats, purge_metric_cache
+
+MIGRATION = os.path.join(plugin_root, 'src', 'db', 'migrations', '042_metric_result_cache.sql')
+
+
+class TestMetricCache(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.db_path = os.path.join(self.temp_dir, 'metric_cache.gpkg')
+
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute('CREATE TABLE gpkg_contents (table_name TEXT, data_type TEXT, identifier TEXT)')
+            conn.execute('CREATE TABLE sample_frame_features (fid INTEGER PRIMARY KEY, geom BLOB)')
+            for table in ['dce_points', 'dce_lines', 'dce_polygons']:
+                conn.execute(f'CREATE TABLE {table} (fid INTEGER PRIMARY KEY, geom BLOB, event_id INTEGER, event_layer_id INTEGER, metadata TEXT)')
+            conn.executemany('INSERT INTO sample_frame_features (fid, geom) VALUES (?, ?)', [(1, b'frame-a'), (2, b'frame-a')])
+            conn.execute('INSERT INTO dce_points (geom, event_id, event_layer_id, metadata) VALUES (?, ?, ?, ?)', (b'point', 100, 5, '{"attributes": {"type": "a"}}'))
+            with open(MIGRATION) as f:
+                conn.executescript(f.read())
+
+        self.metric = SimpleNamespace(id=1, metric_function='count', metric_params={'dce_layers': [{'layer_id_ref': 'structures'}]})
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def _fingerprint(self, metric=None, sample_frame_id=1, event_id=100, dependencies=None):
+        with sqlite3.connect(self.db_path) as conn:
+            return MetricFingerprinter(self.db_path, {}).fingerprint(conn.cursor(), metric or self.metric, sample_frame_id, event_id, dependencies)
+
+    def test_fingerprint_follows_inputs(self):
+        original = self._fingerprint()
+
+        self.assertEqual(original, self._fingerprint())
+        # Same geometry in a different sample frame feature
+        self.assertEqual(original, self._fingerprint(sample_frame_id=2))
+        self.assertNotEqual(original, self._fingerprint(event_id=101))
+        self.assertNotEqual(original, self._fingerprint(dependencies={'numerator': 2.0}))
+        self.assertNotEqual(original, self._fingerprint(SimpleNamespace(id=1, metric_function='count', metric_params={'dce_layers': []})))
+
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute("UPDATE dce_points SET metadata = '{\"attributes\": {\"type\": \"b\"}}'")
+        self.assertNotEqual(original, self._fingerprint())
+
+        changed_dce = self._fingerprint()
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute("UPDATE sample_frame_features SET geom = ? WHERE fid = 1", (b'frame-b',))
+        self.assertNotEqual(changed_dce, self._fingerprint())
+
+    def test_results_are_reused_and_purged(self):
+        fingerprint = self._fingerprint()
+
+        with sqlite3.connect(self.db_path) as conn:
+            self.assertTrue(metric_cache_available(conn))
+            cache = MetricResultCache(conn)
+            self.assertIs(cache.get(fingerprint), MetricResultCache.MISS)
+            cache.put(fingerprint, self.metric, 12.5)
+            cache.flush()
+            conn.commit()
+
+        with sqlite3.connect(self.db_path) as conn:
+            cache = MetricResultCache(conn)
+            self.assertEqual(cache.get(fingerprint), 12.5)
+            cache.flush()
+            conn.commit()
+        self.assertEqual(cache.hits, 1)
+
+        stats = metric_cache_stats(self.db_path)
+        self.assertEqual(stats['entries'], 1)
+        self.assertEqual(stats['hits'], 1)
+
+        self.assertEqual(purge_metric_cache(self.db_path, [2]), 0)
+        self.assertEqual(purge_metric_cache(self.db_path), 1)
+        self.assertEqual(metric_cache_stats(self.db_path)['entries'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
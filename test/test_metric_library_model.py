@@ -0,0 +1,119 @@
+# coding=utf-8
+"""Tests for the metric library item model and its filter proxy."""
+
+import unittest
+from types import SimpleNamespace
+
+try:
+    from utilities import get_qgis_app
+except ImportError:
+    from .utilities import get_qgis_app
+
+get_qgis_app()
+
+from qgis.PyQt import QtCore
+
+try:
+    from src.model.metric_library_model import MetricLibraryModel, MetricLibraryFilterModel, COLUMN_NAME, COLUMN_AVAILABILITY, COLUMN_USAGE, AVAILABILITY_MANUAL
+except ImportError:
+    from qris_dev.src.model.metric_library_model import MetricLibraryModel, MetricLibraryFilterModel, COLUMN_NAME, COLUMN_AVAILABILITY, COLUMN_USAGE, AVAILABILITY_MANUAL
+
+
+def metric(id: int, name: str, protocol: str, hierarchy: list, status: str = 'active'):
+    return SimpleNamespace(id=id, name=name, protocol_machine_code=protocol, hierarchy=hierarchy, status=status, version=1, description=f'{name} description', default_level_id=1)
+
+
+class TestMetricLibraryModel(unittest.TestCase):
+
+    def setUp(self):
+        self.protocols = {
+            1: SimpleNamespace(machine_code='LTPBR', name='Low-Tech Process-Based Restoration'),
+            2: SimpleNamespace(machine_code='BEAVER', name='Beaver Experimental Protocol'),
+        }
+        self.metrics = {
+            1: metric(1, 'Dam Count', 'LTPBR', ['Structures']),
+            2: metric(2, 'Dam Density', 'LTPBR', ['Structures']),
+            3: metric(3, 'Jam Count', 'LTPBR', ['Structures', 'Wood']),
+            4: metric(4, 'Valley Width', 'LTPBR', ['Geomorphic'], status='deprecated'),
+            5: metric(5, 'Dam Height', 'BEAVER', ['Structures']),
+        }
+        self.levels = {metric_id: 0 for metric_id in self.metrics}
+        self.model = MetricLibraryModel(self.metrics, self.protocols, self.levels)
+        self.availability = {1: 'All 2 DCEs', 2: 'Manual Only', 3: 'No DCEs (Missing Inputs)', 4: 'Manual Only', 5: 'Manual Only'}
+        self.proxy = MetricLibraryFilterModel(lambda m: self.availability[m.id])
+        self.proxy.setSourceModel(self.model)
+
+    def test_tree_and_flat_rows(self):
+        self.assertEqual(self.model.rowCount(), 2)
+        ltpbr = self.model.index(0, COLUMN_NAME)
+        self.assertEqual(self.model.data(ltpbr), 'Low-Tech Process-Based Restoration')
+        structures = self.model.index(0, COLUMN_NAME, ltpbr)
+        # Dam Count, Dam Density and the Wood group
+        self.assertEqual(self.model.rowCount(structures), 3)
+
+        index = self.model.metric_index(3)
+        self.assertEqual(self.model.data(index), 'Jam Count')
+        self.assertEqual(self.model.data(self.model.parent(index)), 'Wood')
+
+        self.model.set_flat(True)
+        self.assertEqual(self.model.rowCount(), 5)
+        self.assertEqual(self.model.metric_index(3).row(), 2)
+        self.assertFalse(self.model.parent(self.model.metric_index(3)).isValid())
+
+    def test_batched_updates_emit_one_signal_per_run_of_rows(self):
+        changes = []
+        self.model.dataChanged.connect(lambda top_left, bottom_right, roles=None: changes.append((top_left.row(), bottom_right.row(), top_left.column(), bottom_right.column())))
+
+        self.model.set_flat(True)
+        self.model.set_availability({1: 'Calculating...', 2: 'Calculating...', 3: 'Calculating...', 5: 'Calculating...'})
+        self.assertEqual(changes, [(0, 2, COLUMN_AVAILABILITY, COLUMN_AVAILABILITY), (4, 4, COLUMN_AVAILABILITY, COLUMN_AVAILABILITY)])
+        self.assertEqual(self.model.data(self.model.metric_index(5, COLUMN_AVAILABILITY)), 'Calculating...')
+
+        changes.clear()
+        self.model.set_levels({1: 2, 2: 2})
+        self.assertEqual(changes, [(0, 1, COLUMN_NAME, COLUMN_USAGE)])
+        self.assertEqual(self.levels[2], 2)
+        self.assertEqual(self.model.data(self.model.metric_index(2, COLUMN_USAGE)), 'Indicator')
+        self.assertTrue(self.model.data(self.model.metric_index(2), QtCore.Qt.FontRole).bold())
+
+    def test_edit_usage(self):
+        changed = []
+        self.model.usage_changed.connect(lambda metric_id, level_id: changed.append((metric_id, level_id)))
+
+        self.assertTrue(self.model.setData(self.model.metric_index(1, COLUMN_USAGE), 1))
+        self.assertFalse(self.model.setData(self.model.metric_index(1, COLUMN_NAME), 1))
+        self.assertFalse(self.model.flags(self.model.index(0, COLUMN_USAGE)) & QtCore.Qt.ItemIsEditable)
+        self.assertEqual(changed, [(1, 1)])
+        self.assertEqual(self.levels[1], 1)
+
+    def test_filters(self):
+        # Experimental protocols and deprecated metrics are outside the universe by default
+        self.assertEqual([m.id for m in self.proxy.accepted_metrics()], [1, 2, 3])
+        self.assertEqual(self.proxy.rowCount(), 1)
+
+        self.proxy.set_filters(include_experimental=True, include_deprecated=True)
+        self.assertEqual(len(self.proxy.accepted_metrics()), 5)
+        self.assertEqual(self.proxy.rowCount(), 2)
+
+        self.proxy.set_filters(groups={'Wood'}, search_text='count')
+        self.assertEqual([m.id for m in self.proxy.accepted_metrics()], [3])
+
+        self.proxy.set_filters(groups=None, search_text='', protocols={'LTPBR'}, availability_filter=AVAILABILITY_MANUAL)
+        self.assertEqual([m.id for m in self.proxy.accepted_metrics()], [2, 4])
+
+        self.levels[4] = 1
+        self.proxy.set_filters(in_use_only=True)
+        self.assertEqual([m.id for m in self.proxy.accepted_metrics()], [4])
+
+        # Group rows stay visible when a metric below them is accepted
+        ltpbr = self.proxy.index(0, COLUMN_NAME)
+        geomorphic = self.proxy.index(0, COLUMN_NAME, ltpbr)
+        self.assertEqual(self.proxy.data(geomorphic), 'Geomorphic')
+        self.assertEqual(self.proxy.metric(self.proxy.index(0, COLUMN_NAME, geomorphic)).id, 4)
+
+        with self.assertRaises(AttributeError):
+            self.proxy.set_filters(unknown=True)
+
+
+if __name__ == '__main__':
+    unittest.main()
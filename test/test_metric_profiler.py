@@ -0,0 +1,89 @@
+"""Tests for the optional metric calculation profiler."""
+
+import os
+import sys
+import json
+import shutil
+import tempfile
+import unittest
+
+# Add the parent directory to sys.path so we can import 'qris_dev' as a package
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from qris_dev.src.gp.metric_profiler import MetricProfiler, get_active_profiler, profile_section, profiled
+
+
+@profiled(MetricProfiler.FEATURE_IO)
+def read_features(count):
+    for i in range(count):
+        yield i
+
+
+@profiled(MetricProfiler.RASTER_READ, 'raster')
+def read_raster():
+    return 42
+
+
+class TestMetricProfiler(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        profiler = get_active_profiler()
+        if profiler is not None:
+            profiler.deactivate()
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def test_disabled_calls_pass_through(self):
+        self.assertIsNone(get_active_profiler())
+        self.assertEqual(list(read_features(3)), [0, 1, 2])
+        self.assertEqual(read_raster(), 42)
+        with profile_section(MetricProfiler.METRIC_FUNCTION, 'count'):
+            pass
+
+    def test_records_calls_and_generators(self):
+        profiler = MetricProfiler()
+        profiler.activate()
+        self.assertEqual(list(read_features(3)), [0, 1, 2])
+        read_raster()
+        read_raster()
+        profiler.deactivate()
+
+        timings = profiler.to_dict()['categories']
+        # A generator is one call regardless of how many features it yields
+        self.assertEqual(timings['feature_io']['read_features']['calls'], 1)
+        self.assertEqual(timings['raster_read']['raster']['calls'], 2)
+        self.assertIsNone(get_active_profiler())
+
+    def test_exclusive_time_excludes_nested_sections(self):
+        profiler = MetricProfiler()
+        profiler.activate()
+        with profile_section(MetricProfiler.METRIC_FUNCTION, 'area', MetricProfiler.GEOMETRY):
+            list(read_features(2))
+            read_raster()
+        profiler.deactivate()
+
+        timings = profiler.to_dict()['categories']
+        nested = timings['feature_io']['read_features']['seconds'] + timings['raster_read']['raster']['seconds']
+        inclusive = timings['metric_function']['area']['seconds']
+        exclusive = timings['geometry']['area']['seconds']
+        self.assertAlmostEqual(exclusive, inclusive - nested, places=6)
+
+    def test_write_json(self):
+        profiler = MetricProfiler()
+        profiler.activate()
+        read_raster()
+        profiler.deactivate()
+
+        path = os.path.join(self.temp_dir, 'profiling', 'profile.json')
+        profiler.write_json(path, {'analysis_id': 1})
+        with open(path) as f:
+            output = json.load(f)
+        self.assertEqual(output['metadata'], {'analysis_id': 1})
+        self.assertEqual(output['categories']['raster_read']['raster']['calls'], 1)
+        self.assertTrue(any('raster_read' in line for line in profiler.summary_lines()))
+
+
+if __name__ == '__main__':
+    unittest.main()
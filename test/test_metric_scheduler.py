@@ -0,0 +1,104 @@
+"""Tests for the dependency aware metric scheduler."""
+
+import os
+import sys
+import threading
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    from utilities import get_qgis_app
+except ImportError:
+    from .utilities import get_qgis_app
+
+get_qgis_app()
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+plugin_root = os.path.dirname(current_dir)
+parent_root = os.path.dirname(plugin_root)
+
+if parent_root not in sys.path:
+    sys.path.insert(0, parent_root)
+
+from qris_dev.src.gp.metric_scheduler import MetricScheduler
+
+
+class TestMetricScheduler(unittest.TestCase):
+
+    def setUp(self):
+        self.executor = ThreadPoolExecutor(max_workers=4)
+        self.events = []
+
+    def tearDown(self):
+        self.executor.shutdown()
+
+    def finish(self, metric_id, result, exception):
+        self.events.append(('finish', metric_id, result, None if exception is None else str(exception)))
+
+    def test_independent_metrics_run_concurrently(self):
+        # Both calculations wait for each other, so they can only finish if they run at the same time
+        barrier = threading.Barrier(2, timeout=5)
+
+        def start(metric_id):
+            self.events.append(('start', metric_id))
+            return lambda: barrier.wait() is not None and metric_id * 10
+
+        completed = MetricScheduler(self.executor, {1: [], 2: []}).run(start, self.finish)
+
+        self.assertTrue(completed)
+        self.assertEqual(self.events[:2], [('start', 1), ('start', 2)])
+        self.assertEqual(sorted(self.events[2:]), [('finish', 1, 10, None), ('finish', 2, 20, None)])
+
+    def test_derived_metrics_start_after_their_dependencies(self):
+        release_slow = threading.Event()
+
+        def start(metric_id):
+            self.events.append(('start', metric_id))
+            if metric_id == 4:
+                # Resolved without a calculation (skipped or cached)
+                return None
+            if metric_id == 1:
+                return lambda: release_slow.wait(5) and 'slow'
+            if metric_id == 2:
+                return lambda: release_slow.set() or 'fast'
+            return lambda: metric_id
+
+        dependencies = {1: [], 2: [], 3: [1, 2], 4: [], 5: [3, 4]}
+        self.assertTrue(MetricScheduler(self.executor, dependencies).run(start, self.finish))
+
+        starts = [event[1] for event in self.events if event[0] == 'start']
+        self.assertEqual(starts[:3], [1, 2, 4])
+        position = {event[:2]: i for i, event in enumerate(self.events)}
+        self.assertGreater(position[('start', 3)], position[('finish', 1)])
+        self.assertGreater(position[('start', 3)], position[('finish', 2)])
+        self.assertGreater(position[('start', 5)], position[('finish', 3)])
+        self.assertEqual(self.events[-1], ('finish', 5, 5, None))
+
+    def test_failed_calculations_are_finished_with_the_exception(self):
+
+        def fail():
+            raise ValueError('no geometry')
+
+        def start(metric_id):
+            return fail if metric_id == 1 else (lambda: metric_id)
+
+        self.assertTrue(MetricScheduler(self.executor, {1: [], 2: [1]}).run(start, self.finish))
+        self.assertEqual(self.events, [('finish', 1, None, 'no geometry'), ('finish', 2, 2, None)])
+
+    def test_cancel_stops_starting_metrics(self):
+        started = []
+
+        def start(metric_id):
+            started.append(metric_id)
+            return lambda: metric_id
+
+        # Canceled after the first metric has started: it finishes, nothing else starts
+        completed = MetricScheduler(self.executor, {1: [], 2: [], 3: [1]}).run(start, self.finish, lambda: len(started) > 0)
+
+        self.assertFalse(completed)
+        self.assertEqual(started, [1])
+        self.assertEqual(self.events, [('finish', 1, 1, None)])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,126 @@
+# coding=utf-8
+"""Tests for reach-wide metric value summaries."""
+
+import os
+import sys
+import json
+import shutil
+import sqlite3
+import tempfile
+import unittest
+
+import numpy as np
+
+try:
+    from utilities import get_qgis_app
+except ImportError:
+    from .utilities import get_qgis_app
+
+get_qgis_app()
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+plugin_root = os.path.dirname(current_dir)
+parent_root = os.path.dirname(plugin_root)
+
+if parent_root not in sys.path:
+    sys.path.insert(0, parent_root)
+
+from qris_dev.src.model.connection_manager import open_connection_manager, close_connection_manager
+from qris_dev.src.model.metric_value import metric_values_changed
+from qris_dev.src.model.metric_value_summary import load_metric_value_summaries, clear_metric_value_summary_cache
+
+
+class TestMetricValueSummary(unittest.TestCase):
+
+    def setUp(self):
+        clear_metric_value_summary_cache()
+        self.temp_dir = tempfile.mkdtemp()
+        self.db_path = os.path.join(self.temp_dir, 'project.gpkg')
+        rng = np.random.default_rng(42)
+        self.values = {10: rng.random(25) * 100.0, 11: rng.random(8) * 100.0}
+
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute("""CREATE TABLE metric_values (analysis_id INTEGER, event_id INTEGER, sample_frame_feature_id INTEGER, metric_id INTEGER,
+                            manual_value REAL, automated_value REAL, is_manual INTEGER, uncertainty TEXT, unit_id INTEGER, metadata TEXT, description TEXT,
+                            PRIMARY KEY (analysis_id, event_id, sample_frame_feature_id, metric_id))""")
+            for event_id, values in self.values.items():
+                for feature_id, value in enumerate(values):
+                    # Alternate manual and automated values and the two kinds of uncertainty
+                    is_manual = feature_id % 2
+                    uncertainty = {'Plus/Minus': 2.0} if is_manual else {'Percent': 10.0}
+                    conn.execute('INSERT INTO metric_values VALUES (1, ?, ?, 5, ?, ?, ?, ?, NULL, NULL, NULL)',
+                                 [event_id, feature_id, value if is_manual else -1.0, -1.0 if is_manual else value, is_manual, json.dumps(uncertainty)])
+            # Missing values and other analyses and metrics are ignored
+            conn.execute("INSERT INTO metric_values VALUES (1, 10, 99, 5, NULL, NULL, 0, 'null', NULL, NULL, NULL)")
+            conn.execute("INSERT INTO metric_values VALUES (2, 10, 0, 5, 1000.0, NULL, 1, NULL, NULL, NULL, NULL)")
+            conn.execute("INSERT INTO metric_values VALUES (1, 10, 0, 6, 1000.0, NULL, 1, NULL, NULL, NULL, NULL)")
+
+    def tearDown(self):
+        clear_metric_value_summary_cache()
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def test_summary_matches_numpy(self):
+        summary = load_metric_value_summaries(self.db_path, 1, [5], [11, 12, 10])[5]
+
+        self.assertEqual(summary.event_ids, (11, 12, 10))
+        np.testing.assert_array_equal(summary.count, [8, np.nan, 25])
+        for i, event_id in [(0, 11), (2, 10)]:
+            values = self.values[event_id]
+            q1, median, q3 = np.percentile(values, [25, 50, 75])
+            self.assertAlmostEqual(summary.q1[i], q1)
+            self.assertAlmostEqual(summary.median[i], median)
+            self.assertAlmostEqual(summary.q3[i], q3)
+            self.assertAlmostEqual(summary.mean[i], values.mean())
+            self.assertAlmostEqual(summary.minimum[i], values.min())
+            self.assertAlmostEqual(summary.maximum[i], values.max())
+
+            errors = np.where(np.arange(len(values)) % 2 == 1, 2.0, values * 0.1)
+            self.assertAlmostEqual(summary.mean_uncertainty[i], np.sqrt(np.sum(errors ** 2)) / len(values))
+
+        self.assertTrue(np.isnan(summary.median[1]))
+
+        converted = summary.converted(0.5)
+        self.assertAlmostEqual(converted.median[2], summary.median[2] * 0.5)
+        np.testing.assert_array_equal(converted.count, summary.count)
+
+    def test_summaries_are_cached_until_values_change(self):
+        first = load_metric_value_summaries(self.db_path, 1, [5], [10])
+        self.assertIs(load_metric_value_summaries(self.db_path, 1, [5], [10]), first)
+
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute('UPDATE metric_values SET automated_value = 1000.0 WHERE metric_id = 5 AND is_manual = 0')
+        metric_values_changed(self.db_path)
+
+        second = load_metric_value_summaries(self.db_path, 1, [5], [10])
+        self.assertIsNot(second, first)
+        self.assertEqual(second[5].maximum[0], 1000.0)
+
+    def test_cache_sees_rows_deleted_outside_this_process(self):
+        first = load_metric_value_summaries(self.db_path, 1, [5], [10])
+
+        # As a cascade from deleting a sample frame feature through QGIS, without metric_values_changed
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute('DELETE FROM metric_values WHERE sample_frame_feature_id < 5')
+
+        second = load_metric_value_summaries(self.db_path, 1, [5], [10])
+        self.assertEqual(first[5].count[0], 25)
+        self.assertEqual(second[5].count[0], 20)
+
+    def test_cache_sees_values_updated_outside_this_process(self):
+        open_connection_manager(self.db_path)
+        try:
+            first = load_metric_value_summaries(self.db_path, 1, [5], [10])
+            self.assertIs(load_metric_value_summaries(self.db_path, 1, [5], [10]), first)
+
+            # As an edit of the metric_values table in QGIS, without metric_values_changed
+            with sqlite3.connect(self.db_path) as conn:
+                conn.execute('UPDATE metric_values SET automated_value = 1000.0 WHERE metric_id = 5 AND is_manual = 0')
+
+            second = load_metric_value_summaries(self.db_path, 1, [5], [10])
+            self.assertEqual(second[5].maximum[0], 1000.0)
+        finally:
+            close_connection_manager(self.db_path)
+
+
+if __name__ == '__main__':
+    unittest.main()
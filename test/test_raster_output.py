@@ -0,0 +1,47 @@
+# coding=utf-8
+"""Tests for the raster output creation options and tiling helpers."""
+
+import os
+import sys
+import unittest
+
+from osgeo import gdal
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from qris_dev.src.gp.raster_output import creation_options, resolve_predictor, tile_windows, PREDICTOR_AUTO
+
+
+class TestRasterOutput(unittest.TestCase):
+
+    def test_automatic_predictor_follows_data_type(self):
+        self.assertEqual(resolve_predictor(PREDICTOR_AUTO, gdal.GDT_Float32), 3)
+        self.assertEqual(resolve_predictor(PREDICTOR_AUTO, gdal.GDT_Int16), 2)
+        self.assertEqual(resolve_predictor(3, gdal.GDT_Byte), 2)
+        self.assertIsNone(resolve_predictor(None, gdal.GDT_Float32))
+
+    def test_creation_options(self):
+        cog = creation_options(gdal.GDT_Float32, cog=True, num_threads=4)
+        self.assertIn('NUM_THREADS=4', cog)
+        self.assertIn('PREDICTOR=3', cog)
+        self.assertIn('BLOCKSIZE=512', cog)
+
+        gtiff = creation_options(gdal.GDT_Byte, cog=False, predictor=None)
+        self.assertIn('TILED=YES', gtiff)
+        self.assertFalse(any(option.startswith('PREDICTOR') for option in gtiff))
+
+    def test_tile_windows_cover_raster_with_overlap(self):
+        windows = list(tile_windows(250, 120, 100, overlap=1))
+        self.assertEqual(len(windows), 6)
+
+        covered = sum(width * height for _x, _y, width, height, *_read in windows)
+        self.assertEqual(covered, 250 * 120)
+
+        # Interior tile reads one extra pixel on every side
+        self.assertEqual(windows[4], (100, 100, 100, 20, 99, 99, 102, 21))
+        # First tile is clamped to the raster origin
+        self.assertEqual(windows[0], (0, 0, 100, 100, 0, 0, 101, 101))
+
+
+if __name__ == '__main__':
+    unittest.main()
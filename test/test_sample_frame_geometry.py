@@ -0,0 +1,139 @@
+"""Tests for the projected sample frame geometry store."""
+import unittest
+import os
+import shutil
+import sqlite3
+import tempfile
+import sys
+
+try:
+    from utilities import get_qgis_app
+except ImportError:
+    from .utilities import get_qgis_app
+
+get_qgis_app()
+
+from osgeo import ogr, osr, gdal
+gdal.UseExceptions()
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+plugin_root = os.path.dirname(current_dir)
+parent_root = os.path.dirname(plugin_root)
+
+if parent_root not in sys.path:
+    sys.path.insert(0, parent_root)
+
+from qris_dev.src.gp.sample_frame_geometry import (get_sample_frame_geometry, get_sample_frame_geometries, update_sample_frame_geometries,
+                                                   clear_sample_frame_geometry_cache, spatial_reference, GEOMETRY_TABLE)
+
+MIGRATION = os.path.join(plugin_root, 'src', 'db', 'migrations', '043_sample_frame_geometries.sql')
+UTM_EPSG = 26912
+
+
+def square(min_x, min_y, max_x, max_y):
+    return ogr.CreateGeometryFromWkt(f'POLYGON (({min_x} {min_y}, {max_x} {min_y}, {max_x} {max_y}, {min_x} {max_y}, {min_x} {min_y}))')
+
+
+class TestSampleFrameGeometry(unittest.TestCase):
+
+    def setUp(self):
+        clear_sample_frame_geometry_cache()
+        self.test_dir = tempfile.mkdtemp()
+        self.gpkg_path = os.path.join(self.test_dir, 'project.gpkg')
+
+        self.srs = osr.SpatialReference()
+        self.srs.ImportFromEPSG(4326)
+        self.srs.SetAxisMappingStrategy(osr.OAMS_TRADITIONAL_GIS_ORDER)
+
+        ds = ogr.GetDriverByName('GPKG').CreateDataSource(self.gpkg_path)
+        frames = ds.CreateLayer('sample_frame_features', srs=self.srs, geom_type=ogr.wkbPolygon)
+        frames.CreateField(ogr.FieldDefn('sample_frame_id', ogr.OFTInteger))
+        self.squares = {}
+        for sample_frame_id, geom in [(1, square(-111.0, 45.0, -110.99, 45.01)), (1, square(-110.99, 45.0, -110.98, 45.01)), (2, square(-111.0, 45.01, -110.99, 45.02))]:
+            feature = ogr.Feature(frames.GetLayerDefn())
+            feature.SetField('sample_frame_id', sample_frame_id)
+            feature.SetGeometry(geom)
+            frames.CreateFeature(feature)
+            self.squares[feature.GetFID()] = geom
+        ds = None
+
+    def tearDown(self):
+        clear_sample_frame_geometry_cache()
+        shutil.rmtree(self.test_dir)
+
+    def migrate(self):
+        with open(MIGRATION) as f, sqlite3.connect(self.gpkg_path) as conn:
+            conn.executescript(f.read())
+
+    def stored_rows(self):
+        with sqlite3.connect(self.gpkg_path) as conn:
+            return dict(conn.execute(f'SELECT sample_frame_feature_id, area FROM {GEOMETRY_TABLE}').fetchall())
+
+    def utm(self, geom):
+        utm_srs = osr.SpatialReference()
+        utm_srs.ImportFromEPSG(UTM_EPSG)
+        utm_srs.SetAxisMappingStrategy(osr.OAMS_TRADITIONAL_GIS_ORDER)
+        geom = geom.Clone()
+        geom.Transform(osr.CoordinateTransformation(self.srs, utm_srs))
+        return geom
+
+    def test_projected_measurements(self):
+        geometry = get_sample_frame_geometry(self.gpkg_path, 1)
+        expected = self.utm(self.squares[1])
+
+        self.assertEqual(geometry.utm_epsg, UTM_EPSG)
+        self.assertAlmostEqual(geometry.area, expected.GetArea(), places=3)
+        self.assertAlmostEqual(geometry.perimeter, expected.Boundary().Length(), places=3)
+        for actual, expected_value in zip(geometry.bbox, (-111.0, 45.0, -110.99, 45.01)):
+            self.assertAlmostEqual(actual, expected_value)
+        self.assertAlmostEqual(geometry.projected_geometry().GetArea(), geometry.area, places=3)
+
+        with self.assertRaises(ValueError):
+            get_sample_frame_geometry(self.gpkg_path, 99)
+
+    def test_stored_on_update_and_refreshed_after_edits(self):
+        self.migrate()
+
+        geometries = update_sample_frame_geometries(self.gpkg_path, 1)
+        self.assertEqual(sorted(geometries), [1, 2])
+        self.assertEqual(sorted(self.stored_rows()), [1, 2])
+
+        # Edit one feature and delete the other outside QRiS
+        ds = ogr.Open(self.gpkg_path, 1)
+        layer = ds.GetLayerByName('sample_frame_features')
+        feature = layer.GetFeature(1)
+        feature.SetGeometry(square(-111.0, 45.0, -110.98, 45.01))
+        layer.SetFeature(feature)
+        layer.DeleteFeature(2)
+        ds = None
+
+        # The stale row is recomputed when read, and pruned rows are removed on update
+        edited = get_sample_frame_geometry(self.gpkg_path, 1)
+        self.assertAlmostEqual(edited.area, self.utm(square(-111.0, 45.0, -110.98, 45.01)).GetArea(), places=3)
+        update_sample_frame_geometries(self.gpkg_path, 1)
+        self.assertEqual(list(self.stored_rows()), [1])
+        self.assertAlmostEqual(self.stored_rows()[1], edited.area)
+
+    def test_projects_without_store(self):
+        geometries = get_sample_frame_geometries(self.gpkg_path, [1, 3])
+
+        self.assertEqual(sorted(geometries), [1, 3])
+        self.assertIs(get_sample_frame_geometries(self.gpkg_path, [3])[3], geometries[3])
+
+    def test_srs_id_is_resolved_through_gpkg_spatial_ref_sys(self):
+        utm_srs = osr.SpatialReference()
+        utm_srs.ImportFromEPSG(UTM_EPSG)
+        spatial_ref_sys = {
+            # Custom srs_ids that are not EPSG codes
+            100000: ('EPSG', UTM_EPSG, utm_srs.ExportToWkt()),
+            100001: ('NONE', 100001, utm_srs.ExportToWkt()),
+            0: ('NONE', 0, 'undefined'),
+        }
+
+        self.assertEqual(spatial_reference(100000, spatial_ref_sys).GetAuthorityCode(None), str(UTM_EPSG))
+        self.assertTrue(spatial_reference(100001, spatial_ref_sys).IsSame(utm_srs))
+        self.assertEqual(spatial_reference(0, spatial_ref_sys).GetAuthorityCode(None), '4326')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,118 @@
+# coding=utf-8
+"""Tests for GeoPackage spatial index management."""
+
+import os
+import sys
+import shutil
+import sqlite3
+import tempfile
+import unittest
+
+try:
+    from utilities import get_qgis_app
+except ImportError:
+    from .utilities import get_qgis_app
+
+get_qgis_app()
+
+from osgeo import ogr, osr
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+plugin_root = os.path.dirname(current_dir)
+parent_root = os.path.dirname(plugin_root)
+
+if parent_root not in sys.path:
+    sys.path.insert(0, parent_root)
+
+from qris_dev.src.model.spatial_index import check_spatial_indexes, ensure_spatial_indexes, spatial_index_stats, view_base_table, warn_if_unindexed
+
+
+class TestSpatialIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.gpkg_path = os.path.join(self.temp_dir, 'project.gpkg')
+
+        srs = osr.SpatialReference()
+        srs.ImportFromEPSG(4326)
+        ds = ogr.GetDriverByName('GPKG').CreateDataSource(self.gpkg_path)
+        indexed = ds.CreateLayer('dce_points', srs=srs, geom_type=ogr.wkbPoint)
+        unindexed = ds.CreateLayer('sample_frame_features', srs=srs, geom_type=ogr.wkbPolygon, options=['SPATIAL_INDEX=NO'])
+        for i in range(10):
+            feature = ogr.Feature(indexed.GetLayerDefn())
+            feature.SetGeometry(ogr.CreateGeometryFromWkt(f'POINT ({i} {i})'))
+            indexed.CreateFeature(feature)
+
+            feature = ogr.Feature(unindexed.GetLayerDefn())
+            feature.SetGeometry(ogr.CreateGeometryFromWkt(f'POLYGON (({i} {i}, {i + 1} {i}, {i + 1} {i + 1}, {i} {i}))'))
+            unindexed.CreateFeature(feature)
+        ds = None
+
+        with sqlite3.connect(self.gpkg_path) as conn:
+            conn.execute('CREATE VIEW vw_sample_frame_1 AS SELECT * FROM sample_frame_features WHERE fid < 5')
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def statuses(self):
+        return {status.table_name: status for status in check_spatial_indexes(self.gpkg_path)}
+
+    def test_check(self):
+        statuses = self.statuses()
+
+        self.assertTrue(statuses['dce_points'].healthy)
+        self.assertEqual(statuses['dce_points'].indexed_rows, 10)
+        self.assertFalse(statuses['sample_frame_features'].exists)
+        self.assertFalse(statuses['sample_frame_features'].healthy)
+
+    def test_ensure_creates_missing_index(self):
+        messages = list(ensure_spatial_indexes(self.gpkg_path))
+
+        self.assertEqual(messages, ['Created spatial index for sample_frame_features'])
+        stats = spatial_index_stats(self.gpkg_path)
+        self.assertTrue(stats['sample_frame_features']['healthy'])
+        self.assertEqual(stats['sample_frame_features']['indexed_rows'], 10)
+
+    def test_ensure_rebuilds_stale_index(self):
+        with sqlite3.connect(self.gpkg_path) as conn:
+            conn.execute('DELETE FROM rtree_dce_points_geom WHERE id > 5')
+        self.assertFalse(self.statuses()['dce_points'].healthy)
+
+        messages = list(ensure_spatial_indexes(self.gpkg_path, ['dce_points']))
+
+        self.assertEqual(messages, ['Rebuilt spatial index for dce_points'])
+        self.assertTrue(self.statuses()['dce_points'].healthy)
+
+    def test_ensure_without_counting_rows(self):
+        with sqlite3.connect(self.gpkg_path) as conn:
+            conn.execute('DELETE FROM rtree_dce_points_geom WHERE id > 5')
+
+        # Only the missing index is created; the stale one needs the row counts to be detected
+        messages = list(ensure_spatial_indexes(self.gpkg_path, count_rows=False))
+
+        self.assertEqual(messages, ['Created spatial index for sample_frame_features'])
+        self.assertFalse(self.statuses()['dce_points'].healthy)
+
+    def test_healthy_indexes_are_left_alone(self):
+        list(ensure_spatial_indexes(self.gpkg_path))
+        self.assertEqual(list(ensure_spatial_indexes(self.gpkg_path)), [])
+
+    def test_view_base_table(self):
+        with sqlite3.connect(self.gpkg_path) as conn:
+            curs = conn.cursor()
+            self.assertEqual(view_base_table(curs, 'vw_sample_frame_1'), 'sample_frame_features')
+            self.assertIsNone(view_base_table(curs, 'dce_points'))
+
+    def test_warn_if_unindexed(self):
+        self.assertTrue(warn_if_unindexed(self.gpkg_path, 'dce_points'))
+        self.assertFalse(warn_if_unindexed(self.gpkg_path, 'sample_frame_features'))
+        self.assertFalse(warn_if_unindexed(self.gpkg_path, 'vw_sample_frame_1'))
+
+        list(ensure_spatial_indexes(self.gpkg_path))
+
+        self.assertTrue(warn_if_unindexed(self.gpkg_path, 'sample_frame_features'))
+        self.assertTrue(warn_if_unindexed(self.gpkg_path, 'vw_sample_frame_1'))
+
+
+if __name__ == '__main__':
+    unittest.main()
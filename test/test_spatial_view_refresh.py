@@ -0,0 +1,90 @@
+# coding=utf-8
+"""Tests for incremental (fingerprinted) spatial view maintenance."""
+
+import os
+import sqlite3
+import tempfile
+import unittest
+from types import SimpleNamespace
+
+try:
+    from utilities import get_qgis_app
+except ImportError:
+    from .utilities import get_qgis_app
+
+get_qgis_app()
+
+try:
+    from src.model.db_item_spatial import DBItemSpatial
+    from src.model.project import Project
+except ImportError:
+    from qris_dev.src.model.db_item_spatial import DBItemSpatial
+    from qris_dev.src.model.project import Project
+
+
+class TestSpatialViewRefresh(unittest.TestCase):
+
+    def setUp(self):
+        fd, self.db_path = tempfile.mkstemp(suffix='.gpkg')
+        os.close(fd)
+
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute('CREATE TABLE profile_features (fid INTEGER PRIMARY KEY, profile_id INTEGER, geom BLOB)')
+            conn.execute('CREATE TABLE gpkg_contents (table_name TEXT PRIMARY KEY, data_type TEXT, identifier TEXT, description TEXT, srs_id INTEGER)')
+            conn.execute('CREATE TABLE gpkg_geometry_columns (table_name TEXT PRIMARY KEY, column_name TEXT, geometry_type_name TEXT, srs_id INTEGER, z INTEGER, m INTEGER)')
+            with open(os.path.join(os.path.dirname(__file__), '..', 'src', 'db', 'migrations', '041_spatial_view_fingerprints.sql')) as f:
+                conn.executescript(f.read())
+            conn.commit()
+
+        self.items = [
+            DBItemSpatial('profiles', 1, 'Profile 1', 'profile_features', 'profile_id', 'Linestring'),
+            DBItemSpatial('profiles', 2, 'Profile 2', 'profile_features', 'profile_id', 'Linestring'),
+        ]
+        self.project = SimpleNamespace(
+            project_file=self.db_path,
+            _spatial_views_verified=False,
+            get_spatial_view_items=lambda: iter(self.items),
+        )
+
+    def tearDown(self):
+        if os.path.exists(self.db_path):
+            try:
+                os.remove(self.db_path)
+            except PermissionError:
+                pass
+
+    def _views(self):
+        with sqlite3.connect(self.db_path) as conn:
+            return {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type='view'")}
+
+    def test_only_missing_or_changed_views_are_rebuilt(self):
+        self.assertEqual(Project.refresh_spatial_views(self.project), 2)
+        self.assertEqual(self._views(), {'vw_profiles_1', 'vw_profiles_2'})
+        self.assertTrue(self.project._spatial_views_verified)
+
+        # Nothing changed, nothing rebuilt
+        self.assertEqual(Project.refresh_spatial_views(self.project), 0)
+
+        # A changed definition only rebuilds that view
+        self.items[1].epsg = 3857
+        self.assertEqual(Project.refresh_spatial_views(self.project), 1)
+
+        # Force rebuilds everything
+        self.assertEqual(Project.refresh_spatial_views(self.project, force=True), 2)
+
+    def test_orphaned_views_are_dropped(self):
+        Project.refresh_spatial_views(self.project)
+        self.items.pop()
+
+        self.assertEqual(Project.refresh_spatial_views(self.project), 0)
+        self.assertEqual(self._views(), {'vw_profiles_1'})
+
+        with sqlite3.connect(self.db_path) as conn:
+            fingerprints = {row[0] for row in conn.execute('SELECT view_name FROM spatial_view_fingerprints')}
+            registered = {row[0] for row in conn.execute('SELECT table_name FROM gpkg_geometry_columns')}
+        self.assertEqual(fingerprints, {'vw_profiles_1'})
+        self.assertEqual(registered, {'vw_profiles_1'})
+
+
+if __name__ == '__main__':
+    unittest.main()
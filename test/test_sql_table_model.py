@@ -0,0 +1,69 @@
+# coding=utf-8
+"""Tests for the paged SQLite table model."""
+
+import os
+import shutil
+import sqlite3
+import tempfile
+import unittest
+
+try:
+    from utilities import get_qgis_app
+except ImportError:
+    from .utilities import get_qgis_app
+
+get_qgis_app()
+
+from qgis.PyQt import QtCore
+
+try:
+    from src.model.sql_table_model import SqlTableModel
+except ImportError:
+    from qris_dev.src.model.sql_table_model import SqlTableModel
+
+COLUMNS = [('measurement_date', 'Measurement Date'), ('discharge', 'Discharge (CFS)')]
+
+
+class TestSqlTableModel(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.db_path = os.path.join(self.temp_dir, 'test.gpkg')
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute('CREATE TABLE stream_gage_discharges (fid INTEGER PRIMARY KEY, stream_gage_id INTEGER, measurement_date TEXT, discharge REAL)')
+            conn.executemany('INSERT INTO stream_gage_discharges (stream_gage_id, measurement_date, discharge) VALUES (?, ?, ?)',
+                             [(1, f'2000-01-{day:02d}', float(day)) for day in range(1, 32)] + [(2, '2000-01-01', 99.0)])
+            conn.commit()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def test_rows_are_fetched_in_pages(self):
+        model = SqlTableModel(self.db_path, 'stream_gage_discharges', COLUMNS, 'stream_gage_id = ?', [1], page_size=10)
+
+        self.assertEqual(model.rowCount(), 0)
+        self.assertEqual(model.total_rows, 31)
+        while model.canFetchMore():
+            model.fetchMore()
+        self.assertEqual(model.rowCount(), 31)
+        self.assertEqual(model.data(model.index(0, 0)), '2000-01-01')
+        self.assertEqual(model.headerData(1, QtCore.Qt.Horizontal), 'Discharge (CFS)')
+
+    def test_sort_and_filter_in_sql(self):
+        model = SqlTableModel(self.db_path, 'stream_gage_discharges', COLUMNS, 'stream_gage_id = ?', [1], page_size=5)
+        model.sort(1, QtCore.Qt.DescendingOrder)
+        model.fetchMore()
+        self.assertEqual(model.rowCount(), 5)
+        self.assertEqual(model.data(model.index(0, 1), QtCore.Qt.EditRole), 31.0)
+
+        model.set_filter('stream_gage_id = ? AND measurement_date < ?', [1, '2000-01-04'])
+        self.assertEqual(model.rowCount(), 0)
+        self.assertEqual(model.total_rows, 3)
+
+    def test_export_streams_the_full_query(self):
+        model = SqlTableModel(self.db_path, 'stream_gage_discharges', COLUMNS, 'stream_gage_id = ?', [2], page_size=5)
+        self.assertEqual(model.export_rows(['measurement_date', 'discharge (cfs)']), [{'measurement_date': '2000-01-01', 'discharge (cfs)': 99.0}])
+
+
+if __name__ == '__main__':
+    unittest.main()
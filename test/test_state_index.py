@@ -0,0 +1,92 @@
+# coding=utf-8
+"""Tests for the offline point in US state index."""
+
+import os
+import sys
+import threading
+import unittest
+
+try:
+    from utilities import get_qgis_app
+except ImportError:
+    from .utilities import get_qgis_app
+
+get_qgis_app()
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+plugin_root = os.path.dirname(current_dir)
+parent_root = os.path.dirname(plugin_root)
+
+if parent_root not in sys.path:
+    sys.path.insert(0, parent_root)
+
+from qris_dev.src.gp.state_index import StateIndex, find_state, get_state_index, STREAMSTATS_STATES, VICINITY_STATES
+
+RESOURCES = os.path.join(plugin_root, 'resources')
+
+# (latitude, longitude, state)
+LOCATIONS = [
+    (45.6770, -111.0429, 'MT'),  # Bozeman
+    (40.7608, -111.8910, 'UT'),  # Salt Lake City
+    (44.0521, -123.0868, 'OR'),  # Eugene
+    (35.0844, -106.6504, 'NM'),  # Albuquerque
+    (39.7392, -104.9903, 'CO'),  # Denver
+]
+
+
+class TestStateIndex(unittest.TestCase):
+
+    def test_streamstats_states(self):
+        index = StateIndex(os.path.join(RESOURCES, 'us_states.gpkg'), 'states')
+        self.assertFalse(index.loaded)
+
+        for latitude, longitude, abbr in LOCATIONS:
+            state = index.find(latitude, longitude)
+            self.assertEqual(state.abbr, abbr)
+            self.assertIsNotNone(state.status)
+
+        self.assertTrue(index.loaded)
+
+    def test_vicinity_states_are_projected(self):
+        index = StateIndex(os.path.join(RESOURCES, 'us_states_simplified.geojson'))
+
+        state = index.find(45.6770, -111.0429)
+
+        self.assertEqual(state.abbr, 'MT')
+        self.assertEqual(state.name, 'Montana')
+        self.assertIsNone(state.status)
+        self.assertIn('Albers', index.srs_wkt)
+        # Projected coordinates are in meters, not degrees
+        self.assertGreater(abs(state.geometry.bounds[0]), 180)
+
+    def test_outside_every_state(self):
+        index = StateIndex(os.path.join(RESOURCES, 'us_states.gpkg'), 'states')
+
+        self.assertIsNone(index.find(51.5072, -0.1276))  # London
+        self.assertIsNone(index.find(0.0, -140.0))  # Pacific Ocean
+
+    def test_shared_index(self):
+        self.assertIs(get_state_index(STREAMSTATS_STATES), get_state_index(STREAMSTATS_STATES))
+        self.assertIsNot(get_state_index(STREAMSTATS_STATES), get_state_index(VICINITY_STATES))
+
+        self.assertEqual(find_state('45.6770', '-111.0429').abbr, 'MT')
+        self.assertIsNone(find_state('not a number', -111.0429))
+
+    def test_concurrent_lookups_load_once(self):
+        index = StateIndex(os.path.join(RESOURCES, 'us_states.gpkg'), 'states')
+        results = {}
+
+        def lookup(latitude, longitude, abbr):
+            results[abbr] = index.find(latitude, longitude).abbr
+
+        threads = [threading.Thread(target=lookup, args=location) for location in LOCATIONS]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(results, {abbr: abbr for _latitude, _longitude, abbr in LOCATIONS})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,231 @@
+# coding=utf-8
+"""Tests for batch StreamStats delineation against a local stand-in service."""
+
+import os
+import sys
+import json
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+try:
+    from utilities import get_qgis_app
+except ImportError:
+    from .utilities import get_qgis_app
+
+get_qgis_app()
+
+from osgeo import ogr, osr
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+plugin_root = os.path.dirname(current_dir)
+parent_root = os.path.dirname(plugin_root)
+
+if parent_root not in sys.path:
+    sys.path.insert(0, parent_root)
+
+from qris_dev.src.gp import stream_stats
+from qris_dev.src.gp.stream_stats_batch import BatchPourPoint, StreamStatsCache, StreamStatsBatchTask, run_batch
+from qris_dev.src.model.pour_point import save_pour_points
+
+
+def watershed_response(rcode: str, lat: float, lon: float) -> dict:
+    polygon = {'type': 'Polygon', 'coordinates': [[[lon - 0.01, lat - 0.01], [lon + 0.01, lat - 0.01], [lon + 0.01, lat + 0.01], [lon - 0.01, lat + 0.01], [lon - 0.01, lat - 0.01]]]}
+    return {
+        'stateAbbreviation': rcode,
+        'bcrequest': {'wsresp': {'featurecollection': [[
+            {'name': 'globalwatershedpoint', 'feature': {'type': 'FeatureCollection', 'features': [{'type': 'Feature', 'geometry': {'type': 'Point', 'coordinates': [lon, lat]}}]}},
+            {'name': 'globalwatershed', 'feature': {'type': 'FeatureCollection', 'features': [{'type': 'Feature', 'geometry': polygon}]}},
+        ]]}},
+    }
+
+
+class StandInStreamStats(BaseHTTPRequestHandler):
+    """Answers delineation and basin characteristic requests. The first request for each latitude in fail_once returns 503."""
+
+    requests = []
+    fail_once = set()
+    lock = threading.Lock()
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, status: int, body):
+        data = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        with self.lock:
+            self.requests.append(('GET', url.path))
+        if url.path.startswith('/ss-delineate/v1/delineate/sshydro/'):
+            params = parse_qs(url.query)
+            lat, lon = float(params['lat'][0]), float(params['lon'][0])
+            with self.lock:
+                fail = lat in self.fail_once
+                self.fail_once.discard(lat)
+            if fail:
+                self.send_json(503, {'error': 'busy'})
+            else:
+                self.send_json(200, watershed_response(url.path.rsplit('/', 1)[-1], lat, lon))
+        else:
+            self.send_json(404, {'error': 'not found'})
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        with self.lock:
+            self.requests.append(('POST', url.path))
+        if url.path == '/ss-hydro/v1/basin-characteristics/calculate':
+            self.send_json(200, [{'code': 'DRNAREA', 'value': 12.5}])
+        else:
+            self.send_json(404, {'error': 'not found'})
+
+
+class TestStreamStatsBatch(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), StandInStreamStats)
+        cls.base_url = f'http://127.0.0.1:{cls.server.server_address[1]}'
+        cls.thread = threading.Thread(target=cls.server.serve_forever, daemon=True)
+        cls.thread.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        StandInStreamStats.requests = []
+        StandInStreamStats.fail_once = set()
+        self.backoff = stream_stats.RETRY_BACKOFF_SECONDS
+        stream_stats.RETRY_BACKOFF_SECONDS = 0.01
+
+    def tearDown(self):
+        stream_stats.RETRY_BACKOFF_SECONDS = self.backoff
+        shutil.rmtree(self.temp_dir)
+
+    def points(self):
+        return [
+            BatchPourPoint('Bozeman', 45.6770, -111.0429),
+            BatchPourPoint('Salt Lake City', 40.7608, -111.8910),
+            BatchPourPoint('Eugene', 44.0521, -123.0868),
+        ]
+
+    def create_project(self) -> str:
+        gpkg_path = os.path.join(self.temp_dir, 'project.gpkg')
+        srs = osr.SpatialReference()
+        srs.ImportFromEPSG(4326)
+        ds = ogr.GetDriverByName('GPKG').CreateDataSource(gpkg_path)
+        pour_points = ds.CreateLayer('pour_points', srs=srs, geom_type=ogr.wkbPoint)
+        for name, field_type in [('name', ogr.OFTString), ('latitude', ogr.OFTReal), ('longitude', ogr.OFTReal), ('description', ogr.OFTString),
+                                 ('basin_characteristics', ogr.OFTString), ('flow_statistics', ogr.OFTString), ('metadata', ogr.OFTString)]:
+            pour_points.CreateField(ogr.FieldDefn(name, field_type))
+        catchments = ds.CreateLayer('catchments', srs=srs, geom_type=ogr.wkbMultiPolygon)
+        catchments.CreateField(ogr.FieldDefn('pour_point_id', ogr.OFTInteger))
+        ds = None
+
+        with sqlite3.connect(gpkg_path) as conn:
+            conn.execute('CREATE TABLE spatial_view_fingerprints (view_name TEXT PRIMARY KEY, fingerprint TEXT NOT NULL, updated_on DATETIME DEFAULT CURRENT_TIMESTAMP)')
+        return gpkg_path
+
+    def count(self, gpkg_path: str, table_name: str) -> int:
+        with sqlite3.connect(gpkg_path) as conn:
+            return conn.execute(f'SELECT COUNT(*) FROM {table_name}').fetchone()[0]
+
+    def test_cache_key(self):
+        self.assertEqual(StreamStatsCache.key('mt', 45.677, -111.0429), 'MT_45.677000_-111.042900')
+
+    def test_batch_retries_and_caches(self):
+        StandInStreamStats.fail_once = {40.7608}
+        cache = StreamStatsCache(os.path.join(self.temp_dir, 'cache'))
+
+        points = run_batch(self.points(), True, False, cache, self.base_url, max_workers=2)
+
+        self.assertEqual([point.state_code for point in points], ['MT', 'UT', 'OR'])
+        for point in points:
+            self.assertIsNone(point.error)
+            self.assertIn('featurecollection', point.watershed_data)
+            self.assertEqual(point.basin_chars, {'parameters': [{'code': 'DRNAREA', 'value': 12.5}]})
+            self.assertFalse(point.cached)
+        # Three delineations plus one retry, and three basin characteristics
+        self.assertEqual(len([r for r in StandInStreamStats.requests if r[0] == 'GET']), 4)
+        self.assertEqual(len([r for r in StandInStreamStats.requests if r[0] == 'POST']), 3)
+
+        StandInStreamStats.requests = []
+        rerun = run_batch(self.points(), True, False, cache, self.base_url)
+
+        self.assertEqual(StandInStreamStats.requests, [])
+        self.assertTrue(all(point.cached for point in rerun))
+        self.assertEqual(cache.hits, 3)
+
+    def test_failures_do_not_stop_the_batch(self):
+        points = self.points() + [BatchPourPoint('London', 51.5072, -0.1276)]
+
+        run_batch(points, False, False, None, self.base_url)
+
+        self.assertIsNotNone(points[-1].error)
+        self.assertTrue(all(point.watershed_data is not None for point in points[:-1]))
+
+    def test_task_saves_in_one_transaction(self):
+        gpkg_path = self.create_project()
+        points = self.points() + [BatchPourPoint('London', 51.5072, -0.1276)]
+        task = StreamStatsBatchTask(gpkg_path, points, False, False, False, metadata={'site': 'test'}, cache_folder=os.path.join(self.temp_dir, 'cache'), base_url=self.base_url)
+
+        self.assertTrue(task.run())
+
+        self.assertEqual([pour_point.name for pour_point in task.pour_points], ['Bozeman', 'Salt Lake City', 'Eugene'])
+        self.assertEqual([point.name for point in task.failed], ['London'])
+        self.assertEqual(task.pour_points[0].state_code, 'MT')
+        self.assertEqual(task.pour_points[0].metadata['site'], 'test')
+        self.assertEqual(self.count(gpkg_path, 'pour_points'), 3)
+        self.assertEqual(self.count(gpkg_path, 'catchments'), 3)
+
+    def test_save_skips_malformed_catchments(self):
+        gpkg_path = self.create_project()
+        good = {'latitude': 45.677, 'longitude': -111.0429, 'catchment': stream_stats.delineate_watershed(45.677, -111.0429, 'MT', base_url=self.base_url),
+                'name': 'Good', 'description': None, 'basin_chars': None, 'flow_stats': None}
+        bad = dict(good, name='Bad', catchment={'featurecollection': []})
+        failures = []
+
+        saved = save_pour_points(gpkg_path, [bad, good], failures)
+
+        self.assertEqual([pour_point.name for pour_point in saved], ['Good'])
+        self.assertEqual([values['name'] for values, _message in failures], ['Bad'])
+        self.assertEqual(self.count(gpkg_path, 'pour_points'), 1)
+        self.assertEqual(self.count(gpkg_path, 'catchments'), 1)
+
+    def test_retry_wait_stops_when_canceled(self):
+        canceled = []
+
+        def fail(*args, **kwargs):
+            canceled.append(True)
+            raise stream_stats.requests.ConnectionError('offline')
+
+        original = stream_stats.requests.request
+        stream_stats.requests.request = fail
+        try:
+            start = time.monotonic()
+            with stream_stats.cancelable_requests(lambda: len(canceled) > 0):
+                with self.assertRaises(stream_stats.requests.ConnectionError):
+                    stream_stats.request_with_retry('GET', self.base_url, retries=3, backoff=30.0)
+        finally:
+            stream_stats.requests.request = original
+
+        # One attempt, then the 30 s wait is abandoned
+        self.assertEqual(len(canceled), 1)
+        self.assertLess(time.monotonic() - start, 5.0)
+
+if __name__ == '__main__':
+    unittest.main()
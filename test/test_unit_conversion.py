@@ -13,7 +13,10 @@ from qgis.core import QgsUnitTypes
 # Initialize QGIS app
 get_qgis_app()
 
-from qris_dev.src.lib.unit_conversion import short_unit_name, RatioUnit, distance_units
+import numpy as np
+
+from qris_dev.src.lib.unit_conversion import short_unit_name, RatioUnit, distance_units, convert_units, convert_count_per_length, convert_count_per_area, \
+    conversion_factor, metric_unit_factor, convert_column
 
 class TestUnitConversion(unittest.TestCase):
     
@@ -55,6 +58,38 @@ class TestUnitConversion(unittest.TestCase):
     def test_unknown_unit(self):
         """Test behavior for unknown unit."""
         self.assertEqual(short_unit_name("unknown_stuff"), "unknown_stuff")
+        with self.assertRaises(ValueError):
+            convert_units(1.0, "unknown_stuff", QgsUnitTypes.toString(QgsUnitTypes.DistanceMeters))
+
+    def test_scalar_conversions_use_factor_tables(self):
+        """The scalar helpers are multiplications by the cached factors."""
+        meters = QgsUnitTypes.toString(QgsUnitTypes.DistanceMeters)
+        feet = QgsUnitTypes.toString(QgsUnitTypes.DistanceFeet)
+        square_meters = QgsUnitTypes.toString(QgsUnitTypes.AreaSquareMeters)
+        hectares = QgsUnitTypes.toString(QgsUnitTypes.AreaHectares)
+        m_to_ft = QgsUnitTypes.fromUnitToUnitFactor(QgsUnitTypes.DistanceMeters, QgsUnitTypes.DistanceFeet)
+
+        self.assertAlmostEqual(conversion_factor(meters, feet), m_to_ft)
+        self.assertAlmostEqual(convert_units(10.0, meters, feet), 10.0 * m_to_ft)
+        self.assertAlmostEqual(convert_units(10.0, meters, feet, invert=True), 10.0 / m_to_ft)
+        self.assertAlmostEqual(convert_units(0.5, "ratio", "percent"), 50.0)
+        self.assertEqual(convert_units(7, meters, meters), 7)
+        self.assertIsNone(convert_units(None, meters, feet))
+        self.assertAlmostEqual(convert_count_per_length(10.0, meters, feet), 10.0 / m_to_ft)
+        self.assertAlmostEqual(convert_count_per_area(10.0, square_meters, hectares), 10.0 * 10000.0)
+
+        self.assertEqual(metric_unit_factor(meters, None), 1.0)
+        self.assertAlmostEqual(metric_unit_factor(meters, feet, 'distance'), 1.0 / m_to_ft)
+        self.assertAlmostEqual(metric_unit_factor(square_meters, hectares, 'area'), 10000.0)
+        self.assertAlmostEqual(metric_unit_factor(meters, feet, None, True), 1.0 / m_to_ft)
+
+    def test_convert_column(self):
+        """Columns convert in one multiplication with NaN for missing values."""
+        converted = convert_column([1.0, None, 3, 'text'], 2.0)
+        np.testing.assert_array_equal(converted, [2.0, np.nan, 6.0, np.nan])
+
+        converted = convert_column([1.0, 2.0], [0.5, 10.0])
+        np.testing.assert_array_equal(converted, [0.5, 20.0])
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,146 @@
+# coding=utf-8
+"""Tests for the background WAL checkpoint scheduler."""
+
+import os
+import sys
+import time
+import shutil
+import sqlite3
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from qris_dev.src.model.wal_checkpoint import CHECKPOINT_PASSIVE, CHECKPOINT_TRUNCATE, WalCheckpointScheduler
+
+
+class TestWalCheckpointScheduler(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.db_path = os.path.join(self.temp_dir, 'project.gpkg')
+        # Keep a connection open so that closing connections does not checkpoint the WAL
+        self.conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode = WAL')
+        self.conn.execute('PRAGMA wal_autocheckpoint = 0')
+        self.conn.execute('CREATE TABLE values_table (fid INTEGER PRIMARY KEY, value REAL)')
+        self.conn.commit()
+
+    def tearDown(self):
+        self.conn.close()
+        shutil.rmtree(self.temp_dir)
+
+    def write(self, rows: int = 100):
+        self.conn.executemany('INSERT INTO values_table (value) VALUES (?)', [(float(i),) for i in range(rows)])
+        self.conn.commit()
+
+    def test_not_due_without_writes(self):
+        scheduler = WalCheckpointScheduler(self.db_path, idle_seconds=0)
+        self.assertFalse(scheduler.pending)
+        self.assertFalse(scheduler.due())
+
+    def test_due_after_idle(self):
+        scheduler = WalCheckpointScheduler(self.db_path, idle_seconds=10)
+        scheduler.notify_write()
+
+        self.assertTrue(scheduler.pending)
+        self.assertFalse(scheduler.due())
+        self.assertTrue(scheduler.due(time.monotonic() + 11))
+
+    def test_due_when_wal_over_threshold(self):
+        self.write()
+        scheduler = WalCheckpointScheduler(self.db_path, wal_size_threshold=1, idle_seconds=60)
+        scheduler.notify_write()
+
+        self.assertGreater(scheduler.wal_size(), 0)
+        self.assertTrue(scheduler.due())
+
+    def test_passive_checkpoint(self):
+        self.write()
+        scheduler = WalCheckpointScheduler(self.db_path)
+        scheduler.notify_write()
+
+        result = scheduler.checkpoint(CHECKPOINT_PASSIVE)
+
+        self.assertTrue(result.complete)
+        self.assertGreater(result.wal_bytes_before, 0)
+        self.assertFalse(scheduler.pending)
+        self.assertEqual(scheduler.stats()['passive'], 1)
+
+    def test_truncate_empties_wal(self):
+        self.write()
+        scheduler = WalCheckpointScheduler(self.db_path)
+
+        result = scheduler.truncate()
+
+        self.assertEqual(result.mode, CHECKPOINT_TRUNCATE)
+        self.assertFalse(result.busy)
+        self.assertEqual(result.wal_bytes_after, 0)
+        self.assertEqual(scheduler.wal_size(), 0)
+        self.assertEqual(scheduler.stats()['truncate'], 1)
+
+    def test_write_during_checkpoint_stays_pending(self):
+        self.write()
+        scheduler = WalCheckpointScheduler(self.db_path)
+        scheduler.notify_write()
+        # A reader holding an open snapshot stops the checkpoint copying the later frames
+        reader = sqlite3.connect(self.db_path)
+        try:
+            reader.execute('BEGIN')
+            reader.execute('SELECT COUNT(*) FROM values_table').fetchone()
+            self.write()
+            scheduler.notify_write()
+
+            result = scheduler.checkpoint(CHECKPOINT_PASSIVE)
+        finally:
+            reader.rollback()
+            reader.close()
+
+        self.assertFalse(result.complete)
+        self.assertTrue(scheduler.pending)
+
+    def test_backs_off_while_reader_holds_snapshot(self):
+        self.write()
+        # A reader holding an open snapshot stops every checkpoint copying the later frames
+        reader = sqlite3.connect(self.db_path, check_same_thread=False)
+        try:
+            reader.execute('BEGIN')
+            reader.execute('SELECT COUNT(*) FROM values_table').fetchone()
+            self.write()
+
+            scheduler = WalCheckpointScheduler(self.db_path, idle_seconds=0.05, poll_seconds=0.01)
+            scheduler.start()
+            try:
+                scheduler.notify_write()
+                time.sleep(1.0)
+            finally:
+                scheduler.stop()
+
+            # Retried after 0.05, 0.1, 0.2 and 0.4 s rather than on every 0.01 s poll
+            stats = scheduler.stats()
+            self.assertTrue(scheduler.pending)
+            self.assertGreaterEqual(stats['passive'], 1)
+            self.assertLessEqual(stats['passive'], 6)
+            self.assertFalse(scheduler.due())
+        finally:
+            reader.rollback()
+            reader.close()
+
+    def test_background_thread_checkpoints_when_idle(self):
+        self.write()
+        scheduler = WalCheckpointScheduler(self.db_path, idle_seconds=0.05, poll_seconds=0.02)
+        scheduler.start()
+        try:
+            scheduler.notify_write()
+            deadline = time.monotonic() + 5
+            while scheduler.pending and time.monotonic() < deadline:
+                time.sleep(0.02)
+        finally:
+            scheduler.stop()
+
+        self.assertFalse(scheduler.pending)
+        self.assertGreaterEqual(scheduler.stats()['passive'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
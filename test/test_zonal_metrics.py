@@ -0,0 +1,145 @@
+"""Tests for the vectorized zonal vector metrics."""
+import unittest
+import os
+import shutil
+import tempfile
+import sys
+
+try:
+    from utilities import get_qgis_app
+except ImportError:
+    from .utilities import get_qgis_app
+
+get_qgis_app()
+
+from osgeo import ogr, osr, gdal
+gdal.UseExceptions()
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+plugin_root = os.path.dirname(current_dir)
+parent_root = os.path.dirname(plugin_root)
+
+if parent_root not in sys.path:
+    sys.path.insert(0, parent_root)
+
+from qris_dev.src.gp import zonal_metrics
+from qris_dev.src.gp.zonal_metrics import ZonalMetrics
+from qris_dev.src.model.sample_frame import SampleFrame
+
+UTM_EPSG = 26912
+
+
+def square(min_x, min_y, max_x, max_y):
+    return ogr.CreateGeometryFromWkt(f'POLYGON (({min_x} {min_y}, {max_x} {min_y}, {max_x} {max_y}, {min_x} {max_y}, {min_x} {min_y}))')
+
+
+class TestZonalMetrics(unittest.TestCase):
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.gpkg_path = os.path.join(self.test_dir, 'project.gpkg')
+
+        self.srs = osr.SpatialReference()
+        self.srs.ImportFromEPSG(4326)
+        self.srs.SetAxisMappingStrategy(osr.OAMS_TRADITIONAL_GIS_ORDER)
+
+        ds = ogr.GetDriverByName('GPKG').CreateDataSource(self.gpkg_path)
+        frames = ds.CreateLayer('sample_frame_features', srs=self.srs, geom_type=ogr.wkbPolygon)
+        frames.CreateField(ogr.FieldDefn('sample_frame_id', ogr.OFTInteger))
+        frames.CreateField(ogr.FieldDefn('display_label', ogr.OFTString))
+        for label, geom in [('Upstream', square(-111.0, 45.0, -110.99, 45.01)), ('Downstream', square(-110.99, 45.0, -110.98, 45.01))]:
+            feature = ogr.Feature(frames.GetLayerDefn())
+            feature.SetField('sample_frame_id', 1)
+            feature.SetField('display_label', label)
+            feature.SetGeometry(geom)
+            frames.CreateFeature(feature)
+
+        points = ds.CreateLayer('points', srs=self.srs, geom_type=ogr.wkbPoint)
+        points.CreateField(ogr.FieldDefn('name', ogr.OFTString))
+        for x, y in [(-110.995, 45.002), (-110.995, 45.005), (-110.995, 45.008), (-110.985, 45.005), (-110.9, 45.005)]:
+            feature = ogr.Feature(points.GetLayerDefn())
+            feature.SetField('name', 'point')
+            feature.SetGeometry(ogr.CreateGeometryFromWkt(f'POINT ({x} {y})'))
+            points.CreateFeature(feature)
+
+        self.line = ogr.CreateGeometryFromWkt('LINESTRING (-110.998 45.005, -110.982 45.005)')
+        lines = ds.CreateLayer('lines', srs=self.srs, geom_type=ogr.wkbLineString)
+        feature = ogr.Feature(lines.GetLayerDefn())
+        feature.SetGeometry(self.line)
+        lines.CreateFeature(feature)
+
+        self.polygon = square(-110.998, 45.002, -110.996, 45.004)
+        polygons = ds.CreateLayer('polygons', srs=self.srs, geom_type=ogr.wkbPolygon)
+        feature = ogr.Feature(polygons.GetLayerDefn())
+        feature.SetGeometry(self.polygon)
+        polygons.CreateFeature(feature)
+        ds = None
+
+        self.mask = SampleFrame(1, 'Test', None)
+        self.metrics = ZonalMetrics(self.gpkg_path, self.mask, [])
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def utm(self, geom):
+        utm_srs = osr.SpatialReference()
+        utm_srs.ImportFromEPSG(UTM_EPSG)
+        utm_srs.SetAxisMappingStrategy(osr.OAMS_TRADITIONAL_GIS_ORDER)
+        geom = geom.Clone()
+        geom.Transform(osr.CoordinateTransformation(self.srs, utm_srs))
+        return geom
+
+    def process(self, layer_name):
+        return self.metrics.process_vector({'name': layer_name, 'type': 'vector', 'url': f'{self.gpkg_path}|layername={layer_name}'})
+
+    def by_label(self, metrics):
+        return {self.metrics.polygons[polygon_id]['display_label']: values for polygon_id, values in metrics.items()}
+
+    def test_point_counts(self):
+        metrics = self.by_label(self.process('points'))
+
+        self.assertEqual(metrics['Upstream'], {'count': 3})
+        self.assertEqual(metrics['Downstream'], {'count': 1})
+
+    def test_line_length_split_across_polygons(self):
+        metrics = self.by_label(self.process('lines'))
+
+        self.assertEqual(metrics['Upstream']['count'], 1)
+        self.assertEqual(metrics['Downstream']['count'], 1)
+        self.assertNotIn('area (m²)', metrics['Upstream'])
+        total = metrics['Upstream']['length (m)'] + metrics['Downstream']['length (m)']
+        self.assertAlmostEqual(total, self.utm(self.line).Length(), places=3)
+
+    def test_polygon_area(self):
+        metrics = self.by_label(self.process('polygons'))
+
+        self.assertEqual(metrics['Downstream'], {'count': 0})
+        self.assertAlmostEqual(metrics['Upstream']['area (m²)'], self.utm(self.polygon).GetArea(), places=3)
+
+    def test_chunks_match_single_pass(self):
+        expected = self.process('points')
+
+        chunk_size = zonal_metrics.VECTOR_CHUNK_SIZE
+        zonal_metrics.VECTOR_CHUNK_SIZE = 2
+        try:
+            chunked = self.process('points')
+        finally:
+            zonal_metrics.VECTOR_CHUNK_SIZE = chunk_size
+
+        self.assertEqual(chunked, expected)
+
+    def test_process_layer_canceled(self):
+        layer_def = {'name': 'points', 'type': 'vector', 'url': f'{self.gpkg_path}|layername=points'}
+
+        chunk_size = zonal_metrics.VECTOR_CHUNK_SIZE
+        zonal_metrics.VECTOR_CHUNK_SIZE = 2
+        try:
+            self.assertIsNone(self.metrics.process_layer(layer_def, lambda: True))
+        finally:
+            zonal_metrics.VECTOR_CHUNK_SIZE = chunk_size
+
+        self.assertEqual(self.metrics.process_layer(layer_def, lambda: False), self.process('points'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -11,7 +11,7 @@ gdal.UseExceptions()
 import sys
 # Add the parent directory to sys.path so we can import 'qris_dev' as a package
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
-from qris_dev.src.gp.zonal_statistics import zonal_statistics
+from qris_dev.src.gp.zonal_statistics import zonal_statistics, categorical_zonal_statistics, cell_areas
 
 from utilities import get_qgis_app
 
@@ -124,5 +124,72 @@ class TestZonalStatistics(unittest.TestCase):
     #     self.assertAlmostEqual(stats['mean'], 20)
     #     self.assertAlmostEqual(stats['sum'], 500)
 
+
+class TestCategoricalZonalStatistics(unittest.TestCase):
+
+    def setUp(self):
+        get_qgis_app()
+        self.test_dir = tempfile.mkdtemp()
+        self.raster_path = os.path.join(self.test_dir, 'land_cover.tif')
+
+        # 10 x 10 cells of 10 m. Class 1 in the west half, class 2 in the east half, one no data cell.
+        ds = gdal.GetDriverByName('GTiff').Create(self.raster_path, 10, 10, 1, gdal.GDT_Byte, options=['BLOCKYSIZE=3'])
+        ds.SetGeoTransform((500000, 10, 0, 5000100, 0, -10))
+        srs = osr.SpatialReference()
+        srs.ImportFromEPSG(26912)
+        ds.SetProjection(srs.ExportToWkt())
+        self.wkt = srs.ExportToWkt()
+
+        data = np.ones((10, 10), dtype=np.uint8)
+        data[:, 5:] = 2
+        data[0, 0] = 0
+        band = ds.GetRasterBand(1)
+        band.WriteArray(data)
+        band.SetNoDataValue(0)
+        band.FlushCache()
+        ds = None
+
+    def tearDown(self):
+        if os.path.exists(self.test_dir):
+            shutil.rmtree(self.test_dir)
+
+    def zone(self, min_x, max_x):
+        geom = ogr.CreateGeometryFromWkt(f'POLYGON (({min_x} 5000000, {max_x} 5000000, {max_x} 5000100, {min_x} 5000100, {min_x} 5000000))')
+        srs = osr.SpatialReference()
+        srs.ImportFromWkt(self.wkt)
+        geom.AssignSpatialReference(srs)
+        return geom
+
+    def test_class_counts_and_areas(self):
+        zones = {'west': self.zone(500000, 500050), 'east': self.zone(500050, 500100), 'middle': self.zone(500030, 500070)}
+
+        # The middle zone is rasterized last so it takes the cells it shares with the others
+        stats = categorical_zonal_statistics(self.raster_path, zones)
+
+        self.assertEqual(stats['west'], {1: {'count': 29, 'area': 2900.0}})
+        self.assertEqual(stats['east'], {2: {'count': 30, 'area': 3000.0}})
+        self.assertEqual(stats['middle'], {1: {'count': 20, 'area': 2000.0}, 2: {'count': 20, 'area': 2000.0}})
+
+    def test_zone_outside_raster(self):
+        stats = categorical_zonal_statistics(self.raster_path, {'outside': self.zone(600000, 600050)})
+        self.assertEqual(stats, {'outside': {}})
+
+    def test_no_zones(self):
+        self.assertEqual(categorical_zonal_statistics(self.raster_path, {}), {})
+
+    def test_canceled(self):
+        self.assertIsNone(categorical_zonal_statistics(self.raster_path, {'west': self.zone(500000, 500050)}, lambda: True))
+
+    def test_geographic_cell_areas(self):
+        srs = osr.SpatialReference()
+        srs.ImportFromEPSG(4326)
+
+        # One degree cells at the equator and at 60 degrees north
+        areas = cell_areas((0, 1, 0, 61, 0, -1), srs, 0, 61)
+
+        self.assertAlmostEqual(areas[-1] / 1e6, 12364, delta=20)
+        self.assertAlmostEqual(areas[0] / areas[-1], 0.4924, places=3)
+
+
 if __name__ == "__main__":
     unittest.main()